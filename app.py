@@ -10,19 +10,24 @@ import pytz
 import random
 import uuid
 from urllib.parse import urlencode, quote
-import logging
-from logging.handlers import RotatingFileHandler
+from app_logging import get_logger, log_timing
 from auth import validate_token
 import json
-import smtplib
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-import ollama
-import difflib
 from decimal import Decimal
 from constants import (ACCESS_TO_BUTTON,log_activity, connect_db, connect_ijisem_db, connect_ict_db, 
                        clean_old_logs, get_page_url, VALID_SUBJECTS, get_ready_to_print_books, get_reprint_eligible_books,
-                       get_total_unread_count, check_ready_to_print, fetch_tags, show_book_details, fetch_all_book_authors, fetch_all_printeditions)
+                       get_total_unread_count, check_ready_to_print, fetch_tags, show_book_details, fetch_all_book_authors, fetch_all_printeditions,
+                       with_payment_ledger, invalidate_payment_ledger, invalidate_stock_ledger)
+from operations_sheet import mark_operations_dirty
+from delivery_books import refresh_books_latest_batch
+from migrations import require_schema
+from outbox import queue_email, wake_outbox, get_outbox
+from book_enrichment import enrich_title
+from author_directory import get_author_directory, author_label, add_author, mark_authors_dirty
+from dimensions import get_dimension, invalidate_columns
+from book_tags import sync_book_tags, invalidate_tags
+from file_downloads import download_file_button, forget_file
+from uploads import store_upload, release_upload, thumbnail_for
 
 ####################################################################################################################
 ##################################--------------- Logs ----------------------------#################################
@@ -34,25 +39,8 @@ from datetime import datetime
 ist = pytz.timezone('Asia/Kolkata')
 ist_time = datetime.now(ist)
 
-# Custom filter to exclude watchdog logs
-class NoWatchdogFilter(logging.Filter):
-    def filter(self, record):
-        return not record.name.startswith('watchdog')
-
-# Configure logging
-logger = logging.getLogger('streamlit_app')
-logger.setLevel(logging.DEBUG)
-
-# Remove any existing handlers to avoid duplicate logs
-logger.handlers = []
-
-# Create a rotating file handler (max 1MB, keep 3 backups)
-handler = RotatingFileHandler('streamlit.log', maxBytes=1_000_000, backupCount=3)
-handler.setLevel(logging.DEBUG)
-formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-handler.setFormatter(formatter)
-handler.addFilter(NoWatchdogFilter())
-logger.addHandler(handler)
+# Logging is set up once per process (queue + JSON file writer, see app_logging.py)
+logger = get_logger("main")
 
 ########################################################################################################################
 ##################################--------------- Page Config ----------------------------#############################
@@ -150,6 +138,8 @@ st.cache_data.clear()
 
 # Connect to MySQL
 conn = connect_db()
+require_schema("mysql")  # once per process, see migrations.py
+get_outbox()  # start the mail sender so messages queued before a restart go out
 ijisem_conn = connect_ijisem_db()
 ict_conn = connect_ict_db()
 
@@ -1132,68 +1122,26 @@ def pending_checklist_dialog(conn):
 # Dialog for managing authors
 @st.dialog("Manage Authors", width="medium", on_dismiss = 'rerun')
 def edit_author_detail(conn):
-    # Ensure columns exist
-    try:
-        with conn.session as s:
-            s.execute(text("SELECT about_author, author_photo FROM authors LIMIT 1"))
-    except Exception:
-        # Columns likely missing, add them
-        try:
-            with conn.session as s:
-                try:
-                    s.execute(text("ALTER TABLE authors ADD COLUMN about_author TEXT"))
-                except Exception:
-                    pass
-                try:
-                    s.execute(text("ALTER TABLE authors ADD COLUMN author_photo TEXT"))
-                except Exception:
-                    pass
-                s.commit()
-        except Exception as e:
-             st.error(f"Error updating database schema: {e}")
-
-    # Ensure book_authors delivery columns exist
-    try:
-        with conn.session as s:
-            s.execute(text("SELECT address_line1, city_del FROM book_authors LIMIT 1"))
-    except Exception:
-        try:
-            with conn.session as s:
-                s.execute(text("ALTER TABLE book_authors ADD COLUMN address_line1 TEXT"))
-                s.execute(text("ALTER TABLE book_authors ADD COLUMN address_line2 TEXT"))
-                s.execute(text("ALTER TABLE book_authors ADD COLUMN city_del VARCHAR(255)"))
-                s.execute(text("ALTER TABLE book_authors ADD COLUMN state_del VARCHAR(255)"))
-                s.execute(text("ALTER TABLE book_authors ADD COLUMN pincode VARCHAR(20)"))
-                s.execute(text("ALTER TABLE book_authors ADD COLUMN country VARCHAR(100) DEFAULT 'India'"))
-                s.commit()
-        except Exception as e:
-            st.error(f"Error updating book_authors schema: {e}")
-
-    # Fetch all authors from database
-    with conn.session as s:
-        authors = s.execute(
-            text("SELECT author_id, name, email, phone, about_author, author_photo FROM authors ORDER BY name")
-        ).fetchall()
-    
-    if not authors:
-        st.error("❌ No authors found in database.")
-        return
-
-    # Convert to dictionary for easier handling
-    author_dict = {f"{author.name} (ID: {author.author_id})": author for author in authors}
-    author_options = list(author_dict.keys())
-
     st.markdown("### Author List", unsafe_allow_html=True)
     with st.container(border=True):
         # Author selection
-        selected_author_name = st.selectbox(
-            "Select Author",
-            options=author_options,
-            key="author_select",
+        selected_author_name = author_select(
+            conn, "Select Author", key="author_select", new_option=None,
             help="Select an author to edit or delete"
         )
-        
-        selected_author = author_dict[selected_author_name]
+        if not selected_author_name:
+            st.error("❌ No authors found in database.")
+            return
+
+        # Full row for the chosen author only
+        with conn.session as s:
+            selected_author = s.execute(
+                text("SELECT author_id, name, email, phone, about_author, author_photo FROM authors WHERE author_id = :author_id"),
+                {"author_id": int(selected_author_name.split('(ID: ')[1][:-1])}
+            ).fetchone()
+        if not selected_author:
+            st.error("❌ Author not found. It may have been deleted.")
+            return
         # Highlight author ID with green color
         st.markdown(
             f"#### Selected ID: <span style='color: #2196F3; font-weight: bold;'>{selected_author.author_id}</span>",
@@ -1239,16 +1187,8 @@ def edit_author_detail(conn):
 
         if current_photo:
             st.success(f"Current Photo Available")
-            if os.path.exists(current_photo):
-                with open(current_photo, "rb") as file:
-                    st.download_button(
-                        label="⬇️ Download Current Photo",
-                        data=file,
-                        file_name=os.path.basename(current_photo),
-                        mime="image/jpeg",
-                         key=f"dl_{selected_author.author_id}"
-                    )
-            else:
+            if not download_file_button("⬇️ Download Current Photo", current_photo, mime="image/jpeg",
+                                        key=f"dl_{selected_author.author_id}"):
                  st.warning("⚠️ Photo file record exists but file not found on server.")
 
         btn_col1, btn_col2 = st.columns([3, 1])
@@ -1277,19 +1217,7 @@ def edit_author_detail(conn):
                         photo_path = current_photo
                         if uploaded_photo:
                             try:
-                                file_extension = os.path.splitext(uploaded_photo.name)[1]
-                                # Use author name and ID for filename
-                                author_name_clean = selected_author.name.replace(" ", "_").replace("/", "_").replace("\\", "_")
-                                unique_filename = f"{author_name_clean}_{selected_author.author_id}{file_extension}"
-                                save_path = os.path.join(AUTHOR_PHOTO_UPLOAD_DIR, unique_filename)
-                                
-                                if not os.path.exists(AUTHOR_PHOTO_UPLOAD_DIR):
-                                    os.makedirs(AUTHOR_PHOTO_UPLOAD_DIR)
-                                    
-                                with open(save_path, "wb") as f:
-                                    f.write(uploaded_photo.getbuffer())
-                                
-                                photo_path = save_path
+                                photo_path = store_upload(uploaded_photo, AUTHOR_PHOTO_UPLOAD_DIR)
                                 changes.append("Updated Author Photo")
                             except Exception as e:
                                 st.error(f"Failed to upload photo: {e}")
@@ -1297,6 +1225,10 @@ def edit_author_detail(conn):
 
                         try:
                             with conn.session as s:
+                                previous_photo = s.execute(
+                                    text("SELECT author_photo FROM authors WHERE author_id = :author_id"),
+                                    {"author_id": selected_author.author_id}
+                                ).scalar()
                                 s.execute(
                                     text("""
                                         UPDATE authors 
@@ -1317,6 +1249,10 @@ def edit_author_detail(conn):
                                     }
                                 )
                                 s.commit()
+                            mark_authors_dirty(selected_author.author_id)
+                            # Identical photos share a file, so only drop the old one if nothing else uses it
+                            if previous_photo and previous_photo != photo_path:
+                                release_upload(conn, "author_photo", previous_photo)
                             # Log changes if any
                             if changes:
                                 log_activity(
@@ -1366,6 +1302,8 @@ def edit_author_detail(conn):
                                     {"author_id": selected_author.author_id}
                                 )
                                 s.commit()
+                            mark_authors_dirty(selected_author.author_id)
+                            release_upload(conn, "author_photo", current_photo)
                             # Log deletion
                             log_activity(
                                 conn,
@@ -1472,111 +1410,6 @@ def activity_summary_dialog(conn):
 ###################################################################################################################################
 
 
-# Predefined list of educational subjects
-VALID_SUBJECTS = [
-    "Mathematics", "Physics", "Chemistry", "Biology", "Computer Science",
-    "History", "Geography", "Literature", "Economics", "Business Studies",
-    "Political Science", "Sociology", "Psychology", "Engineering", "Medicine",
-    "Education", "General Science", "Management", "Marketing", "Medical", "Self Help", 
-    "Physical Education", "Commerce", "Law", "Social Science"
-]
-
-def find_closest_subject(suggested_subject):
-    """Map suggested subject to the closest predefined subject."""
-    if not suggested_subject:
-        return "General Science"
-    
-    # Normalize and find closest match
-    suggested_subject = suggested_subject.strip().lower()
-    valid_subjects_lower = [s.lower() for s in VALID_SUBJECTS]
-    
-    # Exact match
-    if suggested_subject in valid_subjects_lower:
-        return VALID_SUBJECTS[valid_subjects_lower.index(suggested_subject)]
-    
-    # Find closest match using difflib
-    closest = difflib.get_close_matches(suggested_subject, valid_subjects_lower, n=1, cutoff=0.6)
-    if closest:
-        return VALID_SUBJECTS[valid_subjects_lower.index(closest[0])]
-    
-    # Fallback
-    return "General Science"
-
-def generate_subject_with_ollama(book_title):
-    """Generate a single concise subject using the Ollama gemma3:1b model."""
-    try:
-        prompt = f"""
-        You are a book categorization assistant. Based on the book title, suggest a single, concise subject that best describes the book's educational content. The subject must be one of the following: {', '.join(VALID_SUBJECTS)}. Return only the subject name with no additional text or formatting.
-
-        Book Title: {book_title}
-
-        Example output: Physics
-        """
-        response = ollama.generate(model="gemma3:1b", prompt=prompt)
-        raw_response = response['response'].strip()
-        
-        # Clean and map to valid subject
-        subject = find_closest_subject(raw_response)
-        
-        if subject == "General Science" and raw_response and raw_response.lower() not in [s.lower() for s in VALID_SUBJECTS]:
-            st.warning(f"No valid subject generated for '{book_title}'. Using fallback: General Science")
-        
-        return subject
-    except Exception as e:
-        st.error(f"Error generating subject for '{book_title}' with gemma3:1b: {str(e)}")
-        return "General Science"  # Fallback on error
-
-def generate_tags_with_ollama(book_title):
-    """Generate tags using the Ollama gemma3:1b model and clean the output."""
-    try:
-        prompt = f"""
-        You are a book tagging assistant for a book management system. 
-        Based only on the given book title, generate exactly 3 to 4 concise and highly relevant tags. 
-
-        Rules:
-        - Tags must be single words or short phrases (max 2 words). 
-        - Do not add filler or generic tags like 'book', 'novel', 'story', 'interesting', 'popular'.
-        - Only return a comma-separated list with exactly 3 to 4 tags, no extra text.
-
-        Book Title: {book_title}
-
-        Example output: Social Security,AI,Machine Learning,Tourism,Management
-        """
-        response = ollama.generate(model="gemma3:1b", prompt=prompt)
-        raw_response = response['response'].strip()
-        
-        # Clean the output to extract only comma-separated tags
-        if raw_response.startswith("here are the tags") or "*" in raw_response or "-" in raw_response:
-            lines = raw_response.split("\n")
-            tags = []
-            for line in lines:
-                line = line.strip()
-                if line.startswith("*") or line.startswith("-"):
-                    tags.append(line.lstrip("*- ").strip())
-                elif "," in line:
-                    tags.extend([tag.strip() for tag in line.split(",") if tag.strip()])
-        else:
-            tags = [tag.strip() for tag in raw_response.split(",") if tag.strip()]
-        
-        # Ensure 3 to 4 tags: trim or pad with fallbacks
-        tags = list(dict.fromkeys([tag.lower() for tag in tags if tag]))  # Remove duplicates and lowercase
-        if len(tags) > 4:
-            tags = tags[:4]  # Take first 4
-        elif len(tags) < 3:
-            # Fallback tags if insufficient
-            fallback_tags = ["general", "education", "literature", "academic"]
-            tags.extend(fallback_tags[:4 - len(tags)])  # Pad to 3 or 4
-        
-        if not tags:
-            st.warning(f"No valid tags generated by gemma3:1b for '{book_title}'.")
-            return []
-        
-        return tags
-    except Exception as e:
-        st.error(f"Failed to generate tags with gemma3:1b for '{book_title}': {str(e)}")
-        return []
-    
-
 agph_email = st.secrets["agph_mail"]["EMAIL_ADDRESS"]
 cipher_email = st.secrets["cipher_mail"]["EMAIL_ADDRESS"]
 ag_volumes_email = st.secrets["ag_volumes_mail"]["EMAIL_ADDRESS"]
@@ -1607,20 +1440,20 @@ PUBLISHER_CONFIG = {
     },
 }
 
-def send_welcome_email(to_email, author_name, author_phone, book_title, book_id, author_id, author_position, publisher="AGPH"):
+def queue_welcome_email(to_email, author_name, author_phone, book_title, book_id, author_id, author_position, publisher="AGPH", session=None):
     """
-    Sends a formatted HTML welcome email.
-    Dynamically switches between SMTP_SSL (Port 465) and STARTTLS (Port 587).
-    Returns: (bool, str) -> (Success Status, Sender Email Address)
+    Queues a formatted HTML welcome email in the outbox (see outbox.py).
+    Pass session to queue it inside the caller's transaction.
+    Returns the email_queue id, or None when it could not be queued.
     """
     if not to_email:
-        return False, None
+        return None
     
     # 1. Load Configuration
     config = PUBLISHER_CONFIG.get(publisher, PUBLISHER_CONFIG.get("AGPH"))
     if not config:
         st.error(f"Configuration for publisher '{publisher}' not found.")
-        return False, None
+        return None
 
     pub_name = config.get("name")
     pub_email = config.get("email")
@@ -1631,20 +1464,13 @@ def send_welcome_email(to_email, author_name, author_phone, book_title, book_id,
     smtp_port = config.get("smtp_port", 587)
 
     try:
-        # 2. Load Credentials
-        if secret_section in st.secrets:
-            secrets_source = st.secrets[secret_section]
-            email_address = secrets_source["EMAIL_ADDRESS"]
-            email_password = secrets_source["EMAIL_PASSWORD"]
-        else:
+        # 2. Check Credentials
+        if secret_section not in st.secrets:
             st.error(f"Secrets section '{secret_section}' not found.")
-            return False, None
+            return None
 
         # 3. Construct Email
-        msg = MIMEMultipart("alternative")
-        msg['From'] = email_address
-        msg['To'] = to_email
-        msg['Subject'] = f"Publication Confirmation - {book_title} | {pub_name}"
+        subject = f"Publication Confirmation - {book_title} | {pub_name}"
 
         # HTML Body (Professional solid color header - deep blue)
         html_body = f"""
@@ -1738,35 +1564,28 @@ def send_welcome_email(to_email, author_name, author_phone, book_title, book_id,
           </body>
         </html>
         """
-        msg.attach(MIMEText(html_body, 'html'))
-
-        # 4. Connect to Server (Logic Branch for SSL vs TLS)
-        # Port 465 = SSL (Hostinger), Port 587 = TLS (Gmail)
-        
-        if smtp_port == 465:
-            # SSL Connection (Hostinger)
-            with smtplib.SMTP_SSL(smtp_server, smtp_port) as server:
-                server.login(email_address, email_password)
-                server.send_message(msg)
-        else:
-            # TLS Connection (Gmail)
-            with smtplib.SMTP(smtp_server, smtp_port) as server:
-                server.starttls()
-                server.login(email_address, email_password)
-                server.send_message(msg)
-            
-        return True, email_address
+        # 4. Queue it; the outbox sender owns SMTP, retries and email_history
+        return queue_email(
+            to_email, subject, html_body, secret_section, smtp_server, smtp_port,
+            book_id=book_id, book_title=book_title,
+            history_details=f"Author: {author_name}, Position: {author_position}",
+            activity=("sent welcome email", f"To: {author_name} ({to_email}), Book ID: {book_id}"),
+            on_sent=("welcome_mail_sent", {"book_id": book_id, "author_id": author_id}),
+            session=session,
+        )
 
     except Exception as e:
-        st.error(f"Failed to send email to {to_email} via {publisher}: {str(e)}")
-        return False, None
+        st.error(f"Failed to queue email to {to_email} via {publisher}: {str(e)}")
+        return None
 
-def send_isbn_email(to_email, author_name, book_title, book_id, isbn, publisher="AGPH"):
+def queue_isbn_email(to_email, author_name, book_title, book_id, isbn, book_author_id, publisher="AGPH"):
     """
-    Sends a formatted HTML email with the received ISBN.
+    Queues a formatted HTML email with the received ISBN. book_author_id is the
+    book_authors row whose isbn_sent_at is stamped once it has been sent.
+    Returns the email_queue id, or None when it could not be queued.
     """
     if not to_email or not isbn:
-        return False, None
+        return None
     
     config = PUBLISHER_CONFIG.get(publisher, PUBLISHER_CONFIG.get("AGPH"))
     pub_name = config.get("name")
@@ -1776,17 +1595,10 @@ def send_isbn_email(to_email, author_name, book_title, book_id, isbn, publisher=
     smtp_port = config.get("smtp_port", 587)
 
     try:
-        if secret_section in st.secrets:
-            secrets_source = st.secrets[secret_section]
-            email_address = secrets_source["EMAIL_ADDRESS"]
-            email_password = secrets_source["EMAIL_PASSWORD"]
-        else:
-            return False, None
+        if secret_section not in st.secrets:
+            return None
 
-        msg = MIMEMultipart("alternative")
-        msg['From'] = email_address
-        msg['To'] = to_email
-        msg['Subject'] = f"ISBN Received - {book_title} | {pub_name}"
+        subject = f"ISBN Received - {book_title} | {pub_name}"
 
         html_body = f"""
         <html>
@@ -1861,66 +1673,16 @@ def send_isbn_email(to_email, author_name, book_title, book_id, isbn, publisher=
           </body>
         </html>
         """
-        msg.attach(MIMEText(html_body, 'html'))
-
-        if smtp_port == 465:
-            with smtplib.SMTP_SSL(smtp_server, smtp_port) as server:
-                server.login(email_address, email_password)
-                server.send_message(msg)
-        else:
-            with smtplib.SMTP(smtp_server, smtp_port) as server:
-                server.starttls()
-                server.login(email_address, email_password)
-                server.send_message(msg)
-            
-        # Log to email_history
-        try:
-            with connect_db().session as s_log:
-                s_log.execute(
-                    text("""
-                        INSERT INTO email_history (timestamp, recipient, sender_email, status, book_id, book_title, triggered_by, details)
-                        VALUES (:timestamp, :recipient, :sender, :status, :book_id, :title, :user, :details)
-                    """),
-                    {
-                        "timestamp": datetime.now(ist),
-                        "recipient": to_email,
-                        "sender": email_address,
-                        "status": "Sent",
-                        "book_id": book_id,
-                        "title": book_title,
-                        "user": st.session_state.get("username", "System"),
-                        "details": f"ISBN Email sent successfully with ISBN: {isbn}"
-                    }
-                )
-                s_log.commit()
-        except Exception:
-            pass
-
-        return True, email_address
+        return queue_email(
+            to_email, subject, html_body, secret_section, smtp_server, smtp_port,
+            book_id=book_id, book_title=book_title,
+            history_details=f"ISBN Email sent with ISBN: {isbn}",
+            activity=("sent isbn email", f"ISBN: {isbn}, Recipient: {author_name} ({to_email}), Book: {book_id}"),
+            on_sent=("isbn_sent_at", {"id": book_author_id}),
+        )
     except Exception as e:
-        # Log failure to email_history
-        try:
-            with connect_db().session as s_log:
-                s_log.execute(
-                    text("""
-                        INSERT INTO email_history (timestamp, recipient, sender_email, status, book_id, book_title, triggered_by, details)
-                        VALUES (:timestamp, :recipient, :sender, :status, :book_id, :title, :user, :details)
-                    """),
-                    {
-                        "timestamp": datetime.now(ist),
-                        "recipient": to_email,
-                        "sender": email_address if 'email_address' in locals() else "N/A",
-                        "status": "Failed",
-                        "book_id": book_id,
-                        "title": book_title,
-                        "user": st.session_state.get("username", "System"),
-                        "details": f"Error: {str(e)}"
-                    }
-                )
-                s_log.commit()
-        except Exception:
-            pass
-        return False, str(e)
+        st.error(f"Failed to queue ISBN email to {to_email}: {str(e)}")
+        return None
 
 @st.dialog("Add New Book", width="large", on_dismiss = 'rerun')
 def add_book_dialog(conn):
@@ -2054,21 +1816,6 @@ def add_book_dialog(conn):
         else:
             st.session_state.authors = [ensure_author_fields(author) for author in st.session_state.authors]
 
-        def get_unique_agents_and_consultants(conn):
-            with conn.session as s:
-                try:
-                    agent_query = text("SELECT DISTINCT corresponding_agent FROM book_authors WHERE corresponding_agent IS NOT NULL AND corresponding_agent != '' ORDER BY corresponding_agent")
-                    agents = [row[0] for row in s.execute(agent_query).fetchall()]
-                    consultant_query = text("SELECT DISTINCT publishing_consultant FROM book_authors WHERE publishing_consultant IS NOT NULL AND publishing_consultant != '' ORDER BY publishing_consultant")
-                    consultants = [row[0] for row in s.execute(consultant_query).fetchall()]
-                    return agents, consultants
-                except Exception as e:
-                    st.error(f"Error fetching agents/consultants: {e}")
-                    st.toast(f"Error fetching agents/consultants: {e}", icon="❌", duration="long")
-                    return [], []
-
-        all_authors = get_all_authors(conn)
-        author_options = ["Add New Author"] + [f"{a.name} (ID: {a.author_id})" for a in all_authors]
         unique_agents, unique_consultants = get_unique_agents_and_consultants(conn)
 
         agent_options = ["Select Agent"] + ["Add New..."] + unique_agents 
@@ -2097,9 +1844,8 @@ def add_book_dialog(conn):
                     if disabled:
                         st.warning(f"Cannot add Author {i+1}. Maximum allowed authors: {max_authors} for {author_type} author type.")
                     else:
-                        selected_author = st.selectbox(
-                            f"Select Author {i+1}",
-                            author_options,
+                        selected_author = author_select(
+                            conn, f"Select Author {i+1}",
                             key=f"author_select_{i}",
                             help="Select an existing author or 'Add New Author' to enter new details.",
                             disabled=disabled
@@ -2107,8 +1853,7 @@ def add_book_dialog(conn):
 
                         if selected_author != "Add New Author" and selected_author and not disabled:
                             # --- Existing Author: Read-Only View ---
-                            selected_author_id = int(selected_author.split('(ID: ')[1][:-1])
-                            selected_author_details = next((a for a in all_authors if a.author_id == selected_author_id), None)
+                            selected_author_details = get_selected_author(conn, selected_author)
                             
                             if selected_author_details:
                                 # Update session state with existing details
@@ -2295,24 +2040,20 @@ def add_book_dialog(conn):
                         # Generate tags and subject
                         if book_data["title"]:
                             st.write("🤖 Generating AI Tags & Subject...")
-                            book_data["tags"] = generate_tags_with_ollama(book_data["title"])
-                            book_data["subject"] = generate_subject_with_ollama(book_data["title"])
+                            book_data["subject"], book_data["tags"], ai_error = enrich_title(conn, book_data["title"])
+                            if ai_error:
+                                st.warning(f"AI suggestions unavailable for '{book_data['title']}' ({ai_error}). Using fallback subject: {book_data['subject']}")
                         
                         st.write("💾 Saving Book Details...")
                         with conn.session as s:
                             # Handle syllabus file upload
                             syllabus_path = None
                             if book_data["syllabus_file"] and not book_data["is_publish_only"] and not book_data["is_thesis_to_book"]:
-                                file_extension = os.path.splitext(book_data["syllabus_file"].name)[1]
-                                unique_filename = f"syllabus_{book_data['title'].replace(' ', '_')}_{int(time.time())}{file_extension}"
-                                syllabus_path_temp = os.path.join(SYLLABUS_UPLOAD_DIR, unique_filename)
                                 if not os.access(SYLLABUS_UPLOAD_DIR, os.W_OK):
                                     st.error(f"No write permission for {SYLLABUS_UPLOAD_DIR}.")
                                     raise PermissionError(f"Cannot write to {SYLLABUS_UPLOAD_DIR}")
                                 try:
-                                    with open(syllabus_path_temp, "wb") as f:
-                                        f.write(book_data["syllabus_file"].getbuffer())
-                                    syllabus_path = syllabus_path_temp
+                                    syllabus_path = store_upload(book_data["syllabus_file"], SYLLABUS_UPLOAD_DIR)
                                 except Exception as e:
                                     st.error(f"Failed to save syllabus file: {str(e)}")
                                     st.toast(f"Failed to save syllabus file: {str(e)}", icon="❌", duration="long")
@@ -2338,15 +2079,19 @@ def add_book_dialog(conn):
                                 "subject": book_data["subject"]
                             })
                             book_id = s.execute(text("SELECT LAST_INSERT_ID();")).scalar()
+                            sync_book_tags(s, book_id, book_data["tags"])
 
                             # Process active authors
                             st.write("👥 Linking Authors...")
                             active_authors = [a for a in author_data if is_author_active(a)]
+                            new_author_ids = []
                             if publisher not in ["AG Kids", "NEET/JEE"]:
                                 for author in active_authors:
                                     if author["author_id"]:
                                         author_id_to_link = author["author_id"]
                                     else:
+                                        if flag_duplicate_authors(conn, author["name"], author["email"], author["phone"]):
+                                            st.write(f"⚠️ {author['name']} may already exist as an author")
                                         s.execute(text("""
                                             INSERT INTO authors (name, email, phone)
                                             VALUES (:name, :email, :phone)
@@ -2358,6 +2103,7 @@ def add_book_dialog(conn):
                                         })
                                         author_id_to_link = s.execute(text("SELECT LAST_INSERT_ID();")).scalar()
                                         author["author_id"] = author_id_to_link
+                                        new_author_ids.append(author_id_to_link)
                                     
                                     if book_id and author_id_to_link:
                                         s.execute(text("""
@@ -2371,56 +2117,21 @@ def add_book_dialog(conn):
                                             "publishing_consultant": author["publishing_consultant"]
                                         })
                             s.commit()
+                            mark_authors_dirty(*new_author_ids)
+                            invalidate_columns("book_authors", ["corresponding_agent", "publishing_consultant"])
+                            invalidate_tags()
+                            mark_operations_dirty(book_id)
 
                             if send_welcome and publisher not in ["AG Kids", "NEET/JEE"]:
-                                st.write("📧 Sending Welcome Emails...")
+                                st.write("📧 Queueing Welcome Emails...")
                                 for author in active_authors:
                                     if author.get("email") and author.get("author_id"):
-                                        st.write(f"⏳Sending email to {author['name']}...")
-                                        email_status = "Failed"
-                                        
-                                        email_success, sender_email = send_welcome_email(author["email"], author["name"], author["phone"], book_data["title"], book_id, author["author_id"], author["author_position"], publisher)
-                                        if email_success:
-                                            email_status = "Success"
-                                            s.execute(text("""
-                                                UPDATE book_authors 
-                                                SET welcome_mail_sent = 1 
-                                                WHERE book_id = :book_id AND author_id = :author_id
-                                            """), {"book_id": book_id, "author_id": author["author_id"]})
-                                            st.write(f"✅ Sent to {author['name']}")
+                                        if queue_welcome_email(author["email"], author["name"], author["phone"], book_data["title"], book_id, author["author_id"], author["author_position"], publisher, session=s):
+                                            st.write(f"📨 Queued for {author['name']}")
                                         else:
-                                            email_status = "Failed"
-                                            st.write(f"❌ Failed to send to {author['name']}")
-
-                                        # Log activity
-                                        log_activity(
-                                            conn,
-                                            st.session_state.user_id,
-                                            st.session_state.username,
-                                            st.session_state.session_id,
-                                            "sent welcome email",
-                                            f"To: {author['name']} ({author['email']}), Book ID: {book_id}, Status: {email_status}"
-                                        )
-                                        
-                                        # Insert into email_history
-                                        try:
-                                            s.execute(text("""
-                                                INSERT INTO email_history (timestamp, recipient, sender_email, status, book_id, book_title, triggered_by, details)
-                                                VALUES (:timestamp, :recipient, :sender_email, :status, :book_id, :book_title, :triggered_by, :details)
-                                            """), {
-                                                "timestamp": ist_time.strftime('%Y-%m-%d %H:%M:%S'),
-                                                "recipient": author["email"],
-                                                "sender_email": sender_email,
-                                                "status": email_status,
-                                                "book_id": book_id,
-                                                "book_title": book_data["title"],   
-                                                "triggered_by": st.session_state.username,
-                                                "details": f"Author: {author['name']}, Position: {author['author_position']}"
-                                            })
-                                        except Exception as e:
-                                            st.error(f"Failed to log email history: {str(e)}")
-                                            
+                                            st.write(f"❌ Could not queue email for {author['name']}")
                                 s.commit()
+                                wake_outbox()
 
                             # Log save action
                             log_activity(
@@ -3010,7 +2721,8 @@ def manage_isbn_dialog(conn, book_id, current_apply_isbn, current_isbn):
                                                         """), {"book_id": book_id}
                                                     )
                                                     s_surrender.commit()
-                                                    
+                                                mark_operations_dirty(book_id)
+
                                                 log_activity(
                                                     conn, st.session_state.user_id, st.session_state.username, st.session_state.session_id,
                                                     "surrendered isbn", f"Book ID: {book_id}, ISBN: {current_isbn}, Reason: {surrender_isbn_reason}"
@@ -3187,7 +2899,8 @@ def manage_isbn_dialog(conn, book_id, current_apply_isbn, current_isbn):
                                             status_label = "Deleted Books"
                                             
                                         s.commit()
-                                    
+                                    mark_operations_dirty(book_id)
+
                                     log_activity(
                                         conn, st.session_state.user_id, st.session_state.username, st.session_state.session_id,
                                         "cancelled book", f"Book ID: {book_id}, Status: {status_label}, Reason: {cancel_reason}"
@@ -3205,16 +2918,11 @@ def manage_isbn_dialog(conn, book_id, current_apply_isbn, current_isbn):
                     # Handle syllabus file upload
                     syllabus_path = current_syllabus_path
                     if syllabus_file and not new_is_publish_only and not new_is_thesis_to_book and st.session_state[f"publisher_{book_id}"] in ["AGPH", "Cipher", "AG Volumes", "AG Classics"]:
-                        file_extension = os.path.splitext(syllabus_file.name)[1]
-                        unique_filename = f"syllabus_{new_title.replace(' ', '_')}_{int(time.time())}{file_extension}"
-                        syllabus_path_temp = os.path.join(SYLLABUS_UPLOAD_DIR, unique_filename)
                         if not os.access(SYLLABUS_UPLOAD_DIR, os.W_OK):
                             st.error(f"No write permission for {SYLLABUS_UPLOAD_DIR}.")
                             raise PermissionError(f"Cannot write to {SYLLABUS_UPLOAD_DIR}")
                         try:
-                            with open(syllabus_path_temp, "wb") as f:
-                                f.write(syllabus_file.getbuffer())
-                            syllabus_path = syllabus_path_temp
+                            syllabus_path = store_upload(syllabus_file, SYLLABUS_UPLOAD_DIR)
                         except Exception as e:
                             st.error(f"Failed to save syllabus file: {str(e)}")
                             st.toast(f"Failed to save syllabus file: {str(e)}", icon="❌", duration="long")
@@ -3388,41 +3096,28 @@ def manage_isbn_dialog(conn, book_id, current_apply_isbn, current_isbn):
                                 "book_id": book_id
                             }
                         )
+                    sync_book_tags(s, book_id, new_tags_json)
                     s.commit()
+                    invalidate_tags()
+                    mark_operations_dirty(book_id)
+                    if current_syllabus_path and syllabus_path != current_syllabus_path:
+                        release_upload(conn, "syllabus", current_syllabus_path)
 
-                    # Send ISBN emails if any authors selected
+                    # Queue ISBN emails if any authors selected
                     if selected_authors_to_email and isbn_to_send:
                         for author in selected_authors_to_email:
-                            success, result = send_isbn_email(
+                            if queue_isbn_email(
                                 author['email'], 
                                 author['name'], 
                                 new_title, 
                                 book_id, 
                                 isbn_to_send, 
+                                author['id'],
                                 publisher=st.session_state[f"publisher_{book_id}"]
-                            )
-                            if success:
-                                # Update timestamp in database
-                                with conn.session as s_email:
-                                    s_email.execute(
-                                        text("UPDATE book_authors SET isbn_sent_at = :timestamp WHERE id = :id"),
-                                        {"timestamp": datetime.now(ist), "id": author['id']}
-                                    )
-                                    s_email.commit()
-                                
-                                # Log to activity_log
-                                log_activity(
-                                    conn,
-                                    st.session_state.user_id,
-                                    st.session_state.username,
-                                    st.session_state.session_id,
-                                    "sent isbn email",
-                                    f"ISBN: {isbn_to_send}, Recipient: {author['name']} ({author['email']}), Book: {book_id}"
-                                )
-                                
-                                st.toast(f"ISBN Email sent to {author['name']}!", icon="📧")
+                            ):
+                                st.toast(f"ISBN Email queued for {author['name']}!", icon="📧")
                             else:
-                                st.error(f"Failed to send ISBN Email to {author['name']}: {result}")
+                                st.error(f"Failed to queue ISBN Email to {author['name']}")
 
                     # Log changes if any
                     if changes:
@@ -3700,7 +3395,8 @@ def manage_price_dialog(book_id, conn):
                                 {"price": price, "book_id": book_id}
                             )
                             s.commit()
-                        
+                        mark_operations_dirty(book_id)
+
                         # 2. Save Author Totals & Remarks
                         for _, row in book_authors.iterrows():
                             aid = row['id']
@@ -3804,6 +3500,7 @@ def manage_price_dialog(book_id, conn):
                                     with conn.session as s:
                                         s.execute(text("DELETE FROM author_payments WHERE id = :pid"), {"pid": p['id']})
                                         s.commit()
+                                    invalidate_payment_ledger()
                                     st.rerun()
                     else:
                         st.info("No payment records found.")
@@ -3846,6 +3543,7 @@ def manage_price_dialog(book_id, conn):
                                         "approved_at": datetime.now() if is_admin else None
                                     })
                                     s.commit()
+                                invalidate_payment_ledger()
                                 st.success("Payment registered!")
                         except ValueError:
                             st.error("Invalid amount")
@@ -3876,13 +3574,12 @@ def fetch_book_authors(book_id, conn):
            ba.delivery_charge, 
            ba.number_of_books, ba.total_amount, 
            ba.delivery_date, ba.tracking_id, ba.delivery_vendor,
-           ba.remark, ba.isbn_sent_at,
-           COALESCE((SELECT SUM(amount) FROM author_payments WHERE book_author_id = ba.id AND status = 'Approved'), 0) as amount_paid
+           ba.remark, ba.isbn_sent_at
     FROM book_authors ba
     JOIN authors a ON ba.author_id = a.author_id
     WHERE ba.book_id = '{book_id}'
     """
-    return conn.query(query, show_spinner = False)
+    return with_payment_ledger(conn.query(query, show_spinner = False), conn)
 
 def insert_author(conn, name, email, phone):
     """Insert a new author into the database and return the author_id."""
@@ -3899,6 +3596,9 @@ def insert_author(conn, name, email, phone):
         if not validate_phone(phone):
             raise ValueError("Invalid phone number format or length")
 
+        # Flag, don't block: same-name authors do exist
+        flag_duplicate_authors(conn, name, email, phone)
+
         with conn.session as s:
             # Insert the author
             result = s.execute(
@@ -3927,7 +3627,8 @@ def insert_author(conn, name, email, phone):
             ).fetchone()
             if not result:
                 raise Exception(f"Author ID {author_id} not found in authors table after commit")
-            
+
+            add_author(author_id, name, email, phone)
             return author_id
     except Exception as e:
         st.error(f"Error inserting author: {e}")
@@ -3943,13 +3644,19 @@ def update_book_authors(id, updates, conn):
     with conn.session as session:
         session.execute(text(query), params)
         session.commit()
+    mark_operations_dirty(author_row_ids=[id])
+    invalidate_columns("book_authors", updates.keys())
+    if 'number_of_books' in updates:
+        invalidate_stock_ledger()
 
 # Function to delete a book_author entry
 def delete_book_author(id, conn):
+    mark_operations_dirty(author_row_ids=[id])
     query = "DELETE FROM book_authors WHERE id = :id"
     with conn.session as session:
         session.execute(text(query), {"id": int(id)})
         session.commit()
+    invalidate_stock_ledger()
 
 def validate_email(email):
     """Validate email format."""
@@ -4041,30 +3748,46 @@ def validate_editor(editor, existing_positions, existing_editor_ids, all_new_edi
     
     return True, ""
 
-def get_all_authors(conn):
-    with conn.session as s:
-        try:
-            query = text("SELECT author_id, name, email, phone FROM authors ORDER BY name")
-            authors = s.execute(query).fetchall()
-            return authors
-        except Exception as e:
-            st.error(f"Error fetching authors: {e}")
-            return []
-        
-        # Fetch unique corresponding agents and publishing consultants
+def author_select(conn, label, key, new_option="Add New Author", current=None, disabled=False, help=None):
+    """
+    Search box + selectbox over the best matching authors (see author_directory).
+    Returns the chosen "Name (ID: n)" label or new_option.
+    """
+    query = st.text_input(
+        "Search Author", key=f"{key}_search", placeholder="Search by name, email or phone...",
+        disabled=disabled, label_visibility="collapsed"
+    )
+    options = [author_label(a) for a in get_author_directory().search(conn, query)]
+    # Keep the current choice selectable while the search shows other names
+    chosen = st.session_state.get(key, current)
+    if chosen and chosen != new_option and chosen not in options:
+        options.insert(0, chosen)
+    if new_option:
+        options.insert(0, new_option)
+    if not options:
+        return None
+    return st.selectbox(label, options, index=options.index(chosen) if chosen in options else 0,
+                        key=key, disabled=disabled, help=help)
+
+def get_selected_author(conn, label):
+    """Directory entry for an author_select() label."""
+    return get_author_directory().get(conn, int(label.split('(ID: ')[1][:-1]))
+
+def flag_duplicate_authors(conn, name, email, phone):
+    """Warn when a new author looks like one already in the database. Returns the matches."""
+    matches = get_author_directory().find_duplicates(conn, name, email, phone)
+    if matches:
+        existing = ", ".join(author_label(a) for a in matches[:3])
+        st.warning(f"'{name}' may already exist: {existing}", icon="⚠️")
+        st.toast(f"Possible duplicate author: {name}", icon="⚠️", duration="long")
+    return matches
+
 def get_unique_agents_and_consultants(conn):
-    with conn.session as s:
-        try:
-            agent_query = text("SELECT DISTINCT corresponding_agent FROM book_authors WHERE corresponding_agent IS NOT NULL AND corresponding_agent != '' ORDER BY corresponding_agent")
-            agents = [row[0] for row in s.execute(agent_query).fetchall()]
-            
-            consultant_query = text("SELECT DISTINCT publishing_consultant FROM book_authors WHERE publishing_consultant IS NOT NULL AND publishing_consultant != '' ORDER BY publishing_consultant")
-            consultants = [row[0] for row in s.execute(consultant_query).fetchall()]
-            
-            return agents, consultants
-        except Exception as e:
-            st.error(f"Error fetching agents/consultants: {e}")
-            return [], []
+    try:
+        return get_dimension("corresponding_agent", conn), get_dimension("publishing_consultant", conn)
+    except Exception as e:
+        st.error(f"Error fetching agents/consultants: {e}")
+        return [], []
 
 # Constants
 MAX_AUTHORS = 4
@@ -4196,18 +3919,6 @@ def render_delivery_slip(book_title, num_copies, author_name, author_address, au
 # Updated dialog for editing author details with improved UI
 @st.dialog("Edit Author Details", width='large', on_dismiss = 'rerun')
 def edit_author_dialog(book_id, conn):
-    # Ensure author_remark column exists in books table
-    try:
-        with conn.session as s:
-            s.execute(text("SELECT author_remark FROM books LIMIT 1"))
-    except Exception:
-        try:
-            with conn.session as s:
-                s.execute(text("ALTER TABLE books ADD COLUMN author_remark TEXT"))
-                s.commit()
-        except Exception as e:
-             st.error(f"Error updating database schema: {e}")
-
     # Fetch book details for title, is_single_author, num_copies, and print_status
     book_details = fetch_book_details(book_id, conn)
     if book_details.empty:
@@ -4320,6 +4031,7 @@ def edit_author_dialog(book_id, conn):
                             {"author_type": selected_author_type, "book_id": book_id}
                         )
                         s.commit()
+                        mark_operations_dirty(book_id)
                         st.success(f"✔️ Author type changed to {selected_author_type}")
                         st.toast(f"Author type changed to {selected_author_type}", icon="✔️", duration="long")
                         log_activity(
@@ -4381,8 +4093,6 @@ def edit_author_dialog(book_id, conn):
         
         # Render author input forms
         st.markdown(f"### Add Up to {available_slots} New Authors")
-        all_authors = get_all_authors(conn)
-        author_options = ["Add New Author"] + [f"{a.name} (ID: {a.author_id})" for a in all_authors]
         unique_agents, unique_consultants = get_unique_agents_and_consultants(conn)
         agent_options = ["Select Agent"] + ["Add New..."] + unique_agents
         consultant_options = ["Select Consultant"] + ["Add New..."] + unique_consultants
@@ -4399,17 +4109,15 @@ def edit_author_dialog(book_id, conn):
                     if disabled:
                         st.warning(f"⚠️ Disabled: Maximum {max_authors_allowed} authors reached for {selected_author_type} mode.")
 
-                    selected_author = st.selectbox(
-                        f"Select Author {i+1}",
-                        author_options,
+                    selected_author = author_select(
+                        conn, f"Select Author {i+1}",
                         key=f"new_author_select_{i}",
                         disabled=disabled
                     )
 
                     if selected_author != "Add New Author" and selected_author and not disabled:
                         # --- Existing Author: Read-Only View ---
-                        selected_author_id = int(selected_author.split('(ID: ')[1][:-1])
-                        selected_author_details = next((a for a in all_authors if a.author_id == selected_author_id), None)
+                        selected_author_details = get_selected_author(conn, selected_author)
                         if selected_author_details:
                             # Update session state
                             st.session_state.new_authors[i].update({
@@ -4561,6 +4269,8 @@ def edit_author_dialog(book_id, conn):
                                         "publishing_consultant": author["publishing_consultant"]
                                     })
                             s.commit()
+                        invalidate_columns("book_authors", ["corresponding_agent", "publishing_consultant"])
+                        mark_operations_dirty(book_id)
                         if authors_added:
                             # Log each added author
                             for author in added_authors:
@@ -4573,56 +4283,18 @@ def edit_author_dialog(book_id, conn):
                                     f"Book ID: {book_id}, Author ID: {author['author_id']}, Name: {author['name']}, Position: {author['author_position']}, Agent: {author['corresponding_agent'] or 'None'}, Consultant: {author['publishing_consultant'] or 'None'}"
                                 )
 
-                            # Send Welcome Emails
+                            # Queue Welcome Emails
                             if send_welcome and publisher not in ["AG Kids", "NEET/JEE"]:
-                                st.write("📧 Sending Welcome Emails...")
+                                st.write("📧 Queueing Welcome Emails...")
                                 with conn.session as s:
                                     for author in added_authors:
                                         if author.get("email") and author.get("author_id"):
-                                            email_status = "Failed"
-                                            
-                                            email_success, sender_email = send_welcome_email(author["email"], author["name"], author["phone"], book_title, book_id, author["author_id"], author["author_position"], publisher)
-                                            if email_success:
-                                                email_status = "Success"
-                                                s.execute(text("""
-                                                    UPDATE book_authors 
-                                                    SET welcome_mail_sent = 1 
-                                                    WHERE book_id = :book_id AND author_id = :author_id
-                                                """), {"book_id": book_id, "author_id": author["author_id"]})
-                                                s.commit()
-                                                st.success(f"✅ Sent to {author['name']}")
+                                            if queue_welcome_email(author["email"], author["name"], author["phone"], book_title, book_id, author["author_id"], author["author_position"], publisher, session=s):
+                                                st.success(f"📨 Queued for {author['name']}")
                                             else:
-                                                email_status = "Failed"
-                                                st.error(f"❌ Failed to send to {author['name']}")
-
-                                            # Log activity
-                                            log_activity(
-                                                conn,
-                                                st.session_state.user_id,
-                                                st.session_state.username,
-                                                st.session_state.session_id,
-                                                "sent welcome email",
-                                                f"To: {author['name']} ({author['email']}), Book ID: {book_id}, Status: {email_status}"
-                                            )
-                                            
-                                            # Insert into email_history
-                                            try:
-                                                s.execute(text("""
-                                                    INSERT INTO email_history (timestamp, recipient, sender_email, status, book_id, book_title, triggered_by, details)
-                                                    VALUES (:timestamp, :recipient, :sender_email, :status, :book_id, :book_title, :triggered_by, :details)
-                                                """), {
-                                                    "timestamp": ist_time.strftime('%Y-%m-%d %H:%M:%S'),
-                                                    "recipient": author["email"],
-                                                    "sender_email": sender_email,
-                                                    "status": email_status,
-                                                    "book_id": book_id,
-                                                    "book_title": book_title,   
-                                                    "triggered_by": st.session_state.username,
-                                                    "details": f"Author: {author['name']}, Position: {author['author_position']}"
-                                                })
-                                            except Exception as e:
-                                                st.error(f"Failed to log email history: {str(e)}")
+                                                st.error(f"❌ Could not queue email for {author['name']}")
                                     s.commit()
+                                wake_outbox()
                             st.cache_data.clear()
                             st.success("✔️ New authors added successfully!")
                             st.toast("New authors added successfully!", icon="✔️", duration="long")
@@ -4717,7 +4389,7 @@ def edit_author_dialog(book_id, conn):
                             col1, col2, col3 = st.columns([0.3,0.6,1], gap="small")
 
                             with col1:
-                                st.image(row['author_photo'],width = 100)
+                                st.image(thumbnail_for(row['author_photo']),width = 100)
                             
                             with col2:
                                 st.markdown(f"**📌 Author ID:** {row['author_id']}")
@@ -4926,16 +4598,8 @@ def edit_author_dialog(book_id, conn):
                                 current_photo = row['author_photo'] if row['author_photo'] is not None else None
                                 uploaded_photo = st.file_uploader("Upload Author Photo", type=['jpg', 'png', 'jpeg'], key=f"photo_{row['id']}")
                                 if current_photo:
-                                    if os.path.exists(current_photo):
-                                        with open(current_photo, "rb") as file:
-                                            st.download_button(
-                                                label="⬇️ Download Photo",
-                                                data=file,
-                                                file_name=os.path.basename(current_photo),
-                                                mime="image/jpeg",
-                                                key=f"dl_{row['id']}"
-                                            )
-                                    else:
+                                    if not download_file_button("⬇️ Download Photo", current_photo, mime="image/jpeg",
+                                                                key=f"dl_{row['id']}"):
                                         st.caption("⚠️ File record exists but file missing.")
                             
                             # Tab 3: Delivery (Now Address & Copies)
@@ -5023,20 +4687,7 @@ def edit_author_dialog(book_id, conn):
                                 
                                     if uploaded_photo:
                                         try:
-                                            import time
-                                            file_extension = os.path.splitext(uploaded_photo.name)[1]
-                                            # Use author name and ID for filename
-                                            author_name_clean = row['name'].replace(" ", "_").replace("/", "_").replace("\\", "_")
-                                            unique_filename = f"{author_name_clean}_{author_id}{file_extension}"
-                                            save_path = os.path.join(AUTHOR_PHOTO_UPLOAD_DIR, unique_filename)
-                                            
-                                            if not os.path.exists(AUTHOR_PHOTO_UPLOAD_DIR):
-                                                os.makedirs(AUTHOR_PHOTO_UPLOAD_DIR)
-                                                
-                                            with open(save_path, "wb") as f:
-                                                f.write(uploaded_photo.getbuffer())
-                                            
-                                            photo_path = save_path
+                                            photo_path = store_upload(uploaded_photo, AUTHOR_PHOTO_UPLOAD_DIR)
                                             author_updates['author_photo'] = photo_path
                                             author_changes.append("Updated Author Photo")
                                         except Exception as e:
@@ -5073,6 +4724,7 @@ def edit_author_dialog(book_id, conn):
                                         
                                             # Update authors table if needed
                                             if author_changes:
+                                                previous_photo = None
                                                 with conn.session as s:
                                                     update_query = "UPDATE authors SET about_author = :about_author"
                                                     params = {
@@ -5083,10 +4735,16 @@ def edit_author_dialog(book_id, conn):
                                                     if 'author_photo' in author_updates:
                                                         update_query += ", author_photo = :author_photo"
                                                         params["author_photo"] = author_updates['author_photo']
+                                                        previous_photo = s.execute(
+                                                            text("SELECT author_photo FROM authors WHERE author_id = :author_id"),
+                                                            {"author_id": author_id}
+                                                        ).scalar()
                                                 
                                                     update_query += " WHERE author_id = :author_id"
                                                     s.execute(text(update_query), params)
                                                     s.commit()
+                                                if previous_photo and previous_photo != author_updates.get('author_photo'):
+                                                    release_upload(conn, "author_photo", previous_photo)
                                                 
                                                 changes.extend(author_changes)
                                             
@@ -5236,17 +4894,10 @@ def edit_author_dialog(book_id, conn):
                                             
                                             with f_col2:
                                                 if corr.correction_file:
-                                                    if os.path.exists(corr.correction_file):
-                                                        with open(corr.correction_file, "rb") as f:
-                                                            st.download_button(
-                                                                label="⬇️ Download File",
-                                                                data=f,
-                                                                file_name=os.path.basename(corr.correction_file),
-                                                                key=f"dl_corr_{corr.id}",
-                                                                use_container_width=True,
-                                                                type="secondary"
-                                                            )
-                                                    else:
+                                                    if not download_file_button(
+                                                        "⬇️ Download File", corr.correction_file,
+                                                        key=f"dl_corr_{corr.id}", use_container_width=True, type="secondary"
+                                                    ):
                                                         st.caption("⚠️ File missing")
                                             
                                             # Mini Timeline for this round if tasks exist
@@ -5296,6 +4947,7 @@ def edit_author_dialog(book_id, conn):
                                                             
                                                             with open(file_path, "wb") as f:
                                                                 f.write(correction_file.getbuffer())
+                                                            forget_file(file_path)
                                                         
                                                         # Insert DB
                                                         with conn.session as s:
@@ -5355,6 +5007,7 @@ def edit_author_dialog(book_id, conn):
                                                             )
                                                             
                                                             s.commit()
+                                                        mark_operations_dirty(book_id)
 
                                                         # Log the correction
                                                         log_activity(
@@ -5403,6 +5056,7 @@ def edit_author_dialog(book_id, conn):
                                 {"remark": new_remark, "book_id": book_id}
                             )
                             s.commit()
+                        mark_operations_dirty(book_id)
                         st.success("✅ Remark saved successfully!")
                         st.toast("Remark updated!", icon="✔️")
                         st.cache_data.clear()
@@ -5483,18 +5137,16 @@ def edit_author_dialog(book_id, conn):
                             for j, editor_tab in enumerate(editor_tabs):
                                 with editor_tab:
                                     editor = edit_data["editors"][j]
-                                    all_authors = get_all_authors(conn)
-                                    author_options = ["Select Existing Editor"] + [f"{a.name} (ID: {a.author_id})" for a in all_authors]
-                                    selected_editor = st.selectbox(
-                                        "Select Writer",  # Changed from "Select Writer"
-                                        author_options,
-                                        index=author_options.index(f"{editor['name']} (ID: {editor['author_id']})") if editor['author_id'] and f"{editor['name']} (ID: {editor['author_id']})" in author_options else 0,
-                                        key=f"edit_chapter_{chapter_id}_editor_select_{j}"
+                                    selected_editor = author_select(
+                                        conn, "Select Writer",
+                                        key=f"edit_chapter_{chapter_id}_editor_select_{j}",
+                                        new_option="Select Existing Editor",
+                                        current=f"{editor['name']} (ID: {editor['author_id']})" if editor['author_id'] else None
                                     )
 
                                     if selected_editor != "Select Existing Editor" and selected_editor:
                                         selected_editor_id = int(selected_editor.split('(ID: ')[1][:-1])
-                                        selected_editor_details = next((a for a in all_authors if a.author_id == selected_editor_id), None)
+                                        selected_editor_details = get_selected_author(conn, selected_editor)
                                         if selected_editor_details:
                                             editor.update({
                                                 "name": selected_editor_details.name,
@@ -5779,8 +5431,6 @@ def edit_author_dialog(book_id, conn):
                     if len(chapter["editors"]) > MAX_EDITORS_PER_CHAPTER:
                         chapter["editors"] = chapter["editors"][:MAX_EDITORS_PER_CHAPTER]
 
-                all_authors = get_all_authors(conn)
-                author_options = ["Add New Editor"] + [f"{a.name} (ID: {a.author_id})" for a in all_authors]
                 unique_agents, unique_consultants = get_unique_agents_and_consultants(conn)
                 agent_options = ["Select Agent"] + unique_agents + ["Add New..."]
                 consultant_options = ["Select Consultant"] + unique_consultants + ["Add New..."]
@@ -5799,16 +5449,16 @@ def edit_author_dialog(book_id, conn):
                     for j, editor_tab in enumerate(editor_tabs):
                         with editor_tab:
                             editor = chapter["editors"][j]
-                            selected_editor = st.selectbox(
-                                "Select Writer",  # Changed from "Select Writer"
-                                author_options,
-                                index=author_options.index(f"{editor['name']} (ID: {editor['author_id']})") if editor['author_id'] and f"{editor['name']} (ID: {editor['author_id']})" in author_options else 0,
-                                key=f"new_chapter_editor_select_{j}"
+                            selected_editor = author_select(
+                                conn, "Select Writer",
+                                key=f"new_chapter_editor_select_{j}",
+                                new_option="Add New Editor",
+                                current=f"{editor['name']} (ID: {editor['author_id']})" if editor['author_id'] else None
                             )
 
                             if selected_editor != "Add New Editor" and selected_editor:
                                 selected_editor_id = int(selected_editor.split('(ID: ')[1][:-1])
-                                selected_editor_details = next((a for a in all_authors if a.author_id == selected_editor_id), None)
+                                selected_editor_details = get_selected_author(conn, selected_editor)
                                 if selected_editor_details:
                                         editor.update({
                                             "name": selected_editor_details.name,
@@ -6098,6 +5748,7 @@ def edit_author_dialog(book_id, conn):
                                     {"author_type": selected_author_type, "book_id": book_id}
                                 )
                                 s.commit()
+                                mark_operations_dirty(book_id)
                                 st.success(f"✔️ Author type changed to {selected_author_type}")
                                 st.toast(f"Author type changed to {selected_author_type}", icon="✔️", duration="long")
                                 log_activity(
@@ -6152,8 +5803,6 @@ def edit_author_dialog(book_id, conn):
                 
                 # Render author input forms
                 st.markdown(f"### Add Up to {available_slots} New Authors")
-                all_authors = get_all_authors(conn)
-                author_options = ["Add New Author"] + [f"{a.name} (ID: {a.author_id})" for a in all_authors]
                 unique_agents, unique_consultants = get_unique_agents_and_consultants(conn)
                 agent_options = ["Select Agent"] + ["Add New..."] + unique_agents
                 consultant_options = ["Select Consultant"] + ["Add New..."] + unique_consultants
@@ -6170,16 +5819,14 @@ def edit_author_dialog(book_id, conn):
                             if disabled:
                                 st.warning(f"⚠️ Disabled: Maximum {max_authors_allowed} authors reached for {selected_author_type} mode.")
 
-                            selected_author = st.selectbox(
-                                f"Select Author {i+1}",
-                                author_options,
+                            selected_author = author_select(
+                                conn, f"Select Author {i+1}",
                                 key=f"new_author_select_{i}",
                                 disabled=disabled
                             )
 
                             if selected_author != "Add New Author" and selected_author and not disabled:
-                                selected_author_id = int(selected_author.split('(ID: ')[1][:-1])
-                                selected_author_details = next((a for a in all_authors if a.author_id == selected_author_id), None)
+                                selected_author_details = get_selected_author(conn, selected_author)
                                 if selected_author_details:
                                     st.session_state.new_authors[i].update({
                                         "name": selected_author_details.name,
@@ -6327,59 +5974,21 @@ def edit_author_dialog(book_id, conn):
                                                 "publishing_consultant": author["publishing_consultant"]
                                             })
                                     s.commit()
-                                    
-                                    # Send welcome emails if requested
+                                    invalidate_columns("book_authors", ["corresponding_agent", "publishing_consultant"])
+                                    mark_operations_dirty(book_id)
+
+                                    # Queue welcome emails if requested
                                     if authors_added and send_welcome_new_authors:
-                                        with st.status("Sending Welcome Emails...", expanded=True) as status:
+                                        with st.status("Queueing Welcome Emails...", expanded=True) as status:
                                             for author in added_authors:
                                                 if author.get("email") and author.get("author_id"):
-                                                    st.write(f"Sending email to {author['name']}...")
-                                                    email_status = "Failed"
-                                                    subject_line = f"Publication Confirmation - {book_title}"
-                                                    
-                                                    email_success, sender_email = send_welcome_email(author["email"], author["name"], author["phone"], book_title, book_id, author["author_id"], author["author_position"], publisher)
-                                                    if email_success:
-                                                        email_status = "Success"
-                                                        s.execute(text("""
-                                                            UPDATE book_authors 
-                                                            SET welcome_mail_sent = 1 
-                                                            WHERE book_id = :book_id AND author_id = :author_id
-                                                        """), {"book_id": book_id, "author_id": author["author_id"]})
-                                                        st.write(f"✅ Sent to {author['name']}")
+                                                    if queue_welcome_email(author["email"], author["name"], author["phone"], book_title, book_id, author["author_id"], author["author_position"], publisher, session=s):
+                                                        st.write(f"📨 Queued for {author['name']}")
                                                     else:
-                                                        email_status = "Failed"
-                                                        st.write(f"❌ Failed to send to {author['name']}")
-                                                    
-                                                    # Log activity for email send
-                                                    log_activity(
-                                                        conn,
-                                                        st.session_state.user_id,
-                                                        st.session_state.username,
-                                                        st.session_state.session_id,
-                                                        "sent welcome email",
-                                                        f"To: {author['name']} ({author['email']}), Book ID: {book_id}, Status: {email_status}"
-                                                    )
-                                                    
-                                                    # Insert into email_history
-                                                    try:
-                                                        s.execute(text("""
-                                                            INSERT INTO email_history (timestamp, recipient, sender_email, status, book_id, book_title, triggered_by, details)
-                                                            VALUES (:timestamp, :recipient, :sender_email, :status, :book_id, :book_title, :triggered_by, :details)
-                                                        """), {
-                                                            "timestamp": pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S'),
-                                                            "recipient": author["email"],
-                                                            "sender_email": sender_email,
-                                                            "status": email_status,
-                                                            "book_id": book_id,
-                                                            "book_title": book_title,
-                                                            "triggered_by": st.session_state.username,
-                                                            "details": f"Author: {author['name']}, Position: {author['author_position']}"
-                                                        })
-                                                    except Exception as e:
-                                                        st.error(f"Failed to log email history: {str(e)}")
-                                                        
-                                            status.update(label="Welcome Emails Processed", state="complete", expanded=False)
+                                                        st.write(f"❌ Could not queue email for {author['name']}")
+                                            status.update(label="Welcome Emails Queued", state="complete", expanded=False)
                                         s.commit()
+                                        wake_outbox()
 
                                 if authors_added:
                                     # Log each added author
@@ -6417,8 +6026,7 @@ def edit_author_dialog(book_id, conn):
 
 
 def fetch_unique_names(column):
-    query = f"SELECT DISTINCT {column} AS name FROM books WHERE {column} IS NOT NULL AND {column} != ''"
-    return sorted(conn.query(query,show_spinner = False)['name'].tolist())
+    return get_dimension(column, conn)
 
 def rewrite_book_logic(book_id, reason, conn):
     """Archives current book operations to extra_books and resets them."""
@@ -6454,6 +6062,7 @@ def rewrite_book_logic(book_id, reason, conn):
             """), {"book_id": book_id})
 
             s.commit()
+        mark_operations_dirty(book_id)
         return True, "Book operations archived and reset successfully!"
     except Exception as e:
         return False, f"Error rewriting book: {str(e)}"
@@ -6628,15 +6237,9 @@ def edit_operation_dialog(book_id, conn):
                 st.warning("Writing section is disabled (Publish Only / Thesis to Book).")
 
             # Download link if exists
-            if not (is_publish_only or is_thesis_to_book) and current_syllabus_path and os.path.exists(current_syllabus_path):
-                with open(current_syllabus_path, "rb") as f:
-                    st.download_button(
-                        label="Download Current Syllabus",
-                        data=f,
-                        file_name=os.path.basename(current_syllabus_path),
-                        key=f"download_syllabus_{book_id}",
-                        use_container_width=True
-                    )
+            if not (is_publish_only or is_thesis_to_book) and current_syllabus_path:
+                download_file_button("Download Current Syllabus", current_syllabus_path,
+                                     key=f"download_syllabus_{book_id}", use_container_width=True)
             
             with st.form(key=f"writing_form_{book_id}", border=False):
                 # Worker selection
@@ -6718,16 +6321,8 @@ def edit_operation_dialog(book_id, conn):
                         # Handle syllabus file upload
                         new_syllabus_path = current_syllabus_path
                         if syllabus_file and not (is_publish_only or is_thesis_to_book):
-                            file_extension = os.path.splitext(syllabus_file.name)[1]
-                            unique_filename = f"syllabus_{book_title.replace(' ', '_')}_{int(time.time())}{file_extension}"
-                            new_syllabus_path_temp = os.path.join(SYLLABUS_UPLOAD_DIR, unique_filename)
                             try:
-                                with open(new_syllabus_path_temp, "wb") as f:
-                                    f.write(syllabus_file.getbuffer())
-                                new_syllabus_path = new_syllabus_path_temp
-                                if current_syllabus_path and current_syllabus_path != new_syllabus_path and os.path.exists(current_syllabus_path):
-                                    try: os.remove(current_syllabus_path)
-                                    except OSError: pass
+                                new_syllabus_path = store_upload(syllabus_file, SYLLABUS_UPLOAD_DIR)
                             except Exception as e:
                                 st.error(f"Failed to save syllabus: {str(e)}")
                                 raise
@@ -6747,7 +6342,10 @@ def edit_operation_dialog(book_id, conn):
                                 "syllabus_path": new_syllabus_path
                             }
                             update_operation_details(book_id, updates)
-                            
+                            # Identical syllabi share a file, so only drop the old one if nothing else uses it
+                            if current_syllabus_path and current_syllabus_path != new_syllabus_path:
+                                release_upload(conn, "syllabus", current_syllabus_path)
+
                             syllabus_info = f"Syllabus: {os.path.basename(new_syllabus_path)}" if new_syllabus_path else "Syllabus: None"
                             details = (f"Book ID: {book_id}, Writer: {writing_by}, Pages: {book_pages}, {syllabus_info}")
                             log_activity(conn, st.session_state.user_id, st.session_state.username, st.session_state.session_id, "updated writing details", details)
@@ -7063,6 +6661,8 @@ def update_operation_details(book_id, updates):
     with conn.session as session:
         session.execute(text(query), params)
         session.commit()
+    mark_operations_dirty(book_id)
+    invalidate_columns("books", updates.keys())
 
 def update_correction_details(correction_id, updates):
     #Update correction details in the corrections table.
@@ -7556,7 +7156,9 @@ def edit_inventory_delivery_dialog(book_id, conn):
                                                 text("DELETE FROM PrintEditions WHERE print_id = :print_id"),
                                                 {"print_id": selected_print_id}
                                             )
+                                            refresh_books_latest_batch(session, [book_id])
                                             session.commit()
+                                        mark_operations_dirty(book_id)
                                         st.success("Print edition deleted successfully!")
                                         st.toast("Print edition deleted!", icon="🗑️")
                                         log_activity(conn, st.session_state.user_id, st.session_state.username, st.session_state.session_id, "deleted print edition", f"Print ID: {selected_print_id}")
@@ -7995,6 +7597,7 @@ def edit_inventory_delivery_dialog(book_id, conn):
                                     inventory_updates
                                 )
                                 session.commit()
+                            invalidate_stock_ledger()
 
                             # Log save action if changes were made
                             if changes:
@@ -8024,6 +7627,7 @@ def update_inventory_delivery_details(book_id, updates, conn):
         with conn.session as session:
             session.execute(text(query), params)
             session.commit()
+        mark_operations_dirty(book_id)
         st.cache_data.clear()
     except Exception as e:
         st.error(f"❌ Error updating books table: {str(e)}")
@@ -9184,6 +8788,7 @@ with st.container(border=False):
 
 # End timing
 total_time = time.time() - start_time
+log_timing("main", "page", total_time * 1000, table_render_ms=round(render_time * 1000, 1))
 st.caption(f"**Total Page Load Time:** {total_time:.2f} seconds")
 st.caption(f"**Table Rendering Time:** {render_time:.2f} seconds")
 
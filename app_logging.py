@@ -0,0 +1,141 @@
+# app_logging.py
+#
+# Logging for the app, set up once per process. Records go through a queue
+# to a listener thread that writes streamlit.log as one JSON object per line,
+# so logging on the script thread never waits on the file. Each record picks
+# up the current user and session from st.session_state, and records tagged
+# with sample_every are only written once per that many calls (for messages
+# logged on every rerun). Page timings are logged here too (see log_timing).
+
+import atexit
+import copy
+import itertools
+import json
+import logging
+import queue
+import threading
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+LOGGER_NAME = "streamlit_app"
+LOG_FILE = "streamlit.log"
+LOG_MAX_BYTES = 10_000_000
+LOG_BACKUP_COUNT = 5
+
+# Attributes every LogRecord has; anything else came from extra= or the filters
+# below and is written as its own JSON field
+STANDARD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "sample_every"}
+
+
+# Custom filter to exclude watchdog logs
+class NoWatchdogFilter(logging.Filter):
+    def filter(self, record):
+        return not record.name.startswith('watchdog')
+
+
+class SessionContextFilter(logging.Filter):
+    """Adds user/session from the calling script's session state (runs on the caller's thread)."""
+
+    def filter(self, record):
+        if get_script_run_ctx(suppress_warning=True) is not None:
+            if not hasattr(record, "user"):
+                record.user = st.session_state.get("username")
+            if not hasattr(record, "session"):
+                record.session = st.session_state.get("session_id")
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps 1 in record.sample_every of each tagged message; untagged records always pass."""
+
+    def __init__(self):
+        super().__init__()
+        self.lock = threading.Lock()
+        self.counters = {}
+
+    def filter(self, record):
+        every = getattr(record, "sample_every", None)
+        if not every or every <= 1:
+            return True
+        with self.lock:
+            counter = self.counters.setdefault((record.name, record.msg), itertools.count())
+            n = next(counter)
+        if n % every:
+            return False
+        record.sampled = every
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for field, value in vars(record).items():
+            if field not in STANDARD_ATTRIBUTES and value is not None:
+                entry[field] = value
+        return json.dumps(entry, default=str)
+
+
+class JsonQueueHandler(QueueHandler):
+    """QueueHandler that keeps the traceback as its own field instead of folding it into the message."""
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.message = record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exception = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = record.exc_text = None
+        return record
+
+
+class PageLogger(logging.LoggerAdapter):
+    """Adds page=... to every record, keeping any extra passed by the caller."""
+
+    def process(self, msg, kwargs):
+        kwargs["extra"] = {**self.extra, **kwargs.get("extra", {})}
+        return msg, kwargs
+
+
+@st.cache_resource
+def setup_logging():
+    """Attach the queue handler and start the file writer thread. Once per process."""
+    log_queue = queue.Queue(-1)
+    file_handler = RotatingFileHandler(LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT)
+    file_handler.setLevel(logging.DEBUG)
+    file_handler.setFormatter(JsonFormatter())
+    file_handler.addFilter(NoWatchdogFilter())
+    listener = QueueListener(log_queue, file_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+    queue_handler = JsonQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter())
+    queue_handler.addFilter(SessionContextFilter())
+
+    logger = logging.getLogger(LOGGER_NAME)
+    logger.setLevel(logging.DEBUG)
+    logger.handlers = [queue_handler]
+    logger.propagate = False
+    return listener
+
+
+def get_logger(page=None):
+    setup_logging()
+    logger = logging.getLogger(LOGGER_NAME)
+    return PageLogger(logger, {"page": page}) if page else logger
+
+
+def log_timing(page, section, duration_ms, **fields):
+    """Record how long a page (or one section of it) took to render."""
+    get_logger(page).info(
+        f"{section} took {duration_ms:.0f} ms",
+        extra={"event": "timing", "section": section, "duration_ms": round(duration_ms, 1), **fields},
+    )
@@ -1,34 +1,15 @@
 import streamlit as st
 import jwt
 import requests
-import logging
-from logging.handlers import RotatingFileHandler
 import time
+import hashlib
+import threading
+from collections import namedtuple
 from constants import ACCESS_TO_BUTTON
+from app_logging import get_logger
 
 
-# Configure logging
-logger = logging.getLogger(__name__)
-
-# Custom filter to exclude watchdog logs
-class NoWatchdogFilter(logging.Filter):
-    def filter(self, record):
-        return not record.name.startswith('watchdog')
-
-# Configure logging
-logger = logging.getLogger('streamlit_app')
-logger.setLevel(logging.DEBUG)
-
-# Remove any existing handlers to avoid duplicate logs
-logger.handlers = []
-
-# Create a rotating file handler (max 1MB, keep 3 backups)
-handler = RotatingFileHandler('streamlit.log', maxBytes=1_000_000, backupCount=3)
-handler.setLevel(logging.DEBUG)
-formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-handler.setFormatter(formatter)
-handler.addFilter(NoWatchdogFilter())
-logger.addHandler(handler)
+logger = get_logger()
 
 
 # Secrets and constants
@@ -47,6 +28,15 @@ FLASK_AUTH_URL = st.secrets["general"]["FLASK_AUTH_URL"]
 FLASK_LOGIN_URL = st.secrets["general"]["FLASK_LOGIN_URL"]
 FLASK_LOGOUT_URL = st.secrets["general"]["FLASK_LOGOUT_URL"]
 
+AUTH_TIMEOUT_SECONDS = 3
+# Sessions stop trusting a token this long before its exp
+EXPIRY_BUFFER_SECONDS = 300
+# A good server answer is reused by other sessions (new tabs) for this long,
+# so a token revoked on the auth server stops opening new sessions within it
+REVALIDATE_SECONDS = 600
+# An unreachable auth server is not asked again for this long
+FAILURE_RETRY_SECONDS = 5
+
 def clear_auth_session():
     # Clear all session state related to authentication
     for key in ['token', 'user_id', 'email', 'role', 'app', 'access', 'start_date', 'username', 'exp', 
@@ -62,14 +52,166 @@ def error_dialog(error_message):
         clear_auth_session()
         st.stop()
 
+ValidationEntry = namedtuple("ValidationEntry", ["details", "error", "valid_until"])
+
+
+class TokenValidationCache:
+    """
+    Auth server answers shared by every session in the process, keyed by a
+    hash of the token. Each new tab is a new session with the same token, so
+    only the first one calls the server; concurrent callers wait for that call
+    instead of making their own.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = {}   # token hash -> ValidationEntry
+        self.inflight = {}  # token hash -> threading.Event
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "server_calls": 0,
+                      "server_errors": 0, "server_ms": 0.0, "server_ms_max": 0.0}
+
+    def validate(self, token, exp):
+        """User details for token, from the cache or the auth server. Raises like _check_with_server."""
+        key = hashlib.sha256(token.encode()).hexdigest()
+        waited = False
+        while True:
+            with self.lock:
+                entry = self.entries.get(key)
+                if entry and entry.valid_until > time.time():
+                    self.stats["coalesced" if waited else "hits"] += 1
+                    if entry.error:
+                        raise entry.error
+                    return entry.details
+                event = self.inflight.get(key)
+                if event is None:
+                    event = self.inflight[key] = threading.Event()
+                    self.stats["misses"] += 1
+                    break
+            # Someone else is asking the server for this token; use their answer
+            event.wait(AUTH_TIMEOUT_SECONDS + 1)
+            waited = True
+
+        started = time.time()
+        details, error = None, None
+        try:
+            details = _check_with_server(token)
+            valid_until = min(exp - EXPIRY_BUFFER_SECONDS, started + REVALIDATE_SECONDS)
+        except jwt.InvalidTokenError as e:
+            # Rejected or revoked: stays that way for every session until it expires
+            error, valid_until = e, exp
+        except requests.RequestException as e:
+            error, valid_until = e, started + FAILURE_RETRY_SECONDS
+        except Exception as e:
+            error, valid_until = e, started
+        elapsed_ms = (time.time() - started) * 1000
+        with self.lock:
+            now = time.time()
+            for k in [k for k, e in self.entries.items() if e.valid_until <= now]:
+                del self.entries[k]
+            self.entries[key] = ValidationEntry(details, error, valid_until)
+            self.stats["server_calls"] += 1
+            self.stats["server_errors"] += isinstance(error, requests.RequestException)
+            self.stats["server_ms"] += elapsed_ms
+            self.stats["server_ms_max"] = max(self.stats["server_ms_max"], elapsed_ms)
+            del self.inflight[key]
+        event.set()
+        if error:
+            raise error
+        return details
+
+    def report(self):
+        with self.lock:
+            s = dict(self.stats)
+            lookups = s["hits"] + s["misses"] + s["coalesced"]
+            return {
+                "Cached Tokens": len(self.entries),
+                "Lookups": lookups,
+                "Hit Rate": f"{(s['hits'] + s['coalesced']) / lookups:.0%}" if lookups else "-",
+                "Auth Server Calls": s["server_calls"],
+                "Auth Server Errors": s["server_errors"],
+                "Avg Latency (ms)": round(s["server_ms"] / s["server_calls"], 1) if s["server_calls"] else None,
+                "Max Latency (ms)": round(s["server_ms_max"], 1),
+            }
+
+
+@st.cache_resource
+def get_token_cache():
+    return TokenValidationCache()
+
+
+def token_cache_stats():
+    return get_token_cache().report()
+
+
+def _check_with_server(token):
+    """Ask the auth server about token and check the user's role/app/access. Raises jwt.InvalidTokenError."""
+    response = requests.post(FLASK_AUTH_URL, json={"token": token}, timeout=AUTH_TIMEOUT_SECONDS)
+    if response.status_code != 200 or not response.json().get('valid'):
+        error = response.json().get('error', 'Invalid token')
+        logger.error(f"Auth failed: {error}")
+        raise jwt.InvalidTokenError(error)
+
+    # ✅ Extract session_id and details from response
+    resp_json = response.json()
+    user_details = resp_json.get('user_details', {})
+
+    role = user_details.get('role', '').lower()
+    app = user_details.get('app', '').lower()
+    access = user_details.get('access', [])
+
+    # Convert access to list if it's a string or None
+    if isinstance(access, str):
+        access = [access] if access else []
+    elif access is None:
+        access = []
+
+    # Role and access validation
+    if role not in VALID_ROLES:
+        logger.error(f"Invalid role: {role}")
+        raise jwt.InvalidTokenError(f"Invalid role '{role}'")
+    if role != 'admin':
+        if app not in VALID_APPS.values():
+            logger.error(f"Invalid app: {app}")
+            raise jwt.InvalidTokenError(f"Invalid app '{app}'")
+        if app == 'main':
+            valid_access = set(ACCESS_TO_BUTTON.keys())
+            if not all(acc in valid_access for acc in access):
+                logger.error(f"Invalid access for main app: {access}")
+                raise jwt.InvalidTokenError(f"Invalid access for main app: {access}")
+        elif app == 'operations':
+            valid_access = {"writer", "proofreader", "formatter", "cover_designer"}
+            if not (len(access) == 1 and access[0] in valid_access):
+                logger.error(f"Invalid access for operations app: {access}")
+                raise jwt.InvalidTokenError(f"Invalid access for operations app: {access}")
+        elif app == 'ijisem':
+            valid_access = {"Full Access"}
+            if not (len(access) == 1 and access[0] in valid_access):
+                logger.error(f"Invalid access for ijisem app: {access}")
+                raise jwt.InvalidTokenError(f"Invalid access for ijisem app: {access}")
+
+    return {
+        "session_id": resp_json.get('session_id'),
+        "email": user_details.get('email', ''),
+        "role": role,
+        "app": app,
+        "access": access,
+        "start_date": user_details.get('start_date', ''),
+        "username": user_details.get('username', ''),
+        "level": user_details.get('level', None),
+        "report_to": user_details.get('report_to', None),
+        "associate_id": user_details.get('associate_id', None),
+        "designation": user_details.get('designation', None),
+    }
+
+
 def validate_token():
     # Check if token and user details are cached and not near expiry
     current_time = time.time()
     if ('token' in st.session_state and
         'session_id' in st.session_state and  # ✅ Added session_id check
         'exp' in st.session_state and
-        st.session_state.exp > current_time + 300):  # 5-minute buffer
-        logger.info("Using cached token validation")
+        st.session_state.exp > current_time + EXPIRY_BUFFER_SECONDS):  # 5-minute buffer
+        logger.debug("Using cached token validation", extra={"sample_every": 100})
         return  # Exit early if cache is valid
 
     # Token fetching
@@ -89,75 +231,16 @@ def validate_token():
         if 'user_id' not in decoded or 'exp' not in decoded:
             raise jwt.InvalidTokenError("Missing user_id or exp")
 
-        # Server-side validation and user details
-        response = requests.post(FLASK_AUTH_URL, json={"token": token}, timeout=3)
-        if response.status_code != 200 or not response.json().get('valid'):
-            error = response.json().get('error', 'Invalid token')
-            logger.error(f"Auth failed: {error}")
-            raise jwt.InvalidTokenError(error)
-
-        # ✅ Extract session_id and details from response
-        resp_json = response.json()
-        session_id = resp_json.get('session_id')
-        user_details = resp_json.get('user_details', {})
-
-        role = user_details.get('role', '').lower()
-        app = user_details.get('app', '').lower()
-        access = user_details.get('access', [])
-        email = user_details.get('email', '')
-        start_date = user_details.get('start_date', '')
-        username = user_details.get('username', '')
-        level = user_details.get('level', None)
-        report_to = user_details.get('report_to', None)
-        associate_id = user_details.get('associate_id', None)
-        designation = user_details.get('designation', None)
-
-        # Convert access to list if it's a string or None
-        if isinstance(access, str):
-            access = [access] if access else []
-        elif access is None:
-            access = []
-
-        # Role and access validation
-        if role not in VALID_ROLES:
-            logger.error(f"Invalid role: {role}")
-            raise jwt.InvalidTokenError(f"Invalid role '{role}'")
-        if role != 'admin':
-            if app not in VALID_APPS.values():
-                logger.error(f"Invalid app: {app}")
-                raise jwt.InvalidTokenError(f"Invalid app '{app}'")
-            if app == 'main':
-                valid_access = set(ACCESS_TO_BUTTON.keys())
-                if not all(acc in valid_access for acc in access):
-                    logger.error(f"Invalid access for main app: {access}")
-                    raise jwt.InvalidTokenError(f"Invalid access for main app: {access}")
-            elif app == 'operations':
-                valid_access = {"writer", "proofreader", "formatter", "cover_designer"}
-                if not (len(access) == 1 and access[0] in valid_access):
-                    logger.error(f"Invalid access for operations app: {access}")
-                    raise jwt.InvalidTokenError(f"Invalid access for operations app: {access}")
-            elif app == 'ijisem':
-                valid_access = {"Full Access"}
-                if not (len(access) == 1 and access[0] in valid_access):
-                    logger.error(f"Invalid access for ijisem app: {access}")
-                    raise jwt.InvalidTokenError(f"Invalid access for ijisem app: {access}")
+        # Server-side validation and user details, shared with other tabs using this token
+        details = get_token_cache().validate(token, decoded['exp'])
 
         # ✅ Cache user details and the NEW session_id
         st.session_state.user_id = decoded['user_id']
-        st.session_state.session_id = session_id  # ✅ NEW: Store session_id for logging
-        st.session_state.email = email
-        st.session_state.role = role
-        st.session_state.app = app
-        st.session_state.access = access
-        st.session_state.start_date = start_date
-        st.session_state.username = username
         st.session_state.exp = decoded['exp']
-        st.session_state.level = level
-        st.session_state.report_to = report_to
-        st.session_state.associate_id = associate_id
-        st.session_state.designation = designation
+        for key, value in details.items():
+            st.session_state[key] = value  # ✅ session_id is used for logging
 
-        logger.info(f"Token validated successfully for user: {email}, session: {session_id}")
+        logger.info(f"Token validated successfully for user: {details['email']}, session: {details['session_id']}")
 
     except jwt.ExpiredSignatureError as e:
         logger.error(f"Token expired: {str(e)}", exc_info=True)
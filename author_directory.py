@@ -0,0 +1,197 @@
+# author_directory.py
+#
+# Process-wide author index for the author pickers. Dialogs search it by name,
+# email or phone and only the top matches go into the selectbox, instead of
+# the whole authors table on every rerun. Writers call mark_authors_dirty()
+# (or add_author()) so only the changed rows are re-read.
+
+import bisect
+import difflib
+import re
+import threading
+import time
+from collections import namedtuple
+
+import streamlit as st
+from sqlalchemy import text
+
+# Full reload interval as a safety net for writers that do not mark authors dirty
+FULL_REFRESH_SECONDS = 600
+# How often to look for authors inserted elsewhere (other processes, pages)
+NEW_AUTHORS_POLL_SECONDS = 30
+# Matches shown in a picker
+SEARCH_LIMIT = 25
+FUZZY_CUTOFF = 0.6
+# Names this close to an existing author's are flagged as likely duplicates
+DUPLICATE_NAME_CUTOFF = 0.9
+
+Author = namedtuple("Author", ["author_id", "name", "email", "phone"])
+
+AUTHOR_COLUMNS = "SELECT author_id, name, email, phone FROM authors"
+
+
+def normalize(value):
+    return re.sub(r"\s+", " ", str(value or "").strip().lower())
+
+
+def phone_key(phone):
+    # Last 10 digits, so +91 / 0 prefixes still match
+    digits = re.sub(r"\D", "", str(phone or ""))
+    return digits[-10:] if len(digits) >= 7 else None
+
+
+def author_label(author):
+    return f"{author.name} (ID: {author.author_id})"
+
+
+class AuthorDirectory:
+    """Authors by id plus a sorted token index for prefix search."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.authors = None
+        self.loaded_at = 0.0
+        self.polled_at = 0.0
+        self.max_id = 0
+        self.dirty = set()
+        self.index_stale = True
+        self.tokens = []       # sorted (token, author_id)
+        self.names = {}        # normalized name -> author ids
+        self.emails = {}
+        self.phones = {}
+
+    def mark_dirty(self, author_ids):
+        with self.lock:
+            self.dirty.update(int(a) for a in author_ids if a)
+
+    def add(self, author):
+        with self.lock:
+            if self.authors is not None:
+                self.authors[author.author_id] = author
+                self.max_id = max(self.max_id, author.author_id)
+                self.index_stale = True
+
+    def _fetch(self, conn, where="", params=None):
+        with conn.session as s:
+            rows = s.execute(text(f"{AUTHOR_COLUMNS} {where}"), params or {}).fetchall()
+        return [Author(int(r.author_id), r.name or "", r.email, r.phone) for r in rows]
+
+    def _sync(self, conn):
+        now = time.time()
+        if self.authors is None or now - self.loaded_at > FULL_REFRESH_SECONDS:
+            self.authors = {a.author_id: a for a in self._fetch(conn)}
+            self.max_id = max(self.authors, default=0)
+            self.loaded_at = self.polled_at = now
+            self.dirty.clear()
+            self.index_stale = True
+            return
+        clauses, params = [], {}
+        if self.dirty:
+            clauses.append("author_id IN :ids")
+            params["ids"] = tuple(self.dirty)
+        if now - self.polled_at > NEW_AUTHORS_POLL_SECONDS:
+            clauses.append("author_id > :max_id")
+            params["max_id"] = self.max_id
+            self.polled_at = now
+        if not clauses:
+            return
+        fresh = self._fetch(conn, "WHERE " + " OR ".join(clauses), params)
+        # Dirty ids that came back empty were deleted
+        for author_id in self.dirty:
+            self.authors.pop(author_id, None)
+        for a in fresh:
+            self.authors[a.author_id] = a
+            self.max_id = max(self.max_id, a.author_id)
+        self.dirty.clear()
+        self.index_stale = True
+
+    def _rebuild_index(self):
+        tokens, names, emails, phones = [], {}, {}, {}
+        for a in self.authors.values():
+            name = normalize(a.name)
+            names.setdefault(name, []).append(a.author_id)
+            words = set(name.split()) | {name}
+            email = normalize(a.email)
+            if email:
+                emails.setdefault(email, []).append(a.author_id)
+                words |= {email, email.split("@")[0]}
+            phone = phone_key(a.phone)
+            if phone:
+                phones.setdefault(phone, []).append(a.author_id)
+                words |= {phone, re.sub(r"\D", "", str(a.phone))}
+            tokens.extend((w, a.author_id) for w in words if w)
+        tokens.sort()
+        self.tokens, self.names, self.emails, self.phones = tokens, names, emails, phones
+        self.index_stale = False
+
+    def _refresh(self, conn):
+        self._sync(conn)
+        if self.index_stale:
+            self._rebuild_index()
+
+    def _prefix_ids(self, prefix):
+        ids = set()
+        i = bisect.bisect_left(self.tokens, (prefix,))
+        while i < len(self.tokens) and self.tokens[i][0].startswith(prefix):
+            ids.add(self.tokens[i][1])
+            i += 1
+        return ids
+
+    def get(self, conn, author_id):
+        with self.lock:
+            self._refresh(conn)
+            return self.authors.get(int(author_id))
+
+    def search(self, conn, query, k=SEARCH_LIMIT):
+        """
+        Top k authors for a search box: id, then name/email/phone prefix matches
+        (every query word must match), then fuzzy name matches. Empty query: first k by name.
+        """
+        with self.lock:
+            self._refresh(conn)
+            q = normalize(query)
+            if not q:
+                return sorted(self.authors.values(), key=lambda a: normalize(a.name))[:k]
+
+            ranked = {}
+            if q.isdigit() and int(q) in self.authors:
+                ranked[int(q)] = 0
+            words = q.split()
+            ids = self._prefix_ids(words[0])
+            for word in words[1:]:
+                ids &= self._prefix_ids(word)
+            for author_id in ids:
+                ranked.setdefault(author_id, 1 if normalize(self.authors[author_id].name).startswith(q) else 2)
+            if len(ranked) < k:
+                for name in difflib.get_close_matches(q, self.names, n=k, cutoff=FUZZY_CUTOFF):
+                    for author_id in self.names[name]:
+                        ranked.setdefault(author_id, 3)
+
+            best = sorted(ranked, key=lambda a: (ranked[a], normalize(self.authors[a].name)))
+            return [self.authors[a] for a in best[:k]]
+
+    def find_duplicates(self, conn, name, email=None, phone=None):
+        """Existing authors with the same email or phone, or a near-identical name."""
+        with self.lock:
+            self._refresh(conn)
+            ids = set(self.emails.get(normalize(email), []))
+            if phone_key(phone):
+                ids.update(self.phones.get(phone_key(phone), []))
+            for close in difflib.get_close_matches(normalize(name), self.names, n=5, cutoff=DUPLICATE_NAME_CUTOFF):
+                ids.update(self.names[close])
+            return sorted((self.authors[a] for a in ids), key=lambda a: a.author_id)
+
+
+@st.cache_resource
+def get_author_directory():
+    return AuthorDirectory()
+
+
+def mark_authors_dirty(*author_ids):
+    """Call after updating or deleting authors rows."""
+    get_author_directory().mark_dirty(author_ids)
+
+
+def add_author(author_id, name, email, phone):
+    """Call after inserting an author."""
+    get_author_directory().add(Author(int(author_id), name or "", email, phone))
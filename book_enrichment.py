@@ -0,0 +1,224 @@
+# book_enrichment.py
+#
+# AI subject/tag suggestions for book titles from the local Ollama model.
+#
+# Results are cached in ai_enrichment_cache keyed by (model, normalized title),
+# so re-typing or re-opening the same title never re-runs inference. Calls use
+# a timeout and fall back to "General Science" / no tags when the model is slow
+# or down. The host comes from st.secrets["ollama"]["HOST"] or OLLAMA_HOST, so a
+# fake HTTP endpoint can stand in for it.
+
+import difflib
+import hashlib
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import ollama
+import streamlit as st
+from sqlalchemy import text
+
+from constants import VALID_SUBJECTS
+from book_tags import resync_book_tags
+from dimensions import invalidate_columns
+from jobs import job_handler, query_frame
+from operations_sheet import mark_operations_dirty
+
+OLLAMA_MODEL = "gemma3:1b"
+OLLAMA_TIMEOUT_SECONDS = 30
+# Concurrent inferences during a backfill; the local model is the bottleneck
+BACKFILL_WORKERS = 2
+FALLBACK_SUBJECT = "General Science"
+FALLBACK_TAGS = ["general", "education", "literature", "academic"]
+
+VALID_SUBJECTS_LOWER = [s.lower() for s in VALID_SUBJECTS]
+
+SUBJECT_PROMPT = """
+        You are a book categorization assistant. Based on the book title, suggest a single, concise subject that best describes the book's educational content. The subject must be one of the following: {subjects}. Return only the subject name with no additional text or formatting.
+
+        Book Title: {title}
+
+        Example output: Physics
+        """
+
+TAGS_PROMPT = """
+        You are a book tagging assistant for a book management system.
+        Based only on the given book title, generate exactly 3 to 4 concise and highly relevant tags.
+
+        Rules:
+        - Tags must be single words or short phrases (max 2 words).
+        - Do not add filler or generic tags like 'book', 'novel', 'story', 'interesting', 'popular'.
+        - Only return a comma-separated list with exactly 3 to 4 tags, no extra text.
+
+        Book Title: {title}
+
+        Example output: Social Security,AI,Machine Learning,Tourism,Management
+        """
+
+# Books missing a subject or tags
+UNENRICHED_BOOKS_SQL = """
+    SELECT book_id, title, tags, subject
+    FROM books
+    WHERE title IS NOT NULL AND title != ''
+      AND (tags IS NULL OR tags IN ('', '[]') OR subject IS NULL OR subject = '')
+    ORDER BY book_id DESC
+"""
+
+
+def normalize_title(title):
+    return re.sub(r"\s+", " ", (title or "").strip().lower())
+
+
+def _title_hash(title_key):
+    return hashlib.sha1(title_key.encode("utf-8")).hexdigest()
+
+
+def find_closest_subject(suggested_subject):
+    """Map suggested subject to the closest predefined subject."""
+    if not suggested_subject:
+        return FALLBACK_SUBJECT
+
+    suggested_subject = suggested_subject.strip().lower()
+
+    # Exact match
+    if suggested_subject in VALID_SUBJECTS_LOWER:
+        return VALID_SUBJECTS[VALID_SUBJECTS_LOWER.index(suggested_subject)]
+
+    # Find closest match using difflib
+    closest = difflib.get_close_matches(suggested_subject, VALID_SUBJECTS_LOWER, n=1, cutoff=0.6)
+    if closest:
+        return VALID_SUBJECTS[VALID_SUBJECTS_LOWER.index(closest[0])]
+
+    return FALLBACK_SUBJECT
+
+
+def parse_tags(raw_response):
+    """Clean the model output into 3-4 lowercase tags."""
+    if raw_response.startswith("here are the tags") or "*" in raw_response or "-" in raw_response:
+        tags = []
+        for line in raw_response.split("\n"):
+            line = line.strip()
+            if line.startswith("*") or line.startswith("-"):
+                tags.append(line.lstrip("*- ").strip())
+            elif "," in line:
+                tags.extend([tag.strip() for tag in line.split(",") if tag.strip()])
+    else:
+        tags = [tag.strip() for tag in raw_response.split(",") if tag.strip()]
+
+    tags = list(dict.fromkeys([tag.lower() for tag in tags if tag]))  # Remove duplicates and lowercase
+    if len(tags) > 4:
+        tags = tags[:4]
+    elif len(tags) < 3:
+        tags.extend(FALLBACK_TAGS[:4 - len(tags)])  # Pad to 3 or 4
+    return tags
+
+
+def ollama_host():
+    return st.secrets.get("ollama", {}).get("HOST") or os.environ.get("OLLAMA_HOST", "http://localhost:11434")
+
+
+@st.cache_resource(show_spinner=False)
+def get_ollama_client():
+    return ollama.Client(host=ollama_host(), timeout=OLLAMA_TIMEOUT_SECONDS)
+
+
+def _generate(prompt, model):
+    return get_ollama_client().generate(model=model, prompt=prompt)['response'].strip()
+
+
+def _cached(conn, title_hash, model):
+    with conn.session as s:
+        return s.execute(text("""
+            SELECT subject, tags FROM ai_enrichment_cache WHERE model = :model AND title_hash = :hash
+        """), {"model": model, "hash": title_hash}).mappings().first()
+
+
+def _store(conn, title_key, title_hash, model, subject, tags):
+    with conn.session as s:
+        s.execute(text("""
+            INSERT INTO ai_enrichment_cache (model, title_hash, title_key, subject, tags)
+            VALUES (:model, :hash, :title_key, :subject, :tags)
+            ON DUPLICATE KEY UPDATE subject = COALESCE(VALUES(subject), subject),
+                                    tags = COALESCE(VALUES(tags), tags)
+        """), {
+            "model": model, "hash": title_hash, "title_key": title_key[:1000],
+            "subject": subject, "tags": json.dumps(tags) if tags is not None else None,
+        })
+        s.commit()
+
+
+def enrich_title(conn, title, model=OLLAMA_MODEL):
+    """
+    (subject, tags, error) for a book title. Cached per model and normalized
+    title; on a model error or timeout returns the fallbacks and the error text,
+    and nothing is cached for the part that failed.
+    """
+    title_key = normalize_title(title)
+    title_hash = _title_hash(title_key)
+    row = _cached(conn, title_hash, model)
+    subject = row["subject"] if row else None
+    tags = json.loads(row["tags"]) if row and row["tags"] else None
+    if subject is not None and tags is not None:
+        return subject, tags, None
+
+    errors = []
+    new_subject = new_tags = None
+    if subject is None:
+        try:
+            new_subject = find_closest_subject(_generate(SUBJECT_PROMPT.format(subjects=', '.join(VALID_SUBJECTS), title=title), model))
+        except Exception as e:
+            errors.append(f"subject: {e}")
+    if tags is None:
+        try:
+            new_tags = parse_tags(_generate(TAGS_PROMPT.format(title=title), model))
+        except Exception as e:
+            errors.append(f"tags: {e}")
+    if new_subject is not None or new_tags is not None:
+        _store(conn, title_key, title_hash, model, new_subject, new_tags)
+
+    subject = subject or new_subject or FALLBACK_SUBJECT
+    tags = tags if tags is not None else (new_tags or [])
+    return subject, tags, "; ".join(errors) or None
+
+
+@job_handler("ai_backfill")
+def run_backfill(job):
+    """Fill in missing subjects and tags for every book, BACKFILL_WORKERS titles at a time."""
+    books = query_frame(job.conn, UNENRICHED_BOOKS_SQL)
+    if books.empty:
+        return "Every book already has a subject and tags"
+
+    updated, failed = 0, 0
+    pool = ThreadPoolExecutor(max_workers=BACKFILL_WORKERS, thread_name_prefix="enrich")
+    try:
+        futures = {pool.submit(enrich_title, job.conn, row.title): row for row in books.itertuples()}
+        for done, future in enumerate(as_completed(futures), start=1):
+            row = futures[future]
+            subject, tags, error = future.result()
+            if error:
+                # Never write fallbacks over a book in bulk
+                failed += 1
+            else:
+                with job.conn.session as s:
+                    s.execute(text("""
+                        UPDATE books
+                        SET tags = CASE WHEN tags IS NULL OR tags IN ('', '[]') THEN :tags ELSE tags END,
+                            subject = CASE WHEN subject IS NULL OR subject = '' THEN :subject ELSE subject END
+                        WHERE book_id = :book_id
+                    """), {"tags": json.dumps(tags), "subject": subject, "book_id": int(row.book_id)})
+                    resync_book_tags(s, [row.book_id])
+                    s.commit()
+                mark_operations_dirty(row.book_id)
+                updated += 1
+            job.progress(done / len(futures), f"{done}/{len(futures)} books, {failed} failed")
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+        if updated:
+            invalidate_columns("books", ["tags", "subject"])
+
+    return f"Updated {updated} books" + (f", {failed} failed (model unavailable or timed out)" if failed else "")
+
+
+def count_unenriched_books(conn):
+    return conn.query(f"SELECT COUNT(*) AS n FROM ({UNENRICHED_BOOKS_SQL}) t", ttl=0, show_spinner=False)['n'].iloc[0]
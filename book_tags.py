@@ -0,0 +1,66 @@
+# book_tags.py
+#
+# book_tags is a normalized copy of books.tags (one row per tag and book),
+# so the tag list, tag counts and "books with these tags" are index lookups
+# instead of parsing every book's JSON. books.tags stays the source shown and
+# edited in the dialogs; whoever writes it calls sync_book_tags() in the same
+# transaction.
+
+import json
+
+from sqlalchemy import text
+
+from dimensions import get_dimension, invalidate_columns
+
+
+def parse_tags(tags):
+    """Tag list from a list or the JSON text stored in books.tags."""
+    if isinstance(tags, str):
+        try:
+            tags = json.loads(tags) if tags.strip() else []
+        except json.JSONDecodeError:
+            return []
+    if not isinstance(tags, list):
+        return []
+    return list(dict.fromkeys(str(t).strip() for t in tags if t and str(t).strip()))
+
+
+def sync_book_tags(session, book_id, tags):
+    """Replace book_id's rows in book_tags. Caller commits, then calls invalidate_tags()."""
+    session.execute(text("DELETE FROM book_tags WHERE book_id = :book_id"), {"book_id": int(book_id)})
+    rows = [{"tag": tag[:255], "book_id": int(book_id)} for tag in parse_tags(tags)]
+    if rows:
+        session.execute(text("INSERT IGNORE INTO book_tags (tag, book_id) VALUES (:tag, :book_id)"), rows)
+
+
+def resync_book_tags(session, book_ids):
+    """Re-read books.tags for these books and sync them (after bulk UPDATEs)."""
+    if not book_ids:
+        return
+    rows = session.execute(text("SELECT book_id, tags FROM books WHERE book_id IN :ids"),
+                           {"ids": tuple(int(b) for b in book_ids)}).fetchall()
+    for book_id, tags in rows:
+        sync_book_tags(session, book_id, tags)
+
+
+def invalidate_tags():
+    invalidate_columns("books", ["tags"])
+
+
+def tag_counts(conn):
+    """{tag: number of books}, from the shared "tag_counts" dimension."""
+    return dict(get_dimension("tag_counts", conn))
+
+
+def books_with_tags(conn, tags):
+    """Ids of books having any of tags."""
+    if not tags:
+        return []
+    with conn.session as s:
+        return [r[0] for r in s.execute(
+            text("SELECT DISTINCT book_id FROM book_tags WHERE tag IN :tags"), {"tags": tuple(tags)}
+        )]
+
+
+# Filter fragment for queries over books b, e.g. settings' PDF export
+BOOKS_WITH_TAGS_SQL = "b.book_id IN (SELECT book_id FROM book_tags WHERE tag IN :filter_tags)"
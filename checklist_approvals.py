@@ -0,0 +1,111 @@
+# checklist_approvals.py
+#
+# Who approves a daily checklist task is the first of the task's own manager,
+# the responsibility's manager and the submission's manager. That is resolved
+# when a log row is written and kept in daily_checklist_logs.approver_id
+# (indexed, see migration 12), so a manager's inbox is an index lookup instead
+# of a COALESCE over three joined tables. Writers call resolve_approvers() in
+# the same transaction and invalidate_pending_counts() after committing.
+
+import threading
+import time
+
+import streamlit as st
+from sqlalchemy import text
+
+# Submissions per inbox page
+INBOX_PAGE_SIZE = 20
+# Safety net for status changes that do not call invalidate_pending_counts
+PENDING_COUNTS_TTL_SECONDS = 60
+
+RESOLVE_APPROVERS_SQL = """
+    UPDATE daily_checklist_logs l
+    JOIN daily_checklist_submissions s ON s.id = l.submission_id
+    LEFT JOIN daily_responsibilities dr ON dr.id = l.responsibility_id
+    SET l.approver_id = COALESCE(l.manager_id, dr.manager_id, s.manager_id)
+    WHERE {where}
+"""
+
+
+def resolve_approvers(session, submission_id=None, responsibility_id=None):
+    """Recompute approver_id for a submission's logs, or every log of a responsibility. Caller commits."""
+    if submission_id is not None:
+        session.execute(text(RESOLVE_APPROVERS_SQL.format(where="l.submission_id = :sid")), {"sid": int(submission_id)})
+    if responsibility_id is not None:
+        session.execute(text(RESOLVE_APPROVERS_SQL.format(where="l.responsibility_id = :rid")), {"rid": int(responsibility_id)})
+
+
+def fetch_approval_inbox(conn, manager_id, user_id=None, after=None, limit=INBOX_PAGE_SIZE):
+    """
+    Submissions with a task waiting on manager_id, newest day first, then by
+    username. after is the cursor returned for the previous page. Returns
+    (page, cursor for the next page or None).
+    """
+    filters, params = [], {"manager_id": int(manager_id), "limit": limit + 1}
+    if user_id is not None:
+        filters.append("s.user_id = :user_id")
+        params["user_id"] = int(user_id)
+    if after is not None:
+        filters.append("""(s.date < :after_date
+            OR (s.date = :after_date AND (u.username > :after_username
+                OR (u.username = :after_username AND s.id > :after_id))))""")
+        params.update(after_date=after[0], after_username=after[1], after_id=after[2])
+    query = f"""
+        SELECT s.*, u.username
+        FROM daily_checklist_submissions s
+        JOIN userss u ON s.user_id = u.id
+        WHERE s.id IN (
+            SELECT l.submission_id FROM daily_checklist_logs l
+            WHERE l.approver_id = :manager_id AND l.status = 'submitted'
+        )
+        {''.join(f' AND {f}' for f in filters)}
+        ORDER BY s.date DESC, u.username ASC, s.id ASC
+        LIMIT :limit
+    """
+    page = conn.query(query, params=params, ttl=0)
+    if len(page) <= limit:
+        return page, None
+    page = page.iloc[:limit]
+    last = page.iloc[-1]
+    return page, (last['date'], last['username'], int(last['id']))
+
+
+class PendingCounts:
+    """Submissions awaiting each approver, from one grouped query shared by the process."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = None
+        self.loaded_at = 0.0
+
+    def get(self, conn, manager_id):
+        with self.lock:
+            if self.counts is None or time.time() - self.loaded_at > PENDING_COUNTS_TTL_SECONDS:
+                with conn.session as s:
+                    rows = s.execute(text("""
+                        SELECT approver_id, COUNT(DISTINCT submission_id)
+                        FROM daily_checklist_logs
+                        WHERE status = 'submitted' AND approver_id IS NOT NULL
+                        GROUP BY approver_id
+                    """)).fetchall()
+                self.counts = {int(approver_id): int(count) for approver_id, count in rows}
+                self.loaded_at = time.time()
+            return self.counts.get(int(manager_id), 0)
+
+    def invalidate(self):
+        with self.lock:
+            self.counts = None
+
+
+@st.cache_resource
+def get_pending_counts():
+    return PendingCounts()
+
+
+def pending_approval_count(conn, manager_id):
+    return get_pending_counts().get(conn, manager_id)
+
+
+def invalidate_pending_counts():
+    """Call after a checklist task is submitted, approved or rejected, or changes approver."""
+    get_pending_counts().invalidate()
@@ -4,8 +4,10 @@ from sqlalchemy import text
 import streamlit as st
 from datetime import datetime
 import pytz
-import json
 import pandas as pd
+import threading
+import time
+from dimensions import get_dimension
 
 ACCESS_TO_BUTTON = {
     # Loop buttons (table)
@@ -129,6 +131,12 @@ def log_activity(conn, user_id, username, session_id, action, details, session=N
         st.error(f"Error logging activity: {e}")
 
 
+# Log cleanup runs at most this often per process, not once per session (every new tab)
+LOG_CLEANUP_INTERVAL_SECONDS = 6 * 3600
+_log_cleanup_lock = threading.Lock()
+_last_log_cleanup = 0.0
+
+
 def clean_old_logs(conn, days_to_keep=180):
     """
     Delete activity_log entries older than `days_to_keep` days and log the cleanup action.
@@ -137,6 +145,11 @@ def clean_old_logs(conn, days_to_keep=180):
     - conn: Database connection object
     - days_to_keep: Number of days to retain logs (default is 30)
     """
+    global _last_log_cleanup
+    with _log_cleanup_lock:
+        if time.time() - _last_log_cleanup < LOG_CLEANUP_INTERVAL_SECONDS:
+            return
+        _last_log_cleanup = time.time()
     try:
         with conn.session as s:
             # Delete logs older than `days_to_keep` days
@@ -293,6 +306,87 @@ def get_reprint_eligible_books(conn):
     return df
 
 
+class SharedCache:
+    """
+    Values by key, shared by every session in the process. Pages call
+    st.cache_data.clear() on load, which would empty an st.cache_data entry on
+    almost every rerun; this lives behind st.cache_resource instead, expires
+    after ttl seconds and is dropped by writers through invalidate().
+    """
+
+    def __init__(self, ttl=None, max_entries=None):
+        self.lock = threading.Lock()
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = {}  # key -> (value, loaded_at)
+        self.generation = 0
+
+    def get(self, key, load):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and (self.ttl is None or time.time() - entry[1] < self.ttl):
+                return entry[0]
+            generation = self.generation
+        value = load()
+        with self.lock:
+            # A value read while invalidate() ran may already be stale: return it, don't keep it
+            if generation == self.generation:
+                self.entries[key] = (value, time.time())
+                if self.max_entries and len(self.entries) > self.max_entries:
+                    del self.entries[min(self.entries, key=lambda k: self.entries[k][1])]
+        return value
+
+    def invalidate(self, key=None):
+        with self.lock:
+            self.generation += 1
+            if key is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(key, None)
+
+
+# Unread chat messages for one user (private + group), in one round trip.
+# Conversations are matched through two index lookups instead of an OR, and
+# seen group messages are excluded with NOT EXISTS so the per-user seen list
+# is probed by index rather than materialized (see the "ict" migrations).
+UNREAD_COUNT_SQL = """
+    SELECT
+        (SELECT COUNT(*)
+         FROM messages m
+         JOIN (SELECT id FROM conversations WHERE user1_id = :user_id
+               UNION
+               SELECT id FROM conversations WHERE user2_id = :user_id) c
+           ON m.conversation_id = c.id
+         WHERE m.seen = 0 AND m.sender_id != :user_id)
+      + (SELECT COUNT(*)
+         FROM group_members gu
+         JOIN group_messages gm ON gm.group_id = gu.group_id
+         WHERE gu.user_id = :user_id
+         AND gm.sender_id != :user_id
+         AND NOT EXISTS (
+             SELECT 1 FROM group_message_seen s
+             WHERE s.user_id = :user_id AND s.message_id = gm.id
+         )) AS count
+"""
+
+
+# Seconds an unread count is reused; the badge may lag this much
+UNREAD_COUNT_TTL_SECONDS = 20
+
+
+@st.cache_resource
+def get_unread_counts():
+    return SharedCache(ttl=UNREAD_COUNT_TTL_SECONDS)
+
+
+def fetch_unread_count(ict_conn, user_id):
+    """Unread count shared by every session of the same user."""
+    def load():
+        res = ict_conn.query(UNREAD_COUNT_SQL, params={"user_id": user_id}, ttl=0, show_spinner=False)
+        return int(res.iloc[0]["count"] or 0) if not res.empty else 0
+    return get_unread_counts().get(int(user_id), load)
+
+
 def get_total_unread_count(ict_conn, user_id):
     """
     Calculates total unread messages (Private + Group) for a specific user.
@@ -302,36 +396,7 @@ def get_total_unread_count(ict_conn, user_id):
         return 0
 
     try:
-        # 1. Private Chat Unread
-        private_query = f"""
-            SELECT COUNT(*) AS count
-            FROM messages m
-            JOIN conversations c ON m.conversation_id = c.id
-            WHERE m.sender_id != {user_id} 
-            AND m.seen = 0
-            AND (c.user1_id = {user_id} OR c.user2_id = {user_id})
-        """
-        private_res = ict_conn.query(private_query, ttl=0, show_spinner = False)
-        private_count = private_res.iloc[0]["count"] if not private_res.empty else 0
-
-        # 2. Group Chat Unread
-        group_query = f"""
-            SELECT COUNT(*) AS count
-            FROM group_messages gm
-            JOIN group_members gu ON gm.group_id = gu.group_id
-            WHERE gu.user_id = {user_id}
-            AND gm.sender_id != {user_id}
-            AND gm.id NOT IN (
-                SELECT message_id 
-                FROM group_message_seen 
-                WHERE user_id = {user_id}
-            )
-        """
-        group_res = ict_conn.query(group_query, ttl=0, show_spinner = False)
-        group_count = group_res.iloc[0]["count"] if not group_res.empty else 0
-
-        return int(private_count + group_count)
-
+        return fetch_unread_count(ict_conn, int(user_id))
     except Exception as e:
         # Optional: st.error(f"Error fetching unread counts: {e}")
         return 0
@@ -372,41 +437,13 @@ def check_ready_to_print(book_id, conn):
 
 
 def fetch_tags(conn):
-
+    """Sorted tag vocabulary across all books (the "tags" dimension)."""
     try:
-        # Fetch and process tags
-        with conn.session as s:
-            tag_query = text("SELECT tags FROM books WHERE tags IS NOT NULL AND tags != ''")
-            all_tags = s.execute(tag_query).fetchall()
-            
-            unique_tags = set()
-            for row in all_tags[:5]:
-                if row[0] and isinstance(row[0], str):
-                    try:
-                        tags = json.loads(row[0])  # Parse JSON array
-                        unique_tags.update(tags)
-                    except json.JSONDecodeError:
-                        st.error(f"Invalid JSON in tags: {row[0]} -> Skipped")
-                else:
-                    st.error(f"Raw tag: {row[0]} -> Skipped (invalid or empty)")
-            
-            # Collect unique tags from all rows
-            for row in all_tags:
-                if row[0] and isinstance(row[0], str):
-                    try:
-                        tags = json.loads(row[0])
-                        unique_tags.update(tags)
-                    except json.JSONDecodeError:
-                        st.write(f"Invalid JSON in tags: {row[0]} -> Skipped")
-            
-            # Convert to sorted list
-            sorted_tags = sorted(unique_tags)
-
-            return sorted_tags
+        return get_dimension("tags", conn)
     except Exception as e:
         st.error(f"Error fetching tags: {e}")
         return []
-    
+
 # New function to fetch detailed print information for a specific book_id
 def fetch_print_details(book_id, conn):
     query = """
@@ -418,19 +455,118 @@ def fetch_print_details(book_id, conn):
     """
     return conn.query(query, params={'book_id': book_id}, show_spinner=False)
 
+# Safety net for author_payments writes that do not call invalidate_payment_ledger
+PAYMENT_LEDGER_TTL_SECONDS = 300
+
+
+@st.cache_resource
+def get_payment_ledger_cache():
+    return SharedCache(ttl=PAYMENT_LEDGER_TTL_SECONDS)
+
+
+def fetch_payment_ledger(conn):
+    """
+    Approved/pending payment totals for every book_author in one GROUP BY,
+    shared by the payments, sales and main app views. Dropped by
+    invalidate_payment_ledger() whenever author_payments is written.
+    Treat the result as read-only.
+    """
+    return get_payment_ledger_cache().get("ledger", lambda: _load_payment_ledger(conn))
+
+def _load_payment_ledger(conn):
+    query = """
+    SELECT book_author_id,
+           SUM(CASE WHEN status = 'Approved' THEN amount ELSE 0 END) as amount_paid,
+           SUM(CASE WHEN status = 'Pending' THEN amount ELSE 0 END) as amount_pending,
+           MAX(CASE WHEN status = 'Rejected' THEN 1 ELSE 0 END) as has_rejected
+    FROM author_payments
+    GROUP BY book_author_id
+    """
+    ledger = conn.query(query, ttl=0, show_spinner=False)
+    for col in ['amount_paid', 'amount_pending', 'has_rejected']:
+        ledger[col] = ledger[col].astype(float)
+    return ledger.set_index('book_author_id')
+
+def invalidate_payment_ledger():
+    get_payment_ledger_cache().invalidate()
+
+def with_payment_ledger(df, conn, id_col='id', columns=('amount_paid',)):
+    """Attach ledger totals to a book_authors frame (0 for authors with no payments)."""
+    ledger = fetch_payment_ledger(conn)
+    df = df.copy()
+    for col in columns:
+        df[col] = df[id_col].map(ledger[col]).fillna(0.0) if not df.empty else pd.Series(dtype=float)
+    return df
+
+STOCK_COLUMNS = ['printed', 'sent_to_authors', 'website_sales', 'amazon_sales',
+                 'flipkart_sales', 'direct_sales', 'sold', 'on_hand',
+                 'temp_physical_count', 'inventory_check_done']
+
+# Safety net for stock writes that do not call invalidate_stock_ledger
+STOCK_LEDGER_TTL_SECONDS = 600
+
+
+@st.cache_resource
+def get_stock_ledger_cache():
+    return SharedCache(ttl=STOCK_LEDGER_TTL_SECONDS)
+
+
+def fetch_stock_ledger(conn):
+    """
+    Per-book stock from the book_stock_ledger view (printed, sent to authors,
+    sold, on hand) plus the book/inventory fields the inventory pages show.
+    Dropped by invalidate_stock_ledger() from batch, delivery, sales and
+    inventory writes, and by mark_operations_dirty() for books edits.
+    """
+    return get_stock_ledger_cache().get("ledger", lambda: _load_stock_ledger(conn)).copy()
+
+def _load_stock_ledger(conn):
+    query = """
+    SELECT
+        b.book_id,
+        b.title,
+        b.isbn,
+        b.isbn_receive_date AS publication_date,
+        b.flipkart_link,
+        b.agph_link,
+        b.amazon_link,
+        b.google_link,
+        b.deliver,
+        i.rack_number,
+        i.temp_physical_count,
+        i.inventory_check_done,
+        l.printed,
+        l.sent_to_authors,
+        l.website_sales,
+        l.amazon_sales,
+        l.flipkart_sales,
+        l.direct_sales,
+        l.sold
+    FROM books b
+    JOIN book_stock_ledger l ON l.book_id = b.book_id
+    LEFT JOIN inventory i ON i.book_id = b.book_id
+    """
+    ledger = conn.query(query, ttl=0, show_spinner=False)
+    ledger['on_hand'] = ledger['printed'].fillna(0) - ledger['sent_to_authors'].fillna(0) - ledger['sold'].fillna(0)
+    ledger[STOCK_COLUMNS] = ledger[STOCK_COLUMNS].fillna(0).astype(int)
+    return ledger
+
+def invalidate_stock_ledger():
+    get_stock_ledger_cache().invalidate()
+
+BOOK_AUTHOR_COLUMNS = [
+    'id', 'book_id', 'author_id', 'name', 'email', 'phone', 'author_position',
+    'welcome_mail_sent', 'corresponding_agent', 'publishing_consultant',
+    'photo_recive', 'id_proof_recive', 'author_details_sent',
+    'cover_agreement_sent', 'agreement_received', 'digital_book_sent',
+    'printing_confirmation', 'delivery_address',
+    'address_line1', 'address_line2', 'city_del', 'state_del', 'pincode', 'country',
+    'delivery_charge', 'number_of_books', 'total_amount', 'delivery_date',
+    'tracking_id', 'delivery_vendor', 'isbn_sent_at'
+]
+
 @st.cache_data
-def fetch_all_book_authors(book_ids, _conn):
-    if not book_ids:  # Handle empty book_ids
-        return pd.DataFrame(columns=[
-            'id', 'book_id', 'author_id', 'name', 'email', 'phone', 'author_position',
-            'welcome_mail_sent', 'corresponding_agent', 'publishing_consultant',
-            'photo_recive', 'id_proof_recive', 'author_details_sent',
-            'cover_agreement_sent', 'agreement_received', 'digital_book_sent',
-            'printing_confirmation', 'delivery_address', 
-            'address_line1', 'address_line2', 'city_del', 'state_del', 'pincode', 'country',
-            'delivery_charge', 'number_of_books', 'total_amount', 'delivery_date',
-            'tracking_id', 'delivery_vendor', 'amount_paid', 'isbn_sent_at'
-        ])
+def fetch_book_author_rows(book_ids, _conn):
     query = """
     SELECT ba.id, ba.book_id, ba.author_id, a.name, a.email, a.phone,
            ba.author_position, ba.welcome_mail_sent, ba.corresponding_agent, 
@@ -439,25 +575,23 @@ def fetch_all_book_authors(book_ids, _conn):
            ba.digital_book_sent, ba.printing_confirmation, ba.delivery_address, 
            ba.address_line1, ba.address_line2, ba.city_del, ba.state_del, ba.pincode, ba.country,
            ba.delivery_charge, ba.number_of_books, ba.total_amount,
-           ba.delivery_date, ba.tracking_id, ba.delivery_vendor, ba.isbn_sent_at,
-           COALESCE((SELECT SUM(amount) FROM author_payments WHERE book_author_id = ba.id AND status = 'Approved'), 0) as amount_paid
+           ba.delivery_date, ba.tracking_id, ba.delivery_vendor, ba.isbn_sent_at
     FROM book_authors ba
     JOIN authors a ON ba.author_id = a.author_id
     WHERE ba.book_id IN :book_ids
     """
+    return _conn.query(query, params={'book_ids': tuple(book_ids)}, show_spinner=False)
+
+def fetch_all_book_authors(book_ids, _conn):
+    # Author rows are cached per book list; amount_paid comes from the shared
+    # payment ledger so it stays current without re-querying the authors
+    if not book_ids:  # Handle empty book_ids
+        return pd.DataFrame(columns=BOOK_AUTHOR_COLUMNS + ['amount_paid'])
     try:
-        return _conn.query(query, params={'book_ids': tuple(book_ids)}, show_spinner=False)
+        return with_payment_ledger(fetch_book_author_rows(book_ids, _conn), _conn)
     except Exception as e:
         st.error(f"Error fetching book authors: {e}")
-        return pd.DataFrame(columns=[
-            'id', 'book_id', 'author_id', 'name', 'email', 'phone', 'author_position',
-            'welcome_mail_sent', 'corresponding_agent', 'publishing_consultant',
-            'photo_recive', 'id_proof_recive', 'author_details_sent',
-            'cover_agreement_sent', 'agreement_received', 'digital_book_sent',
-            'printing_confirmation', 'delivery_address', 'delivery_charge',
-            'number_of_books', 'total_amount', 'delivery_date',
-            'tracking_id', 'delivery_vendor', 'amount_paid'
-        ])
+        return pd.DataFrame(columns=BOOK_AUTHOR_COLUMNS + ['amount_paid'])
 
 @st.cache_data
 def fetch_all_printeditions(book_ids, _conn):
@@ -0,0 +1,223 @@
+# delivery_books.py
+
+import threading
+import time
+
+import pandas as pd
+import streamlit as st
+from sqlalchemy import text
+
+# Full rebuild interval as a safety net for writers that do not mark books dirty
+FULL_REFRESH_SECONDS = 600
+
+# Latest received batch for the given books, written into the book_latest_batch
+# index. Same ranking the delivery queries used to do inline with ROW_NUMBER().
+REFRESH_LATEST_BATCH_SQL = """
+    REPLACE INTO book_latest_batch (book_id, batch_id)
+    SELECT book_id, batch_id FROM (
+        SELECT pe.book_id, pb.batch_id,
+               ROW_NUMBER() OVER(PARTITION BY pe.book_id ORDER BY pb.print_receive_date DESC, pb.batch_id DESC) as rn
+        FROM PrintEditions pe
+        JOIN BatchDetails bd ON pe.print_id = bd.print_id
+        JOIN PrintBatches pb ON bd.batch_id = pb.batch_id
+        WHERE pb.status = 'Received' AND pe.book_id IN :book_ids
+    ) ranked
+    WHERE rn = 1
+"""
+
+PENDING_QUERY = """
+    SELECT
+        b.book_id, b.title, b.date,
+        GROUP_CONCAT(DISTINCT a.name SEPARATOR ', ') AS author_names,
+        pb.batch_id, pb.batch_name, pb.print_receive_date,
+        TRIM(TRAILING ' | ' FROM CONCAT(
+            CASE WHEN SUM(CASE WHEN (
+                ba.address_line1 IS NULL OR ba.address_line1 = '' OR
+                ba.city_del IS NULL OR ba.city_del = '' OR
+                ba.state_del IS NULL OR ba.state_del = '' OR
+                ba.pincode IS NULL OR ba.pincode = '' OR
+                ba.country IS NULL OR ba.country = ''
+            ) THEN 1 ELSE 0 END) > 0 THEN 'Address | ' ELSE '' END,
+            CASE WHEN SUM(CASE WHEN (ba.number_of_books IS NULL OR ba.number_of_books = 0) THEN 1 ELSE 0 END) > 0 THEN 'Copies to Send | ' ELSE '' END
+        )) AS missing_info
+    FROM books b
+    JOIN book_latest_batch lb ON lb.book_id = b.book_id
+    JOIN PrintBatches pb ON pb.batch_id = lb.batch_id
+    JOIN book_authors ba ON b.book_id = ba.book_id
+    JOIN authors a ON ba.author_id = a.author_id
+    WHERE b.print_status = 1 AND b.deliver = 0 AND b.is_cancelled = 0 {and_books}
+    GROUP BY b.book_id, pb.batch_id, pb.batch_name, pb.print_receive_date
+"""
+
+DELIVERED_QUERY = """
+    SELECT
+        b.book_id, b.title, b.date, b.publisher, b.apply_isbn, b.isbn, b.isbn_receive_date,
+        b.is_publish_only, b.is_thesis_to_book, b.deliver,
+        b.writing_start, b.writing_end, b.writing_by,
+        b.proofreading_start, b.proofreading_end, b.proofreading_by,
+        b.formatting_start, b.formatting_end, b.formatting_by,
+        b.cover_start, b.cover_end, b.cover_by,
+        d.author_names, d.delivery_date,
+        pb.batch_id, pb.batch_name, pb.print_receive_date
+    FROM books b
+    JOIN (
+        SELECT ba.book_id,
+               GROUP_CONCAT(DISTINCT a.name SEPARATOR ', ') AS author_names,
+               MAX(ba.delivery_date) AS delivery_date
+        FROM book_authors ba
+        JOIN books db ON db.book_id = ba.book_id AND db.deliver = 1
+        JOIN authors a ON ba.author_id = a.author_id
+        GROUP BY ba.book_id
+        {having}
+    ) d ON d.book_id = b.book_id
+    LEFT JOIN book_latest_batch lb ON lb.book_id = b.book_id
+    LEFT JOIN PrintBatches pb ON pb.batch_id = lb.batch_id
+    WHERE b.deliver = 1 {and_search}
+    ORDER BY d.delivery_date DESC
+"""
+
+
+def refresh_latest_batch(session, batch_id):
+    """Re-rank the latest received batch for every book in batch_id. Caller commits."""
+    book_ids = [r[0] for r in session.execute(text("""
+        SELECT DISTINCT pe.book_id
+        FROM BatchDetails bd
+        JOIN PrintEditions pe ON bd.print_id = pe.print_id
+        WHERE bd.batch_id = :batch_id
+    """), {"batch_id": batch_id})]
+    refresh_books_latest_batch(session, book_ids)
+    return book_ids
+
+
+def refresh_books_latest_batch(session, book_ids):
+    """
+    Re-rank the latest received batch for book_ids, dropping books that no
+    longer have one (e.g. after a print edition is deleted). Caller commits.
+    """
+    if not book_ids:
+        return
+    params = {"book_ids": tuple(int(b) for b in book_ids)}
+    session.execute(text("DELETE FROM book_latest_batch WHERE book_id IN :book_ids"), params)
+    session.execute(text(REFRESH_LATEST_BATCH_SQL), params)
+
+
+def _sort_pending(df):
+    if df.empty:
+        return df
+    return df.sort_values(['print_receive_date', 'date'], ascending=False,
+                          na_position='last', ignore_index=True)
+
+
+class PendingDeliveries:
+    """
+    Process-wide pending delivery queue. Writers call mark_dirty() so only the
+    affected books are re-read; the whole queue is rebuilt every FULL_REFRESH_SECONDS.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.books = None
+        self.loaded_at = 0.0
+        self.dirty = set()
+        self.dirty_author_rows = set()
+
+    def mark_dirty(self, book_ids=(), author_row_ids=()):
+        with self.lock:
+            self.dirty.update(int(b) for b in book_ids if pd.notnull(b))
+            self.dirty_author_rows.update(int(i) for i in author_row_ids if pd.notnull(i))
+
+    def invalidate(self):
+        with self.lock:
+            self.books = None
+
+    def _fetch(self, conn, book_ids=None):
+        and_books = "AND b.book_id IN :book_ids" if book_ids is not None else ""
+        params = {"book_ids": tuple(book_ids)} if book_ids is not None else {}
+        with conn.session as s:
+            result = s.execute(text(PENDING_QUERY.format(and_books=and_books)), params)
+            return pd.DataFrame(result.fetchall(), columns=list(result.keys()))
+
+    def _resolve_author_rows(self, conn):
+        with conn.session as s:
+            rows = s.execute(
+                text("SELECT DISTINCT book_id FROM book_authors WHERE id IN :ids"),
+                {"ids": tuple(self.dirty_author_rows)}
+            )
+            self.dirty.update(r[0] for r in rows)
+        self.dirty_author_rows.clear()
+
+    def snapshot(self, conn):
+        with self.lock:
+            if self.books is None or time.time() - self.loaded_at > FULL_REFRESH_SECONDS:
+                self.books = _sort_pending(self._fetch(conn))
+                self.loaded_at = time.time()
+                self.dirty.clear()
+                self.dirty_author_rows.clear()
+            else:
+                if self.dirty_author_rows:
+                    self._resolve_author_rows(conn)
+                if self.dirty:
+                    book_ids = sorted(self.dirty)
+                    fresh = self._fetch(conn, book_ids)
+                    keep = self.books[~self.books['book_id'].isin(book_ids)]
+                    self.books = _sort_pending(pd.concat([keep, fresh], ignore_index=True))
+                    self.dirty.clear()
+            return self.books.copy()
+
+
+@st.cache_resource
+def get_pending_deliveries():
+    return PendingDeliveries()
+
+
+def mark_delivery_dirty(*book_ids, author_row_ids=()):
+    """Call after changing a book's print, delivery or author address state."""
+    get_pending_deliveries().mark_dirty(book_ids, author_row_ids)
+
+
+def fetch_pending_delivery_books(conn):
+    """Printed, undelivered books with their latest received batch and missing delivery info."""
+    return get_pending_deliveries().snapshot(conn)
+
+
+@st.cache_data(ttl=600, show_spinner=False)
+def fetch_delivery_months(_conn):
+    """(year, month, books) for every month with delivered books, newest first."""
+    query = """
+        SELECT YEAR(delivery_date) AS year, MONTH(delivery_date) AS month, COUNT(*) AS books
+        FROM (
+            SELECT ba.book_id, MAX(ba.delivery_date) AS delivery_date
+            FROM book_authors ba
+            JOIN books b ON b.book_id = ba.book_id AND b.deliver = 1
+            GROUP BY ba.book_id
+        ) d
+        WHERE delivery_date IS NOT NULL
+        GROUP BY YEAR(delivery_date), MONTH(delivery_date)
+        ORDER BY year DESC, month DESC
+    """
+    return _conn.query(query, ttl=0, show_spinner=False)
+
+
+@st.cache_data(ttl=600, show_spinner=False)
+def fetch_delivered_books(_conn, start=None, end=None, search=None):
+    """
+    Delivered books whose latest delivery date falls in [start, end) and/or
+    whose book id or title matches search. With neither, every delivered book.
+    """
+    having, and_search, params = "", "", {}
+    if search:
+        and_search = "AND (CAST(b.book_id AS CHAR) LIKE :q OR b.title LIKE :q)"
+        params["q"] = f"%{search}%"
+    if start is not None:
+        having = "HAVING delivery_date >= :start AND delivery_date < :end"
+        params.update(start=start, end=end)
+    query = DELIVERED_QUERY.format(having=having, and_search=and_search)
+    df = _conn.query(query, params=params, ttl=0, show_spinner=False)
+    df['delivery_date'] = pd.to_datetime(df['delivery_date'])
+    df['date'] = pd.to_datetime(df['date'])
+    return df
+
+
+def invalidate_delivered():
+    fetch_delivery_months.clear()
+    fetch_delivered_books.clear()
@@ -0,0 +1,172 @@
+# dimensions.py
+#
+# Dropdown sources ("dimensions"): the DISTINCT lists behind selectboxes, such
+# as worker names, agents, services and tags. Each one is declared once here
+# with its TTL and the columns it is built from. Values are shared by every
+# session in the process, and writers call invalidate_columns() for the
+# columns they touch so the next read reloads only the dimensions that changed.
+
+import threading
+import time
+from datetime import datetime
+
+import pandas as pd
+import streamlit as st
+from sqlalchemy import text
+
+DEFAULT_TTL_SECONDS = 600
+
+
+class Dimension:
+    def __init__(self, name, loader, ttl, columns):
+        self.name = name
+        self.loader = loader
+        self.ttl = ttl
+        self.columns = {(t.lower(), c.lower()) for t, c in columns}
+
+
+# name -> Dimension
+DIMENSIONS = {}
+
+
+def dimension(name, columns, ttl=DEFAULT_TTL_SECONDS):
+    """Register loader(conn) -> list as dimension `name`, built from (table, column) pairs."""
+    def decorator(fn):
+        DIMENSIONS[name] = Dimension(name, fn, ttl, columns)
+        return fn
+    return decorator
+
+
+def _distinct(conn, table, column):
+    with conn.session as s:
+        return [r[0] for r in s.execute(text(
+            f"SELECT DISTINCT {column} FROM {table} WHERE {column} IS NOT NULL AND {column} != '' ORDER BY {column}"
+        ))]
+
+
+def _worker_loader(column):
+    def load(conn):
+        return sorted(_distinct(conn, "books", column))
+    return load
+
+
+# Operations workers, one dimension per books.<section>_by column
+for _column in ("writing_by", "proofreading_by", "formatting_by", "cover_by"):
+    dimension(_column, [("books", _column)])(_worker_loader(_column))
+
+
+@dimension("corresponding_agent", [("book_authors", "corresponding_agent")])
+def load_agents(conn):
+    return _distinct(conn, "book_authors", "corresponding_agent")
+
+
+@dimension("publishing_consultant", [("book_authors", "publishing_consultant")])
+def load_consultants(conn):
+    return _distinct(conn, "book_authors", "publishing_consultant")
+
+
+@dimension("usernames", [("userss", "username")])
+def load_usernames(conn):
+    with conn.session as s:
+        return [r[0] for r in s.execute(text("SELECT username FROM userss ORDER BY username"))]
+
+
+@dimension("services", [("services", "service_name")])
+def load_services(conn):
+    with conn.session as s:
+        return [r[0] for r in s.execute(text("SELECT service_name FROM services ORDER BY service_name"))]
+
+
+# Tags come from the book_tags index (see book_tags.py), kept in step with books.tags
+@dimension("tags", [("books", "tags")])
+def load_tags(conn):
+    with conn.session as s:
+        return [r[0] for r in s.execute(text("SELECT DISTINCT tag FROM book_tags ORDER BY tag"))]
+
+
+@dimension("tag_counts", [("books", "tags")])
+def load_tag_counts(conn):
+    with conn.session as s:
+        return [(tag, count) for tag, count in s.execute(text("SELECT tag, COUNT(*) FROM book_tags GROUP BY tag ORDER BY tag"))]
+
+
+class DimensionCache:
+    """Process-wide values per dimension plus load/hit counters."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.values = {}      # name -> (values, loaded_at)
+        self.generation = {name: 0 for name in DIMENSIONS}
+        self.stats = {name: {"loads": 0, "hits": 0, "invalidations": 0, "load_ms": 0.0, "loaded_at": None}
+                      for name in DIMENSIONS}
+        # One lock per dimension so a slow load does not block the others
+        self.load_locks = {name: threading.Lock() for name in DIMENSIONS}
+
+    def get(self, name, conn):
+        dim = DIMENSIONS[name]
+        with self.load_locks[name]:
+            with self.lock:
+                cached = self.values.get(name)
+                if cached and time.time() - cached[1] < dim.ttl:
+                    self.stats[name]["hits"] += 1
+                    return list(cached[0])
+                generation = self.generation[name]
+            started = time.time()
+            values = dim.loader(conn)
+            with self.lock:
+                # Invalidated while loading: serve these values but don't keep them
+                if self.generation[name] == generation:
+                    self.values[name] = (values, time.time())
+                stats = self.stats[name]
+                stats["loads"] += 1
+                stats["load_ms"] += (time.time() - started) * 1000
+                stats["loaded_at"] = datetime.now()
+            return list(values)
+
+    def invalidate(self, names):
+        with self.lock:
+            for name in names:
+                self.generation[name] += 1
+                if self.values.pop(name, None) is not None:
+                    self.stats[name]["invalidations"] += 1
+
+    def report(self):
+        with self.lock:
+            rows = []
+            for name, s in self.stats.items():
+                cached = self.values.get(name)
+                rows.append({
+                    "Dimension": name,
+                    "TTL (s)": DIMENSIONS[name].ttl,
+                    "Values": len(cached[0]) if cached else None,
+                    "Loads": s["loads"],
+                    "Hits": s["hits"],
+                    "Invalidations": s["invalidations"],
+                    "Avg Load (ms)": round(s["load_ms"] / s["loads"], 1) if s["loads"] else None,
+                    "Last Loaded": s["loaded_at"],
+                })
+            return pd.DataFrame(rows)
+
+
+@st.cache_resource
+def get_dimension_cache():
+    return DimensionCache()
+
+
+def get_dimension(name, conn):
+    """Values of a registered dimension (sorted list), reloaded after its TTL or an invalidation."""
+    return get_dimension_cache().get(name, conn)
+
+
+def invalidate_dimensions(*names):
+    get_dimension_cache().invalidate(names)
+
+
+def invalidate_columns(table, columns):
+    """Call after writing these columns of table; drops every dimension built from them."""
+    written = {(table.lower(), c.lower()) for c in columns}
+    invalidate_dimensions(*[d.name for d in DIMENSIONS.values() if d.columns & written])
+
+
+def dimension_stats():
+    return get_dimension_cache().report()
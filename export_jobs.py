@@ -0,0 +1,301 @@
+# export_jobs.py
+#
+# Excel and PDF exports from the Settings page, run as background jobs (see jobs.py).
+# Each job builds its file, keeps it as the job's artifact and queues it for the admin.
+
+import io
+from datetime import datetime
+
+import pandas as pd
+import requests
+import streamlit as st
+from PIL import Image as PILImage
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.lib.units import cm
+from reportlab.platypus import Image, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+from constants import log_activity
+from jobs import job_handler, query_frame
+from outbox import queue_email
+
+# Columns of the PDF export rows, as selected on the Settings page
+PDF_BOOK_COLUMNS = ['images', 'title', 'authors', 'isbn', 'book_mrp', 'publisher']
+
+
+def send_export_email(job, subject, body, attachment_data, filename):
+    """Queue an export for the admin in the outbox; delivery and retries happen there."""
+    p = job.params
+    servers = st.secrets["email_servers"]
+    queue_email(
+        st.secrets["general"]["ADMIN_EMAIL"], subject, body, "export_email",
+        servers["GMAIL_SMTP_SERVER"], servers["GMAIL_SMTP_PORT"], subtype="plain",
+        attachment=attachment_data, attachment_name=filename, history_details=subject,
+        triggered_by=(p["user_id"], p["username"], p["session_id"]), conn=job.conn,
+    )
+
+
+def get_all_ijisem_data(conn):
+    # Fetch papers
+    papers_query = "SELECT * FROM papers"
+    papers_df = query_frame(conn, papers_query)
+    
+    # Fetch authors
+    authors_query = "SELECT * FROM authors"
+    authors_df = query_frame(conn, authors_query)
+    
+    # Fetch paper_authors
+    paper_authors_query = "SELECT * FROM paper_authors"
+    paper_authors_df = query_frame(conn, paper_authors_query)
+    
+    # Merge data
+    merged_df = paper_authors_df.merge(papers_df, on='paper_id', how='left')
+    merged_df = merged_df.merge(authors_df, on='author_id', how='left')
+    
+    # Pivot authors to have Author 1 Name))^    author_pivot = merged_df.pivot_table(
+    author_pivot = merged_df.pivot_table(
+        index=['paper_id', 'paper_title'],
+        columns='author_position',
+        values=['name', 'email', 'phone', 'affiliation'],
+        aggfunc='first'
+    ).reset_index()
+    
+    # Flatten the multi-level column names
+    author_pivot.columns = [
+        f'{col[0]}_{col[1]}' if col[1] else col[0] 
+        for col in author_pivot.columns
+    ]
+    
+    # Rename columns to desired format
+    renamed_columns = {'paper_id': 'paper_id', 'paper_title': 'paper_title'}
+    for col in author_pivot.columns:
+        if col not in ['paper_id', 'paper_title']:
+            field, position = col.rsplit('_', 1)
+            renamed_columns[col] = f'Author {position} {field.capitalize()}'
+    
+    author_pivot.rename(columns=renamed_columns, inplace=True)
+    
+    # Merge back with paper details
+    final_df = papers_df.merge(
+        author_pivot[['paper_id'] + [col for col in author_pivot.columns if col.startswith('Author')]], 
+        on='paper_id', 
+        how='left'
+    )
+    
+    return final_df
+
+def get_all_booktracker_data(conn):
+    # Fetch books
+    books_query = "SELECT * FROM books"
+    books_df = query_frame(conn, books_query)
+    
+    # Fetch authors
+    authors_query = "SELECT * FROM authors"
+    authors_df = query_frame(conn, authors_query)
+    
+    # Fetch book_authors
+    book_authors_query = "SELECT * FROM book_authors"
+    book_authors_df = query_frame(conn, book_authors_query)
+    
+    # Fetch inventory
+    inventory_query = "SELECT * FROM inventory"
+    inventory_df = query_frame(conn, inventory_query)
+    
+    # Merge data
+    merged_df = book_authors_df.merge(books_df, on='book_id', how='left')
+    merged_df = merged_df.merge(authors_df, on='author_id', how='left')
+    merged_df = merged_df.merge(inventory_df, on='book_id', how='left')
+    
+    # Pivot authors to have Author 1 Name, Author 1 Email, etc.
+    author_pivot = merged_df.pivot_table(
+        index=['book_id', 'title'],
+        columns='author_position',
+        values=['name', 'email', 'phone'],
+        aggfunc='first'
+    ).reset_index()
+    
+    # Flatten the multi-level column names
+    author_pivot.columns = [
+        f'{col[0]}_{col[1]}' if col[1] else col[0] 
+        for col in author_pivot.columns
+    ]
+    
+    # Rename columns to desired format
+    renamed_columns = {'book_id': 'book_id', 'title': 'title'}
+    for col in author_pivot.columns:
+        if col not in ['book_id', 'title']:
+            field, position = col.rsplit('_', 1)
+            renamed_columns[col] = f'Author {position} {field.capitalize()}'
+    
+    author_pivot.rename(columns=renamed_columns, inplace=True)
+    
+    # Merge back with book details and inventory
+    final_df = books_df.merge(
+        author_pivot[['book_id'] + [col for col in author_pivot.columns if col.startswith('Author')]], 
+        on='book_id',
+        how='left'
+    ).merge(
+        inventory_df,
+        on='book_id',
+        how='left'
+    )
+    
+    return final_df
+
+@job_handler("excel_export")
+def run_excel_export(job):
+    p = job.params
+    database, export_options = p["database"], p["options"]
+    conn = job.conn if database == "MIS" else st.connection("ijisem", type="sql")
+
+    dfs = []
+    for i, option in enumerate(export_options):
+        job.progress(i / (len(export_options) + 1), f"Reading {option}")
+        if database == "IJISEM":
+            if option == "All Data Export":
+                dfs.append(('All_Data', get_all_ijisem_data(conn)))
+            elif option == "Only Author Data":
+                dfs.append(('Authors', query_frame(conn, "SELECT * FROM authors")))
+            else:  # Only Papers Data
+                dfs.append(('Papers', query_frame(conn, "SELECT * FROM papers")))
+        else:  # booktracker
+            if option == "All Data Export":
+                dfs.append(('All_Data', get_all_booktracker_data(conn)))
+            elif option == "Only Author Data":
+                dfs.append(('Authors', query_frame(conn, "SELECT * FROM authors")))
+            elif option == "Only Book Data":
+                dfs.append(('Books', query_frame(conn, "SELECT * FROM books")))
+            else:  # Inventory Data Export
+                dfs.append(('Inventory', query_frame(conn, "SELECT * FROM inventory")))
+
+    job.progress(len(export_options) / (len(export_options) + 1), "Writing Excel file")
+    output = io.BytesIO()
+    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
+        for sheet_name, df in dfs:
+            df.to_excel(writer, sheet_name=sheet_name[:31], index=False)
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    filename = f"{database}_export_{timestamp}.xlsx"
+    job.save_artifact(filename, output.getvalue())
+
+    job.progress(0.95, "Queueing email")
+    subject = f"{database} Data Export - {', '.join(export_options)}"
+    body = f"Please find attached the exported data from {database} database.\nExport types: {', '.join(export_options)}"
+    send_export_email(job, subject, body, output.getvalue(), filename)
+
+    log_activity(
+        job.conn, p["user_id"], p["username"], p["session_id"], "exported excel",
+        f"Database: {database}, Options: {', '.join(export_options)}"
+    )
+    return f"Data exported successfully and queued for Admin Email. Included: {', '.join(export_options)}"
+
+
+def _cover_image(image_url, normal_style):
+    # Fetch the cover and shrink it to a small JPEG for the table
+    if image_url and image_url.startswith(('http://', 'https://')):
+        try:
+            response = requests.get(image_url, stream=True, timeout=5)
+            if response.status_code == 200:
+                pil_image = PILImage.open(io.BytesIO(response.content))
+                pil_image.thumbnail((100, 150), PILImage.Resampling.LANCZOS)
+                img_buffer = io.BytesIO()
+                pil_image.convert('RGB').save(img_buffer, format='JPEG', quality=70, optimize=True)
+                img_buffer.seek(0)
+                return Image(img_buffer, width=3*cm, height=4*cm)
+        except Exception:
+            pass
+    return Paragraph("No Image", normal_style)
+
+
+@job_handler("pdf_export")
+def run_pdf_export(job):
+    p = job.params
+    books = p["books"]
+    summary = p["summary"]
+
+    pdf_output = io.BytesIO()
+    doc = SimpleDocTemplate(pdf_output, pagesize=A4, rightMargin=2.5*cm, leftMargin=2.5*cm, topMargin=1.5*cm, bottomMargin=1.5*cm)
+    elements = []
+
+    # Styles
+    title_style = ParagraphStyle(name='Title', fontName='Helvetica-Bold', fontSize=14, spaceAfter=8)
+    normal_style = ParagraphStyle(name='Normal', fontName='Helvetica', fontSize=8, spaceAfter=4, wordWrap='CJK')
+    summary_style = ParagraphStyle(name='Summary', fontName='Helvetica-Oblique', fontSize=8, spaceAfter=6)
+
+    # Add title
+    elements.append(Paragraph("Exported Books Report", title_style))
+    elements.append(Spacer(1, 8))
+    elements.append(Paragraph(f"Generated on {datetime.now().strftime('%Y-%m-%d')}", normal_style))
+    elements.append(Spacer(1, 8))
+
+    # Add summary
+    elements.append(Paragraph(f"Publisher: {summary['publisher']}", summary_style))
+    elements.append(Paragraph(f"Subject: {summary['subject']}", summary_style))
+    elements.append(Paragraph(f"Date Range: {summary['date_range']}", summary_style))
+    elements.append(Paragraph(f"Image Filter: {summary['image_filter']}", summary_style))
+    elements.append(Paragraph(f"Tags: {summary['tags']}", summary_style))
+    elements.append(Paragraph(f"Number of Books Selected: {len(books)}", summary_style))
+    elements.append(Spacer(1, 8))
+
+    # Table data
+    table_data = [["Image", "Title", "Authors", "ISBN", "MRP", "Publisher"]]
+    for i, row in enumerate(books):
+        job.progress(0.9 * i / len(books), f"Adding book {i + 1}/{len(books)}")
+        table_data.append([
+            _cover_image(row['images'], normal_style),
+            Paragraph(row['title'], normal_style),
+            Paragraph(row['authors'] or 'No Authors', normal_style),
+            Paragraph(row['isbn'], normal_style),
+            Paragraph(row['book_mrp'], normal_style),
+            Paragraph(row['publisher'], normal_style)
+        ])
+
+    # Create table with modern styling
+    table = Table(table_data, colWidths=[3*cm, 4.5*cm, 5.5*cm, 2.7*cm, 1.5*cm, 1.5*cm])
+    table.setStyle(TableStyle([
+        # Header
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2C3E50')),  # Dark slate blue header
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+        ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+        ('VALIGN', (0, 0), (-1, 0), 'MIDDLE'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 9),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 6),
+        ('TOPPADDING', (0, 0), (-1, 0), 6),
+        # Body
+        ('ALIGN', (0, 1), (0, -1), 'CENTER'),  # Center image
+        ('ALIGN', (1, 1), (-1, -1), 'LEFT'),   # Left-align text for readability
+        ('VALIGN', (0, 1), (-1, -1), 'MIDDLE'),
+        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 1), (-1, -1), 8),
+        # Alternate row colors (clean and minimal)
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [
+            colors.HexColor('#FFFFFF'),  # White
+            colors.HexColor('#F7F9FB')   # Very light gray
+        ]),
+        # Grid & borders
+        ('GRID', (0, 0), (-1, -1), 0.3, colors.HexColor('#D3D8E0')),  # Subtle gray grid
+        ('BOX', (0, 0), (-1, -1), 0.5, colors.HexColor('#A0A8B3')),   # Clean outer border
+        # Padding for compactness
+        ('LEFTPADDING', (0, 0), (-1, -1), 4),
+        ('RIGHTPADDING', (0, 0), (-1, -1), 4),
+        ('BOTTOMPADDING', (0, 1), (-1, -1), 3),
+        ('TOPPADDING', (0, 1), (-1, -1), 3),
+    ]))
+    elements.append(table)
+
+    job.progress(0.9, "Building PDF")
+    doc.build(elements)
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    filename = f"Filtered_Books_{timestamp}.pdf"
+    job.save_artifact(filename, pdf_output.getvalue())
+
+    job.progress(0.95, "Queueing email")
+    send_export_email(job, "Filtered Books PDF Export", summary["email_body"], pdf_output.getvalue(), filename)
+
+    log_activity(
+        job.conn, p["user_id"], p["username"], p["session_id"], "exported pdf", summary["log_details"]
+    )
+    return "PDF exported successfully and queued for Admin Email"
@@ -0,0 +1,87 @@
+# file_downloads.py
+#
+# Download buttons for files on disk (syllabi, author photos, correction
+# files). The button gets a callable instead of the bytes, so a file is only
+# read when someone actually clicks it, not on every rerun of the dialog or
+# table that shows it. Existence and size checks are cached for a short while.
+
+import mimetypes
+import os
+import threading
+import time
+from collections import namedtuple
+from functools import partial
+
+import pandas as pd
+import streamlit as st
+
+# Seconds a stat() result is reused
+FILE_INFO_TTL_SECONDS = 60
+
+FileInfo = namedtuple("FileInfo", ["size", "mtime"])
+
+_info_lock = threading.Lock()
+_info = {}  # path -> (FileInfo or None, checked_at)
+
+
+def file_info(path):
+    """FileInfo for an existing regular file, else None. Cached for FILE_INFO_TTL_SECONDS."""
+    if path is None or (not isinstance(path, str) and pd.isna(path)) or not str(path).strip():
+        return None
+    path = str(path)
+    now = time.time()
+    with _info_lock:
+        cached = _info.get(path)
+        if cached and now - cached[1] < FILE_INFO_TTL_SECONDS:
+            return cached[0]
+    try:
+        stat = os.stat(path)
+        info = FileInfo(stat.st_size, stat.st_mtime) if os.path.isfile(path) else None
+    except OSError:
+        info = None
+    with _info_lock:
+        _info[path] = (info, now)
+    return info
+
+
+def file_exists(path):
+    return file_info(path) is not None
+
+
+def forget_file(path):
+    """Drop the cached stat for path; call after writing or deleting it."""
+    with _info_lock:
+        _info.pop(str(path), None)
+
+
+def format_size(size):
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+def read_file(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def download_file_button(label, path, key, mime=None, file_name=None, help=None, **kwargs):
+    """
+    st.download_button for a file on disk, read only when clicked.
+    Returns False (and draws nothing) when the file does not exist.
+    """
+    info = file_info(path)
+    if info is None:
+        return False
+    st.download_button(
+        label=label,
+        data=partial(read_file, path),
+        file_name=file_name or os.path.basename(path),
+        mime=mime or mimetypes.guess_type(path)[0] or "application/octet-stream",
+        key=key,
+        help=f"{help} ({format_size(info.size)})" if help else format_size(info.size),
+        **kwargs,
+    )
+    return True
@@ -0,0 +1,331 @@
+# jobs.py
+#
+# Background jobs for long operations (exports, syncs, marketplace fetches).
+#
+# A job is a row in background_jobs plus a handler registered with
+# @job_handler(kind). Pages call submit_job() and then show_job() to poll it;
+# the work runs on a shared thread pool, so reruns and page refreshes no longer
+# kill it halfway or block the user's session.
+
+import json
+import os
+import shutil
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import streamlit as st
+from sqlalchemy import text
+
+JOB_WORKERS = 3
+# Seconds to wait before retry n (the last value repeats)
+RETRY_BACKOFF_SECONDS = [10, 60, 300]
+# Minimum seconds between progress writes
+PROGRESS_WRITE_SECONDS = 1
+# Result files older than this are removed when the runner starts
+ARTIFACT_RETENTION_DAYS = 7
+ARTIFACT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "job_artifacts")
+
+ACTIVE_STATUSES = ("queued", "running")
+
+# kind -> (handler, max_attempts)
+_HANDLERS = {}
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def job_handler(kind, max_attempts=1):
+    """Register fn(job) as the handler for kind. Its return value becomes the job's final message."""
+    def decorator(fn):
+        _HANDLERS[kind] = (fn, max_attempts)
+        return fn
+    return decorator
+
+
+def query_frame(conn, query, params=None):
+    """Run a SELECT on a fresh session and return a DataFrame (safe off the script thread)."""
+    with conn.session as s:
+        result = s.execute(text(query), params or {})
+        return pd.DataFrame(result.fetchall(), columns=list(result.keys()))
+
+
+def _worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class JobContext:
+    """What a handler gets: its params, a progress reporter and a place for its result file."""
+
+    def __init__(self, runner, job_id, params):
+        self.runner = runner
+        self.id = job_id
+        self.params = params
+        self.conn = runner.conn
+        self.result_path = None
+        self._written_at = 0.0
+
+    def check_cancelled(self):
+        if self.id in self.runner.cancelled:
+            raise JobCancelled()
+
+    def progress(self, fraction, message=None):
+        """Report progress (0..1). Also the point where a cancel request stops the job."""
+        self.check_cancelled()
+        now = time.time()
+        if now - self._written_at < PROGRESS_WRITE_SECONDS and fraction < 1:
+            return
+        self._written_at = now
+        self.runner._update(self.id, progress=max(0.0, min(float(fraction), 1.0)),
+                            message=(message or "")[:255] or None)
+
+    def save_artifact(self, filename, data):
+        """Write the job's result file under job_artifacts/<id>/ and return its path."""
+        folder = os.path.join(ARTIFACT_DIR, str(self.id))
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, os.path.basename(filename))
+        with open(path, "wb") as f:
+            f.write(data)
+        self.result_path = path
+        return path
+
+
+class JobRunner:
+    """Process-wide worker pool. Job state lives in background_jobs, not in memory."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.worker = _worker_name()
+        self.pool = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="job")
+        self.cancelled = set()
+        self.lock = threading.Lock()
+        self._recover()
+        self._clean_artifacts()
+
+    def _update(self, job_id, **fields):
+        sets = ", ".join(f"{k} = :{k}" for k in fields)
+        with self.conn.session as s:
+            s.execute(text(f"UPDATE background_jobs SET {sets} WHERE id = :id"), {**fields, "id": job_id})
+            s.commit()
+
+    def _recover(self):
+        # Jobs left active by a process on this host that is gone now (restart, crash)
+        with self.conn.session as s:
+            rows = s.execute(text("""
+                SELECT id, worker FROM background_jobs
+                WHERE status IN ('queued', 'running') AND worker LIKE :host
+            """), {"host": f"{socket.gethostname()}:%"}).fetchall()
+            dead = [job_id for job_id, worker in rows
+                    if worker != self.worker and not _pid_alive(int(worker.rsplit(":", 1)[1]))]
+            if dead:
+                s.execute(text("""
+                    UPDATE background_jobs
+                    SET status = 'failed', error = 'Interrupted by a server restart', finished_at = NOW()
+                    WHERE id IN :ids
+                """), {"ids": tuple(dead)})
+                s.commit()
+
+    def _clean_artifacts(self):
+        if not os.path.isdir(ARTIFACT_DIR):
+            return
+        cutoff = time.time() - ARTIFACT_RETENTION_DAYS * 86400
+        for name in os.listdir(ARTIFACT_DIR):
+            path = os.path.join(ARTIFACT_DIR, name)
+            if os.path.isdir(path) and os.path.getmtime(path) < cutoff:
+                shutil.rmtree(path, ignore_errors=True)
+
+    def submit(self, kind, params=None, label=None, user_id=None, username=None):
+        if kind not in _HANDLERS:
+            raise ValueError(f"No job handler registered for '{kind}'")
+        max_attempts = _HANDLERS[kind][1]
+        with self.conn.session as s:
+            result = s.execute(text("""
+                INSERT INTO background_jobs (kind, label, params, max_attempts, worker, created_by, created_by_name)
+                VALUES (:kind, :label, :params, :max_attempts, :worker, :user_id, :username)
+            """), {
+                "kind": kind, "label": label or kind, "params": json.dumps(params or {}, default=str),
+                "max_attempts": max_attempts, "worker": self.worker,
+                "user_id": user_id, "username": username,
+            })
+            s.commit()
+            job_id = result.lastrowid
+        self.pool.submit(self._run, job_id)
+        return job_id
+
+    def cancel(self, job_id):
+        with self.lock:
+            self.cancelled.add(job_id)
+        with self.conn.session as s:
+            s.execute(text("UPDATE background_jobs SET cancel_requested = 1 WHERE id = :id"), {"id": job_id})
+            # Not started yet (or waiting for a retry): stop it right here
+            stopped = s.execute(text("""
+                UPDATE background_jobs SET status = 'cancelled', finished_at = NOW()
+                WHERE id = :id AND status = 'queued'
+            """), {"id": job_id}).rowcount
+            s.commit()
+        if stopped:
+            with self.lock:
+                self.cancelled.discard(job_id)
+
+    def get(self, job_id):
+        with self.conn.session as s:
+            row = s.execute(text("SELECT * FROM background_jobs WHERE id = :id"), {"id": job_id}).mappings().first()
+        return dict(row) if row else None
+
+    def latest_active(self, kind, user_id):
+        """Newest queued/running job of kind started by user_id, so a refreshed page can reattach to it."""
+        with self.conn.session as s:
+            row = s.execute(text("""
+                SELECT * FROM background_jobs
+                WHERE kind = :kind AND created_by = :user_id AND status IN ('queued', 'running')
+                ORDER BY id DESC LIMIT 1
+            """), {"kind": kind, "user_id": user_id}).mappings().first()
+        return dict(row) if row else None
+
+    def _run(self, job_id):
+        job = self.get(job_id)
+        if job is None or job["status"] != "queued":
+            return
+        if job_id in self.cancelled:
+            self._finish(job_id, "cancelled", message="Cancelled")
+            return
+
+        handler, _ = _HANDLERS.get(job["kind"], (None, 0))
+        if handler is None:
+            self._finish(job_id, "failed", error=f"No job handler registered for '{job['kind']}'")
+            return
+
+        attempt = job["attempts"] + 1
+        with self.conn.session as s:
+            claimed = s.execute(text("""
+                UPDATE background_jobs
+                SET status = 'running', attempts = :attempt, progress = 0, started_at = NOW()
+                WHERE id = :id AND status = 'queued'
+            """), {"attempt": attempt, "id": job_id}).rowcount
+            s.commit()
+        if not claimed:
+            return
+        ctx = JobContext(self, job_id, json.loads(job["params"] or "{}"))
+        try:
+            message = handler(ctx)
+        except JobCancelled:
+            self._finish(job_id, "cancelled", message="Cancelled")
+        except Exception as e:
+            if attempt < job["max_attempts"] and job_id not in self.cancelled:
+                delay = RETRY_BACKOFF_SECONDS[min(attempt, len(RETRY_BACKOFF_SECONDS)) - 1]
+                self._update(job_id, status="queued", error=str(e),
+                             message=f"Attempt {attempt} failed, retrying in {delay}s")
+                timer = threading.Timer(delay, self.pool.submit, args=(self._run, job_id))
+                timer.daemon = True
+                timer.start()
+            else:
+                self._finish(job_id, "failed", error=str(e), message=None)
+        else:
+            self._finish(job_id, "succeeded", message=(message or "Done")[:255], error=None,
+                         progress=1, result_path=ctx.result_path)
+
+    def _finish(self, job_id, status, **fields):
+        sets = "".join(f", {k} = :{k}" for k in fields)
+        with self.conn.session as s:
+            s.execute(text(f"UPDATE background_jobs SET status = :status, finished_at = NOW(){sets} WHERE id = :id"),
+                      {**fields, "status": status, "id": job_id})
+            s.commit()
+        with self.lock:
+            self.cancelled.discard(job_id)
+
+
+@st.cache_resource(show_spinner=False)
+def get_job_runner():
+    # Import modules that register handlers without a page of their own
+    import export_jobs  # noqa: F401
+    import book_enrichment  # noqa: F401
+    import uploads  # noqa: F401
+    return JobRunner(st.connection("mysql", type="sql"))
+
+
+def submit_job(kind, params=None, label=None):
+    """Queue a job for the current user and return its id."""
+    return get_job_runner().submit(
+        kind, params, label,
+        user_id=st.session_state.get("user_id"), username=st.session_state.get("username"),
+    )
+
+
+def current_job(state_key, kind):
+    """
+    Job id a page is tracking under st.session_state[state_key]. After a browser
+    refresh (new session) it reattaches to the user's unfinished job of this kind.
+    """
+    if state_key not in st.session_state:
+        job = get_job_runner().latest_active(kind, st.session_state.get("user_id"))
+        st.session_state[state_key] = job["id"] if job else None
+    return st.session_state[state_key]
+
+
+@st.fragment(run_every=2)
+def _job_progress(job_id):
+    runner = get_job_runner()
+    job = runner.get(job_id)
+    if job is None or job["status"] not in ACTIVE_STATUSES:
+        # Finished: rerun the page so it can render the result
+        st.rerun()
+    label = job["label"]
+    if job["status"] == "queued":
+        st.progress(0.0, text=f"⏳ {label}: {job['message'] or 'Waiting for a worker...'}")
+    else:
+        st.progress(float(job["progress"] or 0), text=f"⚙️ {label}: {job['message'] or 'Running...'}")
+    if job["cancel_requested"]:
+        st.caption("Cancelling...")
+    elif st.button("Cancel", key=f"cancel_job_{job_id}", icon=":material/cancel:"):
+        runner.cancel(job_id)
+        st.rerun(scope="fragment")
+
+
+def show_job(job_id):
+    """
+    Progress panel for one job. Polls while the job is queued or running and
+    returns None; returns the job row once it has finished.
+    """
+    if job_id is None:
+        return None
+    job = get_job_runner().get(job_id)
+    if job is None:
+        return None
+    if job["status"] in ACTIVE_STATUSES:
+        _job_progress(job_id)
+        return None
+    return job
+
+
+def read_artifact(job):
+    if job and job.get("result_path") and os.path.exists(job["result_path"]):
+        with open(job["result_path"], "rb") as f:
+            return f.read()
+    return None
+
+
+def render_job_result(job, download_label="Download"):
+    """Standard outcome message for a finished job, with a download button for its file."""
+    if job["status"] == "succeeded":
+        st.success(job["message"] or f"{job['label']} finished")
+        data = read_artifact(job)
+        if data is not None:
+            st.download_button(download_label, data, file_name=os.path.basename(job["result_path"]),
+                               key=f"download_job_{job['id']}")
+    elif job["status"] == "cancelled":
+        st.warning(f"{job['label']} was cancelled")
+    else:
+        st.error(f"{job['label']} failed: {job['error']}")
@@ -0,0 +1,342 @@
+# migrations.py
+#
+# Versioned schema migrations, one ordered list per database connection.
+# Runs once per process (first call to require_schema) or from the command line:
+#
+#     python migrations.py              # every database
+#     python migrations.py mysql ict    # only these
+#
+# Pages never run DDL themselves; they call require_schema(), which only
+# checks an in-memory flag after the first successful run.
+
+import sys
+from sqlalchemy import text
+import streamlit as st
+
+# Same CASE used by the Payment Logs tab in pages/payments.py
+PAYMENT_LOG_CATEGORY_SQL = """
+    CASE WHEN action LIKE '%payment%' OR action LIKE '%price%'
+           OR action LIKE '%approved%' OR action LIKE '%rejected%'
+         THEN 'payment' END
+"""
+
+# Per-book stock position: printed, sent to authors, sold and on hand.
+# Each child table is aggregated once and joined, instead of one correlated
+# subquery per book. Shared by the Inventory and Godown Inventory pages.
+STOCK_LEDGER_VIEW_SQL = """
+    CREATE OR REPLACE VIEW book_stock_ledger AS
+    SELECT
+        b.book_id,
+        COALESCE(p.printed, 0) AS printed,
+        COALESCE(a.sent_to_authors, 0) AS sent_to_authors,
+        COALESCE(i.website_sales, 0) AS website_sales,
+        COALESCE(i.amazon_sales, 0) AS amazon_sales,
+        COALESCE(i.flipkart_sales, 0) AS flipkart_sales,
+        COALESCE(i.direct_sales, 0) AS direct_sales,
+        COALESCE(i.website_sales, 0) + COALESCE(i.amazon_sales, 0)
+            + COALESCE(i.flipkart_sales, 0) + COALESCE(i.direct_sales, 0) AS sold
+    FROM books b
+    LEFT JOIN inventory i ON i.book_id = b.book_id
+    LEFT JOIN (
+        SELECT pe.book_id, SUM(bd.copies_in_batch) AS printed
+        FROM BatchDetails bd
+        JOIN PrintEditions pe ON bd.print_id = pe.print_id
+        GROUP BY pe.book_id
+    ) p ON p.book_id = b.book_id
+    LEFT JOIN (
+        SELECT book_id, SUM(number_of_books) AS sent_to_authors
+        FROM book_authors
+        GROUP BY book_id
+    ) a ON a.book_id = b.book_id
+"""
+
+# (version, description, statements). Append new migrations; never edit applied ones.
+MIGRATIONS = {
+    "mysql": [
+        (1, "create sales_orders", [
+            """
+            CREATE TABLE IF NOT EXISTS sales_orders (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                book_id VARCHAR(255),
+                source ENUM('Amazon', 'Flipkart', 'Website', 'Direct'),
+                quantity INT,
+                order_date DATE,
+                order_id VARCHAR(255),
+                customer_details TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+        ]),
+        (2, "sales_orders status and customer columns", [
+            "ALTER TABLE sales_orders ADD COLUMN order_status VARCHAR(50) DEFAULT 'New Order'",
+            "ALTER TABLE sales_orders ADD COLUMN status_date DATE",
+            "ALTER TABLE sales_orders ADD COLUMN customer_name VARCHAR(255)",
+            "ALTER TABLE sales_orders ADD COLUMN customer_phone VARCHAR(50)",
+            "ALTER TABLE sales_orders ADD COLUMN shipping_address TEXT",
+            "ALTER TABLE sales_orders ADD COLUMN corresponding_person VARCHAR(255)",
+            "ALTER TABLE sales_orders ADD COLUMN organization VARCHAR(255)",
+            "ALTER TABLE sales_orders ADD COLUMN city VARCHAR(100)",
+            "ALTER TABLE sales_orders ADD COLUMN discounted_price DECIMAL(10,2)",
+        ]),
+        (3, "author profile, delivery address and remark columns", [
+            "ALTER TABLE authors ADD COLUMN about_author TEXT",
+            "ALTER TABLE authors ADD COLUMN author_photo TEXT",
+            "ALTER TABLE book_authors ADD COLUMN address_line1 TEXT",
+            "ALTER TABLE book_authors ADD COLUMN address_line2 TEXT",
+            "ALTER TABLE book_authors ADD COLUMN city_del VARCHAR(255)",
+            "ALTER TABLE book_authors ADD COLUMN state_del VARCHAR(255)",
+            "ALTER TABLE book_authors ADD COLUMN pincode VARCHAR(20)",
+            "ALTER TABLE book_authors ADD COLUMN country VARCHAR(100) DEFAULT 'India'",
+            "ALTER TABLE book_authors ADD COLUMN slip_generated_date DATE",
+            "ALTER TABLE books ADD COLUMN author_remark TEXT",
+        ]),
+        (4, "daily_responsibilities description, log_actions, priority", [
+            "ALTER TABLE daily_responsibilities ADD COLUMN description TEXT",
+            "ALTER TABLE daily_responsibilities ADD COLUMN log_actions TEXT",
+            "ALTER TABLE daily_responsibilities ADD COLUMN priority INT DEFAULT 1",
+        ]),
+        (5, "payment history paging indexes and activity_log category", [
+            "ALTER TABLE author_payments ADD INDEX idx_author_payments_date_id (payment_date, id)",
+            "ALTER TABLE author_payments ADD INDEX idx_author_payments_status_date (status, payment_date, id)",
+            f"ALTER TABLE activity_log ADD COLUMN action_category VARCHAR(20) AS ({PAYMENT_LOG_CATEGORY_SQL}) STORED",
+            "ALTER TABLE activity_log ADD INDEX idx_activity_log_category_ts (action_category, timestamp)",
+        ]),
+        (6, "book_stock_ledger view", [
+            STOCK_LEDGER_VIEW_SQL,
+        ]),
+        (7, "book_latest_batch index", [
+            """
+            CREATE TABLE IF NOT EXISTS book_latest_batch (
+                book_id INT PRIMARY KEY,
+                batch_id INT NOT NULL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+            )
+            """,
+            """
+            REPLACE INTO book_latest_batch (book_id, batch_id)
+            SELECT book_id, batch_id FROM (
+                SELECT pe.book_id, pb.batch_id,
+                       ROW_NUMBER() OVER(PARTITION BY pe.book_id ORDER BY pb.print_receive_date DESC, pb.batch_id DESC) as rn
+                FROM PrintEditions pe
+                JOIN BatchDetails bd ON pe.print_id = bd.print_id
+                JOIN PrintBatches pb ON bd.batch_id = pb.batch_id
+                WHERE pb.status = 'Received'
+            ) ranked
+            WHERE rn = 1
+            """,
+        ]),
+        (8, "background_jobs", [
+            """
+            CREATE TABLE IF NOT EXISTS background_jobs (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                kind VARCHAR(50) NOT NULL,
+                label VARCHAR(255),
+                status ENUM('queued', 'running', 'succeeded', 'failed', 'cancelled') NOT NULL DEFAULT 'queued',
+                progress FLOAT NOT NULL DEFAULT 0,
+                message VARCHAR(255),
+                params MEDIUMTEXT,
+                result_path VARCHAR(500),
+                error TEXT,
+                attempts INT NOT NULL DEFAULT 0,
+                max_attempts INT NOT NULL DEFAULT 1,
+                cancel_requested TINYINT(1) NOT NULL DEFAULT 0,
+                worker VARCHAR(255),
+                created_by INT,
+                created_by_name VARCHAR(255),
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                started_at DATETIME NULL,
+                finished_at DATETIME NULL,
+                INDEX idx_background_jobs_owner (created_by, kind, id),
+                INDEX idx_background_jobs_status (status)
+            )
+            """,
+        ]),
+        (9, "email_queue outbox", [
+            """
+            CREATE TABLE IF NOT EXISTS email_queue (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                status ENUM('pending', 'sending', 'sent', 'failed') NOT NULL DEFAULT 'pending',
+                to_email VARCHAR(255) NOT NULL,
+                subject VARCHAR(500),
+                body MEDIUMTEXT,
+                subtype VARCHAR(10) NOT NULL DEFAULT 'html',
+                account VARCHAR(100) NOT NULL,
+                smtp_server VARCHAR(255) NOT NULL,
+                smtp_port INT NOT NULL,
+                attachment LONGBLOB,
+                attachment_name VARCHAR(255),
+                book_id INT,
+                book_title VARCHAR(500),
+                history_details TEXT,
+                activity_action VARCHAR(100),
+                activity_details TEXT,
+                on_sent VARCHAR(50),
+                on_sent_params TEXT,
+                user_id INT,
+                username VARCHAR(255),
+                session_id VARCHAR(255),
+                attempts INT NOT NULL DEFAULT 0,
+                last_error TEXT,
+                next_attempt_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                claimed_by VARCHAR(255),
+                claimed_at DATETIME NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                sent_at DATETIME NULL,
+                INDEX idx_email_queue_due (status, next_attempt_at),
+                INDEX idx_email_queue_claim (claimed_by, status)
+            )
+            """,
+        ]),
+        (10, "ai_enrichment_cache", [
+            """
+            CREATE TABLE IF NOT EXISTS ai_enrichment_cache (
+                model VARCHAR(100) NOT NULL,
+                title_hash CHAR(40) NOT NULL,
+                title_key VARCHAR(1000),
+                subject VARCHAR(100),
+                tags TEXT,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+                PRIMARY KEY (model, title_hash)
+            )
+            """,
+        ]),
+        (11, "book_tags index", [
+            """
+            CREATE TABLE IF NOT EXISTS book_tags (
+                tag VARCHAR(255) NOT NULL,
+                book_id INT NOT NULL,
+                PRIMARY KEY (tag, book_id),
+                INDEX idx_book_tags_book (book_id)
+            )
+            """,
+            # Backfill from the JSON column; malformed rows are skipped
+            """
+            INSERT IGNORE INTO book_tags (tag, book_id)
+            SELECT TRIM(jt.tag), b.book_id
+            FROM books b,
+                 JSON_TABLE(IF(JSON_VALID(b.tags), b.tags, '[]'), '$[*]' COLUMNS (tag VARCHAR(255) PATH '$')) jt
+            WHERE b.tags IS NOT NULL AND b.tags != '' AND jt.tag IS NOT NULL AND TRIM(jt.tag) != ''
+            """,
+        ]),
+        (12, "daily checklist approver column", [
+            "ALTER TABLE daily_checklist_logs ADD COLUMN approver_id INT NULL",
+            "CREATE INDEX idx_checklist_logs_approver ON daily_checklist_logs (approver_id, status, submission_id)",
+            # Same fallback as checklist_approvals.RESOLVE_APPROVERS_SQL
+            """
+            UPDATE daily_checklist_logs l
+            JOIN daily_checklist_submissions s ON s.id = l.submission_id
+            LEFT JOIN daily_responsibilities dr ON dr.id = l.responsibility_id
+            SET l.approver_id = COALESCE(l.manager_id, dr.manager_id, s.manager_id)
+            """,
+        ]),
+    ],
+    "ijisem": [],
+    # The chat tables belong to the chat app; only indexes for the unread badge
+    # query in constants.py are added here
+    "ict": [
+        (1, "unread count indexes", [
+            "CREATE INDEX idx_conversations_user1 ON conversations (user1_id)",
+            "CREATE INDEX idx_conversations_user2 ON conversations (user2_id)",
+            "CREATE INDEX idx_messages_unread ON messages (conversation_id, seen, sender_id)",
+            "CREATE INDEX idx_group_members_user ON group_members (user_id, group_id)",
+            "CREATE INDEX idx_group_messages_group ON group_messages (group_id, sender_id)",
+            "CREATE INDEX idx_group_message_seen_user ON group_message_seen (user_id, message_id)",
+        ]),
+    ],
+    "attendance": [],
+    "ag": [],
+    "ebook": [],
+}
+
+EXPECTED_VERSIONS = {db: (steps[-1][0] if steps else 0) for db, steps in MIGRATIONS.items()}
+
+# MySQL errors meaning the change is already there (tables/columns/indexes
+# created by the old per-page checks before this runner existed)
+ALREADY_APPLIED_ERRORS = {1050, 1060, 1061}
+
+# GET_LOCK waits this many seconds per try, for this many tries, before giving up
+LOCK_TIMEOUT_SECONDS = 60
+LOCK_ATTEMPTS = 3
+
+# In-memory flag checked by pages: database -> applied version
+_schema_versions = {}
+
+
+def _error_code(e):
+    args = getattr(getattr(e, 'orig', None), 'args', None) or ()
+    return args[0] if args and isinstance(args[0], int) else None
+
+
+def current_version(session):
+    session.execute(text("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT PRIMARY KEY,
+            description VARCHAR(255),
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """))
+    return session.execute(text("SELECT COALESCE(MAX(version), 0) FROM schema_migrations")).scalar() or 0
+
+
+def migrate(conn, database):
+    """Apply pending migrations for one database and return its schema version."""
+    with conn.session as s:
+        # Serialize concurrent starts (several workers booting at once). GET_LOCK
+        # returns 0 on timeout and NULL on error; never migrate without the lock.
+        for _ in range(LOCK_ATTEMPTS):
+            if s.execute(text("SELECT GET_LOCK('schema_migrations', :timeout)"),
+                         {"timeout": LOCK_TIMEOUT_SECONDS}).scalar() == 1:
+                break
+        else:
+            raise RuntimeError(f"{database}: could not get the schema_migrations lock; "
+                               "another process is still migrating")
+        try:
+            version = current_version(s)
+            for step, description, statements in MIGRATIONS[database]:
+                if step <= version:
+                    continue
+                for statement in statements:
+                    try:
+                        s.execute(text(statement))
+                    except Exception as e:
+                        if _error_code(e) not in ALREADY_APPLIED_ERRORS:
+                            raise RuntimeError(f"{database} migration {step} ({description}) failed: {e}") from e
+                s.execute(text("INSERT INTO schema_migrations (version, description) VALUES (:v, :d)"),
+                          {"v": step, "d": description})
+                s.commit()
+                version = step
+        finally:
+            s.execute(text("SELECT RELEASE_LOCK('schema_migrations')"))
+    _schema_versions[database] = version
+    return version
+
+
+@st.cache_resource(show_spinner=False)
+def ensure_schema(database="mysql"):
+    # Once per process and database
+    return migrate(st.connection(database, type="sql"), database)
+
+
+def require_schema(database="mysql"):
+    """Stop the page if the database is behind the schema this code expects."""
+    expected = EXPECTED_VERSIONS[database]
+    if _schema_versions.get(database, -1) >= expected:
+        return
+    try:
+        version = ensure_schema(database)
+    except Exception as e:
+        st.error(f"Database schema for '{database}' could not be migrated: {e}")
+        st.stop()
+    if version < expected:
+        st.error(f"Database schema for '{database}' is at version {version}, expected {expected}. "
+                 f"Run `python migrations.py {database}`.")
+        st.stop()
+    _schema_versions[database] = version
+
+
+if __name__ == "__main__":
+    for database in sys.argv[1:] or list(MIGRATIONS):
+        if database not in MIGRATIONS:
+            sys.exit(f"Unknown database '{database}'. Known: {', '.join(MIGRATIONS)}")
+        version = migrate(st.connection(database, type="sql"), database)
+        print(f"{database}: schema version {version} (expected {EXPECTED_VERSIONS[database]})")
@@ -0,0 +1,327 @@
+# operations_sheet.py
+
+import threading
+import time
+from datetime import date
+
+import pandas as pd
+import streamlit as st
+from sqlalchemy import text
+
+from constants import invalidate_stock_ledger
+from delivery_books import mark_delivery_dirty
+
+# Full rebuild interval as a safety net for writers that do not mark books dirty
+FULL_REFRESH_SECONDS = 600
+# Minimum seconds between change-detection queries
+FINGERPRINT_SECONDS = 5
+# Number of author slots in the wide (pivoted) sheet
+MAX_AUTHOR_SLOTS = 4
+
+BOOK_COLUMNS = """
+    b.book_id, b.title, b.date, b.images, b.is_cancelled, b.apply_isbn, b.isbn,
+    b.ready_to_print, b.print_status, b.deliver, b.google_review,
+    b.amazon_link, b.agph_link, b.google_link, b.flipkart_link, b.is_publish_only,
+    b.writing_by, b.writing_start, b.writing_end,
+    b.proofreading_by, b.proofreading_start, b.proofreading_end,
+    b.formatting_by, b.formatting_start, b.formatting_end,
+    b.cover_by, b.cover_start, b.cover_end
+"""
+
+AUTHOR_COLUMNS = """
+    ba.id, ba.book_id, ba.author_id, ba.author_position, ba.corresponding_agent,
+    ba.publishing_consultant, ba.welcome_mail_sent, ba.author_details_sent,
+    ba.photo_recive, ba.id_proof_recive, ba.cover_agreement_sent, ba.agreement_received,
+    ba.digital_book_sent, ba.digital_book_approved, ba.printing_confirmation, ba.delivery_date,
+    a.name, a.email, a.phone
+"""
+
+# (long column, wide label) pairs pivoted into "<label> <n>" columns
+AUTHOR_SLOT_FIELDS = [
+    ('author_id', 'Author Id'),
+    ('name', 'Author Name'),
+    ('author_position', 'Position'),
+    ('corresponding_agent', 'Corresponding Author/Agent'),
+    ('publishing_consultant', 'Publishing Consultant'),
+    ('email', 'Email Address'),
+    ('phone', 'Contact No.'),
+]
+
+# (long flag column, wide label) pairs pivoted into 'TRUE'/'FALSE' "<label> <n>" columns
+AUTHOR_SLOT_FLAGS = [
+    ('welcome_mail_sent', 'Welcome Mail / Confirmation'),
+    ('author_details_sent', 'Author Detail'),
+    ('photo_recive', 'Photo'),
+    ('id_proof_recive', 'ID Proof'),
+    ('cover_agreement_sent', 'Send Cover Page and Agreement'),
+    ('agreement_received', 'Agreement Received'),
+    ('digital_proof', 'Digital Prof'),
+    ('printing_confirmation', 'Confirmation'),
+]
+
+SECTION_LABELS = [
+    ('writing', 'Writing'),
+    ('proofreading', 'Proofreading'),
+    ('formatting', 'Formating'),
+    ('cover', 'Cover'),
+]
+
+
+def _flag(series):
+    return series.fillna(0).astype(int).eq(1).map({True: 'TRUE', False: 'FALSE'})
+
+
+class OperationsSheet:
+    """
+    Process-wide store of books and their authors in long (book, author) form.
+
+    Pages read a snapshot and pivot it on demand. Writers call mark_dirty() so only
+    the affected books are re-read; new rows are picked up through a cheap
+    max-id/count fingerprint and everything is rebuilt every FULL_REFRESH_SECONDS.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.books = None
+        self.authors = None
+        self.fingerprint = None
+        self.loaded_at = 0.0
+        self.checked_at = 0.0
+        self.version = 0
+        self.dirty = set()
+        self._pivots = {}
+
+    def mark_dirty(self, book_ids=(), author_row_ids=()):
+        with self.lock:
+            self.dirty.update(int(b) for b in book_ids if pd.notnull(b))
+            if author_row_ids and self.authors is not None and not self.authors.empty:
+                rows = self.authors[self.authors['id'].isin([int(i) for i in author_row_ids])]
+                self.dirty.update(int(b) for b in rows['book_id'])
+
+    def invalidate(self):
+        with self.lock:
+            self.books = None
+
+    def _fetch(self, conn, book_ids=None):
+        where = "WHERE b.book_id IN :book_ids" if book_ids is not None else ""
+        params = {"book_ids": tuple(book_ids)} if book_ids is not None else {}
+        with conn.session as s:
+            result = s.execute(text(f"SELECT {BOOK_COLUMNS} FROM books b {where}"), params)
+            books = pd.DataFrame(result.fetchall(), columns=list(result.keys()))
+            result = s.execute(text(f"""
+                SELECT {AUTHOR_COLUMNS}
+                FROM book_authors ba
+                JOIN books b ON ba.book_id = b.book_id
+                LEFT JOIN authors a ON ba.author_id = a.author_id
+                {where}
+            """), params)
+            authors = pd.DataFrame(result.fetchall(), columns=list(result.keys()))
+        return books, authors
+
+    def _fetch_fingerprint(self, conn):
+        with conn.session as s:
+            row = s.execute(text("""
+                SELECT
+                    (SELECT COUNT(*) FROM books) AS book_count,
+                    (SELECT COALESCE(MAX(book_id), 0) FROM books) AS max_book_id,
+                    (SELECT COUNT(*) FROM book_authors) AS author_count,
+                    (SELECT COALESCE(MAX(id), 0) FROM book_authors) AS max_author_row_id
+            """)).mappings().one()
+        return dict(row)
+
+    def _new_book_ids(self, conn, old, new):
+        """Books touched by rows appended since the last fingerprint."""
+        with conn.session as s:
+            ids = {r[0] for r in s.execute(
+                text("SELECT book_id FROM books WHERE book_id > :max_id"),
+                {"max_id": old['max_book_id']}
+            )}
+            ids.update(r[0] for r in s.execute(
+                text("SELECT DISTINCT book_id FROM book_authors WHERE id > :max_id"),
+                {"max_id": old['max_author_row_id']}
+            ))
+        return ids
+
+    def _replace_books(self, book_ids, books, authors):
+        keep_books = self.books[~self.books['book_id'].isin(book_ids)]
+        keep_authors = self.authors[~self.authors['book_id'].isin(book_ids)]
+        self.books = pd.concat([keep_books, books], ignore_index=True).sort_values('book_id', ignore_index=True)
+        self.authors = _rank_authors(pd.concat([keep_authors, authors], ignore_index=True))
+
+    def snapshot(self, conn):
+        """Return (books, authors) frames, refreshing only what changed."""
+        with self.lock:
+            if self.books is not None and not self.dirty and time.time() - self.checked_at < FINGERPRINT_SECONDS:
+                return self.version, self.books, self.authors
+
+            fingerprint = self._fetch_fingerprint(conn)
+            self.checked_at = time.time()
+            expired = time.time() - self.loaded_at > FULL_REFRESH_SECONDS
+            # Deletes shrink a count; anything but appends forces a full rebuild
+            appended_only = self.fingerprint is not None and all(
+                fingerprint[k] >= self.fingerprint[k] for k in fingerprint
+            )
+
+            if self.books is None or expired or not appended_only:
+                books, authors = self._fetch(conn)
+                self.books = books.sort_values('book_id', ignore_index=True) if not books.empty else books
+                self.authors = _rank_authors(authors)
+                self.loaded_at = time.time()
+                self.dirty.clear()
+                self.version += 1
+            else:
+                if fingerprint != self.fingerprint:
+                    self.dirty.update(self._new_book_ids(conn, self.fingerprint, fingerprint))
+                if self.dirty:
+                    book_ids = sorted(self.dirty)
+                    books, authors = self._fetch(conn, book_ids)
+                    self._replace_books(book_ids, books, authors)
+                    self.dirty.clear()
+                    self.version += 1
+
+            self.fingerprint = fingerprint
+            if len(self._pivots) > 8:
+                self._pivots = {k: v for k, v in self._pivots.items() if k[0] == self.version}
+            return self.version, self.books, self.authors
+
+
+def _rank_authors(authors):
+    """Number each book's authors by (author_position, id), as ROW_NUMBER() did in SQL."""
+    if authors.empty:
+        return authors.assign(rn=pd.Series(dtype=int))
+    authors = authors.sort_values(['book_id', 'author_position', 'id'], ignore_index=True)
+    authors['rn'] = authors.groupby('book_id').cumcount() + 1
+    return authors
+
+
+@st.cache_resource
+def get_operations_sheet():
+    return OperationsSheet()
+
+
+def mark_operations_dirty(*book_ids, author_row_ids=()):
+    """Call after writing to books/book_authors so the shared sheet re-reads those books."""
+    get_operations_sheet().mark_dirty(book_ids, author_row_ids)
+    # Same books feed the pending delivery queue and the stock ledger
+    mark_delivery_dirty(*book_ids, author_row_ids=author_row_ids)
+    invalidate_stock_ledger()
+
+
+def fetch_operations_long(conn):
+    """Books and book authors in long form: (books, authors) with a per-book author rank `rn`."""
+    _, books, authors = get_operations_sheet().snapshot(conn)
+    return books, authors
+
+
+def fetch_operations_sheet(conn, include_cancelled=True, digital_proof_col='digital_book_approved', parse_dates=False):
+    """
+    Wide operations sheet (one row per book, up to MAX_AUTHOR_SLOTS author slots),
+    pivoted from the shared long-form store and memoized per store version.
+
+    With parse_dates=True every "... Date" column comes back as datetime64 so
+    callers can filter with plain masks instead of re-parsing per view. The
+    store version is exposed as df.attrs['version'] for callers that memoize
+    derived views.
+    """
+    sheet = get_operations_sheet()
+    version, books, authors = sheet.snapshot(conn)
+    key = (version, include_cancelled, digital_proof_col, parse_dates)
+    cached = sheet._pivots.get(key)
+    if cached is None:
+        cached = _pivot(books, authors, include_cancelled, digital_proof_col)
+        if parse_dates:
+            for col in [c for c in cached.columns if c.endswith('Date')]:
+                cached[col] = pd.to_datetime(cached[col], errors='coerce')
+        sheet._pivots[key] = cached
+    result = cached.copy()
+    result.attrs['version'] = version
+    return result
+
+
+def _pivot(books, authors, include_cancelled, digital_proof_col):
+    if books.empty:
+        return pd.DataFrame()
+    if not include_cancelled:
+        books = books[books['is_cancelled'].fillna(0).astype(int) == 0]
+
+    slots = authors[(authors['rn'] <= MAX_AUTHOR_SLOTS) & authors['book_id'].isin(books['book_id'])].copy()
+    slots['digital_proof'] = slots[digital_proof_col]
+    for col, _ in AUTHOR_SLOT_FLAGS:
+        slots[col] = _flag(slots[col])
+
+    wide = pd.DataFrame({
+        'Book ID': books['book_id'].values,
+        'Book Title': books['title'].values,
+        'Date': books['date'].values,
+        'Image': books['images'].values,
+    })
+
+    counts = slots.dropna(subset=['author_id']).groupby('book_id').size()
+    wide['No of Author'] = wide['Book ID'].map(counts).fillna(0).astype(int)
+
+    # Per-slot columns: "<label> <n>"
+    per_slot = slots.set_index(['book_id', 'rn'])[[c for c, _ in AUTHOR_SLOT_FIELDS + AUTHOR_SLOT_FLAGS]]
+    per_slot = per_slot.unstack('rn') if not per_slot.empty else pd.DataFrame()
+    labels = dict(AUTHOR_SLOT_FIELDS + AUTHOR_SLOT_FLAGS)
+    slot_columns = {}
+    for col, label in AUTHOR_SLOT_FIELDS + AUTHOR_SLOT_FLAGS:
+        for n in range(1, MAX_AUTHOR_SLOTS + 1):
+            values = per_slot[(col, n)] if (col, n) in per_slot.columns else pd.Series(dtype=object)
+            slot_columns[f"{labels[col]} {n}"] = wide['Book ID'].map(values).values
+
+    # Book-level "any author" flags
+    any_flags = slots.groupby('book_id')[['cover_agreement_sent', 'agreement_received', 'digital_proof', 'printing_confirmation']].max()
+    delivery = slots.groupby('book_id')['delivery_date'].max()
+
+    ordered = {}
+    ordered.update({k: wide[k].values for k in ['Book ID', 'Book Title', 'Date', 'Image', 'No of Author']})
+    for _, label in AUTHOR_SLOT_FIELDS:
+        for n in range(1, MAX_AUTHOR_SLOTS + 1):
+            ordered[f"{label} {n}"] = slot_columns[f"{label} {n}"]
+
+    ids = wide['Book ID']
+    ordered['Book Complete'] = _flag(
+        (books['writing_end'].notna() & books['proofreading_end'].notna() & books['formatting_end'].notna()).astype(int)
+    ).values
+    ordered['Apply ISBN'] = _flag(books['apply_isbn']).values
+    ordered['ISBN'] = books['isbn'].values
+    for col, label in [('cover_agreement_sent', 'Send Cover Page and Agreement'), ('agreement_received', 'Agreement Received'),
+                       ('digital_proof', 'Digital Prof'), ('printing_confirmation', 'Confirmation')]:
+        ordered[label] = ids.map(any_flags[col]).fillna('FALSE').values
+    for _, label in AUTHOR_SLOT_FLAGS[:4]:
+        for n in range(1, MAX_AUTHOR_SLOTS + 1):
+            ordered[f"{label} {n}"] = slot_columns[f"{label} {n}"]
+    ordered['Cover Page'] = books['cover_by'].values
+    ordered['Back Page Update'] = None
+    for _, label in AUTHOR_SLOT_FLAGS[4:]:
+        for n in range(1, MAX_AUTHOR_SLOTS + 1):
+            ordered[f"{label} {n}"] = slot_columns[f"{label} {n}"]
+    ordered['Ready to Print'] = _flag(books['ready_to_print']).values
+    ordered['Print'] = _flag(books['print_status']).values
+    ordered['Amazon Link'] = books['amazon_link'].values
+    ordered['AGPH Link'] = books['agph_link'].values
+    ordered['Google Link'] = books['google_link'].values
+    ordered['Flipkart Link'] = books['flipkart_link'].values
+    ordered['Final Mail'] = None
+    ordered['Deliver'] = _flag(books['deliver']).values
+    ordered['Google Review'] = _flag(books['google_review']).values
+    ordered['Remark'] = None
+    ordered['Delivery Date'] = ids.map(delivery).values
+
+    for section, label in SECTION_LABELS:
+        start = pd.to_datetime(books[f'{section}_start'], errors='coerce')
+        end = pd.to_datetime(books[f'{section}_end'], errors='coerce')
+        ordered[f'{label} Complete'] = _flag(end.notna().astype(int)).values
+        ordered[f'{label} By'] = books[f'{section}_by'].values
+        ordered[f'{label} Start Date'] = start.dt.date.where(start.notna(), None).values
+        ordered[f'{label} Start Time'] = start.dt.strftime('%H:%M:%S').values
+        ordered[f'{label} End Date'] = end.dt.date.where(end.notna(), None).values
+        ordered[f'{label} End Time'] = end.dt.strftime('%H:%M:%S').values
+
+    ordered['Is Publish Only'] = _flag(books['is_publish_only']).values
+    enrolled = pd.to_datetime(books['date'], errors='coerce')
+    ordered['Month'] = enrolled.dt.month_name().values
+    ordered['Year'] = enrolled.dt.year.values
+    ordered['Since Enrolled'] = (pd.Timestamp(date.today()) - enrolled.dt.normalize()).dt.days.values
+
+    return pd.DataFrame(ordered)
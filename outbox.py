@@ -0,0 +1,359 @@
+# outbox.py
+#
+# Outgoing mail. Pages call queue_email(), which only inserts a row into
+# email_queue (optionally inside the caller's transaction). A background sender
+# per process drains the queue in batches, keeps one authenticated SMTP
+# connection per (server, account) open between batches, retries transient
+# failures with backoff and records every outcome in email_history.
+#
+# Any SMTP server works, including a local stand-in (e.g. `python -m aiosmtpd -n
+# -l localhost:8025`): STARTTLS and login are only used when the server offers
+# them / a password is configured.
+
+import json
+import os
+import smtplib
+import socket
+import threading
+import time
+from datetime import datetime
+from email import encoders
+from email.mime.base import MIMEBase
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+import pytz
+import streamlit as st
+from sqlalchemy import text
+
+from app_logging import get_logger
+from constants import log_activity
+from operations_sheet import mark_operations_dirty
+
+logger = get_logger()
+
+# Rows claimed per batch
+BATCH_SIZE = 20
+# Seconds between queue polls when nobody wakes the sender
+POLL_SECONDS = 5
+# Pooled SMTP connections unused for this long are closed
+IDLE_SECONDS = 60
+# Seconds to wait before retry n (the last value repeats)
+RETRY_BACKOFF_SECONDS = [30, 120, 600, 1800]
+MAX_ATTEMPTS = 5
+# Rows stuck in 'sending' this long (process died mid-batch) go back to pending
+STALE_SENDING_MINUTES = 10
+
+ist = pytz.timezone('Asia/Kolkata')
+
+# Bookkeeping run once a message is delivered and marked sent
+ON_SENT_SQL = {
+    "welcome_mail_sent": "UPDATE book_authors SET welcome_mail_sent = 1 WHERE book_id = :book_id AND author_id = :author_id",
+    "isbn_sent_at": "UPDATE book_authors SET isbn_sent_at = :sent_at WHERE id = :id",
+}
+
+# 421 (service closing) and 4xx are worth another try, other 5xx are not
+PERMANENT_SMTP_CODES = range(500, 600)
+# Errors about one message that leave the SMTP session usable
+MESSAGE_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError)
+
+
+def queue_email(to_email, subject, body, account, smtp_server, smtp_port, subtype="html",
+                attachment=None, attachment_name=None, book_id=None, book_title=None,
+                history_details=None, activity=None, on_sent=None, triggered_by=None, session=None, conn=None):
+    """
+    Queue one message and return its email_queue id.
+
+    account is the st.secrets section holding EMAIL_ADDRESS / EMAIL_PASSWORD.
+    activity is an (action, details) pair logged to activity_log with the final status,
+    on_sent a (ON_SENT_SQL key, params) pair run once the message is delivered.
+    triggered_by is (user_id, username, session_id), by default the current user's.
+    Pass session to queue inside an open transaction (the caller commits).
+    """
+    if triggered_by is None:
+        triggered_by = (st.session_state.get("user_id"), st.session_state.get("username", "System"),
+                        st.session_state.get("session_id"))
+    params = {
+        "to_email": to_email, "subject": subject, "body": body, "subtype": subtype,
+        "account": account, "smtp_server": smtp_server, "smtp_port": int(smtp_port),
+        "attachment": attachment, "attachment_name": attachment_name,
+        "book_id": book_id, "book_title": book_title, "history_details": history_details,
+        "activity_action": activity[0] if activity else None,
+        "activity_details": activity[1] if activity else None,
+        "on_sent": on_sent[0] if on_sent else None,
+        "on_sent_params": json.dumps(on_sent[1], default=str) if on_sent else None,
+        "user_id": triggered_by[0], "username": triggered_by[1], "session_id": triggered_by[2],
+    }
+    stmt = text("""
+        INSERT INTO email_queue (to_email, subject, body, subtype, account, smtp_server, smtp_port,
+                                 attachment, attachment_name, book_id, book_title, history_details,
+                                 activity_action, activity_details, on_sent, on_sent_params,
+                                 user_id, username, session_id)
+        VALUES (:to_email, :subject, :body, :subtype, :account, :smtp_server, :smtp_port,
+                :attachment, :attachment_name, :book_id, :book_title, :history_details,
+                :activity_action, :activity_details, :on_sent, :on_sent_params,
+                :user_id, :username, :session_id)
+    """)
+    if session is not None:
+        # Sent once the caller commits; call wake_outbox() after that to skip the poll wait
+        return session.execute(stmt, params).lastrowid
+    with (conn or st.connection("mysql", type="sql")).session as s:
+        queue_id = s.execute(stmt, params).lastrowid
+        s.commit()
+    wake_outbox()
+    return queue_id
+
+
+def wake_outbox():
+    get_outbox().wake()
+
+
+def account_address(account):
+    return st.secrets[account]["EMAIL_ADDRESS"]
+
+
+def build_message(row, from_address):
+    if row["attachment"] is None:
+        msg = MIMEMultipart("alternative")
+    else:
+        msg = MIMEMultipart()
+    msg['From'] = from_address
+    msg['To'] = row["to_email"]
+    msg['Subject'] = row["subject"]
+    msg.attach(MIMEText(row["body"], row["subtype"]))
+    if row["attachment"] is not None:
+        part = MIMEBase('application', 'octet-stream')
+        part.set_payload(row["attachment"])
+        encoders.encode_base64(part)
+        part.add_header('Content-Disposition', f'attachment; filename={row["attachment_name"]}')
+        msg.attach(part)
+    return msg
+
+
+def _is_permanent(e):
+    if isinstance(e, smtplib.SMTPRecipientsRefused):
+        return True
+    return isinstance(e, smtplib.SMTPResponseException) and e.smtp_code in PERMANENT_SMTP_CODES
+
+
+class SmtpPool:
+    """One open, logged-in SMTP connection per (server, port, account)."""
+
+    def __init__(self):
+        self.connections = {}  # key -> [smtp, last_used]
+
+    def _connect(self, server, port, address, password):
+        # Port 465 = SSL (Hostinger), otherwise plain + STARTTLS when offered (Gmail 587)
+        if port == 465:
+            smtp = smtplib.SMTP_SSL(server, port, timeout=30)
+        else:
+            smtp = smtplib.SMTP(server, port, timeout=30)
+            smtp.ehlo()
+            if smtp.has_extn("starttls"):
+                smtp.starttls()
+                smtp.ehlo()
+        if password:
+            smtp.login(address, password)
+        return smtp
+
+    def get(self, server, port, account):
+        key = (server, port, account)
+        entry = self.connections.get(key)
+        if entry is not None:
+            try:
+                if entry[0].noop()[0] == 250:
+                    entry[1] = time.time()
+                    return entry[0]
+            except (smtplib.SMTPException, OSError):
+                pass
+            self.discard(key)
+        secrets = st.secrets[account]
+        smtp = self._connect(server, port, secrets["EMAIL_ADDRESS"], secrets.get("EMAIL_PASSWORD"))
+        self.connections[key] = [smtp, time.time()]
+        return smtp
+
+    def discard(self, key):
+        entry = self.connections.pop(key, None)
+        if entry is not None:
+            try:
+                entry[0].quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+
+    def close_idle(self, max_idle=IDLE_SECONDS):
+        cutoff = time.time() - max_idle
+        for key in [k for k, (_, used) in self.connections.items() if used < cutoff]:
+            self.discard(key)
+
+
+class Outbox:
+    """Background sender draining email_queue. One per process."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.worker = f"{socket.gethostname()}:{os.getpid()}"
+        self.pool = SmtpPool()
+        # id -> (row, sender) delivered over SMTP but not yet marked sent (DB write failed)
+        self.unmarked = {}
+        self.event = threading.Event()
+        self.thread = threading.Thread(target=self._loop, name="outbox", daemon=True)
+        self.thread.start()
+
+    def wake(self):
+        self.event.set()
+
+    def _loop(self):
+        while True:
+            self.event.wait(POLL_SECONDS)
+            self.event.clear()
+            try:
+                self._retry_unmarked()
+                self._release_stale()
+                while self.drain_batch():
+                    pass
+            except Exception:
+                # DB hiccup: leave the rows for the next poll
+                logger.exception("Outbox poll failed", extra={"event": "outbox_error"})
+            self.pool.close_idle()
+
+    def _release_stale(self):
+        # Delivered rows still waiting to be marked sent must not go back to pending
+        held = " AND id NOT IN :held" if self.unmarked else ""
+        params = {"held": tuple(self.unmarked)} if self.unmarked else {}
+        with self.conn.session as s:
+            s.execute(text(f"""
+                UPDATE email_queue SET status = 'pending', claimed_by = NULL
+                WHERE status = 'sending' AND claimed_at < NOW() - INTERVAL {STALE_SENDING_MINUTES} MINUTE{held}
+            """), params)
+            s.commit()
+
+    def _retry_unmarked(self):
+        for queue_id, (row, sender) in list(self.unmarked.items()):
+            self._mark_sent(row)
+            del self.unmarked[queue_id]
+            logger.info("Delivered email marked sent on retry", extra={"event": "outbox_marked", "queue_id": queue_id})
+            self._after_sent(row, sender)
+
+    def _claim(self):
+        with self.conn.session as s:
+            s.execute(text("""
+                UPDATE email_queue SET status = 'sending', claimed_by = :worker, claimed_at = NOW()
+                WHERE status = 'pending' AND next_attempt_at <= NOW()
+                ORDER BY id LIMIT :n
+            """), {"worker": self.worker, "n": BATCH_SIZE})
+            s.commit()
+            held = " AND id NOT IN :held" if self.unmarked else ""
+            params = {"worker": self.worker, "held": tuple(self.unmarked)} if self.unmarked else {"worker": self.worker}
+            return [dict(r) for r in s.execute(text(f"""
+                SELECT * FROM email_queue WHERE status = 'sending' AND claimed_by = :worker{held}
+                ORDER BY smtp_server, smtp_port, account, id
+            """), params).mappings()]
+
+    def drain_batch(self):
+        """Send one batch of due messages; returns how many were claimed."""
+        rows = self._claim()
+        for row in rows:
+            key = (row["smtp_server"], row["smtp_port"], row["account"])
+            try:
+                from_address = account_address(row["account"])
+                msg = build_message(row, from_address)
+                try:
+                    self.pool.get(*key).send_message(msg)
+                except smtplib.SMTPServerDisconnected:
+                    # Pooled connection went stale between noop and send: one fresh try
+                    self.pool.discard(key)
+                    self.pool.get(*key).send_message(msg)
+            except MESSAGE_ERRORS as e:
+                # Refused message, the connection itself is still good
+                self._failed(row, e)
+            except Exception as e:
+                self.pool.discard(key)
+                self._failed(row, e)
+            else:
+                self._sent(row, from_address)
+        return len(rows)
+
+    def _record(self, s, row, status, sender, details):
+        s.execute(text("""
+            INSERT INTO email_history (timestamp, recipient, sender_email, status, book_id, book_title, triggered_by, details)
+            VALUES (:timestamp, :recipient, :sender, :status, :book_id, :title, :user, :details)
+        """), {
+            "timestamp": datetime.now(ist).strftime('%Y-%m-%d %H:%M:%S'),
+            "recipient": row["to_email"],
+            "sender": sender,
+            "status": status,
+            "book_id": row["book_id"],
+            "title": row["book_title"],
+            "user": row["username"],
+            "details": details,
+        })
+        if row["activity_action"]:
+            log_activity(self.conn, row["user_id"], row["username"], row["session_id"],
+                         row["activity_action"], f"{row['activity_details']}, Status: {status}", session=s)
+
+    def _sent(self, row, sender):
+        # The message is already delivered: mark it sent on its own first, so a
+        # failure in the bookkeeping below can never put it back in the queue
+        try:
+            self._mark_sent(row)
+        except Exception:
+            self.unmarked[row["id"]] = (row, sender)
+            logger.critical(
+                "Email delivered but could not be marked sent; holding it until the write succeeds",
+                exc_info=True,
+                extra={"event": "outbox_unmarked", "queue_id": row["id"], "recipient": row["to_email"]},
+            )
+            return
+        self._after_sent(row, sender)
+
+    def _mark_sent(self, row):
+        with self.conn.session as s:
+            s.execute(text("""
+                UPDATE email_queue SET status = 'sent', sent_at = NOW(), attempts = attempts + 1,
+                       last_error = NULL, attachment = NULL
+                WHERE id = :id
+            """), {"id": row["id"]})
+            s.commit()
+
+    def _after_sent(self, row, sender):
+        """on_sent flags and history for a message already marked sent."""
+        try:
+            with self.conn.session as s:
+                if row["on_sent"]:
+                    params = json.loads(row["on_sent_params"] or "{}")
+                    s.execute(text(ON_SENT_SQL[row["on_sent"]]), {**params, "sent_at": datetime.now(ist)})
+                self._record(s, row, "Success", sender, row["history_details"])
+                s.commit()
+        except Exception:
+            logger.exception(
+                "Email sent but its history/on_sent update failed",
+                extra={"event": "outbox_bookkeeping_error", "queue_id": row["id"], "on_sent": row["on_sent"]},
+            )
+            return
+        if row["on_sent"] and row["book_id"]:
+            mark_operations_dirty(row["book_id"])
+
+    def _failed(self, row, error):
+        attempts = row["attempts"] + 1
+        with self.conn.session as s:
+            if attempts < MAX_ATTEMPTS and not _is_permanent(error):
+                delay = RETRY_BACKOFF_SECONDS[min(attempts, len(RETRY_BACKOFF_SECONDS)) - 1]
+                s.execute(text(f"""
+                    UPDATE email_queue
+                    SET status = 'pending', attempts = :attempts, last_error = :error, claimed_by = NULL,
+                        next_attempt_at = NOW() + INTERVAL {int(delay)} SECOND
+                    WHERE id = :id
+                """), {"attempts": attempts, "error": str(error)[:1000], "id": row["id"]})
+            else:
+                s.execute(text("""
+                    UPDATE email_queue SET status = 'failed', attempts = :attempts, last_error = :error
+                    WHERE id = :id
+                """), {"attempts": attempts, "error": str(error)[:1000], "id": row["id"]})
+                details = f"{row['history_details']}, Error: {error}" if row["history_details"] else f"Error: {error}"
+                self._record(s, row, "Failed", st.secrets.get(row["account"], {}).get("EMAIL_ADDRESS", "N/A"), details)
+            s.commit()
+
+
+@st.cache_resource(show_spinner=False)
+def get_outbox():
+    return Outbox(st.connection("mysql", type="sql"))
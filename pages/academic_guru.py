@@ -1,11 +1,13 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 from sqlalchemy.sql import text
 from datetime import datetime
 import altair as alt
 from time import sleep
 from auth import validate_token
 from constants import connect_db, connect_db_ag, log_activity, initialize_click_and_session_id
+from dimensions import get_dimension, invalidate_columns
 
 #Set page configuration
 st.set_page_config(
@@ -192,9 +194,40 @@ st.markdown("""
 # DATA FETCHING
 # ==============================================================================
 
-def fetch_orders(conn):
+SERVICE_STATUS_CODES = ['NOT_STARTED', 'IN_PROGRESS', 'CHANGES_REQUIRED', 'ON_HOLD', 'COMPLETED']
+
+# Derived order status from per-service status counts, first match wins.
+# Orders with no services are 'New'; anything unmatched is 'In Progress'.
+DERIVED_STATUS_RULES = [
+    ('New', lambda c: c['n_services'] == 0),
+    ('Changes Required', lambda c: c['n_changes_required'] > 0),
+    ('In Progress', lambda c: c['n_in_progress'] > 0),
+    ('In Progress', lambda c: (c['n_completed'] > 0) & (c['n_not_started'] > 0)),
+    ('On Hold', lambda c: c['n_on_hold'] > 0),
+    ('Completed', lambda c: c['n_completed'] == c['n_services']),
+    ('New', lambda c: c['n_not_started'] == c['n_services']),
+]
+
+def derive_order_status(df):
+    return np.select(
+        [rule(df) for _, rule in DERIVED_STATUS_RULES],
+        [status for status, _ in DERIVED_STATUS_RULES],
+        default='In Progress'
+    )
+
+@st.cache_data(ttl=300, show_spinner=False)
+def fetch_orders(_conn):
+    """
+    Order list with payment totals and per-service status counts, each
+    aggregated once and joined. Cleared by invalidate_orders() after writes.
+    """
+    count_cols = ['n_services'] + [f"n_{code.lower()}" for code in SERVICE_STATUS_CODES]
+    status_counts = ", ".join(
+        f"SUM(os.status = '{code}') as n_{code.lower()}" for code in SERVICE_STATUS_CODES
+    )
+    order_counts = ", ".join(f"COALESCE(sv.{col}, 0) as {col}" for col in count_cols)
     try:
-        query = """
+        query = f"""
             SELECT 
                 o.order_id,
                 c.full_name,
@@ -209,47 +242,55 @@ def fetch_orders(conn):
                 o.status as order_status,
                 o.created_at,
                 o.assignee,
-                (SELECT COALESCE(SUM(amount), 0) FROM order_payments WHERE order_id = o.order_id) as total_paid,
-                GROUP_CONCAT(CONCAT(COALESCE(os.custom_name, s.service_name), '||', os.status) SEPARATOR ', ') as services_list,
-                GROUP_CONCAT(os.status SEPARATOR ',') as service_statuses
+                COALESCE(p.total_paid, 0) as total_paid,
+                sv.services_list,
+                {order_counts}
             FROM orders o
             JOIN clients c ON o.client_id = c.client_id
-            LEFT JOIN order_services os ON o.order_id = os.order_id
-            LEFT JOIN services s ON os.service_id = s.service_id
-            GROUP BY o.order_id, c.full_name, c.university, c.phone, o.branch, o.academic_level, o.title_topic, o.deadline, o.total_amount, o.payment_status, o.status, o.created_at, o.assignee
+            LEFT JOIN (
+                SELECT order_id, SUM(amount) as total_paid
+                FROM order_payments
+                GROUP BY order_id
+            ) p ON p.order_id = o.order_id
+            LEFT JOIN (
+                SELECT os.order_id,
+                       GROUP_CONCAT(CONCAT(COALESCE(os.custom_name, s.service_name), '||', os.status) SEPARATOR ', ') as services_list,
+                       COUNT(os.status) as n_services,
+                       {status_counts}
+                FROM order_services os
+                LEFT JOIN services s ON os.service_id = s.service_id
+                GROUP BY os.order_id
+            ) sv ON sv.order_id = o.order_id
             ORDER BY o.order_id DESC
         """
-        df = conn.query(query, ttl=0)
+        df = _conn.query(query, ttl=0, show_spinner=False)
         
-        if not df.empty:
-            df['deadline'] = pd.to_datetime(df['deadline'])
-            df['created_at'] = pd.to_datetime(df['created_at'])
-
-            def get_derived_status(row):
-                if not row['service_statuses']: return 'New'
-                statuses = str(row['service_statuses']).split(',')
-                
-                if 'CHANGES_REQUIRED' in statuses: return 'Changes Required'
-                if 'IN_PROGRESS' in statuses: return 'In Progress'
-                
-                # Mixed progress check
-                has_completed = 'COMPLETED' in statuses
-                has_not_started = 'NOT_STARTED' in statuses
-                if has_completed and has_not_started: return 'In Progress'
-                
-                if 'ON_HOLD' in statuses: return 'On Hold'
-                if all(s == 'COMPLETED' for s in statuses): return 'Completed'
-                if all(s == 'NOT_STARTED' for s in statuses): return 'New'
-                
-                return 'In Progress'
-
-            df['order_status'] = df.apply(get_derived_status, axis=1)
-            
+        df['deadline'] = pd.to_datetime(df['deadline'])
+        df['created_at'] = pd.to_datetime(df['created_at'])
+        df['created_month'] = df['created_at'].dt.to_period('M')
+
+        df[count_cols] = df[count_cols].fillna(0).astype(int)
+        df['order_status'] = derive_order_status(df)
+
+        df['total_amount'] = df['total_amount'].fillna(0).astype(float)
+        df['total_paid'] = df['total_paid'].fillna(0).astype(float)
+        df['amount_due'] = (df['total_amount'] - df['total_paid']).clip(lower=0)
+
+        # One lowercase haystack for the search box
+        df['search_text'] = (
+            df['full_name'].fillna('').astype(str) + '\x1f' +
+            df['title_topic'].fillna('').astype(str) + '\x1f' +
+            df['order_id'].astype(str) + '\x1f' +
+            df['assignee'].fillna('').astype(str)
+        ).str.lower()
         return df
     except Exception as e:
         st.error(f"Error fetching orders: {e}")
         return pd.DataFrame()
 
+def invalidate_orders():
+    fetch_orders.clear()
+
 # ==============================================================================
 # HELPERS
 # ==============================================================================
@@ -259,18 +300,14 @@ def render_status_badge(status):
 
 def fetch_all_usernames(conn):
     try:
-        with conn.session as s:
-            users_res = s.execute(text("SELECT username FROM userss ORDER BY username"))
-            users = [row[0] for row in users_res]
-            return users
+        return get_dimension("usernames", conn)
     except Exception as e:
         st.error(f"User Fetch Error: {e}")
         return []
 
 def get_service_options(conn):
     try:
-        df = conn.query("SELECT service_name FROM services ORDER BY service_name", ttl=0)
-        return df['service_name'].tolist()
+        return get_dimension("services", conn)
     except Exception as e:
         st.error(f"Error fetching services: {e}")
         return []
@@ -342,12 +379,7 @@ def all_filters(df):
     filtered_df = df.copy()
     if search_query:
         search_query = search_query.lower()
-        filtered_df = filtered_df[
-            filtered_df['full_name'].str.lower().str.contains(search_query) |
-            filtered_df['title_topic'].str.lower().str.contains(search_query) |
-            filtered_df['order_id'].astype(str).str.contains(search_query) |
-            filtered_df['assignee'].astype(str).str.lower().str.contains(search_query)
-        ]
+        filtered_df = filtered_df[filtered_df['search_text'].str.contains(search_query, regex=False)]
     
     if st.session_state.filters['status']:
         filtered_df = filtered_df[filtered_df['order_status'] == st.session_state.filters['status']]
@@ -479,6 +511,7 @@ def payment_dialog(order_id, conn, users_conn):
                  session.execute(text("UPDATE orders SET total_amount = :amt WHERE order_id = :oid"),
                                  {'amt': new_total_amount, 'oid': order_id})
                  session.commit()
+                 invalidate_orders()
             
             # Log Activity
             try:
@@ -526,6 +559,7 @@ def payment_dialog(order_id, conn, users_conn):
                             session.execute(text("UPDATE orders SET payment_status = :status WHERE order_id = :oid"),
                                             {'status': new_status, 'oid': order_id})
                             session.commit()
+                            invalidate_orders()
                         
                         # Log Activity
                         try:
@@ -813,6 +847,7 @@ def manage_services_dialog(order_id, conn, users_conn):
                                        'pc': p_check, 'st': ch_st_code, 'assignee': assignee_val})
 
                     session.commit()
+                    invalidate_orders()
                     
                     # --- C. FINAL LOGGING ---
                     if changes_made:
@@ -1004,6 +1039,7 @@ def add_order_dialog(conn, users_conn):
                     })
 
                 session.commit()
+                invalidate_orders()
                 
                 # Log Activity
                 try:
@@ -1130,6 +1166,7 @@ def edit_order_dialog(order_id, conn, users_conn):
                                      'NOT_STARTED')
                                 """), {"order_id": order_id, "service_name": service_name, "deadline": deadline})
                             session.commit()
+                            invalidate_orders()
                             
                             # Log Update
                             try:
@@ -1160,6 +1197,7 @@ def edit_order_dialog(order_id, conn, users_conn):
                     session.execute(text("DELETE FROM order_services WHERE order_id = :order_id"), {'order_id': order_id})
                     session.execute(text("DELETE FROM orders WHERE order_id = :order_id"), {'order_id': order_id})
                     session.commit()
+                    invalidate_orders()
                 
                 # Log Delete
                 try:
@@ -1220,6 +1258,7 @@ def edit_client_dialog(conn, users_conn):
                                 "cid": selected_id
                             })
                             s.commit()
+                            invalidate_orders()
                         
                         # Log Activity
                         try:
@@ -1254,6 +1293,7 @@ def manage_services_config_dialog(conn, users_conn):
                     with conn.session as s:
                         s.execute(text("INSERT INTO services (service_name) VALUES (:name)"), {"name": new_svc_name.strip()})
                         s.commit()
+                    invalidate_columns("services", ["service_name"])
                     
                     # Log Add
                     try:
@@ -1294,6 +1334,8 @@ def manage_services_config_dialog(conn, users_conn):
                     with conn.session as s:
                         s.execute(text("DELETE FROM services WHERE service_id = :id"), {"id": svc.service_id})
                         s.commit()
+                        invalidate_orders()
+                    invalidate_columns("services", ["service_name"])
                     
                     # Log Delete
                     try:
@@ -1378,12 +1420,10 @@ if paginated_df.empty:
     st.info("No orders found matching your criteria.")
 else:
     # Group by month
-    grouped_orders = paginated_df.groupby(pd.Grouper(key='created_at', freq='ME'))
+    grouped_orders = paginated_df.groupby('created_month')
     reversed_grouped_orders = reversed(list(grouped_orders))
 
     for month, monthly_orders in reversed_grouped_orders:
-        if monthly_orders.empty: continue
-        
         monthly_orders = monthly_orders.sort_values(by='created_at', ascending=False)
         num_orders = len(monthly_orders)
         
@@ -1459,9 +1499,8 @@ else:
                     """, unsafe_allow_html=True)
                 
                 # Amount
-                total = row['total_amount'] if row['total_amount'] else 0
-                paid = row['total_paid'] if row['total_paid'] else 0
-                due = max(0, total - paid)
+                total = row['total_amount']
+                due = row['amount_due']
                 
                 with cols[4]:
                     if due == 0 and total > 0:
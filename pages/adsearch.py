@@ -2,6 +2,7 @@ import streamlit as st
 import pandas as pd
 from auth import validate_token
 from constants import log_activity, initialize_click_and_session_id, connect_db
+from operations_sheet import fetch_operations_sheet, fetch_operations_long
 
 logo = "logo/logo_black.png"
 fevicon = "logo/favicon_black.ico"
@@ -73,172 +74,41 @@ if click_id and click_id not in st.session_state.logged_click_ids:
     except Exception as e:
         st.error(f"Error logging navigation: {str(e)}")
 
-# SQL query to consolidate book data with updated conditions
-query = """
-WITH RankedAuthors AS (
-    SELECT 
-        ba.*,
-        ROW_NUMBER() OVER (PARTITION BY ba.book_id ORDER BY ba.author_position, ba.id) AS rn
-    FROM book_authors ba
-)
-SELECT 
-    b.book_id AS `Book ID`,
-    b.title AS `Book Title`,
-    b.date AS `Date`,
-    b.images AS `Image`,
-    COUNT(ba.author_id) AS `No of Author`,
-    MAX(CASE WHEN rn = 1 THEN ba.author_id END) AS `Author Id 1`,
-    MAX(CASE WHEN rn = 2 THEN ba.author_id END) AS `Author Id 2`,
-    MAX(CASE WHEN rn = 3 THEN ba.author_id END) AS `Author Id 3`,
-    MAX(CASE WHEN rn = 4 THEN ba.author_id END) AS `Author Id 4`,
-    MAX(CASE WHEN rn = 1 THEN a.name END) AS `Author Name 1`,
-    MAX(CASE WHEN rn = 2 THEN a.name END) AS `Author Name 2`,
-    MAX(CASE WHEN rn = 3 THEN a.name END) AS `Author Name 3`,
-    MAX(CASE WHEN rn = 4 THEN a.name END) AS `Author Name 4`,
-    MAX(CASE WHEN rn = 1 THEN ba.author_position END) AS `Position 1`,
-    MAX(CASE WHEN rn = 2 THEN ba.author_position END) AS `Position 2`,
-    MAX(CASE WHEN rn = 3 THEN ba.author_position END) AS `Position 3`,
-    MAX(CASE WHEN rn = 4 THEN ba.author_position END) AS `Position 4`,
-    MAX(CASE WHEN rn = 1 THEN ba.corresponding_agent END) AS `Corresponding Author/Agent 1`,
-    MAX(CASE WHEN rn = 2 THEN ba.corresponding_agent END) AS `Corresponding Author/Agent 2`,
-    MAX(CASE WHEN rn = 3 THEN ba.corresponding_agent END) AS `Corresponding Author/Agent 3`,
-    MAX(CASE WHEN rn = 4 THEN ba.corresponding_agent END) AS `Corresponding Author/Agent 4`,
-    MAX(CASE WHEN rn = 1 THEN ba.publishing_consultant END) AS `Publishing Consultant 1`,
-    MAX(CASE WHEN rn = 2 THEN ba.publishing_consultant END) AS `Publishing Consultant 2`,
-    MAX(CASE WHEN rn = 3 THEN ba.publishing_consultant END) AS `Publishing Consultant 3`,
-    MAX(CASE WHEN rn = 4 THEN ba.publishing_consultant END) AS `Publishing Consultant 4`,
-    MAX(CASE WHEN rn = 1 THEN a.email END) AS `Email Address 1`,
-    MAX(CASE WHEN rn = 2 THEN a.email END) AS `Email Address 2`,
-    MAX(CASE WHEN rn = 3 THEN a.email END) AS `Email Address 3`,
-    MAX(CASE WHEN rn = 4 THEN a.email END) AS `Email Address 4`,
-    MAX(CASE WHEN rn = 1 THEN a.phone END) AS `Contact No. 1`,
-    MAX(CASE WHEN rn = 2 THEN a.phone END) AS `Contact No. 2`,
-    MAX(CASE WHEN rn = 3 THEN a.phone END) AS `Contact No. 3`,
-    MAX(CASE WHEN rn = 4 THEN a.phone END) AS `Contact No. 4`,
-    CASE 
-        WHEN b.writing_end IS NOT NULL 
-        AND b.proofreading_end IS NOT NULL 
-        AND b.formatting_end IS NOT NULL 
-        THEN 'TRUE' 
-        ELSE 'FALSE' 
-    END AS `Book Complete`,
-    CASE WHEN b.apply_isbn = 1 THEN 'TRUE' ELSE 'FALSE' END AS `Apply ISBN`,
-    b.isbn AS `ISBN`,
-    MAX(CASE WHEN ba.cover_agreement_sent = 1 THEN 'TRUE' ELSE 'FALSE' END) AS `Send Cover Page and Agreement`,
-    MAX(CASE WHEN ba.agreement_received = 1 THEN 'TRUE' ELSE 'FALSE' END) AS `Agreement Received`,
-    MAX(CASE WHEN ba.digital_book_sent = 1 THEN 'TRUE' ELSE 'FALSE' END) AS `Digital Prof`,
-    MAX(CASE WHEN ba.printing_confirmation = 1 THEN 'TRUE' ELSE 'FALSE' END) AS `Confirmation`,
-    MAX(CASE WHEN rn = 1 THEN CASE WHEN ba.welcome_mail_sent = 1 THEN 'TRUE' ELSE 'FALSE' END END) AS `Welcome Mail / Confirmation 1`,
-    MAX(CASE WHEN rn = 2 THEN CASE WHEN ba.welcome_mail_sent = 1 THEN 'TRUE' ELSE 'FALSE' END END) AS `Welcome Mail / Confirmation 2`,
-    MAX(CASE WHEN rn = 3 THEN CASE WHEN ba.welcome_mail_sent = 1 THEN 'TRUE' ELSE 'FALSE' END END) AS `Welcome Mail / Confirmation 3`,
-    MAX(CASE WHEN rn = 4 THEN CASE WHEN ba.welcome_mail_sent = 1 THEN 'TRUE' ELSE 'FALSE' END END) AS `Welcome Mail / Confirmation 4`,
-    MAX(CASE WHEN rn = 1 THEN CASE WHEN ba.author_details_sent = 1 THEN 'TRUE' ELSE 'FALSE' END END) AS `Author Detail 1`,
-    MAX(CASE WHEN rn = 2 THEN CASE WHEN ba.author_details_sent = 1 THEN 'TRUE' ELSE 'FALSE' END END) AS `Author Detail 2`,
-    MAX(CASE WHEN rn = 3 THEN CASE WHEN ba.author_details_sent = 1 THEN 'TRUE' ELSE 'FALSE' END END) AS `Author Detail 3`,
-    MAX(CASE WHEN rn = 4 THEN CASE WHEN ba.author_details_sent = 1 THEN 'TRUE' ELSE 'FALSE' END END) AS `Author Detail 4`,
-    MAX(CASE WHEN rn = 1 THEN CASE WHEN ba.photo_recive = 1 THEN 'TRUE' ELSE 'FALSE' END END) AS `Photo 1`,
-    MAX(CASE WHEN rn = 2 THEN CASE WHEN ba.photo_recive = 1 THEN 'TRUE' ELSE 'FALSE' END END) AS `Photo 2`,
-    MAX(CASE WHEN rn = 3 THEN CASE WHEN ba.photo_recive = 1 THEN 'TRUE' ELSE 'FALSE' END END) AS `Photo 3`,
-    MAX(CASE WHEN rn = 4 THEN CASE WHEN ba.photo_recive = 1 THEN 'TRUE' ELSE 'FALSE' END END) AS `Photo 4`,
-    MAX(CASE WHEN rn = 1 THEN CASE WHEN ba.id_proof_recive = 1 THEN 'TRUE' ELSE 'FALSE' END END) AS `ID Proof 1`,
-    MAX(CASE WHEN rn = 2 THEN CASE WHEN ba.id_proof_recive = 1 THEN 'TRUE' ELSE 'FALSE' END END) AS `ID Proof 2`,
-    MAX(CASE WHEN rn = 3 THEN CASE WHEN ba.id_proof_recive = 1 THEN 'TRUE' ELSE 'FALSE' END END) AS `ID Proof 3`,
-    MAX(CASE WHEN rn = 4 THEN CASE WHEN ba.id_proof_recive = 1 THEN 'TRUE' ELSE 'FALSE' END END) AS `ID Proof 4`,
-    b.cover_by AS `Cover Page`,
-    NULL AS `Back Page Update`,
-    MAX(CASE WHEN rn = 1 THEN CASE WHEN ba.cover_agreement_sent = 1 THEN 'TRUE' ELSE 'FALSE' END END) AS `Send Cover Page and Agreement 1`,
-    MAX(CASE WHEN rn = 2 THEN CASE WHEN ba.cover_agreement_sent = 1 THEN 'TRUE' ELSE 'FALSE' END END) AS `Send Cover Page and Agreement 2`,
-    MAX(CASE WHEN rn = 3 THEN CASE WHEN ba.cover_agreement_sent = 1 THEN 'TRUE' ELSE 'FALSE' END END) AS `Send Cover Page and Agreement 3`,
-    MAX(CASE WHEN rn = 4 THEN CASE WHEN ba.cover_agreement_sent = 1 THEN 'TRUE' ELSE 'FALSE' END END) AS `Send Cover Page and Agreement 4`,
-    MAX(CASE WHEN rn = 1 THEN CASE WHEN ba.agreement_received = 1 THEN 'TRUE' ELSE 'FALSE' END END) AS `Agreement Received 1`,
-    MAX(CASE WHEN rn = 2 THEN CASE WHEN ba.agreement_received = 1 THEN 'TRUE' ELSE 'FALSE' END END) AS `Agreement Received 2`,
-    MAX(CASE WHEN rn = 3 THEN CASE WHEN ba.agreement_received = 1 THEN 'TRUE' ELSE 'FALSE' END END) AS `Agreement Received 3`,
-    MAX(CASE WHEN rn = 4 THEN CASE WHEN ba.agreement_received = 1 THEN 'TRUE' ELSE 'FALSE' END END) AS `Agreement Received 4`,
-    MAX(CASE WHEN rn = 1 THEN CASE WHEN ba.digital_book_sent = 1 THEN 'TRUE' ELSE 'FALSE' END END) AS `Digital Prof 1`,
-    MAX(CASE WHEN rn = 2 THEN CASE WHEN ba.digital_book_sent = 1 THEN 'TRUE' ELSE 'FALSE' END END) AS `Digital Prof 2`,
-    MAX(CASE WHEN rn = 3 THEN CASE WHEN ba.digital_book_sent = 1 THEN 'TRUE' ELSE 'FALSE' END END) AS `Digital Prof 3`,
-    MAX(CASE WHEN rn = 4 THEN CASE WHEN ba.digital_book_sent = 1 THEN 'TRUE' ELSE 'FALSE' END END) AS `Digital Prof 4`,
-    MAX(CASE WHEN rn = 1 THEN CASE WHEN ba.printing_confirmation = 1 THEN 'TRUE' ELSE 'FALSE' END END) AS `Confirmation 1`,
-    MAX(CASE WHEN rn = 2 THEN CASE WHEN ba.printing_confirmation = 1 THEN 'TRUE' ELSE 'FALSE' END END) AS `Confirmation 2`,
-    MAX(CASE WHEN rn = 3 THEN CASE WHEN ba.printing_confirmation = 1 THEN 'TRUE' ELSE 'FALSE' END END) AS `Confirmation 3`,
-    MAX(CASE WHEN rn = 4 THEN CASE WHEN ba.printing_confirmation = 1 THEN 'TRUE' ELSE 'FALSE' END END) AS `Confirmation 4`,
-    CASE WHEN b.ready_to_print = 1 THEN 'TRUE' ELSE 'FALSE' END AS `Ready to Print`,
-    CASE WHEN b.print_status = 1 THEN 'TRUE' ELSE 'FALSE' END AS `Print`,
-    b.amazon_link AS `Amazon Link`,
-    b.agph_link AS `AGPH Link`,
-    b.google_link AS `Google Link`,
-    b.flipkart_link AS `Flipkart Link`,
-    NULL AS `Final Mail`,
-    CASE WHEN b.deliver = 1 THEN 'TRUE' ELSE 'FALSE' END AS `Deliver`,
-    CASE WHEN b.google_review = 1 THEN 'TRUE' ELSE 'FALSE' END AS `Google Review`,
-    NULL AS `Remark`,
-    MAX(ba.delivery_date) AS `Delivery Date`,
-    CASE WHEN b.writing_end IS NOT NULL THEN 'TRUE' ELSE 'FALSE' END AS `Writing Complete`,
-    b.writing_by AS `Writing By`,
-    DATE(b.writing_start) AS `Writing Start Date`,
-    TIME_FORMAT(b.writing_start, '%H:%i:%s') AS `Writing Start Time`,
-    DATE(b.writing_end) AS `Writing End Date`,
-    TIME_FORMAT(b.writing_end, '%H:%i:%s') AS `Writing End Time`,
-    CASE WHEN b.proofreading_end IS NOT NULL THEN 'TRUE' ELSE 'FALSE' END AS `Proofreading Complete`,
-    b.proofreading_by AS `Proofreading By`,
-    DATE(b.proofreading_start) AS `Proofreading Start Date`,
-    TIME_FORMAT(b.proofreading_start, '%H:%i:%s') AS `Proofreading Start Time`,
-    DATE(b.proofreading_end) AS `Proofreading End Date`,
-    TIME_FORMAT(b.proofreading_end, '%H:%i:%s') AS `Proofreading End Time`,
-    CASE WHEN b.formatting_end IS NOT NULL THEN 'TRUE' ELSE 'FALSE' END AS `Formating Complete`,
-    b.formatting_by AS `Formating By`,
-    DATE(b.formatting_start) AS `Formating Start Date`,
-    TIME_FORMAT(b.formatting_start, '%H:%i:%s') AS `Formating Start Time`,
-    DATE(b.formatting_end) AS `Formating End Date`,
-    TIME_FORMAT(b.formatting_end, '%H:%i:%s') AS `Formating End Time`,
-    MONTHNAME(b.date) AS `Month`,
-    YEAR(b.date) AS `Year`,
-    DATEDIFF(CURDATE(), b.date) AS `Since Enrolled`
-FROM books b
-LEFT JOIN RankedAuthors ba ON b.book_id = ba.book_id AND ba.rn <= 4
-LEFT JOIN authors a ON ba.author_id = a.author_id
-WHERE b.is_cancelled = 0
-GROUP BY 
-    b.book_id, b.title, b.date, b.apply_isbn, b.isbn, b.ready_to_print, b.print_status, b.deliver,  
-    b.google_review, b.flipkart_link, b.google_link, b.agph_link, b.amazon_link, 
-    b.writing_by, b.proofreading_by, b.formatting_by, 
-    b.writing_start, b.writing_end, b.proofreading_start, b.proofreading_end, 
-    b.formatting_start, b.formatting_end, b.cover_by
-ORDER BY b.book_id;
-"""
-
+# Shared, incrementally refreshed operations sheet (see operations_sheet.py)
 with st.spinner("Data fetching in progress...", show_time=False):
-    operations_data = conn.query(query, show_spinner=False)
+    operations_data = fetch_operations_sheet(conn, include_cancelled=False, digital_proof_col='digital_book_sent')
+    _, operations_authors = fetch_operations_long(conn)
+    operations_authors = operations_authors[operations_authors['book_id'].isin(operations_data['Book ID'])]
 
 
 try:
-    # Function to get book and author details with error handling
+    def flag_text(value):
+        return 'TRUE' if pd.notnull(value) and int(value) == 1 else 'FALSE'
+
+    # Function to get book and author details from the long (book, author) frame
     def get_book_and_author_details(book_info):
         try:
-            book_details = []
-            no_of_authors = int(book_info.get('No of Author', 0))  # Use `.get` to handle missing keys
-            
-            for i in range(1, no_of_authors + 1):
-                # Safely get author details
-                author_data = {
-                    "Author ID": book_info.get(f'Author Id {i}', None),
-                    "Author Name": book_info.get(f'Author Name {i}', None),
-                    "Position": book_info.get(f'Position {i}', None),
-                    "Email": book_info.get(f'Email Address {i}', None),
-                    "Contact": book_info.get(f'Contact No. {i}', None),
-                    "Publishing Consultant": book_info.get(f'Publishing Consultant {i}', None),
-                    "Corresponding Author/Agent": book_info.get(f'Corresponding Author/Agent {i}', None),
-                    "Welcome Mail": book_info.get(f'Welcome Mail / Confirmation {i}', None),
-                    "Author Detail": book_info.get(f'Author Detail {i}', None),
-                    "Photo": book_info.get(f'Photo {i}', None),
-                    "ID Proof": book_info.get(f'ID Proof {i}', None),
-                    "Send Cover Page": book_info.get(f'Send Cover Page and Agreement {i}', None),
-                    "Agreement Received": book_info.get(f'Agreement Received {i}', None),
-                    "Digital Prof": book_info.get(f'Digital Prof {i}', None),
-                    "Confirmation": book_info.get(f'Confirmation {i}', None),
+            book_authors = operations_authors[operations_authors['book_id'] == book_info['Book ID']]
+            return [
+                {
+                    "Author ID": author['author_id'],
+                    "Author Name": author['name'],
+                    "Position": author['author_position'],
+                    "Email": author['email'],
+                    "Contact": author['phone'],
+                    "Publishing Consultant": author['publishing_consultant'],
+                    "Corresponding Author/Agent": author['corresponding_agent'],
+                    "Welcome Mail": flag_text(author['welcome_mail_sent']),
+                    "Author Detail": flag_text(author['author_details_sent']),
+                    "Photo": flag_text(author['photo_recive']),
+                    "ID Proof": flag_text(author['id_proof_recive']),
+                    "Send Cover Page": flag_text(author['cover_agreement_sent']),
+                    "Agreement Received": flag_text(author['agreement_received']),
+                    "Digital Prof": flag_text(author['digital_book_sent']),
+                    "Confirmation": flag_text(author['printing_confirmation']),
                 }
-                book_details.append(author_data)
-            return book_details
+                for author in book_authors.to_dict('records')
+            ]
         except Exception:
             st.error("Something went wrong while retrieving author details.")
             return []
@@ -282,19 +152,26 @@ try:
             on_change=update_search_column
         )
 
+    # Author-level search fields live in the long (book, author) frame
+    author_columns = {
+        'Author Name': 'name',
+        'Corresponding Author/Agent': 'corresponding_agent',
+        'Email Address': 'email',
+        'Contact No.': 'phone'
+    }
+
     # Function to get unique values for select box
-    def get_unique_values(column_prefix, num_authors=4):
-        values = []
+    def get_unique_values(column_prefix):
         if column_prefix in ["ISBN", "Book Title"]:
             # Handle single-column fields (ISBN, Book Title)
             return sorted(operations_data[column_prefix].astype(str).str.strip().dropna().unique())
         else:
             # Handle author-related fields (e.g., Author Name, Email, Phone, Corresponding Author)
-            for i in range(1, num_authors + 1):
-                column = f"{column_prefix} {i}"
-                if column in operations_data.columns:
-                    values.extend(operations_data[column].dropna().unique())
-            return sorted(set(values))  # Remove duplicates and sort
+            return sorted(operations_authors[author_columns[column_prefix]].dropna().unique())
+
+    def books_with_author_value(column_prefix, value):
+        book_ids = operations_authors.loc[operations_authors[author_columns[column_prefix]] == value, 'book_id']
+        return operations_data[operations_data['Book ID'].isin(book_ids)]
 
     # Input for search query (text input or select box based on column)
     with col2:
@@ -335,18 +212,10 @@ try:
         if search_query:
             if search_column == "Author Name":
                 # Logic for Author Name
-                mask = (operations_data['Author Name 1'] == search_query) | \
-                       (operations_data['Author Name 2'] == search_query) | \
-                       (operations_data['Author Name 3'] == search_query) | \
-                       (operations_data['Author Name 4'] == search_query)
-                filtered_data = operations_data[mask]
+                filtered_data = books_with_author_value('Author Name', search_query)
             elif search_column == "Corresponding Author":
                 # Logic for Corresponding Author
-                mask = (operations_data['Corresponding Author/Agent 1'] == search_query) | \
-                       (operations_data['Corresponding Author/Agent 2'] == search_query) | \
-                       (operations_data['Corresponding Author/Agent 3'] == search_query) | \
-                       (operations_data['Corresponding Author/Agent 4'] == search_query)
-                filtered_data = operations_data[mask]
+                filtered_data = books_with_author_value('Corresponding Author/Agent', search_query)
             elif search_column == "Book Title":
                 # Logic for Book Title
                 filtered_data = operations_data[operations_data['Book Title'] == search_query]
@@ -363,20 +232,12 @@ try:
                 filtered_data = operations_data[operations_data['ISBN'] == search_query]
             elif search_column == "Author Email":
                 # Logic for Author Email
-                mask = (operations_data['Email Address 1'] == search_query) | \
-                       (operations_data['Email Address 2'] == search_query) | \
-                       (operations_data['Email Address 3'] == search_query) | \
-                       (operations_data['Email Address 4'] == search_query)
-                filtered_data = operations_data[mask]
+                filtered_data = books_with_author_value('Email Address', search_query)
             elif search_column == "Author Phone":
                 # Logic for Author Phone
                 # Basic validation: ensure query contains only valid phone number characters
                 if search_query.replace(" ", "").replace("-", "").isdigit():
-                    mask = (operations_data['Contact No. 1'] == search_query) | \
-                           (operations_data['Contact No. 2'] == search_query) | \
-                           (operations_data['Contact No. 3'] == search_query) | \
-                           (operations_data['Contact No. 4'] == search_query)
-                    filtered_data = operations_data[mask]
+                    filtered_data = books_with_author_value('Contact No.', search_query)
                 else:
                     st.error("Phone number must contain only digits, spaces, or hyphens!")
     except Exception:
@@ -7,6 +7,8 @@ import requests, urllib.parse
 import streamlit as st
 import time
 from constants import log_activity, initialize_click_and_session_id, connect_db
+from migrations import require_schema
+from jobs import job_handler, submit_job, current_job, show_job, read_artifact, render_job_result
 from auth import validate_token
 from collections import defaultdict
 import pandas as pd
@@ -14,6 +16,7 @@ import plotly.express as px
 import plotly.graph_objects as go
 import gzip
 import io
+import json
 
 # Set page configuration
 st.set_page_config(
@@ -40,6 +43,7 @@ if user_role != "admin":
 
 # Connect to MySQL
 conn = connect_db()
+require_schema("mysql")
 
 
 # Initialize logged_click_ids if not present
@@ -67,12 +71,8 @@ REFRESH_TOKEN  = st.secrets["amazon"]["REFRESH_TOKEN"]
 ENDPOINT = "https://sellingpartnerapi-eu.amazon.com"
 MARKETPLACE_ID = 'A21TJRUUN4KGV'  # India
 
-def get_lwa_access_token():
-    """Get or refresh LWA access token with caching"""
-    if 'access_token' in st.session_state and 'token_expiry' in st.session_state:
-        if datetime.now() < st.session_state.token_expiry:
-            return st.session_state.access_token
-
+def request_lwa_access_token():
+    """New LWA access token, or None. No session state, so background jobs can call it."""
     response = requests.post(
         "https://api.amazon.com/auth/o2/token",
         data={
@@ -84,10 +84,21 @@ def get_lwa_access_token():
     )
 
     if response.status_code != 200:
+        return None
+    return response.json()['access_token']
+
+
+def get_lwa_access_token():
+    """Get or refresh LWA access token with caching"""
+    if 'access_token' in st.session_state and 'token_expiry' in st.session_state:
+        if datetime.now() < st.session_state.token_expiry:
+            return st.session_state.access_token
+
+    access_token = request_lwa_access_token()
+    if access_token is None:
         st.error('Unable to load access_token.')
         return None
 
-    access_token = response.json()['access_token']
     st.session_state.access_token = access_token
     st.session_state.token_expiry = datetime.now() + timedelta(minutes=55)
     
@@ -95,7 +106,7 @@ def get_lwa_access_token():
 
 
 def fetch_orders(access_token, start_date, end_date, order_statuses=None):
-    """Fetch orders with pagination"""
+    """Fetch orders with pagination. Raises on an API error rather than returning a partial list."""
     if order_statuses is None:
         order_statuses = "Shipped,Unshipped,PartiallyShipped"
     
@@ -129,25 +140,23 @@ def fetch_orders(access_token, start_date, end_date, order_statuses=None):
         )
         
         if response.status_code != 200:
-            st.error(f"Error fetching orders: {response.status_code}")
-            break
+            raise RuntimeError(f"Error fetching orders: {response.status_code} {response.text[:200]}")
         
         orders_data = response.json()
         
-        if 'payload' in orders_data and 'Orders' in orders_data['payload']:
-            all_orders.extend(orders_data['payload']['Orders'])
-            next_token = orders_data['payload'].get('NextToken')
-            if not next_token:
-                break
-            time.sleep(0.6)
-        else:
+        if 'payload' not in orders_data or 'Orders' not in orders_data['payload']:
+            raise RuntimeError(f"Unexpected orders response: {str(orders_data)[:200]}")
+        all_orders.extend(orders_data['payload']['Orders'])
+        next_token = orders_data['payload'].get('NextToken')
+        if not next_token:
             break
+        time.sleep(0.6)
     
     return all_orders
 
 
 def fetch_order_items_batch(access_token, order_ids, progress_callback=None):
-    """Fetch items for multiple orders with rate limiting"""
+    """Fetch items for multiple orders with rate limiting. Raises if any order's items can't be fetched."""
     all_items = []
     
     for idx, order_id in enumerate(order_ids):
@@ -162,12 +171,13 @@ def fetch_order_items_batch(access_token, order_ids, progress_callback=None):
             headers={"x-amz-access-token": access_token}
         )
         
-        if items_response.status_code == 200:
-            items_data = items_response.json()
-            if 'payload' in items_data and 'OrderItems' in items_data['payload']:
-                for item in items_data['payload']['OrderItems']:
-                    item['AmazonOrderId'] = order_id
-                    all_items.append(item)
+        if items_response.status_code != 200:
+            raise RuntimeError(f"Error fetching items for order {order_id}: {items_response.status_code} {items_response.text[:200]}")
+        items_data = items_response.json()
+        if 'payload' in items_data and 'OrderItems' in items_data['payload']:
+            for item in items_data['payload']['OrderItems']:
+                item['AmazonOrderId'] = order_id
+                all_items.append(item)
     
     return all_items
 
@@ -295,6 +305,34 @@ def fetch_active_asins(access_token):
         return None
 
 
+@job_handler("amazon_orders", max_attempts=2)
+def run_amazon_orders(job):
+    """Orders and their items for the current (and optionally previous) period, saved as JSON."""
+    p = job.params
+    access_token = request_lwa_access_token()
+    if access_token is None:
+        raise RuntimeError("Unable to load access_token.")
+
+    periods = [("current", p["start"], p["end"])]
+    if p["compare"]:
+        periods.append(("previous", p["prev_start"], p["prev_end"]))
+
+    result = {}
+    for n, (name, start, end) in enumerate(periods):
+        job.progress(n / len(periods), f"Fetching {name} period orders...")
+        orders = fetch_orders(access_token, datetime.fromisoformat(start), datetime.fromisoformat(end), p["statuses"])
+
+        def update_progress(current, total, n=n, name=name):
+            job.progress((n + current / total) / len(periods), f"{name.title()} period: order {current}/{total}")
+
+        order_ids = [order['AmazonOrderId'] for order in orders]
+        items = fetch_order_items_batch(access_token, order_ids, update_progress) if orders else []
+        result[name] = {"orders": orders, "items": items}
+
+    job.save_artifact("amazon_orders.json", json.dumps(result).encode())
+    return f"Found {len(result['current']['orders'])} orders"
+
+
 def calculate_metrics(orders, items):
     """Calculate comprehensive metrics from orders and items"""
     metrics = {
@@ -545,60 +583,43 @@ st.info(f"📅 Current Period: **{start_date.strftime('%Y-%m-%d')}** to **{end_d
 if show_comparison:
     st.info(f"📅 Previous Period: **{prev_start.strftime('%Y-%m-%d')}** to **{prev_end.strftime('%Y-%m-%d')}**")
 
-# Initialize or refresh data
-if refresh_button or 'dashboard_data' not in st.session_state:
-    with st.spinner('🔐 Authenticating...'):
-        access_token = get_lwa_access_token()
-    
-    if access_token:
-        # Fetch current period
-        with st.spinner('📥 Fetching current period orders...'):
-            orders = fetch_orders(access_token, start_date, end_date, order_statuses)
-            st.session_state.orders = orders
-        
-        # Fetch previous period if comparison enabled
-        if show_comparison:
-            with st.spinner('📥 Fetching previous period orders...'):
-                prev_orders = fetch_orders(access_token, prev_start, prev_end, order_statuses)
-                st.session_state.prev_orders = prev_orders
-        
+# Initialize or refresh data. Orders and items are fetched in a background job
+# (one request per order, rate limited) so reruns do not restart the fetch.
+amazon_job = current_job("amazon_orders_job", "amazon_orders")
+if refresh_button or ('dashboard_data' not in st.session_state and amazon_job is None):
+    st.session_state.amazon_orders_job = submit_job("amazon_orders", {
+        "start": start_date,
+        "end": end_date,
+        "prev_start": prev_start,
+        "prev_end": prev_end,
+        "compare": show_comparison,
+        "statuses": order_statuses,
+    }, label="Amazon orders")
+
+job = show_job(st.session_state.amazon_orders_job)
+if job:
+    st.session_state.amazon_orders_job = None
+    if job["status"] == "succeeded":
+        data = json.loads(read_artifact(job))
+        orders, items = data["current"]["orders"], data["current"]["items"]
+        st.session_state.orders = orders
+        st.session_state.items = items
         if orders:
-            st.success(f"✅ Found {len(orders)} orders in current period")
-            
-            # Fetch order items for current period
-            with st.spinner('📦 Fetching order items...'):
-                progress_bar = st.progress(0)
-                status_text = st.empty()
-                
-                def update_progress(current, total):
-                    progress = current / total
-                    progress_bar.progress(progress)
-                    status_text.text(f"Processing order {current}/{total}")
-                
-                order_ids = [order['AmazonOrderId'] for order in orders]
-                items = fetch_order_items_batch(access_token, order_ids, update_progress)
-                
-                progress_bar.empty()
-                status_text.empty()
-                
-                st.session_state.items = items
-                st.session_state.dashboard_data = calculate_metrics(orders, items)
-                
-                # Fetch items for previous period if needed
-                if show_comparison and prev_orders:
-                    with st.spinner('📦 Fetching previous period items...'):
-                        prev_order_ids = [order['AmazonOrderId'] for order in prev_orders]
-                        prev_items = fetch_order_items_batch(access_token, prev_order_ids)
-                        st.session_state.prev_items = prev_items
-                        st.session_state.prev_dashboard_data = calculate_metrics(prev_orders, prev_items)
-                
-                st.success(f"✅ Fetched {len(items)} items")
+            st.success(f"✅ Found {len(orders)} orders in current period, fetched {len(items)} items")
+            st.session_state.dashboard_data = calculate_metrics(orders, items)
         else:
             st.warning("No orders found for the selected period.")
-            st.session_state.orders = []
-            st.session_state.items = []
             st.session_state.dashboard_data = None
 
+        if "previous" in data:
+            st.session_state.prev_orders = data["previous"]["orders"]
+            st.session_state.prev_items = data["previous"]["items"]
+            if data["previous"]["orders"]:
+                st.session_state.prev_dashboard_data = calculate_metrics(data["previous"]["orders"], data["previous"]["items"])
+    else:
+        render_job_result(job)
+        st.session_state.setdefault("dashboard_data", None)
+
 # Display Dashboard
 if 'dashboard_data' in st.session_state and st.session_state.dashboard_data:
     metrics = st.session_state.dashboard_data
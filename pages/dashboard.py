@@ -9,7 +9,9 @@ import numpy as np
 import datetime
 import time
 from auth import validate_token
-from constants import log_activity, initialize_click_and_session_id, connect_db, clean_url_params
+from app_logging import log_timing
+from constants import log_activity, initialize_click_and_session_id, connect_db, clean_url_params, SharedCache
+from operations_sheet import fetch_operations_sheet, get_operations_sheet
 
 
 logo = "logo/logo_black.png"
@@ -92,6 +94,233 @@ if click_id and click_id not in st.session_state.logged_click_ids:
         st.error(f"Error logging navigation: {str(e)}")
 
 
+######################################################################################
+###########################----------- Derived Views & Timing ----------#############################
+######################################################################################
+
+DISPLAY_DATE_FORMAT = '%d %B %Y'
+
+
+def format_date_columns(df):
+    """Render the datetime64 date columns of a view as display strings."""
+    df = df.copy()
+    for col in [col for col in df.columns if 'Date' in col]:
+        df[col] = df[col].dt.strftime(DISPLAY_DATE_FORMAT)
+    return df
+
+
+def ended_in(data, col, selected_year, selected_month=None):
+    """Mask for rows whose date column falls in the selected year (and month)."""
+    mask = data[col].dt.year == selected_year
+    if selected_month is not None:
+        mask &= data[col].dt.month_name() == selected_month
+    return mask
+
+
+def count_by(data, by_col):
+    return data.groupby(by_col)['Book ID'].count().reset_index()
+
+
+# Derived views keyed by (kind, store version, filters). A process-wide store
+# rather than st.cache_data, which this and other pages clear on load.
+@st.cache_resource
+def get_dashboard_views():
+    return SharedCache(max_entries=36)
+
+
+def _shared_views(key, build):
+    views = get_dashboard_views().get(key, build)
+    # Shared with other sessions: hand out copies
+    return {k: v.copy() if isinstance(v, (pd.DataFrame, pd.Series)) else v for k, v in views.items()}
+
+
+def month_views(version, selected_year, selected_month, data):
+    """
+    Everything that depends on the year/month pills, memoized per store
+    version and filter selection so switching back to a month is free.
+    """
+    return _shared_views(('month', version, selected_year, selected_month),
+                         lambda: _build_month_views(data, selected_year, selected_month))
+
+
+def _build_month_views(data, selected_year, selected_month):
+    month = data[(data['Year'] == selected_year) & (data['Month'] == selected_month)]
+    views = {}
+
+    # Remaining work for the selected month
+    views['written_remaining'] = month[month['Writing Complete'] != 'TRUE'][['Book ID', 'Book Title', 'Date','No of Author']]
+    views['proofread_remaining'] = month[(month['Writing Complete'] == 'TRUE') &
+                                         (month['Proofreading Complete'] != 'TRUE')][['Book ID', 'Book Title', 'Date',
+                                                                                      'No of Author','Writing By','Writing Start Date',
+                                                                                      'Writing End Date']]
+    views['formatted_remaining'] = month[(month['Proofreading Complete'] == 'TRUE') &
+                                         (month['Formating Complete'] != 'TRUE')][['Book ID', 'Book Title', 'Date','No of Author',
+                                                                                   'Proofreading By','Proofreading Start Date',
+                                                                                   'Proofreading End Date']]
+    views['apply_isbn_remaining'] = month[month['Apply ISBN'] != 'TRUE'][['Book ID', 'Book Title', 'Date','No of Author',
+                                                                          'Writing Complete','Proofreading Complete','Formating Complete']]
+    views['printed_remaining'] = month[month['Print'] != 'TRUE'][['Book ID', 'Book Title', 'Date','No of Author',]]
+    views['delivered_remaining'] = month[month['Deliver'] != 'TRUE'][['Book ID', 'Book Title', 'Date','No of Author']]
+
+    # Work finished in the selected month
+    writing_month = data[ended_in(data, 'Writing End Date', selected_year, selected_month)]
+    proof_month = data[ended_in(data, 'Proofreading End Date', selected_year, selected_month)]
+    format_month = data[ended_in(data, 'Formating End Date', selected_year, selected_month)]
+    writing_year = data[ended_in(data, 'Writing End Date', selected_year)]
+
+    writing_complete = writing_month[writing_month['Writing Complete'] == 'TRUE'][[
+        'Book ID', 'Book Title','No of Author', 'Date','Since Enrolled',
+        'Writing By', 'Writing Start Date', 'Writing Start Time', 'Writing End Date', 'Writing End Time']]
+    views['writing_complete'] = writing_complete
+    views['writing_complete_count'] = writing_complete['Book ID'].nunique()
+
+    proofreading_complete = proof_month[proof_month['Proofreading Complete'] == 'TRUE'][[
+        'Book ID', 'Book Title','No of Author', 'Date','Since Enrolled',
+        'Writing By', 'Writing Start Date', 'Writing Start Time', 'Writing End Date', 'Writing End Time',
+        'Proofreading By', 'Proofreading Start Date', 'Proofreading Start Time', 'Proofreading End Date',
+        'Proofreading End Time']]
+    views['proofreading_complete'] = proofreading_complete
+    views['proofreading_complete_count'] = proofreading_complete['Book ID'].nunique()
+
+    views['writing_by_month'] = count_by(writing_month, 'Writing By').sort_values(by='Book ID', ascending=True)
+    views['writing_by_year'] = count_by(writing_year, 'Writing By').sort_values(by='Book ID', ascending=True)
+    views['proofreading_by_month'] = count_by(proof_month, 'Proofreading By').sort_values(by='Book ID', ascending=False)
+    views['formatting_by_month'] = count_by(format_month, 'Formating By').sort_values(by='Book ID', ascending=False)
+
+    # Delivered books of the selected year
+    views['delivered'] = data[(data['Deliver'] == 'TRUE') & (data['Year'] == selected_year)][[
+        'Book ID', 'Book Title', 'Date', 'No of Author','Author Name 1',
+        'Author Name 2', 'Author Name 3', 'Author Name 4', 'Position 1',
+        'Position 2', 'Position 3', 'Position 4','Writing Complete', 'Writing By', 'Writing Start Date',
+        'Writing Start Time', 'Writing End Date', 'Writing End Time',
+        'Proofreading Complete', 'Proofreading By', 'Proofreading Start Date',
+        'Proofreading Start Time', 'Proofreading End Date',
+        'Proofreading End Time', 'Formating Complete', 'Formating By',
+        'Formating Start Date', 'Formating Start Time', 'Formating End Date',
+        'Formating End Time',]]
+
+    return {key: format_date_columns(value) if isinstance(value, pd.DataFrame) and 'Date' in value.columns else value
+            for key, value in views.items()}
+
+
+# Columns shown for books currently running in each stage
+RUNNING_WORK_COLUMNS = {
+    'Formating': ['Book ID', 'Book Title', 'Date', 'Since Enrolled', 'No of Author', 'Formating By',
+                  'Formating Start Date', 'Formating Start Time', 'Proofreading By', 'Proofreading Start Date',
+                  'Proofreading Start Time', 'Proofreading End Date', 'Proofreading End Time',
+                  'Writing By', 'Writing Start Date', 'Writing Start Time', 'Writing End Date',
+                  'Writing End Time'],
+    'Proofreading': ['Book ID', 'Book Title', 'Date', 'Since Enrolled', 'No of Author', 'Proofreading By',
+                     'Proofreading Start Date', 'Proofreading Start Time', 'Writing By', 'Writing Start Date',
+                     'Writing Start Time', 'Writing End Date', 'Writing End Time'],
+    'Writing': ['Book ID', 'Book Title', 'Date', 'Since Enrolled', 'No of Author', 'Writing By',
+                'Writing Start Date', 'Writing Start Time'],
+}
+
+WORK_DONE_COLUMNS = [
+    'Book ID', 'Book Title', 'Date', 'Since Enrolled', 'No of Author', 'Work Done',
+    'Writing Complete', 'Writing By', 'Writing Start Date', 'Writing Start Time',
+    'Writing End Date', 'Writing End Time', 'Proofreading Complete', 'Proofreading By',
+    'Proofreading Start Date', 'Proofreading Start Time', 'Proofreading End Date',
+    'Proofreading End Time', 'Formating Complete', 'Formating By', 'Formating Start Date',
+    'Formating Start Time', 'Formating End Date', 'Formating End Time'
+]
+
+
+def daily_views(version, today, data):
+    """
+    Views that only move with the store version or the calendar day: running
+    work, work done in the last 3 days and the 4-month remaining queues.
+    """
+    return _shared_views(('daily', version, today), lambda: _build_daily_views(data, today))
+
+
+def _build_daily_views(data, today):
+    views = {}
+
+    # Books started but not finished in each stage (assignee present)
+    for key, columns in RUNNING_WORK_COLUMNS.items():
+        views[f'running_{key}'] = data[
+            data[f'{key} By'].notna() &
+            data[f'{key} Start Date'].notna() &
+            data[f'{key} End Date'].isna()
+        ][columns]
+
+    # Work done in the last 3 days, one mask per stage
+    since = pd.Timestamp(today) - pd.Timedelta(days=2)
+    until = pd.Timestamp(today) + pd.Timedelta(days=1)
+    stages = [('Writing', 'Writing End Date'), ('Proofreading', 'Proofreading End Date'),
+              ('Formatting', 'Formating End Date')]
+    done_masks = {label: (data[col] >= since) & (data[col] < until) for label, col in stages}
+    any_done = np.logical_or.reduce(list(done_masks.values()))
+    work_done = data[any_done].copy()
+    labels = pd.Series('', index=work_done.index)
+    for label, mask in done_masks.items():
+        labels = labels.where(~mask[any_done], labels + ', ' + label)
+    work_done['Work Done'] = labels.str.lstrip(', ')
+    views['work_done'] = format_date_columns(work_done[WORK_DONE_COLUMNS]).fillna('Pending')
+
+    # Remaining queues for books enrolled in the last ~4 months
+    recent = data[data['Date'] >= pd.Timestamp(today) - pd.Timedelta(days=4*30)]
+
+    writing = recent[recent['Writing Start Date'].isna() & (recent['Is Publish Only'] != 'TRUE')][[
+        'Book ID', 'Book Title', 'Date', 'Since Enrolled', 'No of Author', 'Writing By'
+    ]].fillna({'Writing By': 'Pending'})
+
+    proofread = recent[
+        (recent['Writing End Date'].notna() | (recent['Is Publish Only'] == 'TRUE')) &
+        recent['Proofreading Start Date'].isna()
+    ][[
+        'Book ID', 'Book Title', 'Date', 'Since Enrolled', 'No of Author',
+        'Writing By', 'Writing Start Date', 'Writing Start Time', 'Writing End Date',
+        'Writing End Time', 'Proofreading By'
+    ]].fillna({'Proofreading By': 'Pending'})
+
+    formatting = recent[recent['Proofreading End Date'].notna() & recent['Formating Start Date'].isna()][[
+        'Book ID', 'Book Title', 'Date', 'Since Enrolled', 'No of Author',
+        'Formating By', 'Writing By', 'Writing Start Date', 'Writing Start Time',
+        'Writing End Date', 'Writing End Time', 'Proofreading By',
+        'Proofreading Start Date', 'Proofreading Start Time', 'Proofreading End Date',
+        'Proofreading End Time'
+    ]].fillna({'Formating By': 'Pending'})
+
+    for key, frame in [('writing_remaining', writing), ('proofread_remaining', proofread),
+                       ('format_remaining', formatting)]:
+        views[key] = format_date_columns(frame)
+        views[f'{key}_count'] = frame['Book ID'].nunique()
+
+    for key in RUNNING_WORK_COLUMNS:
+        views[f'running_{key}'] = format_date_columns(views[f'running_{key}'])
+
+    return views
+
+
+class SectionTimer:
+    """Wall time between checkpoints, logged on every rerun and shown to admins as a small overlay at the end of the page."""
+
+    def __init__(self):
+        self.timings = []
+        self._last = time.perf_counter()
+
+    def lap(self, section):
+        now = time.perf_counter()
+        self.timings.append({'Section': section, 'Time (ms)': round((now - self._last) * 1000, 1)})
+        self._last = now
+
+    def log(self, page):
+        # One record per rerun with every section, for the timing log
+        if self.timings:
+            total = sum(t['Time (ms)'] for t in self.timings)
+            log_timing(page, "page", total, sections={t['Section']: t['Time (ms)'] for t in self.timings})
+
+    def render(self):
+        if not self.timings:
+            return
+        timings = pd.DataFrame(self.timings)
+        with st.expander(f"⏱️ Rendered in {timings['Time (ms)'].sum():.0f} ms", expanded=False):
+            st.dataframe(timings.sort_values('Time (ms)', ascending=False), hide_index=True, width="content")
+
+
 ######################################################################################
 ###########################----------- Data Loader & Spinner ----------#############################
 ######################################################################################
@@ -99,149 +328,15 @@ if click_id and click_id not in st.session_state.logged_click_ids:
 
 def render_full_page():   
 
-    # SQL query to consolidate book data with updated conditions
-    query = """
-        WITH RankedAuthors AS (
-        SELECT 
-            ba.*,
-            ROW_NUMBER() OVER (PARTITION BY ba.book_id ORDER BY ba.author_position, ba.id) AS rn
-        FROM book_authors ba
-    )
-    SELECT 
-        b.book_id AS `Book ID`,
-        b.title AS `Book Title`,
-        b.date AS `Date`,
-        COUNT(ba.author_id) AS `No of Author`,
-        MAX(CASE WHEN rn = 1 THEN ba.author_id END) AS `Author Id 1`,
-        MAX(CASE WHEN rn = 2 THEN ba.author_id END) AS `Author Id 2`,
-        MAX(CASE WHEN rn = 3 THEN ba.author_id END) AS `Author Id 3`,
-        MAX(CASE WHEN rn = 4 THEN ba.author_id END) AS `Author Id 4`,
-        MAX(CASE WHEN rn = 1 THEN a.name END) AS `Author Name 1`,
-        MAX(CASE WHEN rn = 2 THEN a.name END) AS `Author Name 2`,
-        MAX(CASE WHEN rn = 3 THEN a.name END) AS `Author Name 3`,
-        MAX(CASE WHEN rn = 4 THEN a.name END) AS `Author Name 4`,
-        MAX(CASE WHEN rn = 1 THEN ba.author_position END) AS `Position 1`,
-        MAX(CASE WHEN rn = 2 THEN ba.author_position END) AS `Position 2`,
-        MAX(CASE WHEN rn = 3 THEN ba.author_position END) AS `Position 3`,
-        MAX(CASE WHEN rn = 4 THEN ba.author_position END) AS `Position 4`,
-        MAX(CASE WHEN rn = 1 THEN ba.corresponding_agent END) AS `Corresponding Author/Agent 1`,
-        MAX(CASE WHEN rn = 2 THEN ba.corresponding_agent END) AS `Corresponding Author/Agent 2`,
-        MAX(CASE WHEN rn = 3 THEN ba.corresponding_agent END) AS `Corresponding Author/Agent 3`,
-        MAX(CASE WHEN rn = 4 THEN ba.corresponding_agent END) AS `Corresponding Author/Agent 4`,
-        MAX(CASE WHEN rn = 1 THEN ba.publishing_consultant END) AS `Publishing Consultant 1`,
-        MAX(CASE WHEN rn = 2 THEN ba.publishing_consultant END) AS `Publishing Consultant 2`,
-        MAX(CASE WHEN rn = 3 THEN ba.publishing_consultant END) AS `Publishing Consultant 3`,
-        MAX(CASE WHEN rn = 4 THEN ba.publishing_consultant END) AS `Publishing Consultant 4`,
-        MAX(CASE WHEN rn = 1 THEN a.email END) AS `Email Address 1`,
-        MAX(CASE WHEN rn = 2 THEN a.email END) AS `Email Address 2`,
-        MAX(CASE WHEN rn = 3 THEN a.email END) AS `Email Address 3`,
-        MAX(CASE WHEN rn = 4 THEN a.email END) AS `Email Address 4`,
-        MAX(CASE WHEN rn = 1 THEN a.phone END) AS `Contact No. 1`,
-        MAX(CASE WHEN rn = 2 THEN a.phone END) AS `Contact No. 2`,
-        MAX(CASE WHEN rn = 3 THEN a.phone END) AS `Contact No. 3`,
-        MAX(CASE WHEN rn = 4 THEN a.phone END) AS `Contact No. 4`,
-        CASE 
-            WHEN b.writing_end IS NOT NULL 
-            AND b.proofreading_end IS NOT NULL 
-            AND b.formatting_end IS NOT NULL 
-            THEN 'TRUE' 
-            ELSE 'FALSE' 
-        END AS `Book Complete`,
-        CASE WHEN b.apply_isbn = 1 THEN 'TRUE' ELSE 'FALSE' END AS `Apply ISBN`,
-        b.isbn AS `ISBN`,
-        MAX(CASE WHEN ba.cover_agreement_sent = 1 THEN 'TRUE' ELSE 'FALSE' END) AS `Send Cover Page and Agreement`,
-        MAX(CASE WHEN ba.agreement_received = 1 THEN 'TRUE' ELSE 'FALSE' END) AS `Agreement Received`,
-        MAX(CASE WHEN ba.digital_book_approved = 1 THEN 'TRUE' ELSE 'FALSE' END) AS `Digital Prof`,
-        MAX(CASE WHEN ba.printing_confirmation = 1 THEN 'TRUE' ELSE 'FALSE' END) AS `Confirmation`,
-        MAX(CASE WHEN rn = 1 THEN CASE WHEN ba.welcome_mail_sent = 1 THEN 'TRUE' ELSE 'FALSE' END END) AS `Welcome Mail / Confirmation 1`,
-        MAX(CASE WHEN rn = 2 THEN CASE WHEN ba.welcome_mail_sent = 1 THEN 'TRUE' ELSE 'FALSE' END END) AS `Welcome Mail / Confirmation 2`,
-        MAX(CASE WHEN rn = 3 THEN CASE WHEN ba.welcome_mail_sent = 1 THEN 'TRUE' ELSE 'FALSE' END END) AS `Welcome Mail / Confirmation 3`,
-        MAX(CASE WHEN rn = 4 THEN CASE WHEN ba.welcome_mail_sent = 1 THEN 'TRUE' ELSE 'FALSE' END END) AS `Welcome Mail / Confirmation 4`,
-        MAX(CASE WHEN rn = 1 THEN CASE WHEN ba.author_details_sent = 1 THEN 'TRUE' ELSE 'FALSE' END END) AS `Author Detail 1`,
-        MAX(CASE WHEN rn = 2 THEN CASE WHEN ba.author_details_sent = 1 THEN 'TRUE' ELSE 'FALSE' END END) AS `Author Detail 2`,
-        MAX(CASE WHEN rn = 3 THEN CASE WHEN ba.author_details_sent = 1 THEN 'TRUE' ELSE 'FALSE' END END) AS `Author Detail 3`,
-        MAX(CASE WHEN rn = 4 THEN CASE WHEN ba.author_details_sent = 1 THEN 'TRUE' ELSE 'FALSE' END END) AS `Author Detail 4`,
-        MAX(CASE WHEN rn = 1 THEN CASE WHEN ba.photo_recive = 1 THEN 'TRUE' ELSE 'FALSE' END END) AS `Photo 1`,
-        MAX(CASE WHEN rn = 2 THEN CASE WHEN ba.photo_recive = 1 THEN 'TRUE' ELSE 'FALSE' END END) AS `Photo 2`,
-        MAX(CASE WHEN rn = 3 THEN CASE WHEN ba.photo_recive = 1 THEN 'TRUE' ELSE 'FALSE' END END) AS `Photo 3`,
-        MAX(CASE WHEN rn = 4 THEN CASE WHEN ba.photo_recive = 1 THEN 'TRUE' ELSE 'FALSE' END END) AS `Photo 4`,
-        MAX(CASE WHEN rn = 1 THEN CASE WHEN ba.id_proof_recive = 1 THEN 'TRUE' ELSE 'FALSE' END END) AS `ID Proof 1`,
-        MAX(CASE WHEN rn = 2 THEN CASE WHEN ba.id_proof_recive = 1 THEN 'TRUE' ELSE 'FALSE' END END) AS `ID Proof 2`,
-        MAX(CASE WHEN rn = 3 THEN CASE WHEN ba.id_proof_recive = 1 THEN 'TRUE' ELSE 'FALSE' END END) AS `ID Proof 3`,
-        MAX(CASE WHEN rn = 4 THEN CASE WHEN ba.id_proof_recive = 1 THEN 'TRUE' ELSE 'FALSE' END END) AS `ID Proof 4`,
-        b.cover_by AS `Cover Page`,
-        NULL AS `Back Page Update`,
-        MAX(CASE WHEN rn = 1 THEN CASE WHEN ba.cover_agreement_sent = 1 THEN 'TRUE' ELSE 'FALSE' END END) AS `Send Cover Page and Agreement 1`,
-        MAX(CASE WHEN rn = 2 THEN CASE WHEN ba.cover_agreement_sent = 1 THEN 'TRUE' ELSE 'FALSE' END END) AS `Send Cover Page and Agreement 2`,
-        MAX(CASE WHEN rn = 3 THEN CASE WHEN ba.cover_agreement_sent = 1 THEN 'TRUE' ELSE 'FALSE' END END) AS `Send Cover Page and Agreement 3`,
-        MAX(CASE WHEN rn = 4 THEN CASE WHEN ba.cover_agreement_sent = 1 THEN 'TRUE' ELSE 'FALSE' END END) AS `Send Cover Page and Agreement 4`,
-        MAX(CASE WHEN rn = 1 THEN CASE WHEN ba.agreement_received = 1 THEN 'TRUE' ELSE 'FALSE' END END) AS `Agreement Received 1`,
-        MAX(CASE WHEN rn = 2 THEN CASE WHEN ba.agreement_received = 1 THEN 'TRUE' ELSE 'FALSE' END END) AS `Agreement Received 2`,
-        MAX(CASE WHEN rn = 3 THEN CASE WHEN ba.agreement_received = 1 THEN 'TRUE' ELSE 'FALSE' END END) AS `Agreement Received 3`,
-        MAX(CASE WHEN rn = 4 THEN CASE WHEN ba.agreement_received = 1 THEN 'TRUE' ELSE 'FALSE' END END) AS `Agreement Received 4`,
-        MAX(CASE WHEN rn = 1 THEN CASE WHEN ba.digital_book_approved = 1 THEN 'TRUE' ELSE 'FALSE' END END) AS `Digital Prof 1`,
-        MAX(CASE WHEN rn = 2 THEN CASE WHEN ba.digital_book_approved = 1 THEN 'TRUE' ELSE 'FALSE' END END) AS `Digital Prof 2`,
-        MAX(CASE WHEN rn = 3 THEN CASE WHEN ba.digital_book_approved = 1 THEN 'TRUE' ELSE 'FALSE' END END) AS `Digital Prof 3`,
-        MAX(CASE WHEN rn = 4 THEN CASE WHEN ba.digital_book_approved = 1 THEN 'TRUE' ELSE 'FALSE' END END) AS `Digital Prof 4`,
-        MAX(CASE WHEN rn = 1 THEN CASE WHEN ba.printing_confirmation = 1 THEN 'TRUE' ELSE 'FALSE' END END) AS `Confirmation 1`,
-        MAX(CASE WHEN rn = 2 THEN CASE WHEN ba.printing_confirmation = 1 THEN 'TRUE' ELSE 'FALSE' END END) AS `Confirmation 2`,
-        MAX(CASE WHEN rn = 3 THEN CASE WHEN ba.printing_confirmation = 1 THEN 'TRUE' ELSE 'FALSE' END END) AS `Confirmation 3`,
-        MAX(CASE WHEN rn = 4 THEN CASE WHEN ba.printing_confirmation = 1 THEN 'TRUE' ELSE 'FALSE' END END) AS `Confirmation 4`,
-        CASE WHEN b.ready_to_print = 1 THEN 'TRUE' ELSE 'FALSE' END AS `Ready to Print`,
-        CASE WHEN b.print_status = 1 THEN 'TRUE' ELSE 'FALSE' END AS `Print`,
-        b.amazon_link AS `Amazon Link`,
-        b.agph_link AS `AGPH Link`,
-        b.google_link AS `Google Link`,
-        b.flipkart_link AS `Flipkart Link`,
-        NULL AS `Final Mail`,
-        CASE WHEN b.deliver = 1 THEN 'TRUE' ELSE 'FALSE' END AS `Deliver`,
-        CASE WHEN b.google_review = 1 THEN 'TRUE' ELSE 'FALSE' END AS `Google Review`,
-        NULL AS `Remark`,
-        MAX(ba.delivery_date) AS `Delivery Date`,
-        CASE WHEN b.writing_end IS NOT NULL THEN 'TRUE' ELSE 'FALSE' END AS `Writing Complete`,
-        b.writing_by AS `Writing By`,
-        DATE(b.writing_start) AS `Writing Start Date`,
-        TIME_FORMAT(b.writing_start, '%H:%i:%s') AS `Writing Start Time`,
-        DATE(b.writing_end) AS `Writing End Date`,
-        TIME_FORMAT(b.writing_end, '%H:%i:%s') AS `Writing End Time`,
-        CASE WHEN b.proofreading_end IS NOT NULL THEN 'TRUE' ELSE 'FALSE' END AS `Proofreading Complete`,
-        b.proofreading_by AS `Proofreading By`,
-        DATE(b.proofreading_start) AS `Proofreading Start Date`,
-        TIME_FORMAT(b.proofreading_start, '%H:%i:%s') AS `Proofreading Start Time`,
-        DATE(b.proofreading_end) AS `Proofreading End Date`,
-        TIME_FORMAT(b.proofreading_end, '%H:%i:%s') AS `Proofreading End Time`,
-        CASE WHEN b.formatting_end IS NOT NULL THEN 'TRUE' ELSE 'FALSE' END AS `Formating Complete`,
-        b.formatting_by AS `Formating By`,
-        DATE(b.formatting_start) AS `Formating Start Date`,
-        TIME_FORMAT(b.formatting_start, '%H:%i:%s') AS `Formating Start Time`,
-        DATE(b.formatting_end) AS `Formating End Date`,
-        TIME_FORMAT(b.formatting_end, '%H:%i:%s') AS `Formating End Time`,
-        CASE WHEN b.cover_end IS NOT NULL THEN 'TRUE' ELSE 'FALSE' END AS `Cover Complete`,
-        b.cover_by AS `Cover By`,
-        DATE(b.cover_start) AS `Cover Start Date`,
-        TIME_FORMAT(b.cover_start, '%H:%i:%s') AS `Cover Start Time`,
-        DATE(b.cover_end) AS `Cover End Date`,
-        TIME_FORMAT(b.cover_end, '%H:%i:%s') AS `Cover End Time`,
-        CASE WHEN b.is_publish_only = 1 THEN 'TRUE' ELSE 'FALSE' END AS `Is Publish Only`,
-        MONTHNAME(b.date) AS `Month`,
-        YEAR(b.date) AS `Year`,
-        DATEDIFF(CURDATE(), b.date) AS `Since Enrolled`
-    FROM books b
-    LEFT JOIN RankedAuthors ba ON b.book_id = ba.book_id AND ba.rn <= 4
-    LEFT JOIN authors a ON ba.author_id = a.author_id
-    GROUP BY 
-        b.book_id, b.title, b.date, b.apply_isbn, b.isbn, b.ready_to_print, b.print_status, b.deliver, 
-        b.google_review, b.flipkart_link, b.google_link, b.agph_link, b.amazon_link, 
-        b.writing_by, b.proofreading_by, b.formatting_by, b.cover_by,
-        b.writing_start, b.writing_end, b.proofreading_start, b.proofreading_end, 
-        b.formatting_start, b.formatting_end, b.cover_start, b.cover_end,
-        b.is_publish_only
-    ORDER BY b.book_id;
-    """
+    timer = SectionTimer()
 
+    # Shared, incrementally refreshed operations sheet (see operations_sheet.py),
+    # with every date column already parsed to datetime64
     with st.spinner("Data fetching in progress...", show_time=True):
         conn = connect_db()
-        operations_sheet_data_preprocess = conn.query(query, show_spinner=False)
+        operations_sheet_data_preprocess = fetch_operations_sheet(conn, parse_dates=True)
+        version = operations_sheet_data_preprocess.attrs['version']
+    timer.lap("Data load")
 
     unique_year = operations_sheet_data_preprocess['Year'].unique()[~np.isnan(operations_sheet_data_preprocess['Year'].unique())]
 
@@ -330,6 +425,7 @@ def render_full_page():
     with col2:
         if st.button(":material/refresh: Refresh", key="refresh_button", type="tertiary", width="stretch"):
             st.cache_data.clear()
+            get_operations_sheet().invalidate()
 
     with col3:
         if st.button(":material/arrow_back: Go Back", key="back_button", type="tertiary", width="stretch"):
@@ -354,40 +450,15 @@ def render_full_page():
     ####################----------- Remaining Work Expander -------------################
     ######################################################################################
 
-    books_written_remaining = operations_sheet_data_preprocess_month[operations_sheet_data_preprocess_month['Writing Complete'] != 'TRUE'][['Book ID', 'Book Title', 'Date','No of Author']]
-
-    books_proofread_remaining = operations_sheet_data_preprocess_month[(operations_sheet_data_preprocess_month['Writing Complete'] == 'TRUE') & 
-                                                                    (operations_sheet_data_preprocess_month['Proofreading Complete'] != 'TRUE')][['Book ID', 'Book Title', 'Date',
-                                                                                                                                                    'No of Author','Writing By','Writing Start Date',
-                                                                                                                                                    'Writing End Date']]
-
-    books_formatted_remaining = operations_sheet_data_preprocess_month[(operations_sheet_data_preprocess_month['Proofreading Complete'] == 'TRUE') &
-                                                                        (operations_sheet_data_preprocess_month['Formating Complete'] != 'TRUE')][['Book ID', 'Book Title', 'Date','No of Author',
-                                                                                                                                                'Proofreading By','Proofreading Start Date',
-                                                                                                                                                'Proofreading End Date']]
-
-
-    books_remaining = operations_sheet_data_preprocess_month[operations_sheet_data_preprocess_month['Book Complete'] != 'TRUE'][['Book ID', 'Book Title', 'Date','No of Author']]
-    books_apply_isbn_remaining = operations_sheet_data_preprocess_month[operations_sheet_data_preprocess_month['Apply ISBN'] != 'TRUE'][['Book ID', 'Book Title', 'Date','No of Author',
-                                                                                                                                        'Writing Complete','Proofreading Complete','Formating Complete']]
-    books_printed_remaining = operations_sheet_data_preprocess_month[operations_sheet_data_preprocess_month['Print'] != 'TRUE'][['Book ID', 'Book Title', 'Date','No of Author',]]
-    books_delivered_remaining = operations_sheet_data_preprocess_month[operations_sheet_data_preprocess_month['Deliver'] != 'TRUE'][['Book ID', 'Book Title', 'Date','No of Author']]
-
-
-    for df in [books_written_remaining,
-        books_proofread_remaining,
-        books_formatted_remaining,
-        books_remaining,
-        books_apply_isbn_remaining,
-        books_printed_remaining,
-        books_delivered_remaining]:
-        # Identify date columns
-        date_columns = [col for col in df.columns if 'Date' in col]
-        
-        # Format each date column
-        for col in date_columns:
-            df[col] = pd.to_datetime(df[col], errors='coerce')
-            df[col] = df[col].dt.strftime('%d %B %Y')
+    # Month/year slices, memoized per store version and pill selection
+    views = month_views(version, selected_year, selected_month, operations_sheet_data_preprocess)
+    books_written_remaining = views['written_remaining']
+    books_proofread_remaining = views['proofread_remaining']
+    books_formatted_remaining = views['formatted_remaining']
+    books_apply_isbn_remaining = views['apply_isbn_remaining']
+    books_printed_remaining = views['printed_remaining']
+    books_delivered_remaining = views['delivered_remaining']
+    timer.lap("Metrics & remaining work")
 
 
     with st.expander("View Remaining Work", expanded=False,icon='⌛'):
@@ -461,58 +532,10 @@ def render_full_page():
     ######################################################################################
 
 
-    # Extract unique non-null values for each role
-    writing_by = operations_sheet_data_preprocess['Writing By'].unique()[pd.notna(operations_sheet_data_preprocess['Writing By'].unique())]
-    proofreading_by = operations_sheet_data_preprocess['Proofreading By'].unique()[pd.notna(operations_sheet_data_preprocess['Proofreading By'].unique())]
-    formatting_by = operations_sheet_data_preprocess['Formating By'].unique()[pd.notna(operations_sheet_data_preprocess['Formating By'].unique())]
-
-
-    # Define conditions in a dictionary, including columns to select for each case
-    conditions = {
-        'Formating': {
-            'by': formatting_by,
-            'start_col': 'Formating Start Date',
-            'end_col': 'Formating End Date',
-            'columns': ['Book ID', 'Book Title', 'Date', 'Since Enrolled', 'No of Author', 'Formating By', 
-                        'Formating Start Date', 'Formating Start Time', 'Proofreading By', 'Proofreading Start Date', 
-                        'Proofreading Start Time', 'Proofreading End Date', 'Proofreading End Time',
-                        'Writing By', 'Writing Start Date', 'Writing Start Time', 'Writing End Date', 
-                        'Writing End Time']
-        },
-        'Proofreading': {
-            'by': proofreading_by,
-            'start_col': 'Proofreading Start Date',
-            'end_col': 'Proofreading End Date',
-            'columns': ['Book ID', 'Book Title', 'Date', 'Since Enrolled', 'No of Author', 'Proofreading By',
-                        'Proofreading Start Date', 'Proofreading Start Time', 'Writing By', 'Writing Start Date', 
-                        'Writing Start Time', 'Writing End Date', 'Writing End Time']
-        },
-        'Writing': {
-            'by': writing_by,
-            'start_col': 'Writing Start Date',
-            'end_col': 'Writing End Date',
-            'columns': ['Book ID', 'Book Title', 'Date', 'Since Enrolled', 'No of Author', 'Writing By',
-                        'Writing Start Date', 'Writing Start Time']
-        }
-    }
+    # Running work, work done in the last 3 days and remaining queues
+    daily = daily_views(version, today, operations_sheet_data_preprocess)
+    results = {key: daily[f'running_{key}'] for key in RUNNING_WORK_COLUMNS}
 
-    # Extract information based on conditions, including specified columns
-    results = {}
-    for key, cond in conditions.items():
-        # Filter the data and select columns, creating a copy to avoid modifying the original DataFrame
-        current_data = operations_sheet_data_preprocess[
-            (operations_sheet_data_preprocess[f'{key} By'].isin(cond['by'])) & 
-            (operations_sheet_data_preprocess[cond['start_col']].notnull()) & 
-            (operations_sheet_data_preprocess[cond['end_col']].isnull())
-        ][cond['columns']].copy()
-        
-        # Format 'Date' columns in the copy to remove the time part
-        date_columns = [col for col in current_data.columns if 'Date' in col]
-        for date_col in date_columns:
-            current_data[date_col] = pd.to_datetime(current_data[date_col]).dt.strftime('%d %B %Y')
-        
-        # Save the cleaned DataFrame in results
-        results[key] = current_data
     # CSS for the "Status" badge style
     st.markdown("""
         <style>
@@ -562,59 +585,14 @@ def render_full_page():
         )
         st.dataframe(status['data'], width="stretch", hide_index=True)
 
+    timer.lap("Running work")
+
     ######################################################################################
     ###############----------- Work done Books on Previous day & Today -------------################
     ######################################################################################
 
 
-    def work_done_status(df):
-        # Ensure date columns are datetime objects
-        date_columns = ['Date', 'Writing Start Date', 'Writing End Date', 'Proofreading Start Date',
-                        'Proofreading End Date', 'Formating Start Date', 'Formating End Date']
-        for col in date_columns:
-            df[col] = pd.to_datetime(df[col], errors='coerce')
-
-        # Get today's date and the date range for the last 3 days
-        today = datetime.now().date()
-        date_range = [today - timedelta(days=i) for i in range(3)]
-
-        # Filter rows where any of the end dates fall within the last 3 days
-        filtered_df = df[
-            (df['Writing End Date'].dt.date.isin(date_range)) |
-            (df['Proofreading End Date'].dt.date.isin(date_range)) |
-            (df['Formating End Date'].dt.date.isin(date_range))
-        ]
-
-        # Add a column to indicate which work was done
-        def identify_work_done(row):
-            work_done = []
-            if pd.notna(row['Writing End Date']) and row['Writing End Date'].date() in date_range:
-                work_done.append('Writing')
-            if pd.notna(row['Proofreading End Date']) and row['Proofreading End Date'].date() in date_range:
-                work_done.append('Proofreading')
-            if pd.notna(row['Formating End Date']) and row['Formating End Date'].date() in date_range:
-                work_done.append('Formatting')
-            return ', '.join(work_done)  # Ensure this is a string
-
-        filtered_df['Work Done'] = filtered_df.apply(identify_work_done, axis=1)
-
-        # Format date columns to remove time part
-        for col in date_columns:
-            filtered_df[col] = filtered_df[col].dt.strftime('%d %B %Y')
-
-        # Select and reorder columns
-        filtered_df = filtered_df[[
-            'Book ID', 'Book Title', 'Date', 'Since Enrolled', 'No of Author', 'Work Done',
-            'Writing Complete', 'Writing By', 'Writing Start Date', 'Writing Start Time',
-            'Writing End Date', 'Writing End Time', 'Proofreading Complete', 'Proofreading By',
-            'Proofreading Start Date', 'Proofreading Start Time', 'Proofreading End Date',
-            'Proofreading End Time', 'Formating Complete', 'Formating By', 'Formating Start Date',
-            'Formating Start Time', 'Formating End Date', 'Formating End Time'
-        ]].fillna('Pending')
-
-        return filtered_df
-
-    work_done_status = work_done_status(operations_sheet_data_preprocess)
+    work_done_status = daily['work_done']
 
     # Display the last 3 days data section with count, emoji, and title
     st.markdown(
@@ -637,78 +615,16 @@ def render_full_page():
         )
     })
 
+    timer.lap("Work done (3 days)")
+
     ######################################################################################
     ###############----------- Work Remaining status dataframe -------------##############
     ######################################################################################
 
 
-    def writing_remaining(data):
-        data['Writing By'] = data['Writing By'].fillna('Pending')
-        # Filter for books enrolled in the last 4 months and exclude publish-only books
-        four_months_ago = datetime.now().date() - timedelta(days=4*30)  # Approximate 4 months
-        data = data[
-            (data['Writing Start Date'].isnull()) &
-            (data['Is Publish Only'] != 'TRUE') &
-            (pd.to_datetime(data['Date'], errors='coerce').dt.date >= four_months_ago)
-        ][[
-            'Book ID', 'Book Title', 'Date', 'Since Enrolled', 'No of Author', 'Writing By'
-        ]]
-        writing_remaining = data['Book ID'].nunique()
-
-        date_columns = [col for col in data.columns if 'Date' in col]
-        for col in date_columns:
-            data[col] = pd.to_datetime(data[col], errors='coerce').dt.strftime('%d %B %Y')
-
-        return data, writing_remaining
-
-    def proofread_remaining(data):
-        data['Proofreading By'] = data['Proofreading By'].fillna('Pending')
-        # Filter for books enrolled in the last 4 months
-        four_months_ago = datetime.now().date() - timedelta(days=4*30)  # Approximate 4 months
-        data = data[
-            (data['Writing End Date'].notnull() | (data['Is Publish Only'] == 'TRUE')) & 
-            (data['Proofreading Start Date'].isnull()) &
-            (pd.to_datetime(data['Date'], errors='coerce').dt.date >= four_months_ago)
-        ][[
-            'Book ID', 'Book Title', 'Date', 'Since Enrolled', 'No of Author', 
-            'Writing By', 'Writing Start Date', 'Writing Start Time', 'Writing End Date', 
-            'Writing End Time', 'Proofreading By'
-        ]]
-        proof_remaining = data['Book ID'].nunique()
-
-        date_columns = [col for col in data.columns if 'Date' in col]
-        for col in date_columns:
-            data[col] = pd.to_datetime(data[col], errors='coerce').dt.strftime('%d %B %Y')
-
-        return data, proof_remaining
-
-    def format_remaining(data):
-        data['Formating By'] = data['Formating By'].fillna('Pending')
-        # Filter for books enrolled in the last 4 months
-        four_months_ago = datetime.now().date() - timedelta(days=4*30)  # Approximate 4 months
-        data = data[
-            (data['Proofreading End Date'].notnull()) & 
-            (data['Formating Start Date'].isnull()) &
-            (pd.to_datetime(data['Date'], errors='coerce').dt.date >= four_months_ago)
-        ][[
-            'Book ID', 'Book Title', 'Date', 'Since Enrolled', 'No of Author', 
-            'Formating By', 'Writing By', 'Writing Start Date', 'Writing Start Time', 
-            'Writing End Date', 'Writing End Time', 'Proofreading By', 
-            'Proofreading Start Date', 'Proofreading Start Time', 'Proofreading End Date', 
-            'Proofreading End Time'
-        ]]
-        format_remaining = data['Book ID'].nunique()
-
-        date_columns = [col for col in data.columns if 'Date' in col]
-        for col in date_columns:
-            data[col] = pd.to_datetime(data[col], errors='coerce').dt.strftime('%d %B %Y')
-
-        return data, format_remaining
-
-
-    writing_remaining_data,writing_remaining_count = writing_remaining(operations_sheet_data_preprocess)
-    proofread_remaining_data,proofread_remaining_count = proofread_remaining(operations_sheet_data_preprocess)
-    format_remaining_data,format_remaining_count = format_remaining(operations_sheet_data_preprocess)
+    writing_remaining_data, writing_remaining_count = daily['writing_remaining'], daily['writing_remaining_count']
+    proofread_remaining_data, proofread_remaining_count = daily['proofread_remaining'], daily['proofread_remaining_count']
+    format_remaining_data, format_remaining_count = daily['format_remaining'], daily['format_remaining_count']
 
 
     # Define two columns to display dataframes side by side
@@ -766,54 +682,15 @@ def render_full_page():
 
 
 
+    timer.lap("Remaining queues")
+
     ####################################################################################################
     ################-----------  Writing complete in this Month ----------##############
     ####################################################################################################
 
-    def proofreading_complete(data,selected_year,selected_month):
-        proofreading_complete = data[
-        (data['Proofreading End Date'].dt.strftime('%Y') == str(selected_year)) & 
-        (data['Proofreading End Date'].dt.strftime('%B') == str(selected_month))
-    ]
-        proofreading_complete = proofreading_complete[proofreading_complete['Proofreading Complete'] == 'TRUE']
-        proofreading_complete = proofreading_complete[['Book ID', 'Book Title','No of Author', 'Date','Since Enrolled',
-                                                    'Writing By', 'Writing Start Date', 'Writing Start Time', 'Writing End Date', 'Writing End Time',
-                                                    'Proofreading By', 'Proofreading Start Date', 'Proofreading Start Time', 'Proofreading End Date',
-                                                    'Proofreading End Time']]
-        
-        count = proofreading_complete['Book ID'].nunique()
-
-        date_columns = [col for col in proofreading_complete.columns if 'Date' in col]
-        for col in date_columns:
-            proofreading_complete[col] = proofreading_complete[col].dt.strftime('%d %B %Y')
-
-        return proofreading_complete, count
-
-    def writing_complete(data,selected_year,selected_month):
-        writing_complete = data[
-        (data['Writing End Date'].dt.strftime('%Y') == str(selected_year)) & 
-        (data['Writing End Date'].dt.strftime('%B') == str(selected_month))
-    ]
-        writing_complete = (writing_complete[writing_complete['Writing Complete'] == 'TRUE']) 
-        writing_complete = writing_complete[['Book ID', 'Book Title','No of Author', 'Date','Since Enrolled',
-                                                    'Writing By', 'Writing Start Date', 'Writing Start Time', 'Writing End Date', 'Writing End Time']]
-        
-        count = writing_complete['Book ID'].nunique()
-
-        date_columns = [col for col in writing_complete.columns if 'Date' in col]
-        for col in date_columns:
-            writing_complete[col] = writing_complete[col].dt.strftime('%d %B %Y')
-        
-        return writing_complete, count
-
-    writing_complete_data_by_month, writing_complete_data_by_month_count = writing_complete(operations_sheet_data_preprocess,selected_year,
-                                                                                            selected_month)
-    # Monthly data for a specific month
-    operations_sheet_data_preprocess_writng_month = operations_sheet_data_preprocess[
-        (operations_sheet_data_preprocess['Writing End Date'].dt.strftime('%Y') == str(selected_year)) & 
-        (operations_sheet_data_preprocess['Writing End Date'].dt.strftime('%B') == str(selected_month))
-    ]
-    employee_monthly = operations_sheet_data_preprocess_writng_month.groupby('Writing By').count()['Book ID'].reset_index().sort_values(by='Book ID', ascending=True)
+    writing_complete_data_by_month = views['writing_complete']
+    writing_complete_data_by_month_count = views['writing_complete_count']
+    employee_monthly = views['writing_by_month']
 
 
     # Altair chart for monthly data with layering of bars and text
@@ -860,17 +737,15 @@ def render_full_page():
 
 
 
+    timer.lap("Writing complete")
+
     ####################################################################################################
     ################-----------  Proofreading complete in this Month ----------##############
     ####################################################################################################
 
-    proofreading_complete_data_by_month, proofreading_complete_data_by_month_count = proofreading_complete(operations_sheet_data_preprocess,selected_year, 
-                                                                                                        selected_month)
-    operations_sheet_data_preprocess_proof_month = operations_sheet_data_preprocess[
-        (operations_sheet_data_preprocess['Proofreading End Date'].dt.strftime('%Y') == str(selected_year)) & 
-        (operations_sheet_data_preprocess['Proofreading End Date'].dt.strftime('%B') == str(selected_month))
-    ]
-    proofreading_num = operations_sheet_data_preprocess_proof_month.groupby('Proofreading By')['Book ID'].count().reset_index().sort_values(by='Book ID', ascending=False)
+    proofreading_complete_data_by_month = views['proofreading_complete']
+    proofreading_complete_data_by_month_count = views['proofreading_complete_count']
+    proofreading_num = views['proofreading_by_month'].copy()
     proofreading_num.columns = ['Proofreader', 'Book Count']
     cleaned_proofreading_num = proofreading_num[['Proofreader', 'Book Count']]
 
@@ -921,6 +796,8 @@ def render_full_page():
             #st.plotly_chart(proofreading_donut, use_container_width=True)
 
 
+    timer.lap("Proofreading complete")
+
     ######################################################################################
     ######################------------- 40 days data-------------#########################
     ######################################################################################
@@ -1129,10 +1006,7 @@ def render_full_page():
     book_count = len(filtered_df)
     books_per_day = filtered_df.groupby('Date').size().reset_index(name='Books Enrolled')
 
-    date_columns = [col for col in filtered_df.columns if 'Date' in col]
-    for col in date_columns:
-        filtered_df[col] = pd.to_datetime(filtered_df[col], errors='coerce')
-        filtered_df[col] = filtered_df[col].dt.strftime('%d %B %Y')
+    filtered_df = format_date_columns(filtered_df)
 
 
     # Create an Altair line chart
@@ -1167,6 +1041,8 @@ def render_full_page():
         st.altair_chart((line_chart_number_book+text_line_chart_number_book), use_container_width=True,theme="streamlit")
 
 
+    timer.lap("Recently added books")
+
     ###################################################################################################################
     #####################----------- Dilevered books----------###############################################
     #####################################################################################################################
@@ -1178,28 +1054,13 @@ def render_full_page():
         f"<span class='status-badge'>Status: Delivered!</span></h5>", 
         unsafe_allow_html=True
     )
-    delivered_books = operations_sheet_data_preprocess[operations_sheet_data_preprocess['Deliver'] == 'TRUE']
-
-    delivered_books_filter = delivered_books[delivered_books['Year']==selected_year]
-
-    date_columns = [col for col in delivered_books_filter.columns if 'Date' in col]
-    for col in date_columns:
-        delivered_books_filter[col] = pd.to_datetime(delivered_books_filter[col], errors='coerce')
-        delivered_books_filter[col] = delivered_books_filter[col].dt.strftime('%d %B %Y')
-
-    delivered_books_filter = delivered_books_filter[['Book ID', 'Book Title', 'Date', 'No of Author','Author Name 1',
-        'Author Name 2', 'Author Name 3', 'Author Name 4', 'Position 1',
-        'Position 2', 'Position 3', 'Position 4','Writing Complete', 'Writing By', 'Writing Start Date',
-        'Writing Start Time', 'Writing End Date', 'Writing End Time',
-        'Proofreading Complete', 'Proofreading By', 'Proofreading Start Date',
-        'Proofreading Start Time', 'Proofreading End Date',
-        'Proofreading End Time', 'Formating Complete', 'Formating By',
-        'Formating Start Date', 'Formating Start Time', 'Formating End Date',
-        'Formating End Time',]]
+    delivered_books_filter = views['delivered']
 
     st.markdown(f"##### 📋 {len(delivered_books_filter)} Books Delivered in {selected_year}")
     st.dataframe(delivered_books_filter, width="stretch", hide_index=True)
 
+    timer.lap("Delivered books")
+
     ####################################################################################################
     #####################-----------  Line Chart Monthly Books & Authors ----------######################
     ###################################################################################################
@@ -1271,6 +1132,8 @@ def render_full_page():
     )
     st.altair_chart((line_chart + text_books + line_chart_authors + text_authors), use_container_width=True)
 
+    timer.lap("Monthly books & authors")
+
     #####################################################################################################
     #####################-----------  Author Position Count ----------######################
     ####################################################################################################
@@ -1349,6 +1212,8 @@ def render_full_page():
         st.altair_chart(bar_chart_yearly + author_count_text_yearly, use_container_width=True)
 
 
+    timer.lap("Author position count")
+
     #####################################################################################################
     #####################-----------  Top 25 Authors From 2024 ----------######################
     ####################################################################################################
@@ -1406,15 +1271,14 @@ def render_full_page():
                                                                 'Author Name 2', 'Author Name 3', 'Author Name 4', 'Position 1',
                                                                 'Position 2', 'Position 3', 'Position 4','Contact No. 1', 
                                                                 'Contact No. 2', 'Contact No. 3', 'Contact No. 4']]
-        date_columns = [col for col in filtered_data.columns if 'Date' in col]
-        for col in date_columns:
-            filtered_data[col] = pd.to_datetime(filtered_data[col], errors='coerce')
-            filtered_data[col] = filtered_data[col].dt.strftime('%d %B %Y')
+        filtered_data = format_date_columns(filtered_data)
         st.caption(f"{len(filtered_data)} Books by {selected_author}")
         st.dataframe(filtered_data, width="stretch", hide_index=True)
 
 
 
+    timer.lap("Top authors")
+
     #####################################################################################################
     #####################-----------  Bar chart Number of Books in Month ----------######################
     ####################################################################################################
@@ -1687,22 +1551,15 @@ def render_full_page():
     #     st.plotly_chart(format_fig)
 
         
+    timer.lap("Books & authors by month")
+
     #######################################################################################################
     ###################------------- Horizonrtal bar graph Employee Performance----------##################
     #######################################################################################################
 
-    # Monthly data for a specific month
-    operations_sheet_data_preprocess_writng_month = operations_sheet_data_preprocess[
-        (operations_sheet_data_preprocess['Writing End Date'].dt.strftime('%Y') == str(selected_year)) & 
-        (operations_sheet_data_preprocess['Writing End Date'].dt.strftime('%B') == str(selected_month))
-    ]
-    employee_monthly = operations_sheet_data_preprocess_writng_month.groupby('Writing By').count()['Book ID'].reset_index().sort_values(by='Book ID', ascending=True)
-
-    # Full year data
-    operations_sheet_data_preprocess_writng_year = operations_sheet_data_preprocess[
-        (operations_sheet_data_preprocess['Writing End Date'].dt.strftime('%Y') == str(selected_year))
-    ]
-    employee_yearly = operations_sheet_data_preprocess_writng_year.groupby('Writing By').count()['Book ID'].reset_index().sort_values(by='Book ID', ascending=True)
+    # Monthly and full year data
+    employee_monthly = views['writing_by_month']
+    employee_yearly = views['writing_by_year']
 
     # Altair chart for monthly data with layering of bars and text
     monthly_bars = alt.Chart(employee_monthly).mark_bar(color='#F3C623').encode(
@@ -1755,23 +1612,17 @@ def render_full_page():
     with col2:
         st.altair_chart(yearly_chart, use_container_width=True)
 
+    timer.lap("Content team performance")
+
     ######################################################################################
     ###############------------- Bar Chart Formatting & Proofread -----------############
     ######################################################################################
 
-    operations_sheet_data_preprocess_proof_month = operations_sheet_data_preprocess[
-        (operations_sheet_data_preprocess['Proofreading End Date'].dt.strftime('%Y') == str(selected_year)) & 
-        (operations_sheet_data_preprocess['Proofreading End Date'].dt.strftime('%B') == str(selected_month))
-    ]
-    proofreading_num = operations_sheet_data_preprocess_proof_month.groupby('Proofreading By')['Book ID'].count().reset_index().sort_values(by='Book ID', ascending=False)
+    proofreading_num = views['proofreading_by_month'].copy()
     proofreading_num.columns = ['Proofreader', 'Book Count']
 
     # Formatting data
-    operations_sheet_data_preprocess_format_month = operations_sheet_data_preprocess[
-        (operations_sheet_data_preprocess['Formating End Date'].dt.strftime('%Y') == str(selected_year)) & 
-        (operations_sheet_data_preprocess['Formating End Date'].dt.strftime('%B') == str(selected_month))
-    ]
-    formatting_num = operations_sheet_data_preprocess_format_month.groupby('Formating By')['Book ID'].count().reset_index().sort_values(by='Book ID', ascending=False)
+    formatting_num = views['formatting_by_month'].copy()
     formatting_num.columns = ['Formatter', 'Book Count']
 
     # Create the bar chart for Proofreading
@@ -1826,6 +1677,8 @@ def render_full_page():
         st.altair_chart(formatting_chart, use_container_width=True)
 
 
+    timer.lap("Formatting & proofread")
+
     ######################################################################################################################
     #####################-----------  Bar chart Number of Monthly Books & Authors in 2024 ----------######################
     ######################################################################################################################
@@ -1893,6 +1746,8 @@ def render_full_page():
             st.altair_chart(author_chart + author_text, use_container_width=True)
 
 
+    timer.lap("Monthly bar charts")
+
     ###################################################################################################################
     #####################----------- Pie Books and Authors added by Publishing Consultan----------######################
     #####################################################################################################################
@@ -1940,6 +1795,11 @@ def render_full_page():
     with col2:
         st.plotly_chart(fig_authors_added_yearly, use_container_width=True)
 
+    timer.lap("Publishing consultants")
+    timer.log("dashboard")
+    if user_role == "admin":
+        timer.render()
+
 
 # Step 1: Reserve a spot for everything
 placeholder = st.empty()
@@ -2,6 +2,8 @@ import streamlit as st
 import pandas as pd
 from sqlalchemy import text
 import time
+from migrations import require_schema
+from jobs import job_handler, query_frame, submit_job, current_job, show_job, render_job_result
 
 st.set_page_config(
     page_title="BookTracker → eBook Sync",
@@ -87,6 +89,7 @@ def connect_ebook_db():
 
 conn_booktracker = connect_booktracker_db()
 conn_ebook       = connect_ebook_db()
+require_schema("mysql")
 
 def normalize(val: str) -> str:
     return val.strip().lower() if val else ""
@@ -97,6 +100,111 @@ def is_empty(val):
     if str(val).strip() == "": return True
     return False
 
+# ── eBook Store helpers (also used by the background sync jobs) ──────────────
+def fetch_ebook_products():
+    return query_frame(conn_ebook, "SELECT id, book_id, title, sku FROM products")
+
+def fetch_ebook_subjects():
+    return query_frame(conn_ebook, "SELECT id, name FROM subjects")
+
+def fetch_product_subjects():
+    return query_frame(conn_ebook, "SELECT product_id, subject_id FROM product_subjects")
+
+def fetch_eb_authors():
+    return query_frame(conn_ebook, "SELECT id, name, profile_image, bio FROM authors")
+
+def get_or_create_subject(session, subject_name: str, existing_subjects: dict) -> int | None:
+    name = subject_name.strip()
+    if not name: return None
+    key = name.lower()
+    if key in existing_subjects: return existing_subjects[key]
+    slug = name.lower().replace(" ", "-").replace("/", "-")
+    result = session.execute(
+        text("INSERT INTO subjects (name, slug, status, created_at) VALUES (:name, :slug, 'active', NOW())"),
+        {"name": name, "slug": slug}
+    )
+    new_id = result.lastrowid
+    existing_subjects[key] = new_id
+    return new_id
+
+# ── Background sync jobs ──────────────────────────────────────────────────────
+# Both run in one transaction: a failure or cancel rolls the whole sync back.
+@job_handler("ebook_book_sync")
+def run_book_sync(job):
+    p = job.params
+    matched_rows = p["matched"]
+    ok, skip, subj_link = 0, 0, 0
+
+    df_subj = fetch_ebook_subjects()
+    existing_subjects = {row["name"].lower(): row["id"] for _, row in df_subj.iterrows()}
+    df_ps = fetch_product_subjects()
+    existing_links = set(zip(df_ps["product_id"], df_ps["subject_id"]))
+    df_eb = fetch_ebook_products()
+    eb_lookup = {normalize(r["title"]): r for _, r in df_eb.iterrows()}
+
+    with conn_ebook.session as s:
+        for i, row in enumerate(matched_rows):
+            title, bt_book_id, bt_isbn, bt_subject = row["BookTracker Title"], row["BT book_id"], row["BT isbn (→ SKU)"], row["BT subject"]
+            eb_current = eb_lookup.get(normalize(title))
+
+            if eb_current is None: # Fix: Truth value of Series check
+                continue
+
+            product_pk = int(eb_current["id"])
+            updates = {}
+            if p["update_book_id"] and (p["overwrite_book_id"] or is_empty(eb_current["book_id"])): updates["book_id"] = int(bt_book_id)
+            if p["update_sku"] and (p["overwrite_sku"] or is_empty(eb_current["sku"])): updates["sku"] = bt_isbn
+
+            if updates:
+                set_clause = ", ".join(f"{k} = :{k}" for k in updates)
+                updates["_title"] = title
+                s.execute(text(f"UPDATE products SET {set_clause} WHERE title = :_title"), updates)
+                ok += 1
+            else: skip += 1
+
+            if p["sync_subjects"] and bt_subject:
+                # Handle Overwrite Subjects
+                if p["overwrite_subjects"]:
+                    s.execute(text("DELETE FROM product_subjects WHERE product_id = :pid"), {"pid": product_pk})
+                    # Clear local link cache for this product
+                    existing_links = {link for link in existing_links if link[0] != product_pk}
+
+                for subj_name in [s2.strip() for s2 in bt_subject.replace(";", ",").split(",") if s2.strip()]:
+                    subj_id = get_or_create_subject(s, subj_name, existing_subjects)
+                    if subj_id and (product_pk, subj_id) not in existing_links:
+                        s.execute(text("INSERT INTO product_subjects (product_id, subject_id) VALUES (:pid, :sid)"), {"pid": product_pk, "sid": subj_id})
+                        existing_links.add((product_pk, subj_id))
+                        subj_link += 1
+
+            job.progress((i + 1) / len(matched_rows), f"✔ {ok} updated · {skip} skipped · {subj_link} subject links")
+        s.commit()
+    return f"Sync completed! {ok} updated, {skip} skipped, {subj_link} subject links added."
+
+@job_handler("ebook_author_sync")
+def run_author_sync(job):
+    p = job.params
+    matches, updated, skipped = p["matches"], 0, 0
+    eb_state = {r["id"]: r for _, r in fetch_eb_authors().iterrows()}
+    with conn_ebook.session as s:
+        for i, row in enumerate(matches):
+            auth_id = int(row["EB_ID"])
+            curr_eb, update_payload = eb_state.get(auth_id), {}
+
+            if curr_eb is None: continue # Fix: Safety check
+
+            if row["Full_Bio"] is not None and (p["overwrite_bio"] or is_empty(curr_eb.get("bio"))): update_payload["bio"] = row["Full_Bio"]
+            if row["New_Mapped_Path"] and (p["overwrite_img"] or is_empty(curr_eb.get("profile_image"))): update_payload["profile_image"] = row["New_Mapped_Path"]
+
+            if update_payload:
+                set_stmt = ", ".join([f"{k} = :{k}" for k in update_payload])
+                update_payload["aid"] = auth_id
+                s.execute(text(f"UPDATE authors SET {set_stmt} WHERE id = :aid"), update_payload)
+                updated += 1
+            else: skipped += 1
+            job.progress((i + 1) / len(matches), f"✔ {updated} updated · {skipped} skipped")
+        s.commit()
+    return f"Sync Complete! {updated} updated, {skipped} skipped."
+
 # ── Helper: Book Sync Logic ───────────────────────────────────────────────────
 def show_book_sync():
     st.markdown("# 📚 BookTracker → eBook Store")
@@ -106,29 +214,6 @@ def show_book_sync():
     def fetch_booktracker_books():
         return conn_booktracker.query("SELECT book_id, title, isbn, subject FROM books", ttl=0)
 
-    def fetch_ebook_products():
-        return conn_ebook.query("SELECT id, book_id, title, sku FROM products", ttl=0)
-
-    def fetch_ebook_subjects():
-        return conn_ebook.query("SELECT id, name FROM subjects", ttl=0)
-
-    def fetch_product_subjects():
-        return conn_ebook.query("SELECT product_id, subject_id FROM product_subjects", ttl=0)
-
-    def get_or_create_subject(session, subject_name: str, existing_subjects: dict) -> int | None:
-        name = subject_name.strip()
-        if not name: return None
-        key = name.lower()
-        if key in existing_subjects: return existing_subjects[key]
-        slug = name.lower().replace(" ", "-").replace("/", "-")
-        result = session.execute(
-            text("INSERT INTO subjects (name, slug, status, created_at) VALUES (:name, :slug, 'active', NOW())"),
-            {"name": name, "slug": slug}
-        )
-        new_id = result.lastrowid
-        existing_subjects[key] = new_id
-        return new_id
-
     # UI: Preview
     col_l, col_r = st.columns(2)
     with col_l:
@@ -203,60 +288,16 @@ def show_book_sync():
         if "analysis" not in st.session_state or not st.session_state["analysis"]["matched"]:
             st.warning("Run the Dry Analysis first.")
         else:
-            matched_rows = st.session_state["analysis"]["matched"]
-            log_lines, ok, skip, err, subj_link = [], 0, 0, 0, 0
-            log_placeholder = st.empty()
-            prog = st.progress(0)
-            
-            df_subj = fetch_ebook_subjects()
-            existing_subjects = {row["name"].lower(): row["id"] for _, row in df_subj.iterrows()}
-            df_ps = fetch_product_subjects()
-            existing_links = set(zip(df_ps["product_id"], df_ps["subject_id"]))
-            df_eb = fetch_ebook_products()
-            eb_lookup = {normalize(r["title"]): r for _, r in df_eb.iterrows()}
-
-            try:
-                with conn_ebook.session as s:
-                    for i, row in enumerate(matched_rows):
-                        title, bt_book_id, bt_isbn, bt_subject = row["BookTracker Title"], row["BT book_id"], row["BT isbn (→ SKU)"], row["BT subject"]
-                        eb_current = eb_lookup.get(normalize(title))
-                        
-                        if eb_current is None: # Fix: Truth value of Series check
-                            continue
-                            
-                        product_pk = int(eb_current["id"])
-                        updates = {}
-                        if update_book_id and (overwrite_book_id or is_empty(eb_current["book_id"])): updates["book_id"] = int(bt_book_id)
-                        if update_sku and (overwrite_sku or is_empty(eb_current["sku"])): updates["sku"] = bt_isbn
-                        
-                        if updates:
-                            set_clause = ", ".join(f"{k} = :{k}" for k in updates)
-                            updates["_title"] = title
-                            s.execute(text(f"UPDATE products SET {set_clause} WHERE title = :_title"), updates)
-                            log_lines.append(f"<span class='log-ok'>✔ UPDATED [{title}]</span><br>")
-                            ok += 1
-                        else: skip += 1
-
-                        if sync_subjects and bt_subject:
-                            # Handle Overwrite Subjects
-                            if overwrite_subjects:
-                                s.execute(text("DELETE FROM product_subjects WHERE product_id = :pid"), {"pid": product_pk})
-                                # Clear local link cache for this product
-                                existing_links = {link for link in existing_links if link[0] != product_pk}
-
-                            for subj_name in [s2.strip() for s2 in bt_subject.replace(";", ",").split(",") if s2.strip()]:
-                                subj_id = get_or_create_subject(s, subj_name, existing_subjects)
-                                if subj_id and (product_pk, subj_id) not in existing_links:
-                                    s.execute(text("INSERT INTO product_subjects (product_id, subject_id) VALUES (:pid, :sid)"), {"pid": product_pk, "sid": subj_id})
-                                    existing_links.add((product_pk, subj_id))
-                                    subj_link += 1
-                        
-                        prog.progress((i + 1) / len(matched_rows))
-                        log_placeholder.markdown(f"<div class='log-box'>{''.join(log_lines[-50:])}</div>", unsafe_allow_html=True)
-                    s.commit()
-                    st.success("Sync completed!")
-            except Exception as e:
-                st.error(f"Sync failed: {e}")
+            st.session_state.book_sync_job = submit_job("ebook_book_sync", {
+                "matched": st.session_state["analysis"]["matched"],
+                "update_book_id": update_book_id, "update_sku": update_sku, "sync_subjects": sync_subjects,
+                "overwrite_book_id": overwrite_book_id, "overwrite_sku": overwrite_sku,
+                "overwrite_subjects": overwrite_subjects,
+            }, label="Book sync")
+
+    job = show_job(current_job("book_sync_job", "ebook_book_sync"))
+    if job:
+        render_job_result(job)
 
 # ── Helper: Author Sync Logic ──────────────────────────────────────────────────
 def show_author_sync():
@@ -268,7 +309,6 @@ def show_author_sync():
     NEW_PATH_BASE = "/home/rishabhvyas/EbookApp/Backend/uploads/authors/"
 
     def fetch_bt_authors(): return conn_booktracker.query("SELECT author_id, name, about_author, author_photo FROM authors", ttl=0)
-    def fetch_eb_authors(): return conn_ebook.query("SELECT id, name, profile_image, bio FROM authors", ttl=0)
     def transform_path(old_path):
         if pd.isna(old_path) or str(old_path).strip() == "": return None
         return str(old_path).replace(OLD_PATH_BASE, NEW_PATH_BASE)
@@ -308,31 +348,14 @@ def show_author_sync():
     if st.button("🚀 Start Final Sync", type="primary"):
         if "author_matches" not in st.session_state: st.error("Run Analysis first.")
         else:
-            matches, log_lines, updated, skipped = st.session_state["author_matches"], [], 0, 0
-            log_placeholder, prog = st.empty(), st.progress(0)
-            eb_state = {r["id"]: r for _, r in fetch_eb_authors().iterrows()}
-            try:
-                with conn_ebook.session as s:
-                    for i, row in enumerate(matches):
-                        auth_id, curr_eb, update_payload = row["EB_ID"], eb_state.get(row["EB_ID"]), {}
-                        
-                        if curr_eb is None: continue # Fix: Safety check
-
-                        if pd.notna(row["Full_Bio"]) and (overwrite_bio or is_empty(curr_eb.get("bio"))): update_payload["bio"] = row["Full_Bio"]
-                        if row["New_Mapped_Path"] and (overwrite_img or is_empty(curr_eb.get("profile_image"))): update_payload["profile_image"] = row["New_Mapped_Path"]
-                        
-                        if update_payload:
-                            set_stmt = ", ".join([f"{k} = :{k}" for k in update_payload])
-                            update_payload["aid"] = auth_id
-                            s.execute(text(f"UPDATE authors SET {set_stmt} WHERE id = :aid"), update_payload)
-                            log_lines.append(f"<span class='log-ok'>✔ {row['Name']} updated</span><br>")
-                            updated += 1
-                        else: skipped += 1
-                        prog.progress((i + 1) / len(matches))
-                        log_placeholder.markdown(f"<div class='log-box'>{''.join(log_lines[-50:])}</div>", unsafe_allow_html=True)
-                    s.commit()
-                    st.success(f"Sync Complete! {updated} updated, {skipped} skipped.")
-            except Exception as e: st.error(f"Error: {e}")
+            matches = [{k: (None if pd.isna(v) else v) for k, v in row.items()} for row in st.session_state["author_matches"]]
+            st.session_state.author_sync_job = submit_job("ebook_author_sync", {
+                "matches": matches, "overwrite_bio": overwrite_bio, "overwrite_img": overwrite_img,
+            }, label="Author sync")
+
+    job = show_job(current_job("author_sync_job", "ebook_author_sync"))
+    if job:
+        render_job_result(job)
 
 # ── Main Navigation ──────────────────────────────────────────────────────────
 st.sidebar.title("⚙️ Database Transfer")
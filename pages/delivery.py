@@ -3,7 +3,11 @@ import pandas as pd
 from datetime import datetime
 from sqlalchemy import text
 from auth import validate_token
-from constants import log_activity, initialize_click_and_session_id, connect_db, show_book_details, fetch_all_printeditions, fetch_all_book_authors
+from migrations import require_schema
+from constants import log_activity, initialize_click_and_session_id, connect_db, show_book_details, fetch_all_printeditions, fetch_all_book_authors, invalidate_stock_ledger
+from operations_sheet import mark_operations_dirty
+from delivery_books import (fetch_pending_delivery_books, fetch_delivery_months, fetch_delivered_books,
+                            invalidate_delivered, get_pending_deliveries)
 import streamlit.components.v1 as components
 
 logo = "logo/logo_black.png"
@@ -35,8 +39,6 @@ if user_role != 'admin' and not (
     st.error("⚠️ Access Denied: You don't have permission to access this page.")
     st.stop()
 
-st.cache_data.clear()
-
 st.markdown("""
     <style>
         .main > div { padding-top: 0px !important; }
@@ -107,6 +109,7 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 conn = connect_db()
+require_schema("mysql")
 
 if "logged_delivery_click_ids" not in st.session_state:
     st.session_state.logged_delivery_click_ids = set()
@@ -119,74 +122,6 @@ if click_id and click_id not in st.session_state.logged_delivery_click_ids:
     except Exception as e:
         st.error(f"Error logging navigation: {str(e)}")
 
-def get_pending_delivery_books(conn):
-    query = """
-    SELECT 
-        b.book_id, b.title, b.date,
-        GROUP_CONCAT(DISTINCT a.name SEPARATOR ', ') AS author_names,
-        lb.batch_id, lb.batch_name, lb.print_receive_date,
-        TRIM(TRAILING ' | ' FROM CONCAT(
-            CASE WHEN SUM(CASE WHEN (
-                ba.address_line1 IS NULL OR ba.address_line1 = '' OR
-                ba.city_del IS NULL OR ba.city_del = '' OR
-                ba.state_del IS NULL OR ba.state_del = '' OR
-                ba.pincode IS NULL OR ba.pincode = '' OR
-                ba.country IS NULL OR ba.country = ''
-            ) THEN 1 ELSE 0 END) > 0 THEN 'Address | ' ELSE '' END,
-            CASE WHEN SUM(CASE WHEN (ba.number_of_books IS NULL OR ba.number_of_books = 0) THEN 1 ELSE 0 END) > 0 THEN 'Copies to Send | ' ELSE '' END
-        )) AS missing_info
-    FROM books b
-    JOIN book_authors ba ON b.book_id = ba.book_id
-    JOIN authors a ON ba.author_id = a.author_id
-    JOIN (
-        SELECT pe.book_id, pb.batch_id, pb.batch_name, pb.print_receive_date,
-               ROW_NUMBER() OVER(PARTITION BY pe.book_id ORDER BY pb.print_receive_date DESC, pb.batch_id DESC) as rn
-        FROM PrintEditions pe
-        JOIN BatchDetails bd ON pe.print_id = bd.print_id
-        JOIN PrintBatches pb ON bd.batch_id = pb.batch_id
-        WHERE pb.status = 'Received'
-    ) lb ON b.book_id = lb.book_id AND lb.rn = 1
-    WHERE b.print_status = 1 AND b.deliver = 0 AND b.is_cancelled = 0
-    GROUP BY b.book_id, lb.batch_id, lb.batch_name, lb.print_receive_date
-    ORDER BY lb.print_receive_date DESC, b.date DESC;
-    """
-    return conn.query(query, ttl=0)
-
-def get_delivered_books(conn):
-    query = """
-    SELECT 
-        b.book_id, b.title, b.date, b.publisher, b.apply_isbn, b.isbn, b.isbn_receive_date, 
-        b.is_publish_only, b.is_thesis_to_book, b.deliver,
-        b.writing_start, b.writing_end, b.writing_by,
-        b.proofreading_start, b.proofreading_end, b.proofreading_by,
-        b.formatting_start, b.formatting_end, b.formatting_by,
-        b.cover_start, b.cover_end, b.cover_by,
-        GROUP_CONCAT(DISTINCT a.name SEPARATOR ', ') AS author_names,
-        MAX(ba.delivery_date) AS delivery_date,
-        lb.batch_id, lb.batch_name, lb.print_receive_date
-    FROM books b
-    JOIN book_authors ba ON b.book_id = ba.book_id
-    JOIN authors a ON ba.author_id = a.author_id
-    LEFT JOIN (
-        SELECT pe.book_id, pb.batch_id, pb.batch_name, pb.print_receive_date,
-               ROW_NUMBER() OVER(PARTITION BY pe.book_id ORDER BY pb.print_receive_date DESC, pb.batch_id DESC) as rn
-        FROM PrintEditions pe
-        JOIN BatchDetails bd ON pe.print_id = bd.print_id
-        JOIN PrintBatches pb ON bd.batch_id = pb.batch_id
-    ) lb ON b.book_id = lb.book_id AND lb.rn = 1
-    WHERE b.deliver = 1
-    GROUP BY 
-        b.book_id, b.title, b.date, b.publisher, b.apply_isbn, b.isbn, b.isbn_receive_date, 
-        b.is_publish_only, b.is_thesis_to_book, b.deliver,
-        b.writing_start, b.writing_end, b.writing_by,
-        b.proofreading_start, b.proofreading_end, b.proofreading_by,
-        b.formatting_start, b.formatting_end, b.formatting_by,
-        b.cover_start, b.cover_end, b.cover_by,
-        lb.batch_id, lb.batch_name, lb.print_receive_date
-    ORDER BY delivery_date DESC;
-    """
-    return conn.query(query, ttl=0)
-
 def update_book_authors(id, updates, conn):
     set_clause = ", ".join([f"{key} = :{key}" for key in updates.keys()])
     query = f"UPDATE book_authors SET {set_clause} WHERE id = :id"
@@ -195,6 +130,9 @@ def update_book_authors(id, updates, conn):
     with conn.session as session:
         session.execute(text(query), params)
         session.commit()
+    mark_operations_dirty(author_row_ids=[id])
+    if 'number_of_books' in updates:
+        invalidate_stock_ledger()
 
 def has_valid_delivery_info(row) -> bool:
     """
@@ -231,15 +169,6 @@ def manage_delivery_dialog(book_id, book_title, conn):
     # unique session_state key and the save button uses on_click=.
     # ─────────────────────────────────────────────────────────────────────────
 
-    # ── Ensure slip_generated_date column exists ──────────────────────────────
-    try:
-        with conn.session as s:
-            s.execute(text("SELECT slip_generated_date FROM book_authors LIMIT 1"))
-    except Exception:
-        with conn.session as s:
-            s.execute(text("ALTER TABLE book_authors ADD COLUMN slip_generated_date DATE"))
-            s.commit()
-
     # ── Tab / state keys ──────────────────────────────────────────────────────
     TAB_DETAILS = "1 · Fill Details"
     TAB_PREVIEW = "2 · Preview Slip"
@@ -593,6 +522,8 @@ def manage_delivery_dialog(book_id, book_title, conn):
                             {"d": d, "bid": book_id},
                         )
                         s.commit()
+                    mark_operations_dirty(book_id)
+                    invalidate_delivered()
                     log_activity(
                         conn, st.session_state.user_id,
                         st.session_state.username, st.session_state.session_id,
@@ -632,12 +563,13 @@ def delivery_management_page():
     with col2:
         if st.button(":material/refresh: Refresh", key="refresh", type="tertiary"): 
             st.cache_data.clear()
+            get_pending_deliveries().invalidate()
             st.rerun()
 
     tab_pending, tab_delivered = st.tabs(["🕒 Pending Delivery", "✅ Delivered History"])
 
     with tab_pending:
-        pending_books = get_pending_delivery_books(conn)
+        pending_books = fetch_pending_delivery_books(conn)
         st.markdown(f'<div class="status-badge-blue">Pending Delivery <span class="badge-count">{len(pending_books)}</span></div>', unsafe_allow_html=True)
         st.caption("Books that have been printed and are awaiting delivery. Click the edit icon to manage delivery details and generate slips.")
 
@@ -686,10 +618,7 @@ def delivery_management_page():
             else: st.info("No books pending delivery.")
 
     with tab_delivered:
-        delivered_books = get_delivered_books(conn)
-        book_ids = delivered_books['book_id'].tolist()
-        authors_data = fetch_all_book_authors(book_ids, conn)
-        printeditions_data = fetch_all_printeditions(book_ids, conn)
+        delivery_months = fetch_delivery_months(conn)
 
         # Initialize filter states
         if 'del_history_page' not in st.session_state: st.session_state.del_history_page = 0
@@ -700,6 +629,9 @@ def delivery_management_page():
             st.session_state.del_month_pills = None
             st.session_state.del_history_page = 0
 
+        month_order = ["January", "February", "March", "April", "May", "June", 
+                       "July", "August", "September", "October", "November", "December"]
+
         # Layout for Search and Filters
         f_col1, f_col2 = st.columns([4, 2], vertical_alignment="bottom")
         
@@ -710,19 +642,15 @@ def delivery_management_page():
             with st.popover("📅 Date Filters", use_container_width=True):
                 st.button("Reset All", on_click=reset_del_filters, use_container_width=True)
                 
-                if not delivered_books.empty:
-                    delivered_books['delivery_date'] = pd.to_datetime(delivered_books['delivery_date'])
-                    years = sorted(delivered_books['delivery_date'].dt.year.unique(), reverse=True)
+                if not delivery_months.empty:
+                    years = delivery_months['year'].astype(int).unique().tolist()
                     
                     selected_year = st.pills("Select Year", options=years, key="del_year_pills", selection_mode="single")
                     
                     if selected_year:
-                        year_data = delivered_books[delivered_books['delivery_date'].dt.year == selected_year]
+                        year_months = set(delivery_months.loc[delivery_months['year'] == selected_year, 'month'].astype(int))
                         # Sort months chronologically
-                        months = year_data['delivery_date'].dt.strftime('%B').unique().tolist()
-                        month_order = ["January", "February", "March", "April", "May", "June", 
-                                       "July", "August", "September", "October", "November", "December"]
-                        available_months = [m for m in month_order if m in months]
+                        available_months = [m for i, m in enumerate(month_order, start=1) if i in year_months]
                         
                         selected_month = st.pills("Select Month", options=available_months, key="del_month_pills", selection_mode="single")
                     else:
@@ -731,26 +659,25 @@ def delivery_management_page():
                     selected_year = None
                     selected_month = None
 
-        # Apply Filters
-        filtered_df = delivered_books.copy()
-        if not filtered_df.empty:
-            if 'date' in filtered_df.columns:
-                filtered_df['date'] = pd.to_datetime(filtered_df['date'])
-            
-            # Year Filter
-            if selected_year:
-                filtered_df = filtered_df[filtered_df['delivery_date'].dt.year == selected_year]
-            
-            # Month Filter
-            if selected_month:
-                filtered_df = filtered_df[filtered_df['delivery_date'].dt.strftime('%B') == selected_month]
-            
-            # Search Filter
-            if search_query:
-                filtered_df = filtered_df[
-                    (filtered_df['book_id'].astype(str).str.contains(search_query, case=False)) |
-                    (filtered_df['title'].str.contains(search_query, case=False))
-                ]
+        # Only the selected window is loaded: a month, a year, or (with no
+        # filters) the latest delivery month. Search covers all delivered books.
+        start = end = None
+        default_month = None
+        if selected_year and selected_month:
+            month_num = month_order.index(selected_month) + 1
+            start = datetime(selected_year, month_num, 1).date()
+            end = datetime(selected_year + month_num // 12, month_num % 12 + 1, 1).date()
+        elif selected_year:
+            start = datetime(selected_year, 1, 1).date()
+            end = datetime(selected_year + 1, 1, 1).date()
+        elif not search_query and not delivery_months.empty:
+            latest = delivery_months.iloc[0]
+            year, month_num = int(latest['year']), int(latest['month'])
+            start = datetime(year, month_num, 1).date()
+            end = datetime(year + month_num // 12, month_num % 12 + 1, 1).date()
+            default_month = f"{month_order[month_num - 1]} {year}"
+
+        filtered_df = fetch_delivered_books(conn, start=start, end=end, search=search_query.strip() or None)
 
         # Pagination Logic
         items_per_page = 50
@@ -759,13 +686,16 @@ def delivery_management_page():
         
         if 'del_history_page' not in st.session_state:
             st.session_state.del_history_page = 0
-            
         if st.session_state.del_history_page >= total_pages:
             st.session_state.del_history_page = total_pages - 1
 
         start_idx = st.session_state.del_history_page * items_per_page
         end_idx = start_idx + items_per_page
-        paginated_df = filtered_df.iloc[start_idx:end_idx]
+        paginated_df = filtered_df.iloc[start_idx:end_idx].copy()
+
+        book_ids = paginated_df['book_id'].tolist()
+        authors_data = fetch_all_book_authors(book_ids, conn)
+        printeditions_data = fetch_all_printeditions(book_ids, conn)
 
         # Header Info
         st.markdown(f'<div class="status-badge-blue">Delivered Books <span class="badge-count">{total_items}</span></div>', unsafe_allow_html=True)
@@ -777,6 +707,8 @@ def delivery_management_page():
         
         if applied_filters_text:
             st.caption(f"Active Filters: {', '.join(applied_filters_text)}")
+        elif default_month:
+            st.caption(f"Showing deliveries from {default_month}. Pick a year or month, or search, to see older ones.")
 
         with st.container(border=True):
             del_col_sizes = [0.8, 3.5, 1, 1, 1, 1, 0.8]
@@ -5,6 +5,7 @@ import time
 import json
 from auth import validate_token
 from constants import connect_db, log_activity, initialize_click_and_session_id
+from operations_sheet import mark_operations_dirty
 
 st.set_page_config(page_title="Extra & Deleted Books", page_icon="🗑️", layout="wide")
 
@@ -191,7 +192,8 @@ def reenroll_book(extra_book_id, source_data, target_book_id):
             s.execute(text("DELETE FROM extra_books WHERE id = :id"), {"id": extra_book_id})
             
             s.commit()
-            
+        mark_operations_dirty(target_book_id, book_id)
+
         return True, f"Successfully transferred details to '{target_title}' and moved original to deleted books."
     except Exception as e:
         return False, f"Error reenrolling: {str(e)}"
@@ -255,6 +257,7 @@ def restore_book(book_id, title):
             s.execute(text("DELETE FROM deleted_books WHERE book_id = :book_id"), {"book_id": book_id})
             
             s.commit()
+        mark_operations_dirty(book_id)
         return True, f"✅ Book '{title}' restored successfully."
     except Exception as e:
         return False, f"Error restoring book: {e}"
@@ -1,5 +1,6 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 from sqlalchemy import text
 from datetime import datetime
 from auth import validate_token
@@ -49,8 +50,6 @@ if user_role != 'admin' and not (
     st.error("⚠️ Access Denied: You don't have permission to access this page.")
     st.stop()
 
-st.cache_data.clear()
-
 st.markdown("""
     <style>
             
@@ -265,7 +264,20 @@ st.markdown("""
 ##################################--------------- Helping Functions ----------------------------######################
 #######################################################################################################################
 
-def fetch_papers(conn):
+EMI_COLUMNS = ['emi_1_amount', 'emi_2_amount', 'emi_3_amount']
+
+def payment_labels(df):
+    """Payment badge text for every paper: 'No dues', '₹N Due' or 'Pending'."""
+    amount = pd.to_numeric(df['payment_amount'], errors='coerce')
+    paid = df[EMI_COLUMNS].apply(pd.to_numeric, errors='coerce').sum(axis=1)
+    remaining = amount - paid
+    due = "₹" + remaining.clip(lower=0).fillna(0).astype(int).astype(str) + " Due"
+    labels = np.where(remaining <= 0, "No dues", due)
+    return np.where(amount.notna() & (amount > 0), labels, "Pending")
+
+@st.cache_data(ttl=300, show_spinner=False)
+def fetch_papers(_conn):
+    """All papers with parsed dates and payment labels. Cleared by invalidate_papers()."""
     try:
         query = """
             SELECT 
@@ -290,41 +302,48 @@ def fetch_papers(conn):
             FROM papers p
             ORDER BY p.receiving_date DESC
         """
-        df = conn.query(query, show_spinner=False)
+        df = _conn.query(query, ttl=0, show_spinner=False)
         # Convert receiving_date to datetime
         df['receiving_date'] = pd.to_datetime(df['receiving_date'])
         df['paper_uploading_date'] = pd.to_datetime(df['paper_uploading_date'])
         df['payment_date'] = pd.to_datetime(df['payment_date'])
+        df['payment_label'] = payment_labels(df)
         return df
     except Exception as e:
         st.error(f"Error fetching papers: {e}")
         return pd.DataFrame()
 
-def fetch_author_names(paper_id, conn):
-    """Fetch author names for a paper, formatted with Material Icons."""
-    # Validate conn
-    if not hasattr(conn, 'session'):
-        return "Database error: Invalid connection"
-    
-    try:
-        with conn.session as session:
-            query = text("""
-                SELECT a.name
-                FROM authors a
-                JOIN paper_authors pa ON a.author_id = pa.author_id
-                WHERE pa.paper_id = :paper_id
-                ORDER BY pa.author_position IS NULL, pa.author_position ASC
-            """)
-            results = session.execute(query, {'paper_id': paper_id}).fetchall()
-            author_names = [result.name for result in results]
-            if author_names:
-                return ", ".join(
-                    f"""<span class="material-symbols-rounded" style="vertical-align: middle; font-size:12px;">person</span> {name}"""
-                    for name in author_names
-                )
-            return "No authors"
-    except Exception as e:
-        return f"Database error: {str(e)}"
+@st.cache_data(ttl=300, show_spinner=False)
+def fetch_all_author_names(paper_ids, _conn):
+    """
+    Author names for a page of papers in one query, formatted with Material Icons.
+    Raises on a database error so the failure is not cached; see the caller.
+    """
+    if not paper_ids:
+        return {}
+    with _conn.session as session:
+        query = text("""
+            SELECT pa.paper_id, a.name
+            FROM authors a
+            JOIN paper_authors pa ON a.author_id = pa.author_id
+            WHERE pa.paper_id IN :paper_ids
+            ORDER BY pa.paper_id, pa.author_position IS NULL, pa.author_position ASC
+        """)
+        results = session.execute(query, {'paper_ids': tuple(paper_ids)}).fetchall()
+    names = {}
+    for row in results:
+        names.setdefault(row.paper_id, []).append(row.name)
+    return {
+        paper_id: ", ".join(
+            f"""<span class="material-symbols-rounded" style="vertical-align: middle; font-size:12px;">person</span> {name}"""
+            for name in author_names
+        )
+        for paper_id, author_names in names.items()
+    }
+
+def invalidate_papers():
+    fetch_papers.clear()
+    fetch_all_author_names.clear()
 
 def format_date(date):
     return date.strftime('%Y-%m-%d') if pd.notnull(date) else 'N/A'
@@ -332,44 +351,6 @@ def format_date(date):
 def format_review(review_done):
     return 'Completed' if review_done else 'Pending'
 
-def format_payment(row, emi_data=None):
-    
-    # If row is a single value (e.g., payment_amount), treat it as such
-    if isinstance(row, (int, float)):
-        payment_amount = row
-        # Use emi_data if provided, otherwise assume no EMI payments
-        if emi_data is None:
-            emi_data = {"emi_1_amount": 0, "emi_2_amount": 0, "emi_3_amount": 0}
-    elif isinstance(row, (dict, pd.Series)):
-        # Convert to dict if row is a Series
-        row = row.to_dict() if isinstance(row, pd.Series) else row
-        payment_amount = row.get("payment_amount", 0)
-        emi_data = {
-            "emi_1_amount": row.get("emi_1_amount", 0),
-            "emi_2_amount": row.get("emi_2_amount", 0),
-            "emi_3_amount": row.get("emi_3_amount", 0)
-        }
-    else:
-        return "Invalid row format"
-
-    # Check if payment_amount is valid
-    if pd.notnull(payment_amount) and payment_amount > 0:
-        total_paid = sum(
-            amount for amount in [
-                emi_data.get("emi_1_amount", 0),
-                emi_data.get("emi_2_amount", 0),
-                emi_data.get("emi_3_amount", 0)
-            ] if pd.notnull(amount)
-        )
-        
-        if total_paid >= payment_amount:
-            return "No dues"
-        else:
-            remaining = payment_amount - total_paid
-            return f"₹{int(remaining)} Due"
-    return "Pending"
-
-
 def format_status(status, status_type):
     if status_type == "review":
         badge_class = "badge-completed" if status == "Completed" else "badge-pending"
@@ -479,6 +460,7 @@ def add_paper_dialog(conn):
                         'publishing_type': publishing_type
                     })
                     session.commit()
+                    invalidate_papers()
                 st.success("Paper added successfully!")
                 st.rerun()
             except Exception as e:
@@ -591,6 +573,7 @@ def edit_delete_author_dialog(conn):
                         'author_id': author_id
                     })
                     session.commit()
+                    invalidate_papers()
                 st.success("Author details updated successfully!")
                 st.rerun()
             except Exception as e:
@@ -629,6 +612,7 @@ def edit_delete_author_dialog(conn):
                                     session.execute(query, {'author_id': author_id})
                                     
                                     session.commit()
+                                    invalidate_papers()
                                     st.success("Author deleted successfully!")
                                     st.rerun()
                                 except Exception as e:
@@ -642,6 +626,7 @@ def edit_delete_author_dialog(conn):
                                     query = text("DELETE FROM authors WHERE author_id = :author_id")
                                     session.execute(query, {'author_id': author_id})
                                     session.commit()
+                                    invalidate_papers()
                                     st.success("Author deleted successfully!")
                                     st.rerun()
                                 except Exception as e:
@@ -824,6 +809,7 @@ def payment_dialog(paper_id, conn):
                         'paper_id': paper_id
                     })
                     session.commit()
+                    invalidate_papers()
                 st.success("Payment details updated successfully!")
 
                 # Update session state for EMI visibility
@@ -933,6 +919,7 @@ def edit_paper_dialog(paper_id, conn):
                         'paper_id': paper_id
                     })
                     session.commit()
+                    invalidate_papers()
                 st.success("✅ Paper details updated successfully!")
                 st.rerun()
             except Exception as e:
@@ -966,6 +953,7 @@ def edit_paper_dialog(paper_id, conn):
                                 deleted_papers = result.rowcount
                                 
                                 session.commit()
+                                invalidate_papers()
                             st.success(f"✅ Paper deleted successfully! (Removed {deleted_authors} author associations and {deleted_papers} paper record)")
                             st.session_state.confirm_delete = False
                             st.rerun()
@@ -1112,6 +1100,7 @@ def edit_author_dialog(paper_id, conn):
                                     'author_id': author['author_id']
                                 })
                                 session.commit()
+                                invalidate_papers()
                             st.success(f"Author {author['name']} removed from the paper!", icon="✅")
                             st.rerun()  # Refresh the dialog to reflect changes
                         except Exception as e:
@@ -1174,6 +1163,7 @@ def edit_author_dialog(paper_id, conn):
                                             'author_id': author['author_id']
                                         })
                                         session.commit()
+                                        invalidate_papers()
                                     st.success("Checklist updated!", icon="✅")
                                 except Exception as e:
                                     st.error(f"Error updating checklist: {e}")
@@ -1328,6 +1318,7 @@ def edit_author_dialog(paper_id, conn):
                                 'author_position': author_position
                             })
                             session.commit()
+                            invalidate_papers()
                             st.success("Existing author updated and added to paper!", icon="✅")
                         else:
                             # Create new author
@@ -1355,6 +1346,7 @@ def edit_author_dialog(paper_id, conn):
                                 'author_position': author_position
                             })
                             session.commit()
+                            invalidate_papers()
                             st.success("New author added!", icon="✅")
                         
                         # Reset form
@@ -1447,6 +1439,7 @@ def edit_paper_status_dialog(paper_id, conn):
                             'paper_id': paper_id
                         })
                         session.commit()
+                        invalidate_papers()
                     st.success("Writing details updated successfully!")
                 except Exception as e:
                     st.error(f"Error updating writing details: {e}")
@@ -1489,6 +1482,7 @@ def edit_paper_status_dialog(paper_id, conn):
                         'paper_id': paper_id
                     })
                     session.commit()
+                    invalidate_papers()
                 st.success("Review details updated successfully!")
                 st.rerun()  # Refresh the page to reflect changes
             except Exception as e:
@@ -1517,6 +1511,7 @@ def edit_paper_status_dialog(paper_id, conn):
                         'paper_id': paper_id
                     })
                     session.commit()
+                    invalidate_papers()
                 st.success("Formatting details updated successfully!")
                 st.rerun()  # Refresh the page to reflect changes
             except Exception as e:
@@ -1548,6 +1543,7 @@ def edit_paper_status_dialog(paper_id, conn):
                         'paper_id': paper_id
                     })
                     session.commit()
+                    invalidate_papers()
                 st.success("Publish details updated successfully!")
             except Exception as e:
                 st.error(f"Error updating publish details: {e}")
@@ -2104,10 +2100,15 @@ def render_table(df, page, items_per_page, conn, applied_filters=False):
             with col7:
                 st.markdown('<div class="table-header">Actions</div>', unsafe_allow_html=True)
 
+            # Authors for the whole page in one query; a failure is shown for this run only, not cached
+            paper_ids = tuple(paginated_papers['paper_id'].astype(int).tolist())
+            try:
+                author_names = fetch_all_author_names(paper_ids, conn)
+            except Exception as e:
+                st.error(f"Error fetching author names: {e}")
+                author_names = {paper_id: "Database error" for paper_id in paper_ids}
+
             # Group by month
-            paginated_papers['month_year'] = paginated_papers['receiving_date'].apply(
-                lambda x: x.strftime('%B %Y') if pd.notnull(x) else 'Unknown'
-            )
             grouped_papers = paginated_papers.groupby(pd.Grouper(key='receiving_date', freq='ME'))
             reversed_grouped_papers = reversed(list(grouped_papers))
 
@@ -2131,7 +2132,7 @@ def render_table(df, page, items_per_page, conn, applied_filters=False):
                     first_row = False
 
                     # Get author names
-                    authors_display = fetch_author_names(row['paper_id'], conn)
+                    authors_display = author_names.get(row['paper_id'], "No authors")
 
                     # Get plagiarism and ai_plagiarism values with symbols
                     plagiarism_value = row['plagiarism'] if pd.notnull(row['plagiarism']) else 'N/A'
@@ -2177,7 +2178,7 @@ def render_table(df, page, items_per_page, conn, applied_filters=False):
                     with col5:
                         st.markdown(f'<div class="data-row">{format_status(row["acceptance"], "acceptance")}</div>', unsafe_allow_html=True)
                     with col6:
-                        st.markdown(f'<div class="data-row">{format_status(format_payment(row), "payment")}</div>', unsafe_allow_html=True)
+                        st.markdown(f'<div class="data-row">{format_status(row["payment_label"], "payment")}</div>', unsafe_allow_html=True)
                     with col7:
                         btn_col1, btn_col2, btn_col3, btn_col4 = st.columns([1, 1, 1, 1], vertical_alignment="center", gap="small")
                         with btn_col1:
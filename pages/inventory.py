@@ -5,7 +5,9 @@ import time
 from auth import validate_token
 from sqlalchemy import text
 import plotly.graph_objects as go
-from constants import log_activity, initialize_click_and_session_id, connect_db, check_ready_to_print
+from constants import log_activity, initialize_click_and_session_id, connect_db, check_ready_to_print, fetch_stock_ledger, invalidate_stock_ledger
+from migrations import require_schema
+from operations_sheet import mark_operations_dirty
 
 
 
@@ -38,7 +40,6 @@ if user_role != 'admin' and not (
     st.error("⚠️ Access Denied: You don't have permission to access this page.")
     st.stop()
 
-st.cache_data.clear()
 
 st.markdown("""
     <style>
@@ -108,6 +109,7 @@ st.markdown("""
 
 
 conn = connect_db()
+require_schema("mysql")
 
 # Initialize logged_click_ids if not present
 if "logged_click_ids" not in st.session_state:
@@ -128,44 +130,14 @@ if click_id and click_id not in st.session_state.logged_click_ids:
     except Exception as e:
         st.error(f"Error logging navigation: {str(e)}")
 
-@st.cache_data
 def fetch_data():
-    conn = connect_db()
-    query = """
-    SELECT
-        b.book_id,
-        b.title,
-        b.isbn,
-        b.isbn_receive_date AS publication_date,
-        b.flipkart_link,
-        b.agph_link,
-        b.amazon_link,
-        b.google_link,
-        b.deliver,
-        i.rack_number,
-        COALESCE(
-            (SELECT SUM(ba.number_of_books) 
-             FROM book_authors ba 
-             WHERE ba.book_id = b.book_id), 
-            0
-        ) AS books_sent_to_authors,
-        COALESCE(i.website_sales, 0) AS website_sales,
-        COALESCE(i.amazon_sales, 0) AS amazon_sales,
-        COALESCE(i.flipkart_sales, 0) AS flipkart_sales,
-        COALESCE(i.direct_sales, 0) AS direct_sales,
-        COALESCE(
-            (SELECT SUM(bd.copies_in_batch) 
-             FROM BatchDetails bd 
-             JOIN PrintEditions pe ON bd.print_id = pe.print_id 
-             WHERE pe.book_id = b.book_id), 
-            0
-        ) AS total_printed_books
-    FROM books b
-    LEFT JOIN inventory i ON b.book_id = i.book_id
-    """
-   
-    df = conn.query(query, show_spinner=False)
-    return df
+    # Shared stock ledger, renamed to the columns this page already uses
+    ledger = fetch_stock_ledger(conn)
+    return ledger[[
+        'book_id', 'title', 'isbn', 'publication_date', 'flipkart_link', 'agph_link',
+        'amazon_link', 'google_link', 'deliver', 'rack_number', 'sent_to_authors',
+        'website_sales', 'amazon_sales', 'flipkart_sales', 'direct_sales', 'printed'
+    ]].rename(columns={'sent_to_authors': 'books_sent_to_authors', 'printed': 'total_printed_books'})
 
 st.markdown("""
         <style>
@@ -235,6 +207,7 @@ with col1:
 with col2:
     if st.button(":material/refresh: Refresh", key="refresh", type="tertiary"):
         st.cache_data.clear()
+        invalidate_stock_ledger()
 with col3:
     if st.button(":material/arrow_back: Go Back", key="back_button", type="tertiary", width="stretch"):
         st.switch_page('app.py')
@@ -247,7 +220,7 @@ if "reset_trigger" not in st.session_state:
 # Fetch data
 df = fetch_data()
 
-data_for_chart = fetch_data()
+data_for_chart = df.copy()
 
 
 @st.dialog("Inventory Visualizations", width="large")
@@ -907,6 +880,7 @@ def update_book_details(book_id, current_data):
 
                     # Commit changes
                     session.commit()
+                mark_operations_dirty(book_id)
 
                 # Clear cache and refresh data
                 st.cache_data.clear()
@@ -2,7 +2,9 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 from sqlalchemy import text
-from constants import connect_db, log_activity, initialize_click_and_session_id, clean_url_params
+from migrations import require_schema
+from operations_sheet import mark_operations_dirty
+from constants import connect_db, log_activity, initialize_click_and_session_id, clean_url_params, with_payment_ledger, invalidate_payment_ledger
 from datetime import datetime
 import time
 from auth import validate_token
@@ -145,6 +147,7 @@ st.markdown("""
 
 # Database Connection
 conn = connect_db()
+require_schema("mysql")  # activity_log.action_category and paging indexes
 
 # Check Permissions
 if st.session_state.get("role") != "admin":
@@ -160,9 +163,7 @@ with col2:
 
 # --- Helper Functions ---
 
-def fetch_all_transactions(conn, start_date):
-    query = """
-    SELECT 
+TRANSACTION_COLUMNS = """
         ap.id, 
         ap.amount, 
         ap.payment_date, 
@@ -183,11 +184,78 @@ def fetch_all_transactions(conn, start_date):
     JOIN book_authors ba ON ap.book_author_id = ba.id
     JOIN authors a ON ba.author_id = a.author_id
     JOIN books b ON ba.book_id = b.book_id
-    WHERE b.date >= :start_date
+"""
+
+def transaction_filters(start_date, status=None, consultant=None, mode=None, date_range=None, search=None):
+    """Build the WHERE clause shared by the history page and its count."""
+    clauses = ["b.date >= :start_date"]
+    params = {"start_date": start_date}
+    if status and status != "All":
+        clauses.append("ap.status = :status")
+        params["status"] = status
+    if consultant and consultant != "All":
+        clauses.append("ba.publishing_consultant = :consultant")
+        params["consultant"] = consultant
+    if mode and mode != "All":
+        clauses.append("ap.payment_mode = :mode")
+        params["mode"] = mode
+    if date_range and len(date_range) == 2:
+        clauses.append("ap.payment_date BETWEEN :pay_from AND :pay_to")
+        params["pay_from"], params["pay_to"] = date_range
+    if search:
+        clauses.append("""(ba.book_id LIKE :search OR b.title LIKE :search OR a.name LIKE :search
+                          OR ap.transaction_id LIKE :search OR ap.requested_by LIKE :search)""")
+        params["search"] = f"%{search}%"
+    return " AND ".join(clauses), params
+
+def fetch_transactions_page(conn, filters, cursor=None, page_size=40):
+    """One keyset page of transactions, newest first. cursor = (payment_date, id) of the last row shown."""
+    where, params = filters
+    if cursor:
+        where += " AND (ap.payment_date < :cursor_date OR (ap.payment_date = :cursor_date AND ap.id < :cursor_id))"
+        params = {**params, "cursor_date": cursor[0], "cursor_id": cursor[1]}
+    query = f"""
+    SELECT {TRANSACTION_COLUMNS}
+    WHERE {where}
+    ORDER BY ap.payment_date DESC, ap.id DESC
+    LIMIT {int(page_size)}
+    """
+    return conn.query(query, params=params, ttl=0)
+
+def count_transactions(conn, filters):
+    where, params = filters
+    query = f"""
+    SELECT COUNT(*) as total
+    FROM author_payments ap
+    JOIN book_authors ba ON ap.book_author_id = ba.id
+    JOIN authors a ON ba.author_id = a.author_id
+    JOIN books b ON ba.book_id = b.book_id
+    WHERE {where}
+    """
+    return int(conn.query(query, params=params, ttl=0).iloc[0]['total'])
+
+def fetch_pending_transactions(conn, start_date):
+    query = f"""
+    SELECT {TRANSACTION_COLUMNS}
+    WHERE ap.status = 'Pending' AND b.date >= :start_date
     ORDER BY ap.payment_date DESC, ap.id DESC
     """
     return conn.query(query, params={"start_date": start_date}, ttl=0)
 
+def fetch_book_transactions(conn, book_id):
+    query = f"""
+    SELECT {TRANSACTION_COLUMNS}
+    WHERE ba.book_id = :book_id
+    ORDER BY ap.payment_date DESC, ap.id DESC
+    """
+    return conn.query(query, params={"book_id": book_id}, ttl=0)
+
+@st.cache_data(ttl=600, show_spinner=False)
+def fetch_transaction_filter_options(_conn):
+    consultants = _conn.query("SELECT DISTINCT publishing_consultant FROM book_authors WHERE publishing_consultant IS NOT NULL AND publishing_consultant != '' ORDER BY publishing_consultant", ttl=0, show_spinner=False)
+    modes = _conn.query("SELECT DISTINCT payment_mode FROM author_payments WHERE payment_mode IS NOT NULL AND payment_mode != '' ORDER BY payment_mode", ttl=0, show_spinner=False)
+    return consultants['publishing_consultant'].tolist(), modes['payment_mode'].tolist()
+
 def fetch_payment_overview(conn, start_date):
     query = """
     SELECT 
@@ -199,16 +267,16 @@ def fetch_payment_overview(conn, start_date):
         a.name as author_name,
         ba.total_amount as amount_due,
         ba.publishing_consultant,
-        ba.corresponding_agent,
-        COALESCE((SELECT SUM(amount) FROM author_payments WHERE book_author_id = ba.id AND status = 'Approved'), 0) as amount_paid,
-        COALESCE((SELECT SUM(amount) FROM author_payments WHERE book_author_id = ba.id AND status = 'Pending'), 0) as amount_pending
+        ba.corresponding_agent
     FROM book_authors ba
     JOIN books b ON ba.book_id = b.book_id
     JOIN authors a ON ba.author_id = a.author_id
     WHERE b.date >= :start_date
     ORDER BY b.date DESC
     """
-    return conn.query(query, params={"start_date": start_date}, ttl=0)
+    overview = conn.query(query, params={"start_date": start_date}, ttl=0)
+    # Paid/pending totals come from the shared payment ledger (one GROUP BY)
+    return with_payment_ledger(overview, conn, id_col='book_author_id', columns=('amount_paid', 'amount_pending'))
 
 def fetch_book_authors(book_id, conn):
     query = f"""
@@ -220,13 +288,12 @@ def fetch_book_authors(book_id, conn):
            ba.printing_confirmation, ba.delivery_address, ba.delivery_charge, 
            ba.number_of_books, ba.total_amount, 
            ba.delivery_date, ba.tracking_id, ba.delivery_vendor,
-           ba.remark,
-           COALESCE((SELECT SUM(amount) FROM author_payments WHERE book_author_id = ba.id AND status = 'Approved'), 0) as amount_paid
+           ba.remark
     FROM book_authors ba
     JOIN authors a ON ba.author_id = a.author_id
     WHERE ba.book_id = '{book_id}'
     """
-    return conn.query(query, show_spinner = False)
+    return with_payment_ledger(conn.query(query, show_spinner = False), conn)
 
 def update_book_authors(id, updates, conn):
     set_clause = ", ".join([f"{key} = :{key}" for key in updates.keys()])
@@ -236,6 +303,7 @@ def update_book_authors(id, updates, conn):
     with conn.session as session:
         session.execute(text(query), params)
         session.commit()
+    mark_operations_dirty(author_row_ids=[id])
 
 @st.dialog("Manage Book Payments", width="large")
 def manage_price_dialog(book_id, conn):
@@ -568,6 +636,7 @@ def manage_price_dialog(book_id, conn):
                                     with conn.session as s:
                                         s.execute(text("DELETE FROM author_payments WHERE id = :pid"), {"pid": p['id']})
                                         s.commit()
+                                    invalidate_payment_ledger()
                                     st.rerun()
                     else:
                         st.info("No payment records found.")
@@ -607,6 +676,7 @@ def manage_price_dialog(book_id, conn):
                                         "approved_at": datetime.now() if is_admin else None
                                     })
                                     s.commit()
+                                invalidate_payment_ledger()
                                 st.success("Payment registered!")
                                 st.rerun()
                         except ValueError:
@@ -637,6 +707,7 @@ def update_payment_status(payment_id, new_status, approved_by, conn, rejection_r
                 {"status": new_status, "approved_by": approved_by, "id": payment_id, "rejection_reason": rejection_reason}
             )
             s.commit()
+        invalidate_payment_ledger()
         return True
     except Exception as e:
         st.error(f"Error updating status: {e}")
@@ -646,14 +717,12 @@ def update_payment_status(payment_id, new_status, approved_by, conn, rejection_r
 def show_approval_dialog(row, conn):
     # Fetch Author Summary
     summary_query = """
-    SELECT 
-        total_amount as amount_due,
-        COALESCE((SELECT SUM(amount) FROM author_payments WHERE book_author_id = :ba_id AND status = 'Approved'), 0) as amount_paid,
-        COALESCE((SELECT SUM(amount) FROM author_payments WHERE book_author_id = :ba_id AND status = 'Pending'), 0) as amount_pending
+    SELECT id, total_amount as amount_due
     FROM book_authors
     WHERE id = :ba_id
     """
     summary_df = conn.query(summary_query, params={"ba_id": row['book_author_id']}, ttl=0)
+    summary_df = with_payment_ledger(summary_df, conn, columns=('amount_paid', 'amount_pending'))
     summary = summary_df.iloc[0] if not summary_df.empty else {"amount_due": 0, "amount_paid": 0, "amount_pending": 0}
     
     # Fetch History
@@ -753,7 +822,7 @@ def show_approval_dialog(row, conn):
                         st.rerun()
 
 @st.dialog("Book Payment Details", width="large")
-def show_book_payment_details(book_id, title, price, group, all_transactions, conn):
+def show_book_payment_details(book_id, title, price, group, conn):
     st.markdown(f"### 📖 {book_id} : {title}")
     st.markdown(f"**Book Price:** ₹{price if pd.notna(price) else 'N/A'}")
     
@@ -769,6 +838,7 @@ def show_book_payment_details(book_id, title, price, group, all_transactions, co
         
     book_authors['payment_group'] = book_authors.apply(assign_group, axis=1)
     groups = book_authors.groupby('payment_group')
+    book_txns = fetch_book_transactions(conn, book_id)
 
     for group_id, group_df in groups:
         is_group = not group_id.startswith("INDV_")
@@ -778,9 +848,9 @@ def show_book_payment_details(book_id, title, price, group, all_transactions, co
         total_due = float(group_df['total_amount'].sum() or 0)
         total_paid = float(group_df['amount_paid'].sum() or 0)
         
-        # Calculate pending for this group from all_transactions
+        # Calculate pending for this group from the book's transactions
         ba_ids = group_df['id'].tolist()
-        group_txns = all_transactions[all_transactions['book_author_id'].isin(ba_ids)]
+        group_txns = book_txns[book_txns['book_author_id'].isin(ba_ids)]
         total_pending = float(group_txns[group_txns['status'] == 'Pending']['amount'].sum() or 0)
 
         # Status badge
@@ -865,20 +935,59 @@ if current_filters != st.session_state.prev_filters:
     st.session_state.prev_filters = current_filters
 
 # --- Fetch Data ---
-def fetch_activity_logs(conn):
-    query = """
+def fetch_activity_logs_page(conn, search=None, cursor=None, page_size=50):
+    """
+    One keyset page of payment-related activity, newest first. cursor is
+    (timestamp, rows already shown at that timestamp) so ties are not skipped.
+    """
+    where = "action_category = 'payment'"
+    params = {}
+    if search:
+        where += " AND (username LIKE :search OR action LIKE :search OR details LIKE :search)"
+        params["search"] = f"%{search}%"
+    offset = 0
+    if cursor:
+        where += " AND timestamp <= :cursor_ts"
+        params["cursor_ts"] = cursor[0]
+        offset = int(cursor[1])
+    query = f"""
     SELECT timestamp, username, action, details 
     FROM activity_log 
-    WHERE action LIKE '%payment%' 
-       OR action LIKE '%price%' 
-       OR action LIKE '%approved%' 
-       OR action LIKE '%rejected%'
+    WHERE {where}
     ORDER BY timestamp DESC 
-    LIMIT 1000
+    LIMIT {int(page_size)} OFFSET {offset}
     """
-    return conn.query(query)
+    return conn.query(query, params=params, ttl=0)
+
+def next_log_cursor(page_df, cursor):
+    last_ts = page_df['timestamp'].iloc[-1]
+    ties = int((page_df['timestamp'] == last_ts).sum())
+    if cursor and cursor[0] == last_ts:
+        ties += int(cursor[1])
+    return (last_ts, ties)
+
+def keyset_pager(state_key, has_next, next_cursor, label):
+    """Previous/Next controls over a stack of cursors kept in session state."""
+    cursors = st.session_state[state_key]
+    p_col1, p_col2, p_col3 = st.columns([1, 4, 1], vertical_alignment="center")
+    with p_col1:
+        if st.button("Previous", key=f"prev_{state_key}", disabled=len(cursors) == 1):
+            cursors.pop()
+            st.rerun()
+    with p_col2:
+        st.write(f"<div style='text-align:center;'>Page {len(cursors)} {label}</div>", unsafe_allow_html=True)
+    with p_col3:
+        if st.button("Next", key=f"next_{state_key}", disabled=not has_next):
+            cursors.append(next_cursor)
+            st.rerun()
 
-all_transactions = fetch_all_transactions(conn, start_date_filter)
+def reset_pager_on_change(state_key, filters):
+    # Back to the first page whenever the server-side filters change
+    if st.session_state.get(f"{state_key}_filters") != filters:
+        st.session_state[state_key] = [None]
+        st.session_state[f"{state_key}_filters"] = filters
+
+pending_transactions = fetch_pending_transactions(conn, start_date_filter)
 overview_df = fetch_payment_overview(conn, start_date_filter)
 
 # Define Tabs
@@ -887,7 +996,7 @@ tab_overview, tab_consultant, tab_history, tab_logs = st.tabs(["📊 Payment Ove
 with tab_overview:
     if not overview_df.empty:
         
-        pending_txns = all_transactions[all_transactions['status'] == 'Pending']
+        pending_txns = pending_transactions
 
         # --- Pending Approvals Section ---
         if not pending_txns.empty:
@@ -1029,7 +1138,7 @@ with tab_overview:
                         btn_c1, btn_c2 = st.columns([1,1])
                         with btn_c1:
                             if st.button(":material/visibility:", key=f"view_{book_id}", help="View Details"):
-                                show_book_payment_details(book_id, title, price, group, all_transactions, conn)
+                                show_book_payment_details(book_id, title, price, group, conn)
                         with btn_c2:
                             if st.button(":material/currency_rupee:", key=f"man_{book_id}", help="Manage Price & Payments"):
                                 manage_price_dialog(book_id, conn)
@@ -1259,45 +1368,37 @@ with tab_consultant:
         st.info("No data available for the selected period.")
 
 with tab_history:
-    if not all_transactions.empty:
-        # Search for history tab specifically
+    consultant_options, mode_options = fetch_transaction_filter_options(conn)
+    f_col1, f_col2, f_col3, f_col4, f_col5 = st.columns([3, 1.2, 1.5, 1.2, 2])
+    with f_col1:
         hist_search = st.text_input("🔍 Search Transactions", placeholder="Search by Book ID, Author, Txn ID...", key="hist_search_input")
-        
-        filtered_hist = all_transactions.copy()
-        if hist_search:
-            hs = hist_search.lower()
-            filtered_hist = filtered_hist[
-                filtered_hist['book_id'].astype(str).str.lower().str.contains(hs) |
-                filtered_hist['title'].astype(str).str.lower().str.contains(hs) |
-                filtered_hist['author_name'].astype(str).str.lower().str.contains(hs) |
-                filtered_hist['transaction_id'].astype(str).str.lower().str.contains(hs) |
-                filtered_hist['requested_by'].astype(str).str.lower().str.contains(hs)
-            ]
-
-        # History Pagination Logic
-        items_per_page_hist = 40
-        total_hist = len(filtered_hist)
-        total_pages_hist = max(1, (total_hist + items_per_page_hist - 1) // items_per_page_hist)
-
-        if 'hist_page' not in st.session_state:
-            st.session_state.hist_page = 0
-        
-        # Reset page if search changes
-        if 'prev_hist_search' not in st.session_state:
-            st.session_state.prev_hist_search = ""
-        if hist_search != st.session_state.prev_hist_search:
-            st.session_state.hist_page = 0
-            st.session_state.prev_hist_search = hist_search
-
-        if st.session_state.hist_page >= total_pages_hist:
-            st.session_state.hist_page = total_pages_hist - 1
-        
-        start_idx_h = st.session_state.hist_page * items_per_page_hist
-        end_idx_h = start_idx_h + items_per_page_hist
-        paged_hist = filtered_hist.iloc[start_idx_h:end_idx_h]
+    with f_col2:
+        hist_status = st.selectbox("Status", ["All", "Pending", "Approved", "Rejected"], key="hist_status")
+    with f_col3:
+        hist_consultant = st.selectbox("Consultant", ["All"] + consultant_options, key="hist_consultant")
+    with f_col4:
+        hist_mode = st.selectbox("Mode", ["All"] + mode_options, key="hist_mode")
+    with f_col5:
+        hist_dates = st.date_input("Payment Date", value=(), key="hist_dates")
+
+    # Filters are applied in SQL; only the current page is fetched and rendered
+    items_per_page_hist = 40
+    hist_filters = transaction_filters(start_date_filter, hist_status, hist_consultant, hist_mode,
+                                       hist_dates if len(hist_dates) == 2 else None, hist_search.strip())
+    reset_pager_on_change("hist_cursors", repr(hist_filters))
+    total_hist = count_transactions(conn, hist_filters)
+
+    if total_hist:
+        page_rows = fetch_transactions_page(conn, hist_filters, st.session_state.hist_cursors[-1], items_per_page_hist + 1)
+        if page_rows.empty and len(st.session_state.hist_cursors) > 1:
+            # Rows under the cursor were removed; start over from the newest page
+            st.session_state.hist_cursors = [None]
+            st.rerun()
+        has_next_hist = len(page_rows) > items_per_page_hist
+        paged_hist = page_rows.iloc[:items_per_page_hist]
 
         with st.container(border=True):
-            st.markdown(f"<h5><span class='header-status-badge-orange'>Transaction History <span class='badge-count'>{len(filtered_hist)}</span></span></h5>", 
+            st.markdown(f"<h5><span class='header-status-badge-orange'>Transaction History <span class='badge-count'>{total_hist}</span></span></h5>", 
                         unsafe_allow_html=True)
             
             st.markdown('<div class="header-row">', unsafe_allow_html=True)
@@ -1343,75 +1444,28 @@ with tab_history:
                 st.markdown("<hr style='margin: 5px 0; border: 0.1px solid #f8f9fa;'>", unsafe_allow_html=True)
 
         # Pagination controls for History
-        if total_pages_hist > 1:
+        if has_next_hist or len(st.session_state.hist_cursors) > 1:
             st.divider()
-            h_col1, h_col2, h_col3, h_col4 = st.columns([1, 2, 1, 2], vertical_alignment="center")
-            
-            with h_col1:
-                if st.session_state.hist_page > 0:
-                    if st.button("Previous", key="prev_hist_button"):
-                        st.session_state.hist_page -= 1
-                        st.rerun()
-            
-            with h_col2:
-                st.write(f"Page **{st.session_state.hist_page + 1}** of **{total_pages_hist}** (Total: {total_hist} transactions)")
-            
-            with h_col3:
-                if st.session_state.hist_page < total_pages_hist - 1:
-                    if st.button("Next", key="next_hist_button"):
-                        st.session_state.hist_page += 1
-                        st.rerun()
-            
-            with h_col4:
-                h_page_options = list(range(1, total_pages_hist + 1))
-                h_selected_page = st.selectbox(
-                    "Go to page",
-                    options=h_page_options,
-                    index=st.session_state.hist_page,
-                    key="hist_page_selector",
-                    label_visibility="collapsed"
-                )
-                if h_selected_page != st.session_state.hist_page + 1:
-                        st.session_state.hist_page = h_selected_page - 1
-                        st.rerun()
-                else:
-                    st.info("No transactions found for the selected period.")
+            last = paged_hist.iloc[-1]
+            keyset_pager("hist_cursors", has_next_hist, (last['payment_date'], int(last['id'])),
+                         f"of {(total_hist + items_per_page_hist - 1) // items_per_page_hist} (Total: {total_hist} transactions)")
+    else:
+        st.info("No transactions found for the selected period.")
                 
 with tab_logs:
-    logs_df = fetch_activity_logs(conn)
-    if not logs_df.empty:
-        log_search = st.text_input("🔍 Search Logs", placeholder="Search by user, activity or details...", key="log_search_input")
-        
-        filtered_logs = logs_df.copy()
-        if log_search:
-            ls = log_search.lower()
-            filtered_logs = filtered_logs[
-                filtered_logs['username'].astype(str).str.lower().str.contains(ls) |
-                filtered_logs['action'].astype(str).str.lower().str.contains(ls) |
-                filtered_logs['details'].astype(str).str.lower().str.contains(ls)
-            ]
-
-        # Logs Pagination
-        items_per_page_logs = 50
-        total_logs = len(filtered_logs)
-        total_pages_logs = max(1, (total_logs + items_per_page_logs - 1) // items_per_page_logs)
+    log_search = st.text_input("🔍 Search Logs", placeholder="Search by user, activity or details...", key="log_search_input")
 
-        if 'log_page' not in st.session_state:
-            st.session_state.log_page = 0
-        
-        if log_search != st.session_state.get('prev_log_search', ''):
-            st.session_state.log_page = 0
-            st.session_state.prev_log_search = log_search
+    items_per_page_logs = 50
+    reset_pager_on_change("log_cursors", log_search.strip())
+    log_cursor = st.session_state.log_cursors[-1]
+    page_logs = fetch_activity_logs_page(conn, log_search.strip(), log_cursor, items_per_page_logs + 1)
 
-        if st.session_state.log_page >= total_pages_logs:
-            st.session_state.log_page = total_pages_logs - 1
-        
-        start_idx_l = st.session_state.log_page * items_per_page_logs
-        end_idx_l = start_idx_l + items_per_page_logs
-        paged_logs = filtered_logs.iloc[start_idx_l:end_idx_l]
+    if not page_logs.empty:
+        has_next_logs = len(page_logs) > items_per_page_logs
+        paged_logs = page_logs.iloc[:items_per_page_logs]
 
         with st.container(border=True):
-            st.markdown(f"<h5><span class='header-status-badge-green'>Payment Logs <span class='badge-count'>{len(filtered_logs)}</span></span></h5>", 
+            st.markdown("<h5><span class='header-status-badge-green'>Payment Logs</span></h5>", 
                         unsafe_allow_html=True)
             
             st.markdown('<div class="header-row">', unsafe_allow_html=True)
@@ -1432,19 +1486,9 @@ with tab_logs:
                 with r_cols[3]: 
                     st.write(row['details'])
 
-        if total_pages_logs > 1:
+        if has_next_logs or len(st.session_state.log_cursors) > 1:
             st.divider()
-            l_col1, l_col2, l_col3 = st.columns([1, 4, 1], vertical_alignment="center")
-            with l_col1:
-                if st.button("Previous", key="prev_log_btn", disabled=st.session_state.log_page == 0):
-                    st.session_state.log_page -= 1
-                    st.rerun()
-            with l_col2:
-                st.write(f"<div style='text-align:center;'>Page {st.session_state.log_page + 1} of {total_pages_logs}</div>", unsafe_allow_html=True)
-            with l_col3:
-                if st.button("Next", key="next_log_btn", disabled=st.session_state.log_page == total_pages_logs - 1):
-                    st.session_state.log_page += 1
-                    st.rerun()
+            keyset_pager("log_cursors", has_next_logs, next_log_cursor(paged_logs, log_cursor), "")
     else:
         st.info("No activity logs found.")
                 
\ No newline at end of file
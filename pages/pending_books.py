@@ -2,6 +2,7 @@ import streamlit as st
 import pandas as pd
 from datetime import datetime, date, timedelta
 import plotly.express as px
+import numpy as np
 import io
 from auth import validate_token
 from constants import log_activity, initialize_click_and_session_id, connect_db, show_book_details, fetch_all_printeditions, fetch_all_book_authors
@@ -399,72 +400,89 @@ if click_id and click_id != "None" and click_id not in st.session_state.logged_c
         st.error(f"Error logging navigation: {str(e)}")
 
 
-# Function to determine stuck reason
-def get_stuck_reason(book_id, book_row, authors_df, printeditions_df):
-    book_authors_df = authors_df[authors_df['book_id'] == book_id]
-    book_printeditions_df = printeditions_df[printeditions_df['book_id'] == book_id]
-
-    # Define the checklist sequence
-    checklist_sequence = [
-        ("welcome_mail_sent", "Welcome Mail Pending"),
-        ("author_details_sent", "Waiting for Author Details"),
-        ("photo_recive", "Waiting for Photo"),
-        ("apply_isbn_not_applied", "ISBN Not Applied"),
-        ("isbn_not_received", "ISBN Not Received"),
-        ("cover_agreement_sent", "Cover/Agreement Pending"),
-        ("writing", "Writing Pending", "writing_start", "writing_end"),
-        ("proofreading", "Proofreading Pending", "proofreading_start", "proofreading_end"),
-        ("formatting", "Formatting Pending", "formatting_start", "formatting_end"),
-        ("cover", "Cover Design Pending", "cover_start", "cover_end"),
-        ("digital_book_sent", "Waiting for Digital Proof"),
-        ("id_proof_recive", "Waiting for ID Proof"),
-        ("agreement_received", "Waiting for Agreement"),
-        ("printing_confirmation", "Waiting for Print Confirmation")
-    ]
+# Publishing checklist in the order stuck reasons are evaluated.
+# (field, label) for author flags and ISBN checks, (field, label, start, end) for operations.
+STUCK_REASON_STEPS = [
+    ("welcome_mail_sent", "Welcome Mail Pending"),
+    ("author_details_sent", "Waiting for Author Details"),
+    ("photo_recive", "Waiting for Photo"),
+    ("apply_isbn_not_applied", "ISBN Not Applied"),
+    ("isbn_not_received", "ISBN Not Received"),
+    ("cover_agreement_sent", "Cover/Agreement Pending"),
+    ("writing", "Writing Pending", "writing_start", "writing_end"),
+    ("proofreading", "Proofreading Pending", "proofreading_start", "proofreading_end"),
+    ("formatting", "Formatting Pending", "formatting_start", "formatting_end"),
+    ("cover", "Cover Design Pending", "cover_start", "cover_end"),
+    ("digital_book_sent", "Waiting for Digital Proof"),
+    ("id_proof_recive", "Waiting for ID Proof"),
+    ("agreement_received", "Waiting for Agreement"),
+    ("printing_confirmation", "Waiting for Print Confirmation")
+]
+ISBN_STEPS = ["apply_isbn_not_applied", "isbn_not_received"]
+AUTHOR_FLAG_STEPS = [step[0] for step in STUCK_REASON_STEPS if len(step) == 2 and step[0] not in ISBN_STEPS]
+
+# Reason codes: checklist steps keep their position, then the after-work states
+STUCK_REASONS = [step[1] for step in STUCK_REASON_STEPS] + ["Waiting for Print", "In Printing", "Not Dispatched Yet", "Not Started"]
+PRINT_STATUS_REASONS = {"In Printing": "In Printing", "Received": "Not Dispatched Yet"}
+
+
+def classify_stuck_reasons(books_df, authors_df, printeditions_df):
+    """
+    First blocking step for every book in one pass.
 
-    # Exclude "writing" step if is_publish_only or is_thesis_to_book is 1
-    is_publish_only = book_row.get('is_publish_only', 0) == 1
-    is_thesis_to_book = book_row.get('is_thesis_to_book', 0) == 1
-    if is_publish_only or is_thesis_to_book:
-        checklist_sequence = [item for item in checklist_sequence if item[0] != "writing"]
-
-    # Check print editions status
-    if not book_printeditions_df.empty:
-        latest_print = book_printeditions_df.sort_values(by='print_id', ascending=False).iloc[0]
-        if latest_print['status'] == "In Printing":
-            return "In Printing"
-        elif latest_print['status'] == "Received":
-            return "Not Dispatched Yet"
-
-    # Check author checklist and operations
-    if not book_authors_df.empty:
-        for field, label, *date_fields in checklist_sequence:
-            if len(date_fields) == 2:  # Operations with start/end dates
-                start_field, end_field = date_fields
-                if book_row[start_field] is not None and pd.notnull(book_row[start_field]):
-                    if book_row[end_field] is None or pd.isnull(book_row[end_field]):
-                        return label
-                else:
-                    return label
-            else:  # Checklist items
-                if field == "apply_isbn_not_applied":
-                    if book_row.get('apply_isbn', 0) == 0:
-                        return label
-                elif field == "isbn_not_received":
-                    if book_row.get('apply_isbn', 0) == 1 and (book_row.get('isbn') is None or pd.isnull(book_row.get('isbn'))):
-                        return label
-                else:
-                    if not book_authors_df[field].all():
-                        return label
-
-    # Check if ready for print
-    if (not book_authors_df.empty and 
-        all(book_authors_df[field].all() for field, _, *date_fields in checklist_sequence if len(date_fields) == 0 and field not in ["apply_isbn_not_applied", "isbn_not_received"]) and
-        all(book_row[end_field] is not None and pd.notnull(book_row[end_field]) 
-            for _, _, *date_fields in checklist_sequence if len(date_fields) == 2)):
-        return "Waiting for Print"
-
-    return "Not Started"
+    Author flags are reduced per book with a groupby-min (a step is done only
+    when every author has it), each step becomes a column of a blocked matrix
+    in checklist order, and argmax picks the first blocked step. Returns a
+    frame aligned to books_df.index with stuck_code (index into STUCK_REASONS)
+    and stuck_reason.
+    """
+    if books_df.empty:
+        return pd.DataFrame({'stuck_code': pd.Series(dtype=int), 'stuck_reason': pd.Series(dtype=object)})
+
+    book_ids = books_df['book_id'].to_numpy()
+    has_authors = np.isin(book_ids, authors_df['book_id'].to_numpy())
+
+    # Missing flag values don't block a step (same as Series.all())
+    flags = authors_df[['book_id'] + AUTHOR_FLAG_STEPS].copy()
+    for field in AUTHOR_FLAG_STEPS:
+        values = flags[field].to_numpy(dtype=object)
+        flags[field] = pd.isna(values) | values.astype(bool)
+    all_done = flags.groupby('book_id')[AUTHOR_FLAG_STEPS].min().reindex(book_ids, fill_value=True)
+
+    skip_writing = books_df['is_publish_only'].eq(1) | books_df['is_thesis_to_book'].eq(1)
+
+    blocked = []
+    for field, label, *date_fields in STUCK_REASON_STEPS:
+        if date_fields:
+            start_field, end_field = date_fields
+            step_blocked = books_df[start_field].isna() | books_df[end_field].isna()
+            if field == "writing":
+                step_blocked &= ~skip_writing
+            blocked.append(step_blocked.to_numpy())
+        elif field == "apply_isbn_not_applied":
+            blocked.append(books_df['apply_isbn'].eq(0).to_numpy())
+        elif field == "isbn_not_received":
+            blocked.append((books_df['apply_isbn'].eq(1) & books_df['isbn'].isna()).to_numpy())
+        else:
+            blocked.append(~all_done[field].to_numpy())
+    blocked = np.column_stack(blocked)
+
+    codes = np.where(blocked.any(axis=1), blocked.argmax(axis=1), STUCK_REASONS.index("Waiting for Print"))
+    codes = np.where(has_authors, codes, STUCK_REASONS.index("Not Started"))
+
+    # The latest print edition overrides the checklist
+    if not printeditions_df.empty:
+        latest_status = (printeditions_df.sort_values('print_id')
+                         .drop_duplicates('book_id', keep='last')
+                         .set_index('book_id')['status'])
+        print_reason = pd.Series(book_ids).map(latest_status).map(PRINT_STATUS_REASONS)
+        reason_codes = {reason: code for code, reason in enumerate(STUCK_REASONS)}
+        codes = np.where(print_reason.notna(), print_reason.map(reason_codes).fillna(0).astype(int), codes)
+
+    return pd.DataFrame({
+        'stuck_code': codes,
+        'stuck_reason': np.array(STUCK_REASONS, dtype=object)[codes],
+    }, index=books_df.index)
 
 @st.dialog("Publishing Process Flow", width="medium")
 def show_stuck_reason_sequence(is_publish_only=False):
@@ -623,44 +641,31 @@ def show_stuck_reason_sequence(is_publish_only=False):
 #@st.dialog("Book Stuck Reason Summary", width="large")
 def show_stuck_reason_summary(books_df, authors_df, printeditions_df, key_suffix=""):
 
-    # Prepare data for table and export
-    today = date.today()
-    export_data = []
-    stuck_data = []
-    for _, book_row in books_df.iterrows():
-        book_id = book_row['book_id']
-        reason = get_stuck_reason(book_id, book_row, authors_df, printeditions_df)
-        
-        # Get author count and consultants
-        book_authors = authors_df[authors_df['book_id'] == book_id]
-        author_count = len(book_authors)
-        consultants = ", ".join(book_authors['publishing_consultant'].dropna().unique()) if not book_authors.empty else "N/A"
-        
-        # Calculate days since enrolled
-        enrolled_date = book_row['date'] if pd.notnull(book_row['date']) else None
-        days_stuck = (today - enrolled_date).days if enrolled_date else 0
-        
-        # Data for table
-        stuck_data.append({
-            'book_id': book_id,
-            'reason': reason,
-            'author_count': author_count,
-            'days_stuck': days_stuck
-        })
-        
-        # Data for export
-        export_data.append({
-            'Book ID': book_id,
-            'Title': book_row['title'],
-            'Date': enrolled_date,
-            'Since Enrolled': days_stuck,
-            'Stuck Reason': reason,
-            'Number of Authors': author_count,
-            'Publishing Consultants': consultants
-        })
+    # Prepare data for table and export from the precomputed reason columns
+    today = pd.Timestamp(date.today())
+    enrolled = pd.to_datetime(books_df['date'], errors='coerce')
+    days_stuck = (today - enrolled).dt.days.fillna(0).astype(int)
+    consultants = (authors_df.dropna(subset=['publishing_consultant'])
+                   .drop_duplicates(['book_id', 'publishing_consultant'])
+                   .groupby('book_id')['publishing_consultant'].agg(", ".join))
+
+    stuck_df = pd.DataFrame({
+        'book_id': books_df['book_id'],
+        'reason': books_df['stuck_reason'],
+        'author_count': books_df['author_count'],
+        'days_stuck': days_stuck
+    })
+    export_df = pd.DataFrame({
+        'Book ID': books_df['book_id'],
+        'Title': books_df['title'],
+        'Date': books_df['date'].where(books_df['date'].notna(), None),
+        'Since Enrolled': days_stuck,
+        'Stuck Reason': books_df['stuck_reason'],
+        'Number of Authors': books_df['author_count'],
+        'Publishing Consultants': books_df['book_id'].map(consultants).fillna("N/A")
+    })
 
     # Aggregate data for table
-    stuck_df = pd.DataFrame(stuck_data)
     reason_summary = stuck_df.groupby('reason').agg({
         'book_id': 'count',
         'author_count': 'sum',
@@ -669,9 +674,6 @@ def show_stuck_reason_summary(books_df, authors_df, printeditions_df, key_suffix
     reason_summary.columns = ['Reason For Hold', 'Book Count', 'Total Authors', 'Avg Days Stuck']
     reason_summary['Avg Days Stuck'] = reason_summary['Avg Days Stuck'].round(1)
 
-    # Prepare export DataFrame
-    export_df = pd.DataFrame(export_data)
-
     # Create two columns for table and pie chart
     col_table, col_chart = st.columns([1, 1])
 
@@ -763,15 +765,20 @@ WHERE deliver = 0 AND is_cancelled = 0
 """
 books_data = conn.query(query, show_spinner=False)
 
-# Split into pending and archived
-pending_data = books_data[books_data['is_archived'] == 0]
-archived_data = books_data[books_data['is_archived'] == 1]
-
 # Fetch author and print edition data for initial book_ids
 book_ids = books_data['book_id'].tolist()
 authors_data = fetch_all_book_authors(book_ids, conn)
 printeditions_data = fetch_all_printeditions(book_ids, conn)
 
+# Stuck reason and author count for every book, computed once and reused by
+# the reason filter, sorting, summary, export and the book rows
+books_data = books_data.join(classify_stuck_reasons(books_data, authors_data, printeditions_data))
+books_data['author_count'] = books_data['book_id'].map(authors_data.groupby('book_id').size()).fillna(0).astype(int)
+
+# Split into pending and archived
+pending_data = books_data[books_data['is_archived'] == 0]
+archived_data = books_data[books_data['is_archived'] == 1]
+
 # Get all possible publishers
 all_publishers = books_data['publisher'].unique().tolist()
 
@@ -862,30 +869,12 @@ if st.session_state.selected_publishers:
 
 # Apply Stuck Reason Filter to both datasets
 if st.session_state.selected_reasons:
-    if not filtered_pending_data.empty:
-        book_ids = filtered_pending_data['book_id'].tolist()
-        authors_data_filtered = authors_data[authors_data['book_id'].isin(book_ids)]
-        printeditions_data_filtered = printeditions_data[printeditions_data['book_id'].isin(book_ids)]
-        filtered_pending_data['stuck_reason'] = filtered_pending_data['book_id'].apply(
-            lambda x: get_stuck_reason(x, filtered_pending_data[filtered_pending_data['book_id'] == x].iloc[0], authors_data_filtered, printeditions_data_filtered)
-        )
-        filtered_pending_data = filtered_pending_data[filtered_pending_data['stuck_reason'].isin(st.session_state.selected_reasons)]
-    
-    if not filtered_archived_data.empty:
-        book_ids = filtered_archived_data['book_id'].tolist()
-        authors_data_filtered = authors_data[authors_data['book_id'].isin(book_ids)]
-        printeditions_data_filtered = printeditions_data[printeditions_data['book_id'].isin(book_ids)]
-        filtered_archived_data['stuck_reason'] = filtered_archived_data['book_id'].apply(
-            lambda x: get_stuck_reason(x, filtered_archived_data[filtered_archived_data['book_id'] == x].iloc[0], authors_data_filtered, printeditions_data_filtered)
-        )
-        filtered_archived_data = filtered_archived_data[filtered_archived_data['stuck_reason'].isin(st.session_state.selected_reasons)]
+    filtered_pending_data = filtered_pending_data[filtered_pending_data['stuck_reason'].isin(st.session_state.selected_reasons)]
+    filtered_archived_data = filtered_archived_data[filtered_archived_data['stuck_reason'].isin(st.session_state.selected_reasons)]
 
 # Apply Sorting to both datasets
 def apply_sorting(data):
     if not data.empty:
-        book_ids = data['book_id'].tolist()
-        authors_data_filtered = authors_data[authors_data['book_id'].isin(book_ids)]
-        printeditions_data_filtered = printeditions_data[printeditions_data['book_id'].isin(book_ids)]
         if st.session_state.sort_by == "Book ID":
             data = data.sort_values(by='book_id', ascending=(st.session_state.sort_order == "Ascending"))
         elif st.session_state.sort_by == "Date":
@@ -894,9 +883,6 @@ def apply_sorting(data):
             data['days_since'] = data['date'].apply(lambda x: (date.today() - x).days if pd.notnull(x) else float('inf'))
             data = data.sort_values(by='days_since', ascending=(st.session_state.sort_order == "Ascending"))
         elif st.session_state.sort_by == "Stuck Reason":
-            data['stuck_reason'] = data['book_id'].apply(
-                lambda x: get_stuck_reason(x, data[data['book_id'] == x].iloc[0], authors_data_filtered, printeditions_data_filtered)
-            )
             data = data.sort_values(by='stuck_reason', ascending=(st.session_state.sort_order == "Ascending"))
     return data
 
@@ -1004,8 +990,8 @@ with tab1:
 
                 for _, book in filtered_pending_data.iterrows():
                     book_id = book['book_id']
-                    stuck_reason = get_stuck_reason(book_id, book, authors_data, printeditions_data)
-                    author_count = len(authors_data[authors_data['book_id'] == book_id])
+                    stuck_reason = book['stuck_reason']
+                    author_count = book['author_count']
                     
                     # Determine days badge class
                     days_since = (date.today() - book["date"]).days if pd.notnull(book["date"]) else None
@@ -1071,8 +1057,8 @@ with tab2:
 
                 for _, book in filtered_archived_data.iterrows():
                     book_id = book['book_id']
-                    stuck_reason = get_stuck_reason(book_id, book, authors_data, printeditions_data)
-                    author_count = len(authors_data[authors_data['book_id'] == book_id])
+                    stuck_reason = book['stuck_reason']
+                    author_count = book['author_count']
                     
                     # Determine days badge class
                     days_since = (date.today() - book["date"]).days if pd.notnull(book["date"]) else None
@@ -3,8 +3,12 @@ import pandas as pd
 from datetime import datetime
 from sqlalchemy import text
 from io import BytesIO
+from functools import partial
 from auth import validate_token
-from constants import log_activity, initialize_click_and_session_id, connect_db, get_ready_to_print_books, get_reprint_eligible_books
+from constants import log_activity, initialize_click_and_session_id, connect_db, get_ready_to_print_books, get_reprint_eligible_books, invalidate_stock_ledger
+from operations_sheet import mark_operations_dirty
+from delivery_books import refresh_latest_batch, mark_delivery_dirty
+from migrations import require_schema
 
 
 logo = "logo/logo_black.png"
@@ -160,6 +164,7 @@ def format_int(val):
         return "-"
 
 conn = connect_db()
+require_schema("mysql")
 
 # Initialize logged_click_ids if not present
 if "logged_click_ids" not in st.session_state:
@@ -202,10 +207,14 @@ def get_running_batches(conn):
     df = conn.query(query, ttl=0)  # Disable caching
     return df
 
-# Fetch books in a specific batch
-def get_batch_books(conn, batch_id):
+# Fetch books for one or more batches in a single query
+def get_batches_books(conn, batch_ids):
+    if not batch_ids:
+        return pd.DataFrame(columns=['batch_id', 'book_id', 'title', 'copies_in_batch', 'book_size', 'binding',
+                                     'print_color', 'print_cost', 'edition_number', 'page_number', 'page_type', 'cover_type'])
     query = """
     SELECT 
+        bd.batch_id,
         b.book_id,
         b.title,
         bd.copies_in_batch,
@@ -224,12 +233,32 @@ def get_batch_books(conn, batch_id):
     JOIN 
         books b ON pe.book_id = b.book_id
     WHERE 
-        bd.batch_id = :batch_id
+        bd.batch_id IN :batch_ids
     ORDER BY 
-        b.book_id;
+        bd.batch_id, b.book_id;
     """
-    df = conn.query(query, ttl=0, params={"batch_id": batch_id})
-    return df
+    return conn.query(query, ttl=0, params={"batch_ids": tuple(int(i) for i in batch_ids)})
+
+# Fetch books in a specific batch
+def get_batch_books(conn, batch_id):
+    return get_batches_books(conn, [batch_id]).drop(columns='batch_id')
+
+def batch_excel_bytes(batch_books):
+    # Passed to download_button as a callable, so the workbook is only built when Export is clicked
+    excel_data = pd.DataFrame({
+        'S.no.': range(1, len(batch_books) + 1),
+        'Book Title': batch_books['title'].values,
+        'Number of Book Copies': batch_books['copies_in_batch'].apply(lambda x: int(float(x)) if pd.notnull(x) else None).values,
+        'Number of Pages': batch_books['page_number'].apply(lambda x: int(float(x)) if pd.notnull(x) else None).values,
+        'Book Size': batch_books['book_size'].values,
+        'Book Pages': batch_books['page_type'].values,
+        'Cover Page': batch_books['cover_type'].values,
+        'Binding': batch_books['binding'].values,
+    })
+    output = BytesIO()
+    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
+        excel_data.to_excel(writer, index=False, sheet_name='Batch Books')
+    return output.getvalue()
 
 # Create a new batch and assign books
 def create_batch(conn, batch_name, printer_name, print_sent_date, selected_books):
@@ -253,27 +282,21 @@ def create_batch(conn, batch_name, printer_name, print_sent_date, selected_books
         )
         batch_id = result.lastrowid
         
-        # Collect print_ids and handle first print books
-        first_print_ids = []
-        print_ids = []
-        for book in selected_books:
-            print_id = book['print_id']  # Use the existing print_id
-            print_ids.append(print_id)  # Collect print_id for status update
-            session.execute(
-                text("""
-                    INSERT INTO BatchDetails 
-                        (batch_id, print_id, copies_in_batch)
-                    VALUES 
-                        (:batch_id, :print_id, :copies_in_batch)
-                """),
-                {
-                    "batch_id": batch_id,
-                    "print_id": print_id,
-                    "copies_in_batch": book['num_copies']
-                }
-            )
-            if book['print_type'] == 'First Print':
-                first_print_ids.append(book['book_id'])
+        # All batch lines in one executemany
+        print_ids = [book['print_id'] for book in selected_books]
+        first_print_ids = [book['book_id'] for book in selected_books if book['print_type'] == 'First Print']
+        session.execute(
+            text("""
+                INSERT INTO BatchDetails 
+                    (batch_id, print_id, copies_in_batch)
+                VALUES 
+                    (:batch_id, :print_id, :copies_in_batch)
+            """),
+            [
+                {"batch_id": batch_id, "print_id": book['print_id'], "copies_in_batch": book['num_copies']}
+                for book in selected_books
+            ]
+        )
         
         # Update first-print books to mark as printed
         if first_print_ids:
@@ -290,6 +313,8 @@ def create_batch(conn, batch_name, printer_name, print_sent_date, selected_books
             )
         
         session.commit()
+    mark_operations_dirty(*first_print_ids)
+    invalidate_stock_ledger()
     return batch_id
 
 # Update batch receive date
@@ -324,7 +349,14 @@ def update_batch_receive_date(conn, batch_id, receive_date):
             {"batch_id": batch_id}
         )
 
+        book_ids = refresh_latest_batch(session, batch_id)
         session.commit()
+    invalidate_stock_ledger()
+    mark_delivery_dirty(*book_ids)
+
+def or_default(series, default):
+    """Replace empty values (None, NaN, 0, '') with default."""
+    return series.where(series.notna() & series.astype(bool), default)
 
 @st.dialog("Create New Batch", width="medium")
 def create_batch_dialog():
@@ -340,35 +372,19 @@ def create_batch_dialog():
     reprint_books = get_reprint_eligible_books(conn)
     
     # Combine first prints and reprints for multiselect
-    all_books = []
-    for _, book in first_print_books.iterrows():
-        all_books.append({
-            'book_id': book['book_id'],
-            'title': book['title'],
-            'num_copies': book['num_copies'],
-            'book_size': book['book_size'],
-            'binding': book['binding'],
-            'print_color': 'Black & White',  # Default for first prints
-            'print_type': book['print_type'],
-            'page_number': book['page_number'],
-            'page_type': book['page_type'],
-            'cover_type': book['cover_type'],
-            'print_id': book['print_id']  # Include print_id
-        })
-    for _, book in reprint_books.iterrows():
-        all_books.append({
-            'book_id': book['book_id'],
-            'title': book['title'],
-            'num_copies': book['copies_planned'] if book['copies_planned'] else 7,
-            'book_size': book['book_size'] if book['book_size'] else '6x9',
-            'binding': book['binding'] if book['binding'] else 'Paperback',
-            'print_color': book['print_color'] if book['print_color'] else 'Black & White',
-            'print_type': book['print_type'],
-            'page_number': book['page_number'],
-            'page_type': book['page_type'],
-            'cover_type': book['cover_type'],
-            'print_id': book['print_id']  # Include print_id
-        })
+    option_columns = ['book_id', 'title', 'num_copies', 'book_size', 'binding', 'print_color',
+                      'print_type', 'page_number', 'page_type', 'cover_type', 'print_id']
+    first_prints = first_print_books.assign(print_color='Black & White')  # Default for first prints
+    reprints = reprint_books.assign(
+        num_copies=or_default(reprint_books['copies_planned'], 7),
+        book_size=or_default(reprint_books['book_size'], '6x9'),
+        binding=or_default(reprint_books['binding'], 'Paperback'),
+        print_color=or_default(reprint_books['print_color'], 'Black & White'),
+    )
+    all_books = pd.concat(
+        [first_prints.reindex(columns=option_columns), reprints.reindex(columns=option_columns)],
+        ignore_index=True
+    ).to_dict('records')
     
     # Multiselect with all books pre-selected
     book_options = [f"{book['title']} ({book['print_type']})" for book in all_books]
@@ -590,11 +606,13 @@ def print_management_page():
                 if st.button(":material/edit: Edit Batch", type="secondary"):
                     edit_batch_dialog(running_batches)
             if not running_batches.empty:
+                running_books = get_batches_books(conn, running_batches['batch_id'].tolist())
+                books_by_batch = {batch_id: books for batch_id, books in running_books.groupby('batch_id')}
                 with st.expander('View Running Batches', expanded=True):
                     for _, batch in running_batches.iterrows():
                         with st.container(border=False):
                             # Batch details in a clean layout
-                            batch_books = get_batch_books(conn, batch['batch_id'])
+                            batch_books = books_by_batch.get(batch['batch_id'], running_books.iloc[0:0])
                             st.markdown(f'<div class="status-badge-non">{batch["batch_name"]} (ID: {batch["batch_id"]})</div>', unsafe_allow_html=True)
                             details_cols = st.columns([2, 2, 2, 2, 2, 0.8])
                             details_cols[0].write(f" **Created:** {batch['created_at'].strftime('%Y-%m-%d')}")
@@ -605,27 +623,9 @@ def print_management_page():
                             
                             # Add Excel download button
                             if not batch_books.empty:
-                                # Prepare Excel file
-                                excel_data = pd.DataFrame({
-                                    'S.no.': range(1, len(batch_books) + 1),
-                                    'Book Title': batch_books['title'],
-                                    'Number of Book Copies': batch_books['copies_in_batch'].apply(lambda x: int(float(x)) if pd.notnull(x) else None),
-                                    'Number of Pages': batch_books['page_number'].apply(lambda x: int(float(x)) if pd.notnull(x) else None),
-                                    'Book Size': batch_books['book_size'],
-                                    'Book Pages': batch_books['page_type'],
-                                    'Cover Page': batch_books['cover_type'],
-                                    'Binding': batch_books['binding'],
-                                })
-                                
-                                # Convert to Excel
-                                output = BytesIO()
-                                with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-                                    excel_data.to_excel(writer, index=False, sheet_name='Batch Books')
-                                excel_bytes = output.getvalue()
-                                
                                 details_cols[5].download_button(
                                     label=" :material/download: Export",
-                                    data=excel_bytes,
+                                    data=partial(batch_excel_bytes, batch_books),
                                     file_name=f"batch_{batch['batch_id']}_books.xlsx",
                                     mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
                                     key=f"download_excel_{batch['batch_id']}",
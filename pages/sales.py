@@ -1,5 +1,5 @@
 import streamlit as st
-from constants import log_activity , get_total_unread_count, connect_ict_db, connect_db, get_page_url, show_book_details, fetch_all_printeditions, fetch_all_book_authors
+from constants import log_activity , get_total_unread_count, connect_ict_db, connect_db, get_page_url, show_book_details, fetch_all_printeditions, fetch_all_book_authors, with_payment_ledger, invalidate_payment_ledger
 import re
 import uuid
 import pandas as pd
@@ -8,6 +8,7 @@ from urllib.parse import urlencode, quote
 from urllib.parse import urlencode
 from sqlalchemy import text
 from auth import validate_token
+from operations_sheet import mark_operations_dirty
 from datetime import datetime
 
 
@@ -308,13 +309,12 @@ def fetch_book_authors(book_id, conn):
            ba.printing_confirmation, ba.delivery_address, ba.delivery_charge, 
            ba.number_of_books, ba.total_amount, 
            ba.delivery_date, ba.tracking_id, ba.delivery_vendor,
-           ba.remark,
-           COALESCE((SELECT SUM(amount) FROM author_payments WHERE book_author_id = ba.id AND status = 'Approved'), 0) as amount_paid
+           ba.remark
     FROM book_authors ba
     JOIN authors a ON ba.author_id = a.author_id
     WHERE ba.book_id = '{book_id}'
     """
-    return conn.query(query, show_spinner = False)
+    return with_payment_ledger(conn.query(query, show_spinner = False), conn)
 
 def get_author_badge(author_type, author_count):
     """Generate author type badge with distinct styles."""
@@ -917,6 +917,7 @@ def manage_price_dialog(book_id, conn):
                                     with conn.session as s:
                                         s.execute(text("DELETE FROM author_payments WHERE id = :pid"), {"pid": p['id']})
                                         s.commit()
+                                    invalidate_payment_ledger()
                                     st.rerun()
                     else:
                         st.info("No payment records found.")
@@ -956,6 +957,7 @@ def manage_price_dialog(book_id, conn):
                                         "approved_at": datetime.now() if is_admin else None
                                     })
                                     s.commit()
+                                invalidate_payment_ledger()
                                 st.success("Payment registered!")
                                 st.rerun()
                         except ValueError:
@@ -978,6 +980,7 @@ def update_book_authors(id, updates, conn):
     with conn.session as session:
         session.execute(text(query), params)
         session.commit()
+    mark_operations_dirty(author_row_ids=[id])
 
 def get_isbn_display(book_id, isbn, apply_isbn):
     if has_open_author_position(conn, book_id):
@@ -3,7 +3,8 @@ import pandas as pd
 import time
 from datetime import datetime, date
 from sqlalchemy import text
-from constants import log_activity, initialize_click_and_session_id, connect_db
+from constants import log_activity, initialize_click_and_session_id, connect_db, invalidate_stock_ledger
+from migrations import require_schema
 import uuid
 from auth import validate_token
 
@@ -70,52 +71,8 @@ st.markdown("""
             """, unsafe_allow_html=True)
 
 
-# Initialize Table
-def init_db():
-    try:
-        with conn.session as s:
-            s.execute(text("""
-                CREATE TABLE IF NOT EXISTS sales_orders (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    book_id VARCHAR(255),
-                    source ENUM('Amazon', 'Flipkart', 'Website', 'Direct'),
-                    quantity INT,
-                    order_date DATE,
-                    order_id VARCHAR(255),
-                    customer_details TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                );
-            """))
-            s.commit()
-            
-            # Check and add new columns if they don't exist
-            columns_to_add = [
-                ("order_status", "VARCHAR(50) DEFAULT 'New Order'"),
-                ("status_date", "DATE"),
-                ("customer_name", "VARCHAR(255)"),
-                ("customer_phone", "VARCHAR(50)"),
-                ("shipping_address", "TEXT"),
-                ("corresponding_person", "VARCHAR(255)"),
-                ("organization", "VARCHAR(255)"),
-                ("city", "VARCHAR(100)"),
-                ("discounted_price", "DECIMAL(10,2)")
-            ]
-            
-            for col_name, col_def in columns_to_add:
-                try:
-                    # Check if column exists
-                    check_query = text(f"SHOW COLUMNS FROM sales_orders LIKE '{col_name}'")
-                    result = s.execute(check_query).fetchone()
-                    if not result:
-                        s.execute(text(f"ALTER TABLE sales_orders ADD COLUMN {col_name} {col_def}"))
-                        s.commit()
-                except Exception as e:
-                    st.warning(f"Could not check/add column {col_name}: {e}")
-
-    except Exception as e:
-        st.error(f"Error initializing database: {e}")
-
-init_db()
+# sales_orders schema is managed by migrations.py
+require_schema("mysql")
 
 st.markdown("""
     <style>
@@ -311,7 +268,8 @@ def add_order_dialog():
                             )
 
                     s.commit()
-                
+                invalidate_stock_ledger()
+
                 # Extract book title from label "Title (ID: ...)"
                 book_title = selected_book_label.split(" (ID:")[0] if selected_book_label else "Unknown Book"
                 
@@ -526,7 +484,8 @@ def edit_order_dialog(order_data):
                         )
 
                 s.commit()
-            
+            invalidate_stock_ledger()
+
             log_activity(
                 conn,
                 st.session_state.user_id,
@@ -570,7 +529,8 @@ def delete_order_dialog(order_data):
                         {"qty": order_data['quantity'], "book_id": order_data['book_id']}
                     )
                 s.commit()
-            
+            invalidate_stock_ledger()
+
             log_activity(
                 conn,
                 st.session_state.user_id,
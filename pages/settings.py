@@ -3,24 +3,19 @@ import pandas as pd
 from sqlalchemy import text
 from datetime import datetime
 import re
-import io
 import random
 from auth import validate_token
-from constants import ACCESS_TO_BUTTON,log_activity, connect_db, connect_ijisem_db, initialize_click_and_session_id, VALID_SUBJECTS, fetch_tags
-from auth import VALID_APPS
+from migrations import require_schema
+from constants import ACCESS_TO_BUTTON,log_activity, connect_db, connect_ijisem_db, initialize_click_and_session_id, VALID_SUBJECTS
+from auth import VALID_APPS, token_cache_stats
 import json
-import smtplib
-from email.mime.multipart import MIMEMultipart
-from email.mime.base import MIMEBase
-from email.mime.text import MIMEText
-from email import encoders
-from reportlab.lib.pagesizes import A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import cm
-from reportlab.lib import colors
-from PIL import Image as PILImage
-import requests
+from outbox import queue_email
+from checklist_approvals import resolve_approvers, invalidate_pending_counts
+from book_tags import tag_counts, BOOKS_WITH_TAGS_SQL
+from dimensions import DIMENSIONS, invalidate_columns, invalidate_dimensions, dimension_stats
+from jobs import submit_job, current_job, show_job, render_job_result, get_job_runner, ACTIVE_STATUSES
+from book_enrichment import OLLAMA_MODEL, count_unenriched_books
+from export_jobs import PDF_BOOK_COLUMNS
 from werkzeug.security import generate_password_hash
 
 
@@ -183,6 +178,7 @@ st.cache_data.clear()
 
 # Connect to MySQL
 conn = connect_db()
+require_schema("mysql")
 ijisem_conn = connect_ijisem_db()
 
 EMAIL_ADDRESS = st.secrets["export_email"]["EMAIL_ADDRESS"]
@@ -259,7 +255,10 @@ def edit_responsibility_dialog(conn, resp_id, task_name, description, manager_id
                             WHERE id = :id
                         """), {"name": updated_name.strip(), "desc": updated_desc.strip() if updated_desc else None, 
                                "mid": updated_mid, "actions": actions_str, "priority": updated_priority, "id": resp_id})
+                        # Logs without their own manager fall back to this one
+                        resolve_approvers(s, responsibility_id=resp_id)
                         s.commit()
+                    invalidate_pending_counts()
                     st.toast("✅ Responsibility updated!")
                     st.rerun()
                 except Exception as e:
@@ -312,7 +311,7 @@ with st.sidebar:
     st.markdown("### ⚙️ Settings")
     main_section = st.radio(
         "Section",
-        ["Manage Users", "Export Data"],
+        ["Manage Users", "Export Data", "AI Tagging", "Dropdown Cache", "Uploads", "Auth Cache"],
         key="settings_main_section"
     )
     if main_section == "Manage Users":
@@ -321,7 +320,7 @@ with st.sidebar:
             ["Users", "Edit User", "Add User", "Responsibilities"],
             key="settings_user_nav"
         )
-    else:
+    elif main_section == "Export Data":
         selected_export_tab = st.radio(
             "Export Tools",
             ["Export as PDF", "Export as Excel"],
@@ -329,191 +328,21 @@ with st.sidebar:
         )
 
 def send_otp_email(to_email, otp):
+    """Queue the admin password OTP in the outbox. True when queued."""
     try:
-        email_addr = st.secrets["ag_volumes_mail"]["EMAIL_ADDRESS"]
-        email_pass = st.secrets["ag_volumes_mail"]["EMAIL_PASSWORD"]
-        
-        msg = MIMEMultipart()
-        msg["From"] = email_addr
-        msg["To"] = to_email
-        msg["Subject"] = "Admin Password Change OTP"
-        
+        servers = st.secrets["email_servers"]
         body = f"Your OTP for changing the admin password is: {otp}\nThis OTP is valid for 10 minutes."
-        msg.attach(MIMEText(body, "plain"))
-        
-        # Use GMAIL_SMTP_SERVER and GMAIL_SMTP_PORT as they are standard for Gmail, or use what's in secrets if appropriate.
-        # Based on existing send_email, it uses GMAIL_SMTP_SERVER and GMAIL_SMTP_PORT.
-        server = smtplib.SMTP(st.secrets["email_servers"]["GMAIL_SMTP_SERVER"], st.secrets["email_servers"]["GMAIL_SMTP_PORT"])
-        server.starttls()
-        server.login(email_addr, email_pass)
-        server.send_message(msg)
-        server.quit()
+        queue_email(
+            to_email, "Admin Password Change OTP", body, "ag_volumes_mail",
+            servers["GMAIL_SMTP_SERVER"], servers["GMAIL_SMTP_PORT"], subtype="plain",
+            history_details="Admin password change OTP", conn=conn,
+        )
         return True
     except Exception as e:
         st.error(f"Failed to send OTP email: {e}")
         return False
     
 
-def get_all_ijisem_data(conn):
-    # Fetch papers
-    papers_query = "SELECT * FROM papers"
-    papers_df = conn.query(papers_query)
-    
-    # Fetch authors
-    authors_query = "SELECT * FROM authors"
-    authors_df = conn.query(authors_query)
-    
-    # Fetch paper_authors
-    paper_authors_query = "SELECT * FROM paper_authors"
-    paper_authors_df = conn.query(paper_authors_query)
-    
-    # Merge data
-    merged_df = paper_authors_df.merge(papers_df, on='paper_id', how='left')
-    merged_df = merged_df.merge(authors_df, on='author_id', how='left')
-    
-    # Pivot authors to have Author 1 Name))^    author_pivot = merged_df.pivot_table(
-    author_pivot = merged_df.pivot_table(
-        index=['paper_id', 'paper_title'],
-        columns='author_position',
-        values=['name', 'email', 'phone', 'affiliation'],
-        aggfunc='first'
-    ).reset_index()
-    
-    # Flatten the multi-level column names
-    author_pivot.columns = [
-        f'{col[0]}_{col[1]}' if col[1] else col[0] 
-        for col in author_pivot.columns
-    ]
-    
-    # Rename columns to desired format
-    renamed_columns = {'paper_id': 'paper_id', 'paper_title': 'paper_title'}
-    for col in author_pivot.columns:
-        if col not in ['paper_id', 'paper_title']:
-            field, position = col.rsplit('_', 1)
-            renamed_columns[col] = f'Author {position} {field.capitalize()}'
-    
-    author_pivot.rename(columns=renamed_columns, inplace=True)
-    
-    # Merge back with paper details
-    final_df = papers_df.merge(
-        author_pivot[['paper_id'] + [col for col in author_pivot.columns if col.startswith('Author')]], 
-        on='paper_id', 
-        how='left'
-    )
-    
-    return final_df
-
-def get_all_booktracker_data(conn):
-    # Fetch books
-    books_query = "SELECT * FROM books"
-    books_df = conn.query(books_query)
-    
-    # Fetch authors
-    authors_query = "SELECT * FROM authors"
-    authors_df = conn.query(authors_query)
-    
-    # Fetch book_authors
-    book_authors_query = "SELECT * FROM book_authors"
-    book_authors_df = conn.query(book_authors_query)
-    
-    # Fetch inventory
-    inventory_query = "SELECT * FROM inventory"
-    inventory_df = conn.query(inventory_query)
-    
-    # Merge data
-    merged_df = book_authors_df.merge(books_df, on='book_id', how='left')
-    merged_df = merged_df.merge(authors_df, on='author_id', how='left')
-    merged_df = merged_df.merge(inventory_df, on='book_id', how='left')
-    
-    # Pivot authors to have Author 1 Name, Author 1 Email, etc.
-    author_pivot = merged_df.pivot_table(
-        index=['book_id', 'title'],
-        columns='author_position',
-        values=['name', 'email', 'phone'],
-        aggfunc='first'
-    ).reset_index()
-    
-    # Flatten the multi-level column names
-    author_pivot.columns = [
-        f'{col[0]}_{col[1]}' if col[1] else col[0] 
-        for col in author_pivot.columns
-    ]
-    
-    # Rename columns to desired format
-    renamed_columns = {'book_id': 'book_id', 'title': 'title'}
-    for col in author_pivot.columns:
-        if col not in ['book_id', 'title']:
-            field, position = col.rsplit('_', 1)
-            renamed_columns[col] = f'Author {position} {field.capitalize()}'
-    
-    author_pivot.rename(columns=renamed_columns, inplace=True)
-    
-    # Merge back with book details and inventory
-    final_df = books_df.merge(
-        author_pivot[['book_id'] + [col for col in author_pivot.columns if col.startswith('Author')]], 
-        on='book_id',
-        how='left'
-    ).merge(
-        inventory_df,
-        on='book_id',
-        how='left'
-    )
-    
-    return final_df
-
-def send_email(subject, body, attachment_data, filename):
-    try:
-        msg = MIMEMultipart()
-        msg['From'] = EMAIL_ADDRESS
-        msg['To'] = ADMIN_EMAIL
-        msg['Subject'] = subject
-
-        msg.attach(MIMEText(body, 'plain'))
-
-        part = MIMEBase('application', 'octet-stream')
-        part.set_payload(attachment_data)
-
-        encoders.encode_base64(part)
-        part.add_header(
-            'Content-Disposition',
-            f'attachment; filename={filename}'
-        )
-        msg.attach(part)
-
-        server = smtplib.SMTP(GMAIL_SMTP_SERVER, GMAIL_SMTP_PORT)
-        server.starttls()
-        server.login(EMAIL_ADDRESS, EMAIL_PASSWORD)
-        server.send_message(msg)
-        server.quit()
-        return True
-    except Exception as e:
-        st.error(f"Failed to send email: {e}")
-        return False
-
-def send_otp_email(to_email, otp):
-    try:
-        email_addr = st.secrets["ag_volumes_mail"]["EMAIL_ADDRESS"]
-        email_pass = st.secrets["ag_volumes_mail"]["EMAIL_PASSWORD"]
-        
-        msg = MIMEMultipart()
-        msg["From"] = email_addr
-        msg["To"] = to_email
-        msg["Subject"] = "Admin Password Change OTP"
-        
-        body = f"Your OTP for changing the admin password is: {otp}\nThis OTP is valid for 10 minutes."
-        msg.attach(MIMEText(body, "plain"))
-        
-        # Use GMAIL_SMTP_SERVER and GMAIL_SMTP_PORT as they are standard for Gmail, or use what's in secrets if appropriate.
-        # Based on existing send_email, it uses GMAIL_SMTP_SERVER and GMAIL_SMTP_PORT.
-        server = smtplib.SMTP(st.secrets["email_servers"]["GMAIL_SMTP_SERVER"], st.secrets["email_servers"]["GMAIL_SMTP_PORT"])
-        server.starttls()
-        server.login(email_addr, email_pass)
-        server.send_message(msg)
-        server.quit()
-        return True
-    except Exception as e:
-        st.error(f"Failed to send OTP email: {e}")
-        return False
 
 if main_section == "Manage Users":
     
@@ -1048,6 +877,7 @@ if main_section == "Manage Users":
                                                 )
                                             s.commit()
                             
+                                        invalidate_columns("userss", ["username"])
                                         log_activity(
                                             conn, st.session_state.user_id, st.session_state.username,
                                             st.session_state.session_id, "updated user",
@@ -1081,6 +911,7 @@ if main_section == "Manage Users":
                                             s.execute(text("DELETE FROM user_app_access WHERE user_id = :id"), {"id": selected_user.id})
                                             s.execute(text("DELETE FROM userss WHERE id = :id"), {"id": selected_user.id})
                                             s.commit()
+                                        invalidate_columns("userss", ["username"])
                                         log_activity(
                                             conn, st.session_state.user_id, st.session_state.username,
                                             st.session_state.session_id, "deleted user",
@@ -1292,6 +1123,7 @@ if main_section == "Manage Users":
                                             )
                                         s.commit()
                         
+                                    invalidate_columns("userss", ["username"])
                                     log_activity(
                                         conn, st.session_state.user_id, st.session_state.username,
                                         st.session_state.session_id, "added user",
@@ -1312,40 +1144,6 @@ if main_section == "Manage Users":
                                     st.error(f"❌ Database error: {str(e)}")
 
         elif selected_user_tab == "Responsibilities":
-            # Ensure description, log_actions and priority columns exist
-            try:
-                with conn.session as s:
-                    s.execute(text("SELECT description FROM daily_responsibilities LIMIT 1"))
-            except Exception:
-                try:
-                    with conn.session as s:
-                        s.execute(text("ALTER TABLE daily_responsibilities ADD COLUMN description TEXT"))
-                        s.commit()
-                except Exception as e:
-                    st.error(f"Error updating daily_responsibilities schema (description): {e}")
-
-            try:
-                with conn.session as s:
-                    s.execute(text("SELECT log_actions FROM daily_responsibilities LIMIT 1"))
-            except Exception:
-                try:
-                    with conn.session as s:
-                        s.execute(text("ALTER TABLE daily_responsibilities ADD COLUMN log_actions TEXT"))
-                        s.commit()
-                except Exception as e:
-                    st.error(f"Error updating daily_responsibilities schema (log_actions): {e}")
-
-            try:
-                with conn.session as s:
-                    s.execute(text("SELECT priority FROM daily_responsibilities LIMIT 1"))
-            except Exception:
-                try:
-                    with conn.session as s:
-                        s.execute(text("ALTER TABLE daily_responsibilities ADD COLUMN priority INT DEFAULT 1"))
-                        s.commit()
-                except Exception as e:
-                    st.error(f"Error updating daily_responsibilities schema (priority): {e}")
-
             col1, col2 = st.columns([5,1])
             with col1:
                 st.write("### 📋 Manage Daily Responsibilities")
@@ -1536,60 +1334,23 @@ if main_section == "Export Data":
                     if not export_options:
                         st.error("Please select at least one export option")
                         return
-                        
-                    with st.spinner("Generating export..."):
-                        dfs = []
-                        if database == "IJISEM":
-                            for option in export_options:
-                                if option == "All Data Export":
-                                    df = get_all_ijisem_data(ijisem_conn)
-                                    dfs.append(('All_Data', df))
-                                elif option == "Only Author Data":
-                                    df = ijisem_conn.query("SELECT * FROM authors")
-                                    dfs.append(('Authors', df))
-                                else:  # Only Papers Data
-                                    df = ijisem_conn.query("SELECT * FROM papers")
-                                    dfs.append(('Papers', df))
-                        else:  # booktracker
-                            for option in export_options:
-                                if option == "All Data Export":
-                                    df = get_all_booktracker_data(conn)
-                                    dfs.append(('All_Data', df))
-                                elif option == "Only Author Data":
-                                    df = conn.query("SELECT * FROM authors")
-                                    dfs.append(('Authors', df))
-                                elif option == "Only Book Data":
-                                    df = conn.query("SELECT * FROM books")
-                                    dfs.append(('Books', df))
-                                else:  # Inventory Data Export
-                                    df = conn.query("SELECT * FROM inventory")
-                                    dfs.append(('Inventory', df))
-                        
-                        # Create Excel file in memory
-                        output = io.BytesIO()
-                        with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-                            for sheet_name, df in dfs:
-                                df.to_excel(writer, sheet_name=sheet_name[:31], index=False)
-                        
-                        # Get current timestamp for filename
-                        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                        filename = f"{database}_export_{timestamp}.xlsx"
-                        
-                        # Send email
-                        subject = f"{database} Data Export - {', '.join(export_options)}"
-                        body = f"Please find attached the exported data from {database} database.\nExport types: {', '.join(export_options)}"
-                        
-                        if send_email(subject, body, output.getvalue(), filename):
-                            log_activity(
-                                conn, st.session_state.user_id, st.session_state.username,
-                                st.session_state.session_id, "exported excel",
-                                f"Database: {database}, Options: {', '.join(export_options)}"
-                            )
-                            st.success(f"Data exported successfully and sent to Admin Email: {ADMIN_EMAIL}. Included: {', '.join(export_options)}")
-                            st.toast(f"Data exported successfully and sent to Admin Email: {ADMIN_EMAIL}. Included: {', '.join(export_options)}", icon="✔️", duration="long")
-                            st.balloons()
-                        else:
-                            st.error("Failed to send export email")
+
+                    # Runs in the background; the page keeps polling it across reruns
+                    st.session_state.excel_export_job = submit_job("excel_export", {
+                        "database": database,
+                        "options": export_options,
+                        "user_id": st.session_state.user_id,
+                        "username": st.session_state.username,
+                        "session_id": st.session_state.session_id,
+                    }, label=f"{database} Excel export")
+
+                job = show_job(current_job("excel_export_job", "excel_export"))
+                if job:
+                    render_job_result(job, "Download Excel")
+                    if job["status"] == "succeeded" and st.session_state.get("excel_export_done") != job["id"]:
+                        st.session_state.excel_export_done = job["id"]
+                        st.toast(f"Data exported successfully and queued for Admin Email: {ADMIN_EMAIL}", icon="✔️", duration="long")
+                        st.balloons()
 
 
 
@@ -1625,8 +1386,9 @@ if main_section == "Export Data":
                     image_filter = st.selectbox("Image Filter", ["All", "With Image", "Without Image"], index=0, key="filter_image_presence")
                 
                 # Tags filter (multiselect below)
-                sorted_tags = fetch_tags(conn)
-                selected_tags = st.multiselect("Tags", sorted_tags, help="Select tags to filter books", key="filter_tags")
+                counts = tag_counts(conn)
+                selected_tags = st.multiselect("Tags", list(counts), format_func=lambda t: f"{t} ({counts.get(t, 0)})",
+                                               help="Select tags to filter books", key="filter_tags")
                 
                 # Build query with filters, joining book_authors and authors to get author names and positions
                 query = """
@@ -1645,9 +1407,8 @@ if main_section == "Export Data":
                     query += " AND b.deliver = :deliver"
                     params["deliver"] = 1 if delivery_status == "Delivered" else 0
                 if selected_tags:
-                    query += " AND (" + " OR ".join(["b.tags LIKE :tag" + str(i) for i in range(len(selected_tags))]) + ")"
-                    for i, tag in enumerate(selected_tags):
-                        params[f"tag{i}"] = f"%{tag}%"
+                    query += f" AND {BOOKS_WITH_TAGS_SQL}"
+                    params["filter_tags"] = tuple(selected_tags)
                 if selected_author_type != "All":
                     query += " AND b.author_type = :author_type"
                     params["author_type"] = selected_author_type
@@ -1706,138 +1467,34 @@ if main_section == "Export Data":
                 
                 # Export button
                 if st.button("Export to PDF", key="export_pdf_button", type="primary", disabled=selected_df.empty):
-                    with st.spinner("Generating PDF (This may take while)..."):
-                        # Generate PDF using reportlab
-                        pdf_output = io.BytesIO()
-                        doc = SimpleDocTemplate(pdf_output, pagesize=A4, rightMargin=2.5*cm, leftMargin=2.5*cm, topMargin=1.5*cm, bottomMargin=1.5*cm)
-                        elements = []
-                        
-                        # Styles
-                        styles = getSampleStyleSheet()
-                        title_style = ParagraphStyle(name='Title', fontName='Helvetica-Bold', fontSize=14, spaceAfter=8)
-                        normal_style = ParagraphStyle(name='Normal', fontName='Helvetica', fontSize=8, spaceAfter=4, wordWrap='CJK')
-                        summary_style = ParagraphStyle(name='Summary', fontName='Helvetica-Oblique', fontSize=8, spaceAfter=6)
-                        
-                        # Add title
-                        elements.append(Paragraph("Exported Books Report", title_style))
-                        elements.append(Spacer(1, 8))
-                        elements.append(Paragraph(f"Generated on {datetime.now().strftime('%Y-%m-%d')}", normal_style))
-                        elements.append(Spacer(1, 8))
-                        
-                        # Add summary
-                        book_count = len(selected_df)
-                        publisher_text = selected_publisher if selected_publisher != "All" else "All Publishers"
-                        tags_text = ", ".join(selected_tags) if selected_tags else "None"
-                        subject_text = selected_subject if selected_subject != "All" else "All Subjects"
-                        date_range_text = f"{selected_dates[0]} to {selected_dates[1]}" if len(selected_dates) == 2 else "All Time"
-                        
-                        elements.append(Paragraph(f"Publisher: {publisher_text}", summary_style))
-                        elements.append(Paragraph(f"Subject: {subject_text}", summary_style))
-                        elements.append(Paragraph(f"Date Range: {date_range_text}", summary_style))
-                        elements.append(Paragraph(f"Image Filter: {image_filter}", summary_style))
-                        elements.append(Paragraph(f"Tags: {tags_text}", summary_style))
-                        elements.append(Paragraph(f"Number of Books Selected: {book_count}", summary_style))
-                        elements.append(Spacer(1, 8))
-                        
-                        # Table data
-                        table_data = [["Image", "Title", "Authors", "ISBN", "MRP", "Publisher"]]
-                        for idx, row in selected_df.iterrows():
-                            image_url = row['images'] if pd.notna(row['images']) else ''
-                            title = row['title'] if pd.notna(row['title']) else ''
-                            authors = row['authors'] if pd.notna(row['authors']) else 'No Authors'
-                            isbn = row['isbn'] if pd.notna(row['isbn']) else ''
-                            mrp = str(row['book_mrp']) if pd.notna(row['book_mrp']) else ''
-                            publisher_ = str(row['publisher']) if pd.notna(row['publisher']) else ''
-                            
-                            # Handle image (fetch from URL and compress/resize)
-                            image_element = Paragraph("No Image", normal_style)
-                            if image_url and image_url.startswith(('http://', 'https://')):
-                                try:
-                                    response = requests.get(image_url, stream=True, timeout=5)
-                                    if response.status_code == 200:
-                                        # Load image with PIL
-                                        pil_image = PILImage.open(io.BytesIO(response.content))
-                                        # Resize to 100x150 pixels for compactness
-                                        pil_image.thumbnail((100, 150), PILImage.Resampling.LANCZOS)
-                                        # Save compressed to BytesIO as JPEG
-                                        img_buffer = io.BytesIO()
-                                        pil_image.convert('RGB').save(img_buffer, format='JPEG', quality=70, optimize=True)
-                                        img_buffer.seek(0)
-                                        # Load into reportlab Image
-                                        image_element = Image(img_buffer, width=3*cm, height=4*cm)
-                                except Exception:
-                                    pass
-                                    
-                            table_data.append([
-                                image_element,
-                                Paragraph(title, normal_style),
-                                Paragraph(authors, normal_style),
-                                Paragraph(isbn, normal_style),
-                                Paragraph(mrp, normal_style),
-                                Paragraph(publisher_, normal_style)
-                            ])
-                        
-                        # Create table with modern styling
-                        table = Table(table_data, colWidths=[3*cm, 4.5*cm, 5.5*cm, 2.7*cm, 1.5*cm, 1.5*cm])
-                        table.setStyle(TableStyle([
-                            # Header
-                            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2C3E50')),  # Dark slate blue header
-                            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-                            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-                            ('VALIGN', (0, 0), (-1, 0), 'MIDDLE'),
-                            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                            ('FONTSIZE', (0, 0), (-1, 0), 9),
-                            ('BOTTOMPADDING', (0, 0), (-1, 0), 6),
-                            ('TOPPADDING', (0, 0), (-1, 0), 6),
-                            # Body
-                            ('ALIGN', (0, 1), (0, -1), 'CENTER'),  # Center image
-                            ('ALIGN', (1, 1), (-1, -1), 'LEFT'),   # Left-align text for readability
-                            ('VALIGN', (0, 1), (-1, -1), 'MIDDLE'),
-                            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-                            ('FONTSIZE', (0, 1), (-1, -1), 8),
-                            # Alternate row colors (clean and minimal)
-                            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [
-                                colors.HexColor('#FFFFFF'),  # White
-                                colors.HexColor('#F7F9FB')   # Very light gray
-                            ]),
-                            # Grid & borders
-                            ('GRID', (0, 0), (-1, -1), 0.3, colors.HexColor('#D3D8E0')),  # Subtle gray grid
-                            ('BOX', (0, 0), (-1, -1), 0.5, colors.HexColor('#A0A8B3')),   # Clean outer border
-                            # Padding for compactness
-                            ('LEFTPADDING', (0, 0), (-1, -1), 4),
-                            ('RIGHTPADDING', (0, 0), (-1, -1), 4),
-                            ('BOTTOMPADDING', (0, 1), (-1, -1), 3),
-                            ('TOPPADDING', (0, 1), (-1, -1), 3),
-                        ]))
-                        
-                        elements.append(table)
-                        
-                        # Build PDF
-                        try:
-                            doc.build(elements)
-                        except Exception as e:
-                            st.error(f"Failed to generate PDF: {str(e)}")
-                            st.toast(f"Failed to generate PDF: {str(e)}", icon="❌", duration="long")
-                            return
-                        
-                        # Send email
-                        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                        filename = f"Filtered_Books_{timestamp}.pdf"
-                        subject = f"Filtered Books PDF Export"
-                        body = f"Please find attached the filtered books report from the MIS database.\nFilters applied: Publisher={selected_publisher}, Delivery Status={delivery_status}, Subject={selected_subject}, Tags={', '.join(selected_tags) or 'None'}, Author Type={selected_author_type}"
-                        
-                        if send_email(subject, body, pdf_output.getvalue(), filename):
-                            log_activity(
-                                conn, st.session_state.user_id, st.session_state.username,
-                                st.session_state.session_id, "exported pdf",
-                                f"Publisher: {selected_publisher}, Subject: {selected_subject}, Status: {delivery_status}, Dates: {date_range_text}, Image Filter: {image_filter}"
-                            )
-                            st.success(f"PDF exported successfully and sent to Admin Email: {ADMIN_EMAIL}")
-                            st.toast(f"PDF exported successfully and sent to Admin Email: {ADMIN_EMAIL}", icon="✔️", duration="long")
-                            st.balloons()
-                        else:
-                            st.error("Failed to send export email")
-                            st.toast("Failed to send export email", icon="❌", duration="long")
+                    publisher_text = selected_publisher if selected_publisher != "All" else "All Publishers"
+                    subject_text = selected_subject if selected_subject != "All" else "All Subjects"
+                    date_range_text = f"{selected_dates[0]} to {selected_dates[1]}" if len(selected_dates) == 2 else "All Time"
+                    books = selected_df[PDF_BOOK_COLUMNS].fillna('').astype(str).to_dict('records')
+                    # Cover downloads and PDF building run in the background
+                    st.session_state.pdf_export_job = submit_job("pdf_export", {
+                        "books": books,
+                        "summary": {
+                            "publisher": publisher_text,
+                            "subject": subject_text,
+                            "date_range": date_range_text,
+                            "image_filter": image_filter,
+                            "tags": ", ".join(selected_tags) if selected_tags else "None",
+                            "email_body": f"Please find attached the filtered books report from the MIS database.\nFilters applied: Publisher={selected_publisher}, Delivery Status={delivery_status}, Subject={selected_subject}, Tags={', '.join(selected_tags) or 'None'}, Author Type={selected_author_type}",
+                            "log_details": f"Publisher: {selected_publisher}, Subject: {selected_subject}, Status: {delivery_status}, Dates: {date_range_text}, Image Filter: {image_filter}",
+                        },
+                        "user_id": st.session_state.user_id,
+                        "username": st.session_state.username,
+                        "session_id": st.session_state.session_id,
+                    }, label=f"PDF export ({len(books)} books)")
+
+                job = show_job(current_job("pdf_export_job", "pdf_export"))
+                if job:
+                    render_job_result(job, "Download PDF")
+                    if job["status"] == "succeeded" and st.session_state.get("pdf_export_done") != job["id"]:
+                        st.session_state.pdf_export_done = job["id"]
+                        st.toast(f"PDF exported successfully and queued for Admin Email: {ADMIN_EMAIL}", icon="✔️", duration="long")
+                        st.balloons()
 
             with button_col2:
                 st.markdown(f"**Total Books: <span style='color:red;'>{len(selected_df)}</span>**", unsafe_allow_html=True)
@@ -1850,3 +1507,83 @@ if main_section == "Export Data":
             col1, _ = st.columns(2)
             with col1:
                 export_data()
+
+
+
+    ###################################################################################################################################
+    ##################################--------------- AI Subject & Tag Backfill ----------------------------##################################
+    ###################################################################################################################################
+
+
+if main_section == "AI Tagging":
+    st.write("### 🤖 AI Subject & Tag Backfill")
+    st.caption(f"Suggests a subject and tags with {OLLAMA_MODEL} for every book that is missing either. "
+               "Titles already seen are answered from the cache; existing subjects and tags are never overwritten.")
+
+    with st.container(border=True):
+        backfill_job = current_job("ai_backfill_job", "ai_backfill")
+        running = backfill_job is not None and (get_job_runner().get(backfill_job) or {}).get("status") in ACTIVE_STATUSES
+        st.metric("Books missing a subject or tags", count_unenriched_books(conn))
+        if st.button("Start Backfill", key="ai_backfill_button", type="primary", disabled=running):
+            st.session_state.ai_backfill_job = submit_job("ai_backfill", label="AI subject & tag backfill")
+            log_activity(
+                conn, st.session_state.user_id, st.session_state.username,
+                st.session_state.session_id, "started ai backfill", f"Model: {OLLAMA_MODEL}"
+            )
+            st.rerun()
+
+        job = show_job(st.session_state.ai_backfill_job)
+        if job:
+            render_job_result(job)
+
+
+if main_section == "Dropdown Cache":
+    st.write("### 🗂️ Dropdown Cache")
+    st.caption("Shared values behind selectboxes (worker names, agents, services, tags). "
+               "Each list is reloaded after its TTL or when a save touches its column.")
+
+    with st.container(border=True):
+        st.dataframe(dimension_stats(), hide_index=True, width="stretch")
+        if st.button("Reload All", key="reload_dimensions_button"):
+            invalidate_dimensions(*DIMENSIONS)
+            st.rerun()
+
+
+if main_section == "Uploads":
+    st.write("### 🖼️ Upload Thumbnails")
+    st.caption("New author photos get a thumbnail and a WebP copy when uploaded. "
+               "This builds the missing ones for photos uploaded before that.")
+
+    with st.container(border=True):
+        upload_job = current_job("upload_backfill_job", "upload_backfill")
+        running = upload_job is not None and (get_job_runner().get(upload_job) or {}).get("status") in ACTIVE_STATUSES
+        if st.button("Build Thumbnails", key="upload_backfill_button", type="primary", disabled=running):
+            st.session_state.upload_backfill_job = submit_job("upload_backfill", label="Author photo thumbnails")
+            log_activity(
+                conn, st.session_state.user_id, st.session_state.username,
+                st.session_state.session_id, "started upload backfill", "Author photos"
+            )
+            st.rerun()
+
+        job = show_job(st.session_state.upload_backfill_job)
+        if job:
+            render_job_result(job)
+
+
+if main_section == "Auth Cache":
+    st.write("### 🔐 Token Validation Cache")
+    st.caption("Auth server answers shared by every session in this process. A new tab with the same token "
+               "reuses the answer instead of calling the server again; revoked tokens stop working for new tabs "
+               "within 10 minutes.")
+
+    with st.container(border=True):
+        stats = token_cache_stats()
+        cols = st.columns(4)
+        cols[0].metric("Hit Rate", stats["Hit Rate"])
+        cols[1].metric("Auth Server Calls", stats["Auth Server Calls"])
+        cols[2].metric("Avg Latency (ms)", stats["Avg Latency (ms)"] if stats["Avg Latency (ms)"] is not None else "-")
+        cols[3].metric("Cached Tokens", stats["Cached Tokens"])
+        st.caption(f"{stats['Lookups']} lookups, {stats['Auth Server Errors']} server errors, "
+                   f"max latency {stats['Max Latency (ms)']} ms")
+        if st.button("Refresh", key="refresh_auth_stats_button"):
+            st.rerun()
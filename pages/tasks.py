@@ -10,6 +10,9 @@ import uuid
 from auth import validate_token
 import calendar
 from datetime import datetime, timedelta, date
+from team_timesheets import get_team_week, user_week_rows, mark_timesheet_changed
+from checklist_approvals import resolve_approvers, fetch_approval_inbox, pending_approval_count, invalidate_pending_counts
+from migrations import require_schema
 
 
 # --- Initial Imports and Setup ---
@@ -32,6 +35,7 @@ token = st.session_state.token
 
 conn = connect_db()
 ict_conn = connect_ict_db()
+require_schema("mysql")
 
 CHAT_URL  = st.secrets["general"]["CHAT_URL"]
 
@@ -405,6 +409,7 @@ def submit_timesheet_for_approval(conn, timesheet_id, current_status):
                 WHERE id = :id AND status IN ('draft', 'rejected')
             """), {"id": timesheet_id, "submitted_at": submitted_time})
             s.commit()
+        mark_timesheet_changed(st.session_state.user_id)
 
         action = "RESUBMIT_TIMESHEET" if current_status == 'rejected' else "SUBMIT_TIMESHEET"
         details = f"{action.replace('_', ' ').title()} for timesheet ID: {timesheet_id}"
@@ -435,19 +440,13 @@ def get_late_submitters_for_manager(conn, manager_id):
     if today.weekday() not in [0, 1]: # 0=Monday, 1=Tuesday
         return []
 
-    prev_fiscal_week, _, _ = get_previous_week_details()
+    _, prev_start_of_week, _ = get_previous_week_details()
 
     try:
-        query = """
-            SELECT u.username
-            FROM userss u
-            JOIN timesheets t ON u.id = t.user_id
-            WHERE t.manager_id = :manager_id
-              AND t.fiscal_week = :fiscal_week
-              AND t.status IN ('draft', 'rejected')
-        """
-        df = conn.query(query, params={"manager_id": manager_id, "fiscal_week": prev_fiscal_week}, ttl=300)
-        return df['username'].tolist()
+        _, summary = get_team_week_summary(conn, manager_id, prev_start_of_week)
+        if summary.empty:
+            return []
+        return summary.loc[summary['status'].isin(['draft', 'rejected']), 'username'].tolist()
     except Exception as e:
         st.error(f"Error fetching late submitters: {e}")
         return []
@@ -1000,6 +999,21 @@ def get_direct_reports(_conn, manager_id: int) -> pd.DataFrame:
         st.error(f"Error fetching direct reports: {e}")
         return pd.DataFrame()
     
+def get_team_week_summary(conn, manager_id, week_start_date: date):
+    """(work rows, per-user summary) of one week for all of manager_id's direct reports, from the shared team cache."""
+    reports = get_direct_reports(conn, manager_id)
+    if reports.empty:
+        return pd.DataFrame(), pd.DataFrame()
+    return get_team_week(conn, manager_id, reports, week_start_date, get_ist_date())
+
+
+def get_default_review_week():
+    """Monday of the week managers review by default: last week on Monday/Tuesday, else this week."""
+    if get_ist_date().weekday() in [0, 1]:
+        return get_previous_week_details()[1]
+    return get_current_week_details()[1]
+
+
 def get_weekly_timesheet_details(conn, user_id: int, week_start_date: date) -> pd.DataFrame:
     """
     Fetches comprehensive weekly timesheet details, including work entries,
@@ -1090,26 +1104,12 @@ def get_submitted_timesheet_users(conn, manager_id):
     Returns:
         list: List of usernames who have submitted their timesheets.
     """
-    today = get_ist_date()
-    
-    # Determine the fiscal week to check
-    if today.weekday() in [0, 1]:  # Monday or Tuesday, check previous week
-        fiscal_week, _, _ = get_previous_week_details()
-    else:
-        # Assume get_current_week_details() exists to get current week's fiscal week
-        fiscal_week, _, _ = get_current_week_details()  # Replace with actual function if different
-    
     try:
-        query = """
-            SELECT u.username
-            FROM userss u
-            JOIN timesheets t ON u.id = t.user_id
-            WHERE t.manager_id = :manager_id
-              AND t.fiscal_week = :fiscal_week
-              AND t.status = 'submitted'
-        """
-        df = conn.query(query, params={"manager_id": manager_id, "fiscal_week": fiscal_week}, ttl=0)
-        return df['username'].tolist()
+        # Monday or Tuesday: previous week, otherwise the current one
+        _, summary = get_team_week_summary(conn, manager_id, get_default_review_week())
+        if summary.empty:
+            return []
+        return summary.loc[summary['status'] == 'submitted', 'username'].tolist()
     except Exception as e:
         st.error(f"Error fetching submitted timesheet users: {e}")
         return []
@@ -1562,8 +1562,9 @@ def confirm_submission_dialog(conn, timesheet_id, current_status):
 
 
 @st.dialog("Weekly Timesheet Details", width="large")
-def show_weekly_dialog(conn, user_id, username, week_start_date, is_manager=False, is_admin = False):
-    """Dialog for viewing weekly timesheet details with a dynamic horizontal layout, including System Failure."""
+def show_weekly_dialog(conn, user_id, username, week_start_date, is_manager=False, is_admin = False, df=None):
+    """Dialog for viewing weekly timesheet details with a dynamic horizontal layout, including System Failure.
+    df: the week's rows if already loaded (team review), else they are queried."""
     week_end_date = week_start_date + timedelta(days=6)
     # Calculate week number
     week_number = week_start_date.isocalendar().week
@@ -1573,7 +1574,8 @@ def show_weekly_dialog(conn, user_id, username, week_start_date, is_manager=Fals
     with col2:
         st.caption(f"{week_start_date.strftime('%b %d')} - {week_end_date.strftime('%b %d, %Y')}")
 
-    df = get_weekly_timesheet_details(conn, user_id, week_start_date)
+    if df is None:
+        df = get_weekly_timesheet_details(conn, user_id, week_start_date)
 
     if df.empty:
         st.info("No entries for this week.")
@@ -1667,6 +1669,7 @@ def show_weekly_dialog(conn, user_id, username, week_start_date, is_manager=Fals
                                 {"id": timesheet_id, "ist_time": ist_time}
                             )
                             s.commit()
+                            mark_timesheet_changed(user_id)
                             
                             # Log with IST time
                             log_activity(
@@ -1710,6 +1713,7 @@ def show_weekly_dialog(conn, user_id, username, week_start_date, is_manager=Fals
                                         {"id": timesheet_id, "notes": notes.strip(), "ist_time": ist_time}
                                     )
                                     s.commit()
+                                    mark_timesheet_changed(user_id)
                                     
                                     # Log with IST time
                                     log_activity(
@@ -2380,36 +2384,18 @@ def timesheet_history_page(conn):
         st.session_state.show_week_details_for = None
 
 
-@st.cache_data(ttl=60)
-def get_all_pending_daily_submissions_for_manager(_conn, manager_id):
-    """
-    Retrieves all daily submissions for a manager that have at least one 'submitted' task,
-    where the manager is responsible for that specific task based on a fallback hierarchy.
-    """
-    query = """
-        SELECT DISTINCT s.*, u.username 
-        FROM daily_checklist_submissions s
-        JOIN userss u ON s.user_id = u.id
-        JOIN daily_checklist_logs l ON s.id = l.submission_id
-        LEFT JOIN daily_responsibilities dr ON l.responsibility_id = dr.id
-        WHERE COALESCE(l.manager_id, dr.manager_id, s.manager_id) = :manager_id
-        AND l.status = 'submitted'
-        ORDER BY s.date DESC, u.username ASC
-    """
-    return _conn.query(query, params={"manager_id": manager_id}, ttl=0)
-
 def get_daily_submissions_for_manager(conn, manager_id, date):
     # Only show users who have at least one task that is NOT pending or started,
-    # and the manager is responsible for that specific task.
+    # and the manager is responsible for that specific task (approver_id, see checklist_approvals.py).
     query = """
-        SELECT DISTINCT s.*, u.username 
+        SELECT s.*, u.username
         FROM daily_checklist_submissions s
         JOIN userss u ON s.user_id = u.id
-        JOIN daily_checklist_logs l ON s.id = l.submission_id
-        LEFT JOIN daily_responsibilities dr ON l.responsibility_id = dr.id
-        WHERE COALESCE(l.manager_id, dr.manager_id, s.manager_id) = :manager_id
-        AND s.date = :date
-        AND l.status NOT IN ('pending', 'started')
+        WHERE s.date = :date
+        AND s.id IN (
+            SELECT l.submission_id FROM daily_checklist_logs l
+            WHERE l.approver_id = :manager_id AND l.status NOT IN ('pending', 'started')
+        )
     """
     return conn.query(query, params={"manager_id": manager_id, "date": date}, ttl=0)
 
@@ -2624,8 +2610,9 @@ def render_daily_checklist_inline(conn, sub_row, is_manager=False, is_admin=Fals
                                     if all(row[0] == 'approved' for row in all_statuses):
                                         s.execute(text("UPDATE daily_checklist_submissions SET status = 'approved', reviewed_at = :now WHERE id = :sid"),
                                                     {"now": now, "sid": sub_id})
-                                    
+
                                     s.commit()
+                                invalidate_pending_counts()
                                 st.rerun()
                             except Exception as e: st.error(f"Error: {e}")
         
@@ -2648,9 +2635,75 @@ def render_daily_checklist_inline(conn, sub_row, is_manager=False, is_admin=Fals
                                             s.execute(text("UPDATE daily_checklist_submissions SET status = 'rejected', reviewed_at = :now WHERE id = :sid"),
                                                         {"now": now, "sid": sub_id})
                                             s.commit()
+                                        invalidate_pending_counts()
                                         st.rerun()
                                     except Exception as e: st.error(f"Error: {e}")
 
+def render_team_review(conn, manager_id):
+    """One week for every direct report at once: status, hours and missing days, loaded with a single query."""
+    current_week_start = get_current_week_details()[1]
+    week_options = [current_week_start - timedelta(weeks=i) for i in range(8)]
+    default_week = get_default_review_week()
+    selected_week = st.selectbox(
+        "Week",
+        options=week_options,
+        index=week_options.index(default_week) if default_week in week_options else 0,
+        format_func=lambda d: f"Week {d.isocalendar().week} ({d.strftime('%b %d')} - {(d + timedelta(days=5)).strftime('%b %d, %Y')})",
+        key="team_review_week"
+    )
+
+    _, summary = get_team_week_summary(conn, manager_id, selected_week)
+    if summary.empty:
+        st.info("No direct reports found.")
+        return
+
+    status_map = {"approved": "🟢 Approved", "submitted": "🟠 Submitted", "rejected": "🔴 Rejected",
+                  "draft": "🔵 Draft", "not started": "⚪️ Not Started"}
+    counts = summary['status'].value_counts()
+    m1, m2, m3, m4 = st.columns(4)
+    m1.metric("To Review", int(counts.get('submitted', 0)))
+    m2.metric("Approved", int(counts.get('approved', 0)))
+    m3.metric("Draft / Rejected", int(counts.get('draft', 0) + counts.get('rejected', 0)))
+    m4.metric("Not Started", int(counts.get('not started', 0)))
+
+    table = summary.assign(status=summary['status'].map(status_map).fillna(summary['status']))
+    st.dataframe(
+        table[['username', 'status', 'logged_hours', 'working_hours', 'downtime_hours', 'leaves',
+               'half_days', 'missing_days', 'missing', 'submitted_at']],
+        hide_index=True,
+        width="stretch",
+        column_config={
+            "username": "Employee",
+            "status": "Status",
+            "logged_hours": st.column_config.NumberColumn("Logged (hrs)", format="%.2f"),
+            "working_hours": st.column_config.NumberColumn("Working (hrs)", format="%.2f"),
+            "downtime_hours": st.column_config.NumberColumn("Downtime (hrs)", format="%.2f"),
+            "leaves": "Leaves",
+            "half_days": "Half Days",
+            "missing_days": "Missing Days",
+            "missing": "Days Without Entries",
+            "submitted_at": st.column_config.DatetimeColumn("Submitted", format="MMM DD, hh:mm a"),
+        },
+    )
+
+    # Submitted timesheets first, since those are the ones waiting on the manager
+    review_order = summary.sort_values(by='status', key=lambda s: s != 'submitted', kind='stable')
+    c1, c2 = st.columns([3, 1], vertical_alignment="bottom")
+    with c1:
+        review_user_id = st.selectbox(
+            "Open Timesheet",
+            options=review_order['user_id'].tolist(),
+            format_func=lambda uid: f"{summary.loc[summary['user_id'] == uid, 'username'].iloc[0]} "
+                                    f"({status_map.get(summary.loc[summary['user_id'] == uid, 'status'].iloc[0], '')})",
+            key="team_review_user"
+        )
+    with c2:
+        if st.button("Open", key="team_review_open_btn", width='stretch', type="primary"):
+            review_username = summary.loc[summary['user_id'] == review_user_id, 'username'].iloc[0]
+            st.session_state.team_review_open = (review_user_id, review_username, selected_week)
+            st.rerun()
+
+
 def manager_dashboard(conn):
     st.subheader("📋 Manager Dashboard", anchor=False, divider="rainbow")
     
@@ -2687,23 +2740,39 @@ def manager_dashboard(conn):
     user_info = users_df[users_df['username'] == selected_user].iloc[0]
     selected_user_id = user_info['id']
     
-    tab_weekly, tab_pending, tab_history, tab_activity = st.tabs(["📅 Weekly Timesheets", "⏳ Pending Approvals", "📊 Checklist History", "🕵️ User Activity"])
+    pending_count = pending_approval_count(conn, st.session_state.user_id)
+    pending_label = f"⏳ Pending Approvals ({pending_count})" if pending_count else "⏳ Pending Approvals"
+    tab_team, tab_weekly, tab_pending, tab_history, tab_activity = st.tabs(["👥 Team Review", "📅 Weekly Timesheets", pending_label, "📊 Checklist History", "🕵️ User Activity"])
+
+    with tab_team:
+        render_team_review(conn, st.session_state.user_id)
 
     with tab_pending:
         # Section 1: All Pending Approvals (Across all dates)
         st.write("### ⏳ Pending Approvals (All Dates)")
-        pending_subs = get_all_pending_daily_submissions_for_manager(conn, st.session_state.user_id)
-        
-        # Filter for selected user if any
-        user_pending = pending_subs[pending_subs['username'] == selected_user] if not pending_subs.empty else pd.DataFrame()
-        
-        if user_pending.empty:
+
+        # Keyset pages: cursors[i] is where page i starts, reset when the employee changes
+        cursor_key = f"pending_cursors_{selected_user_id}"
+        cursors = st.session_state.setdefault(cursor_key, [None])
+        user_pending, next_cursor = fetch_approval_inbox(conn, st.session_state.user_id, user_id=selected_user_id, after=cursors[-1])
+
+        if user_pending.empty and len(cursors) == 1:
             st.success(f"✨ No pending approvals found for **{selected_user}**.")
         else:
             for _, row in user_pending.iterrows():
                 st.write(f"📅 **Date: {row['date'].strftime('%B %d, %Y')}**")
                 render_daily_checklist_inline(conn, row, is_manager=True, is_admin=(st.session_state.role == 'admin'))
 
+            if len(cursors) > 1 or next_cursor:
+                p1, p2, p3 = st.columns([1, 2, 1], vertical_alignment="center")
+                if p1.button("← Newer", key="pending_prev_page", disabled=len(cursors) == 1, width='stretch'):
+                    cursors.pop()
+                    st.rerun()
+                p2.caption(f"Page {len(cursors)}")
+                if p3.button("Older →", key="pending_next_page", disabled=next_cursor is None, width='stretch'):
+                    cursors.append(next_cursor)
+                    st.rerun()
+
     with tab_history:
         # Section 2: Checklist Calendar
         st.write("### 📅 Checklist Calendar")
@@ -2953,6 +3022,14 @@ def manager_dashboard(conn):
         show_weekly_dialog(conn, selected_user_id, selected_user, st.session_state.show_week_details_for, is_manager=True)
         st.session_state.show_week_details_for = None
 
+    # Opened from the Team Review tab, with the rows already in the team cache
+    if st.session_state.get("team_review_open"):
+        review_user_id, review_username, review_week = st.session_state.team_review_open
+        team_rows, _ = get_team_week_summary(conn, st.session_state.user_id, review_week)
+        show_weekly_dialog(conn, review_user_id, review_username, review_week, is_manager=True,
+                           df=user_week_rows(team_rows, review_user_id))
+        st.session_state.team_review_open = None
+
 
 
 def get_daily_submissions_for_admin(conn, user_id, date):
@@ -3461,6 +3538,7 @@ def daily_checklist_page(conn):
                             task_manager_id = row['manager_id'] if pd.notna(row['manager_id']) else manager_id
                             s.execute(text("INSERT INTO daily_checklist_logs (submission_id, responsibility_id, manager_id) VALUES (:sid, :rid, :mid)"),
                                       {"sid": sub_id, "rid": row['id'], "mid": task_manager_id})
+                        resolve_approvers(s, submission_id=sub_id)
                         s.commit()
                     st.rerun()
                 except Exception as e:
@@ -3487,6 +3565,7 @@ def daily_checklist_page(conn):
                         task_manager_id = resp_row['manager_id'] if pd.notna(resp_row['manager_id']) else sub_row['manager_id']
                         s.execute(text("INSERT INTO daily_checklist_logs (submission_id, responsibility_id, manager_id) VALUES (:sid, :rid, :mid)"),
                                   {"sid": sub_id, "rid": rid, "mid": task_manager_id})
+                    resolve_approvers(s, submission_id=sub_id)
                     s.commit()
                 st.rerun()
 
@@ -3510,7 +3589,9 @@ def daily_checklist_page(conn):
                         needs_rerun = True
                 
                 if needs_rerun:
+                    resolve_approvers(s, submission_id=sub_id)
                     s.commit()
+                    invalidate_pending_counts()
                     st.rerun()
         except Exception as e:
             pass
@@ -3525,7 +3606,9 @@ def daily_checklist_page(conn):
                         m_id = int(mgr_res.iloc[0]['id'])
                         with conn.session as s:
                             s.execute(text("UPDATE daily_checklist_submissions SET manager_id = :mid WHERE id = :sid"), {"mid": m_id, "sid": sub_id})
+                            resolve_approvers(s, submission_id=sub_id)
                             s.commit()
+                        invalidate_pending_counts()
                         st.rerun()
             except:
                 pass
@@ -3742,6 +3825,7 @@ def daily_checklist_page(conn):
                                                 else:
                                                     st.session_state.checklist_toast = ("Correction submitted, but NOT logged to timesheet (check pending weeks). ⚠️", None)
                                                 s.commit()
+                                            invalidate_pending_counts()
                                             st.rerun()
                                         except Exception as e: st.error(f"Error: {e}")
                         else:
@@ -3778,6 +3862,7 @@ def daily_checklist_page(conn):
                                         else:
                                             st.session_state.checklist_toast = ("Task ended & submitted, but NOT logged to timesheet (check pending weeks). ⚠️", None)
                                         s.commit()
+                                    invalidate_pending_counts()
                                     st.rerun()
                                 except Exception as e: st.error(f"Error: {e}")
                     
@@ -3792,6 +3877,7 @@ def daily_checklist_page(conn):
                                     s.execute(text("UPDATE daily_checklist_submissions SET status = 'submitted', submitted_at = :now WHERE id = :id"),
                                               {"now": now, "id": sub_id})
                                     s.commit()
+                                invalidate_pending_counts()
                                 st.rerun()
                             except Exception as e: st.error(f"Error: {e}")
                     
@@ -3809,6 +3895,7 @@ def daily_checklist_page(conn):
                                         INSERT INTO daily_checklist_logs (submission_id, responsibility_id, status, is_correction, manager_id)
                                         VALUES (:sid, :rid, 'pending', 1, :mid)
                                     """), {"sid": sub_id, "rid": row['responsibility_id'], "mid": row['manager_id']})
+                                    resolve_approvers(s, submission_id=sub_id)
                                     s.commit()
                                 st.rerun()
                             except Exception as e: st.error(f"Error: {e}")
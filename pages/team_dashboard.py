@@ -10,10 +10,18 @@ import altair as alt
 from auth import validate_token
 from constants import log_activity, connect_db, get_page_url, initialize_click_and_session_id, get_total_unread_count, connect_ict_db
 import uuid
+from functools import partial
 from datetime import datetime, timezone, timedelta, time
 from time import sleep
 from sqlalchemy.sql import text
 from constants import get_page_url
+from operations_sheet import mark_operations_dirty
+from dimensions import get_dimension, invalidate_columns
+from file_downloads import download_file_button, file_exists, read_file
+from working_time import (
+    working_durations, split_working_minutes, format_day_hours,
+    worker_aggregates, MINUTES_PER_DAY
+)
 
 
 # Set page configuration
@@ -735,18 +743,11 @@ def show_author_details_dialog(book_id):
 
             with cols[6]:
                 photo_path = row.get('Author Photo Path')
-                has_photo = bool(photo_path and os.path.exists(photo_path))
-                photo_data = b""
-                if has_photo:
-                    try:
-                        with open(photo_path, "rb") as file:
-                            photo_data = file.read()
-                    except Exception:
-                        has_photo = False
-                
+                has_photo = file_exists(photo_path)
+
                 st.download_button(
                     label="⬇️ Photo",
-                    data=photo_data,
+                    data=partial(read_file, photo_path) if has_photo else b"",
                     file_name=os.path.basename(photo_path) if has_photo else "none.jpg",
                     mime="image/jpeg",
                     key=f"dl_photo_{row['Author ID']}",
@@ -1134,59 +1135,12 @@ def render_worker_completion_graph(books_df, selected_month, section, holds_df=N
         st.write(f"##### {section.capitalize()} Completed in {selected_month} by {selected_worker}")
         display_columns = ['Book ID', 'Title', f'{section.capitalize()} By', 'Time Taken', 'Start Date', 'Start Time', 'End Date', 'End Time', 'Hold Time'] if 'Title' in books_df.columns else ['Book ID', f'{section.capitalize()} By', 'Time Taken', 'Start Date', 'Start Time', 'End Date', 'End Time', 'Hold Time']
 
-        # Calculate time taken (excluding hold periods)
+        # Calculate time taken (excluding hold periods) and hold time for all books at once
         completed_books = completed_books.copy()  # Avoid modifying original dataframe
-        completed_books['Time Taken'] = completed_books.apply(
-            lambda row: calculate_working_duration(
-                row[start_col],
-                row[end_col],
-                [(h['hold_start'], h['resume_time'] or row[end_col]) for _, h in holds_df[(holds_df['book_id'] == row['Book ID']) & (holds_df['section'] == section)].iterrows()] if holds_df is not None and not holds_df[(holds_df['book_id'] == row['Book ID']) & (holds_df['section'] == section)].empty else []
-            ),
-            axis=1
-        )
-        completed_books['Time Taken'] = completed_books['Time Taken'].apply(
-            lambda x: f"{x[0]}d {x[1]}h"
-        )
-
-        def calculate_total_hold_time(row, holds_df, end_col, section):
-            """
-            Calculate total hold time for a book in calendar days and hours.
-            Returns (total_days, remaining_hours) where 1 day = 24 hours.
-            """
-            if holds_df is None or holds_df.empty:
-                return (0, 0)
-            
-            # Filter hold periods for this book and section
-            book_holds = holds_df[(holds_df['book_id'] == row['Book ID']) & (holds_df['section'] == section)]
-            if book_holds.empty:
-                return (0, 0)
-            
-            total_minutes = 0
-            hold_periods = [
-                (h['hold_start'], h['resume_time'] if pd.notnull(h['resume_time']) else row[end_col])
-                for _, h in book_holds.iterrows()
-            ]
-            
-            for hold_start, hold_end in hold_periods:
-                if pd.isna(hold_start) or pd.isna(hold_end) or hold_start >= hold_end:
-                    continue
-                # Calculate duration in calendar days (total time, not working hours)
-                duration = (hold_end - hold_start).total_seconds() / 60
-                total_minutes += duration
-            
-            # Convert total minutes to days and hours (1 day = 24 hours)
-            total_hours = total_minutes / 60.0
-            total_days = int(total_hours // 24)
-            remaining_hours = int(round(total_hours % 24))
-            return (total_days, remaining_hours)
-
-        completed_books['Hold Time'] = completed_books.apply(
-            lambda row: calculate_total_hold_time(row, holds_df, end_col, section),
-            axis=1
-        )
-        completed_books['Hold Time'] = completed_books['Hold Time'].apply(
-            lambda x: f"{x[0]}d {x[1]}h" if x != (0, 0) else "0d 0h"
-        )
+        spans = working_durations(completed_books, start_col, end_col, holds_df, section=section)
+        completed_books['working_minutes'] = spans['working_minutes']
+        completed_books['Time Taken'] = format_day_hours(spans['working_minutes'])
+        completed_books['Hold Time'] = format_day_hours(spans['hold_calendar_minutes'], day_minutes=MINUTES_PER_DAY)
 
         # Split Start and End into Date and Time with AM/PM format
         completed_books['Start Date'] = completed_books[start_col].dt.strftime('%Y-%m-%d')
@@ -1202,7 +1156,8 @@ def render_worker_completion_graph(books_df, selected_month, section, holds_df=N
 
     with col2:
         # Group by worker for the bar chart
-        worker_counts = completed_books.groupby(by_col).size().reset_index(name='Book Count')
+        worker_counts = worker_aggregates(completed_books, by_col)
+        worker_counts['Avg Time'] = format_day_hours(worker_counts['Avg Minutes'])
         if selected_worker != 'All':
             worker_counts = worker_counts[worker_counts[by_col] == selected_worker]
         
@@ -1220,7 +1175,7 @@ def render_worker_completion_graph(books_df, selected_month, section, holds_df=N
             x=alt.X('Book Count:Q', title='Number of Books Completed', axis=alt.Axis(values=tick_values, grid=True, gridOpacity=0.3)),
             y=alt.Y(f'{by_col}:N', title='Team Member', sort='-x'),
             color=alt.Color(f'{by_col}:N', scale=alt.Scale(scheme='darkgreen'), legend=None),
-            tooltip=[f'{by_col}:N', 'Book Count:Q']
+            tooltip=[f'{by_col}:N', 'Book Count:Q', 'Avg Time:N']
         )
 
         # Add text labels at the end of the bars
@@ -1404,9 +1359,7 @@ def render_metrics(books_df, selected_month, section, user_role, holds_df=None):
 
 # Helper function to fetch unique names (assumed to exist or can be added)
 def fetch_unique_names(column_name, conn):
-    query = f"SELECT DISTINCT {column_name} FROM books WHERE {column_name} IS NOT NULL"
-    result = conn.query(query, show_spinner=False)
-    return sorted(result[column_name].tolist())
+    return get_dimension(column_name, conn)
 
 # --- Helper Functions ---
 def get_status(start, end, current_date):
@@ -2175,6 +2128,8 @@ def edit_section_dialog(book_id, conn, section):
                                 params["id"] = int(book_id)
                                 s.execute(text(query), params)
                                 s.commit()
+                            mark_operations_dirty(book_id)
+                            invalidate_columns("books", updates.keys())
                             # Log the start action
                             details = f"Book ID: {book_id}, Start Time: {now}, By: {worker}"
                             try:
@@ -2313,6 +2268,7 @@ def edit_section_dialog(book_id, conn, section):
                                         params["id"] = int(book_id)
                                         s.execute(text(query), params)
                                         s.commit()
+                                    mark_operations_dirty(book_id)
                                     # Log the end action
                                     details = f"Book ID: {book_id}, End Time: {now}, By: {current_worker}"
                                     if needs_pages and book_pages is not None:
@@ -2372,6 +2328,7 @@ def edit_section_dialog(book_id, conn, section):
                                             params["id"] = int(book_id)
                                             s.execute(text(query), params)
                                             s.commit()
+                                        mark_operations_dirty(book_id)
                                         # Log the end action
                                         details = f"Book ID: {book_id}, End Time: {now}, By: {current_worker}"
                                         if needs_pages and book_pages is not None:
@@ -2566,27 +2523,25 @@ def render_correction_table(correction_books, section, conn):
                 with col_configs[6]:
                     file_path = row.get('Correction File')
                     corr_text = row.get('Correction Text')
-                    has_file = pd.notnull(file_path) and file_path and os.path.exists(file_path)
+                    has_file = file_exists(file_path)
                     has_text = pd.notnull(corr_text) and str(corr_text).strip() != ""
 
                     if has_file:
-                        with open(file_path, "rb") as file:
-                            st.download_button(
-                                label=":material/download:",
-                                data=file,
-                                file_name=os.path.basename(file_path),
-                                mime="application/octet-stream",
-                                key=f"dl_corr_file_{section}_{row['Book ID']}",
-                                help="Download Correction File",
-                                on_click=lambda: log_activity(
-                                    conn,
-                                    st.session_state.user_id,
-                                    st.session_state.username,
-                                    st.session_state.session_id,
-                                    "downloaded correction file",
-                                    f"Book ID: {row['Book ID']}, Section: {section}, File: {os.path.basename(file_path)}"
-                                )
+                        download_file_button(
+                            label=":material/download:",
+                            path=file_path,
+                            mime="application/octet-stream",
+                            key=f"dl_corr_file_{section}_{row['Book ID']}",
+                            help="Download Correction File",
+                            on_click=lambda: log_activity(
+                                conn,
+                                st.session_state.user_id,
+                                st.session_state.username,
+                                st.session_state.session_id,
+                                "downloaded correction file",
+                                f"Book ID: {row['Book ID']}, Section: {section}, File: {os.path.basename(file_path)}"
                             )
+                        )
                     elif has_text:
                         st.download_button(
                             label=":material/download:",
@@ -2763,6 +2718,13 @@ def render_table(books_df, title, column_sizes, color, section, role, is_running
             writing_worker_map = None
 
         skip_start = "Hold" in title
+        # Working durations for every row in one vectorized pass
+        if not skip_start and not filtered_df.empty:
+            start_col, end_col = f'{section.capitalize()} Start', f'{section.capitalize()} End'
+            timed_df = filtered_df.assign(_until=filtered_df[end_col].fillna(pd.Timestamp(datetime.now())))
+            filtered_df = filtered_df.assign(
+                duration_str=format_day_hours(working_durations(timed_df, start_col, '_until')['working_minutes'])
+            )
         for _, row in filtered_df.iterrows():
             col_configs = st.columns(column_sizes[:len(columns)])
             col_idx = 0
@@ -2803,22 +2765,12 @@ def render_table(books_df, title, column_sizes, color, section, role, is_running
                     days_since = get_days_since_enrolled(row['Date'], current_date)
                     status_html = f'<span class="pill status-{"pending" if status == "Pending" else "running" if status == "Running" else "completed"}">{status}'
                     if days is not None and status == "Running":
-                        duration = calculate_working_duration(row[f'{section.capitalize()} Start'], datetime.now())
-                        if duration:
-                            days, hours = duration
-                            duration_str = f"{days}d" if hours == 0 else f"{days}d {hours}h"
-                            status_html += f' {duration_str}'
+                        status_html += f' {row["duration_str"].removesuffix(" 0h")}'
                     elif "Completed" in title:
                         start_date = row[f'{section.capitalize()} Start']
                         end_date = row[f'{section.capitalize()} End']
                         if pd.notnull(start_date) and pd.notnull(end_date) and start_date != '0000-00-00 00:00:00' and end_date != '0000-00-00 00:00:00':
-                            duration = calculate_working_duration(start_date, end_date)
-                            if duration:
-                                days, hours = duration
-                                duration_str = f"{days}d" if hours == 0 else f"{days}d {hours}h"
-                                status_html += f' ({duration_str})'
-                            else:
-                                status_html += ' (-)'
+                            status_html += f' ({row["duration_str"].removesuffix(" 0h")})'
                         else:
                             status_html += ' (-)'
                     elif not is_running and days_since is not None:
@@ -2901,26 +2853,24 @@ def render_table(books_df, title, column_sizes, color, section, role, is_running
                 if "Syllabus" in columns and not is_running:
                     with col_configs[col_idx]:
                         syllabus_path = row['Syllabus Path']
-                        disabled = pd.isna(syllabus_path) or not syllabus_path or not os.path.exists(syllabus_path)
+                        disabled = not file_exists(syllabus_path)
                         if not disabled:
-                            with open(syllabus_path, "rb") as file:
-                                st.download_button(
-                                    label=":material/download:",
-                                    data=file,
-                                    file_name=syllabus_path.split("/")[-1],
-                                    mime="application/pdf",
-                                    key=f"download_syllabus_{section}_{row['Book ID']}",
-                                    disabled=disabled,
-                                    help="Download Syllabus",
-                                    on_click=lambda: log_activity(
-                                        conn,
-                                        st.session_state.user_id,
-                                        st.session_state.username,
-                                        st.session_state.session_id,
-                                        "downloaded syllabus",
-                                        f"Book ID: {row['Book ID']}"
-                                    )
+                            download_file_button(
+                                label=":material/download:",
+                                path=syllabus_path,
+                                mime="application/pdf",
+                                key=f"download_syllabus_{section}_{row['Book ID']}",
+                                disabled=disabled,
+                                help="Download Syllabus",
+                                on_click=lambda: log_activity(
+                                    conn,
+                                    st.session_state.user_id,
+                                    st.session_state.username,
+                                    st.session_state.session_id,
+                                    "downloaded syllabus",
+                                    f"Book ID: {row['Book ID']}"
                                 )
+                            )
                         else:
                             st.download_button(
                                 label=":material/download:",
@@ -2992,25 +2942,23 @@ def render_table(books_df, title, column_sizes, color, section, role, is_running
                     col_idx += 1
                     with col_configs[col_idx]:
                         syllabus_path = row['Syllabus Path']
-                        disabled = pd.isna(syllabus_path) or not syllabus_path or not os.path.exists(syllabus_path)
+                        disabled = not file_exists(syllabus_path)
                         if not disabled:
-                            with open(syllabus_path, "rb") as file:
-                                st.download_button(
-                                    label=":material/download:",
-                                    data=file,
-                                    file_name=syllabus_path.split("/")[-1],
-                                    mime="application/pdf",
-                                    key=f"download_syllabus_{section}_{row['Book ID']}_running",
-                                    disabled=disabled,
-                                    on_click=lambda: log_activity(
-                                        conn,
-                                        st.session_state.user_id,
-                                        st.session_state.username,
-                                        st.session_state.session_id,
-                                        "downloaded syllabus",
-                                        f"Book ID: {row['Book ID']}"
-                                    )
+                            download_file_button(
+                                label=":material/download:",
+                                path=syllabus_path,
+                                mime="application/pdf",
+                                key=f"download_syllabus_{section}_{row['Book ID']}_running",
+                                disabled=disabled,
+                                on_click=lambda: log_activity(
+                                    conn,
+                                    st.session_state.user_id,
+                                    st.session_state.username,
+                                    st.session_state.session_id,
+                                    "downloaded syllabus",
+                                    f"Book ID: {row['Book ID']}"
                                 )
+                            )
                         else:
                             st.download_button(
                                 label=":material/download:",
@@ -3280,67 +3228,21 @@ def calculate_duration(start, end):
 def calculate_active_time(start, end, holds_df, section):
     if pd.isna(start) or pd.isna(end):
         return "Not Started"
-    
-    # Office hours: Monday to Saturday, 9:30 AM to 6:00 PM
-    office_start_hour = 9.5  # 9:30 AM
-    office_end_hour = 18.0   # 6:00 PM
-    office_hours_per_day = office_end_hour - office_start_hour  # 8.5 hours
-    
-    # Initialize total work time
-    current = start
-    total_work_seconds = 0
-    
-    while current < end:
-        # Skip Sundays
-        if current.weekday() == 6:  # Sunday
-            current = current.replace(hour=0, minute=0, second=0) + timedelta(days=1)
-            continue
-            
-        # Determine work period for the day
-        day_start = current.replace(hour=int(office_start_hour), minute=int((office_start_hour % 1) * 60))
-        day_end = current.replace(hour=int(office_end_hour), minute=0)
-        
-        # Adjust if current time is before or after office hours
-        if current < day_start:
-            current = day_start
-        if current >= day_end:
-            current = current.replace(hour=0, minute=0, second=0) + timedelta(days=1)
-            continue
-            
-        # Find end of work period for current day
-        work_end = min(end, day_end)
-        
-        # Check for holds within this period
-        section_holds = holds_df[holds_df['section'] == section]
-        hold_seconds = 0
-        for _, hold in section_holds.iterrows():
-            if pd.notna(hold['hold_start']) and pd.notna(hold['resume_time']):
-                hold_start = max(hold['hold_start'], current)
-                hold_end = min(hold['resume_time'], work_end)
-                if hold_start < hold_end:
-                    # Only count hold time within office hours
-                    hold_time = hold_end - hold_start
-                    hold_seconds += hold_time.total_seconds()
-        
-        # Calculate active work time for this period
-        period_seconds = (work_end - current).total_seconds() - hold_seconds
-        if period_seconds > 0:
-            total_work_seconds += period_seconds
-        
-        # Move to next day
-        current = current.replace(hour=0, minute=0, second=0) + timedelta(days=1)
-    
-    # Convert total seconds to human-readable format
-    days = total_work_seconds // (office_hours_per_day * 3600)
-    remaining_seconds = total_work_seconds % (office_hours_per_day * 3600)
-    hours = remaining_seconds // 3600
-    minutes = (remaining_seconds % 3600) // 60
+
+    # holds_df is already scoped to this book; only closed holds are excluded from active time
+    holds = holds_df[holds_df['resume_time'].notna()] if holds_df is not None and not holds_df.empty else None
+    interval = pd.DataFrame({'Book ID': [holds['book_id'].iloc[0] if holds is not None and not holds.empty else None],
+                             'start': [start], 'end': [end]})
+    total_minutes = working_durations(interval, 'start', 'end', holds, section=section)['working_minutes'].iloc[0]
+
+    # Convert total minutes to human-readable format
+    days, hours, minutes = (int(v[0]) for v in split_working_minutes([total_minutes]))
     if days > 0:
-        return f"{int(days)}d {int(hours)}h {int(minutes)}m"
+        return f"{days}d {hours}h {minutes}m"
     elif hours > 0:
-        return f"{int(hours)}h {int(minutes)}m"
+        return f"{hours}h {minutes}m"
     else:
-        return f"{int(minutes)}m"
+        return f"{minutes}m"
 
 # Format timestamp to DD/MM/YYYY HH:MM AM/PM
 def format_timestamp(ts):
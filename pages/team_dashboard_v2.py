@@ -3,6 +3,7 @@ import warnings
 import pandas as pd
 import os
 import uuid
+from functools import partial
 import altair as alt
 from datetime import datetime, timezone, timedelta, time
 from time import sleep
@@ -13,6 +14,13 @@ from constants import (
     initialize_click_and_session_id, get_total_unread_count, connect_ict_db
 )
 from urllib.parse import urlencode, quote
+from operations_sheet import mark_operations_dirty
+from dimensions import get_dimension, invalidate_columns
+from file_downloads import download_file_button, file_exists, read_file
+from working_time import (
+    working_durations, split_working_minutes, format_day_hours,
+    worker_aggregates, MINUTES_PER_DAY
+)
 
 warnings.simplefilter('ignore')
 
@@ -616,9 +624,7 @@ def fetch_holds(section: str) -> pd.DataFrame:
     return holds_df
 
 def fetch_unique_names(column_name, conn):
-    query = f"SELECT DISTINCT {column_name} FROM books WHERE {column_name} IS NOT NULL"
-    result = conn.query(query, show_spinner=False)
-    return sorted(result[column_name].tolist())
+    return get_dimension(column_name, conn)
 
 def calculate_working_duration(start_date, end_date, hold_periods=None):
     """Calculate duration in working hours (09:30–18:00, Mon–Sat) between two timestamps,
@@ -717,13 +723,17 @@ def get_hold_periods(holds_df, book_id, section, end_date=None):
     relevant = holds_df[(holds_df['book_id'] == book_id) & (holds_df['section'] == section)]
     return [(h['hold_start'], h['resume_time'] or end_date) for _, h in relevant.iterrows()]
 
+def _badge_duration(row, start_date, end_date, book_id, section, holds_df):
+    """Use the precomputed working minutes from smart_table_engine, falling back to the scalar calculator."""
+    if pd.notnull(row.get('working_minutes')):
+        days, hours, minutes = split_working_minutes([row['working_minutes']])
+        return int(days[0]), int(hours[0]), int(minutes[0])
+    return calculate_working_duration(start_date, end_date, hold_periods=get_hold_periods(holds_df, book_id, section))
+
 # --- UI Components ---
 def render_status_badge(row, section, title, is_active, holds_df=None):
     current_date = datetime.now().date()
     book_id = row['Book ID']
-    
-    # Pre-calculate hold periods if holds_df is provided
-    book_holds = get_hold_periods(holds_df, book_id, section)
 
     if "Hold" in title:
         hs = row.get('hold_start', pd.NaT)
@@ -738,13 +748,11 @@ def render_status_badge(row, section, title, is_active, holds_df=None):
             enrolled_days = (current_date - (row['Date'] if isinstance(row['Date'], datetime) else pd.to_datetime(row['Date']).date())).days
             st.markdown(f'<span class="pill status-pending">Pending <span class="since-enrolled">{enrolled_days}d</span></span>', unsafe_allow_html=True)
         elif status == "Running":
-            # Pass holds to duration calculator
-            d, h, m = calculate_working_duration(st_date, datetime.now(), hold_periods=book_holds)
+            d, h, m = _badge_duration(row, st_date, datetime.now(), book_id, section, holds_df)
             time_str = f"{d}d" + (f" {h}h" if h > 0 else "")
             st.markdown(f'<span class="pill status-running">Running <span class="since-enrolled">{time_str}</span></span>', unsafe_allow_html=True)
         elif status == "Completed":
-            # Pass holds to duration calculator
-            d, h, m = calculate_working_duration(st_date, en_date, hold_periods=book_holds)
+            d, h, m = _badge_duration(row, st_date, en_date, book_id, section, holds_df)
             time_str = f"{d}d" + (f" {h}h" if h > 0 else "")
             st.markdown(f'<span class="pill status-completed">Completed <span class="since-enrolled">{time_str}</span></span>', unsafe_allow_html=True)
 
@@ -768,6 +776,13 @@ def smart_table_engine(df, title, section, role, table_type, config, holds_df=No
             if search:
                 filtered_df = df[df['Book ID'].astype(str).str.contains(search, case=False) | df['Title'].str.contains(search, case=False)]
         
+        # Hold-aware working time for every visible row in one vectorized pass
+        if "Hold" not in title and not filtered_df.empty:
+            start_col, end_col = f"{section.capitalize()} Start", f"{section.capitalize()} End"
+            timed_df = filtered_df.assign(_until=filtered_df[end_col].fillna(pd.Timestamp(datetime.now())))
+            spans = working_durations(timed_df, start_col, '_until', holds_df, section=section)
+            filtered_df = filtered_df.assign(working_minutes=spans['working_minutes'])
+
         cols = config['columns'][table_type]
         sizes = config['sizes'][table_type]
         
@@ -809,10 +824,9 @@ def smart_table_engine(df, title, section, role, table_type, config, holds_df=No
                         st.markdown(f'<span class="pill apply-isbn-{"yes" if v == "Yes" else "no"}">{v}</span>', unsafe_allow_html=True)
                     elif c == "Syllabus":
                         p = row.get('Syllabus Path')
-                        disabled = pd.isna(p) or not p or not os.path.exists(p)
+                        disabled = not file_exists(p)
                         if not disabled:
-                            with open(p, "rb") as f:
-                                st.download_button(":material/download:", f, os.path.basename(p), key=f"dl_s_{row['Book ID']}_{table_type}", on_click=lambda: log_activity(conn, user_id, user_name, session_id, "downloaded syllabus", f"ID: {row['Book ID']}"))
+                            download_file_button(":material/download:", p, key=f"dl_s_{row['Book ID']}_{table_type}", on_click=lambda: log_activity(conn, user_id, user_name, session_id, "downloaded syllabus", f"ID: {row['Book ID']}"))
                         else: st.download_button(":material/download:", "", disabled=True, key=f"dl_s_{row['Book ID']}_{table_type}")
                     elif c == "Rating":
                         if st.button("Rate", key=f"rate_{section}_{row['Book ID']}"):
@@ -1005,18 +1019,11 @@ def show_author_details_dialog(book_id):
 
             with cols[6]:
                 photo_path = row.get('Author Photo Path')
-                has_photo = bool(photo_path and os.path.exists(photo_path))
-                photo_data = b""
-                if has_photo:
-                    try:
-                        with open(photo_path, "rb") as file:
-                            photo_data = file.read()
-                    except Exception:
-                        has_photo = False
-                
+                has_photo = file_exists(photo_path)
+
                 st.download_button(
                     label="⬇️ Photo",
-                    data=photo_data,
+                    data=partial(read_file, photo_path) if has_photo else b"",
                     file_name=os.path.basename(photo_path) if has_photo else "none.jpg",
                     mime="image/jpeg",
                     key=f"dl_photo_{row['Author ID']}",
@@ -1342,59 +1349,13 @@ def render_worker_completion_graph(books_df, selected_month, section, holds_df=N
         st.write(f"##### {section.capitalize()} Completed in {selected_month} by {selected_worker}")
         display_columns = ['Book ID', 'Title', f'{section.capitalize()} By', 'Time Taken', 'Start Date', 'Start Time', 'End Date', 'End Time', 'Hold Time'] if 'Title' in books_df.columns else ['Book ID', f'{section.capitalize()} By', 'Time Taken', 'Start Date', 'Start Time', 'End Date', 'End Time', 'Hold Time']
 
-        # Calculate time taken (excluding hold periods)
+        # Calculate time taken (excluding hold periods) and hold time for all books at once
         completed_books = completed_books.copy()  # Avoid modifying original dataframe
-        completed_books['Time Taken'] = completed_books.apply(
-            lambda row: calculate_working_duration(
-                row[start_col],
-                row[end_col],
-                get_hold_periods(holds_df, row['Book ID'], section, row[end_col])
-            ),
-            axis=1
-        )
-        completed_books['Time Taken'] = completed_books['Time Taken'].apply(
-            lambda x: f"{x[0]}d {x[1]}h"
-        )
-
-        def calculate_total_hold_time(row, holds_df, end_col, section):
-            """
-            Calculate total hold time for a book in calendar days and hours.
-            Returns (total_days, remaining_hours) where 1 day = 24 hours.
-            """
-            if holds_df is None or holds_df.empty:
-                return (0, 0)
-            
-            # Filter hold periods for this book and section
-            book_holds = holds_df[(holds_df['book_id'] == row['Book ID']) & (holds_df['section'] == section)]
-            if book_holds.empty:
-                return (0, 0)
-            
-            total_minutes = 0
-            hold_periods = [
-                (h['hold_start'], h['resume_time'] if pd.notnull(h['resume_time']) else row[end_col])
-                for _, h in book_holds.iterrows()
-            ]
-            
-            for hold_start, hold_end in hold_periods:
-                if pd.isna(hold_start) or pd.isna(hold_end) or hold_start >= hold_end:
-                    continue
-                # Calculate duration in calendar days (total time, not working hours)
-                duration = (hold_end - hold_start).total_seconds() / 60
-                total_minutes += duration
-            
-            # Convert total minutes to days and hours (1 day = 24 hours)
-            total_hours = total_minutes / 60.0
-            total_days = int(total_hours // 24)
-            remaining_hours = int(round(total_hours % 24))
-            return (total_days, remaining_hours)
-
-        completed_books['Hold Time'] = completed_books.apply(
-            lambda row: calculate_total_hold_time(row, holds_df, end_col, section),
-            axis=1
-        )
-        completed_books['Hold Time'] = completed_books['Hold Time'].apply(
-            lambda x: f"{x[0]}d {x[1]}h" if x != (0, 0) else "0d 0h"
-        )
+        spans = working_durations(completed_books, start_col, end_col, holds_df, section=section)
+        completed_books['working_minutes'] = spans['working_minutes']
+        days, hours, _ = split_working_minutes(spans['working_minutes'])
+        completed_books['Time Taken'] = [f"{d}d {h}h" for d, h in zip(days, hours)]
+        completed_books['Hold Time'] = format_day_hours(spans['hold_calendar_minutes'], day_minutes=MINUTES_PER_DAY)
 
         # Split Start and End into Date and Time with AM/PM format
         completed_books['Start Date'] = completed_books[start_col].dt.strftime('%Y-%m-%d')
@@ -1411,7 +1372,8 @@ def render_worker_completion_graph(books_df, selected_month, section, holds_df=N
 
     with col2:
         # Group by worker for the bar chart
-        worker_counts = completed_books.groupby(by_col).size().reset_index(name='Book Count')
+        worker_counts = worker_aggregates(completed_books, by_col)
+        worker_counts['Avg Time'] = format_day_hours(worker_counts['Avg Minutes'])
         if selected_worker != 'All':
             worker_counts = worker_counts[worker_counts[by_col] == selected_worker]
         
@@ -1429,7 +1391,7 @@ def render_worker_completion_graph(books_df, selected_month, section, holds_df=N
             x=alt.X('Book Count:Q', title='Number of Books Completed', axis=alt.Axis(values=tick_values, grid=True, gridOpacity=0.3)),
             y=alt.Y(f'{by_col}:N', title='Team Member', sort='-x'),
             color=alt.Color(f'{by_col}:N', scale=alt.Scale(scheme='darkgreen'), legend=None),
-            tooltip=[f'{by_col}:N', 'Book Count:Q']
+            tooltip=[f'{by_col}:N', 'Book Count:Q', 'Avg Time:N']
         )
 
         # Add text labels at the end of the bars
@@ -2359,6 +2321,8 @@ def edit_section_dialog(book_id, conn, section):
                                 params["id"] = int(book_id)
                                 s.execute(text(query), params)
                                 s.commit()
+                            mark_operations_dirty(book_id)
+                            invalidate_columns("books", updates.keys())
                             # Log the start action
                             details = f"Book ID: {book_id}, Start Time: {now}, By: {worker}"
                             try:
@@ -2497,6 +2461,7 @@ def edit_section_dialog(book_id, conn, section):
                                         params["id"] = int(book_id)
                                         s.execute(text(query), params)
                                         s.commit()
+                                    mark_operations_dirty(book_id)
                                     # Log the end action
                                     details = f"Book ID: {book_id}, End Time: {now}, By: {current_worker}"
                                     if needs_pages and book_pages is not None:
@@ -2556,6 +2521,7 @@ def edit_section_dialog(book_id, conn, section):
                                             params["id"] = int(book_id)
                                             s.execute(text(query), params)
                                             s.commit()
+                                        mark_operations_dirty(book_id)
                                         # Log the end action
                                         details = f"Book ID: {book_id}, End Time: {now}, By: {current_worker}"
                                         if needs_pages and book_pages is not None:
@@ -2750,27 +2716,25 @@ def render_correction_table(correction_books, section, conn):
                 with col_configs[6]:
                     file_path = row.get('Correction File')
                     corr_text = row.get('Correction Text')
-                    has_file = pd.notnull(file_path) and file_path and os.path.exists(file_path)
+                    has_file = file_exists(file_path)
                     has_text = pd.notnull(corr_text) and str(corr_text).strip() != ""
 
                     if has_file:
-                        with open(file_path, "rb") as file:
-                            st.download_button(
-                                label=":material/download:",
-                                data=file,
-                                file_name=os.path.basename(file_path),
-                                mime="application/octet-stream",
-                                key=f"dl_corr_file_{section}_{row['Book ID']}",
-                                help="Download Correction File",
-                                on_click=lambda: log_activity(
-                                    conn,
-                                    st.session_state.user_id,
-                                    st.session_state.username,
-                                    st.session_state.session_id,
-                                    "downloaded correction file",
-                                    f"Book ID: {row['Book ID']}, Section: {section}, File: {os.path.basename(file_path)}"
-                                )
+                        download_file_button(
+                            label=":material/download:",
+                            path=file_path,
+                            mime="application/octet-stream",
+                            key=f"dl_corr_file_{section}_{row['Book ID']}",
+                            help="Download Correction File",
+                            on_click=lambda: log_activity(
+                                conn,
+                                st.session_state.user_id,
+                                st.session_state.username,
+                                st.session_state.session_id,
+                                "downloaded correction file",
+                                f"Book ID: {row['Book ID']}, Section: {section}, File: {os.path.basename(file_path)}"
                             )
+                        )
                     elif has_text:
                         st.download_button(
                             label=":material/download:",
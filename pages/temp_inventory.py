@@ -2,7 +2,8 @@ import streamlit as st
 import pandas as pd
 import time
 from auth import validate_token
-from constants import connect_db, initialize_click_and_session_id, log_activity
+from constants import connect_db, initialize_click_and_session_id, log_activity, fetch_stock_ledger, invalidate_stock_ledger
+from migrations import require_schema
 from sqlalchemy import text
 
 # Page configuration
@@ -43,6 +44,7 @@ st.markdown("""
 # Authentication and Session Initialization
 validate_token()
 initialize_click_and_session_id()
+require_schema("mysql")
 
 if 'pending_page' not in st.session_state:
     st.session_state['pending_page'] = 1
@@ -139,58 +141,24 @@ def update_physical_count(book_id, title, current_cell, current_stock, temp_coun
                 
                 st.success("Updated successfully!")
                 time.sleep(1)
-                st.cache_data.clear()
+                invalidate_stock_ledger()
                 st.rerun()
         except Exception as e:
             st.error(f"Error updating: {str(e)}")
 
 def fetch_inventory_data():
-    conn = connect_db()
-    query = """
-    SELECT
-        b.book_id,
-        b.title,
-        i.rack_number,
-        COALESCE(i.temp_physical_count, 0) as temp_physical_count,
-        COALESCE(i.inventory_check_done, 0) as inventory_check_done,
-        COALESCE(
-            (SELECT SUM(bd.copies_in_batch) 
-             FROM BatchDetails bd 
-             JOIN PrintEditions pe ON bd.print_id = pe.print_id 
-             WHERE pe.book_id = b.book_id), 
-            0
-        ) AS total_printed,
-        COALESCE(
-            (SELECT SUM(ba.number_of_books) 
-             FROM book_authors ba 
-             WHERE ba.book_id = b.book_id), 
-            0
-        ) AS author_copies,
-        COALESCE(i.website_sales, 0) AS website_sales,
-        COALESCE(i.amazon_sales, 0) AS amazon_sales,
-        COALESCE(i.flipkart_sales, 0) AS flipkart_sales,
-        COALESCE(i.direct_sales, 0) AS direct_sales
-    FROM books b
-    LEFT JOIN inventory i ON b.book_id = i.book_id
-    WHERE b.deliver = 1
-    """
-    df = conn.query(query, show_spinner="Fetching inventory data...")
-    
-    # Fill NaN values for numeric columns to prevent conversion errors
-    numeric_cols = ['total_printed', 'author_copies', 'website_sales', 'amazon_sales', 'flipkart_sales', 'direct_sales', 'temp_physical_count']
-    df[numeric_cols] = df[numeric_cols].fillna(0).astype(int)
-    
-    # Calculate System Stock
-    df['System Stock'] = (
-        df['total_printed'] - 
-        df['author_copies'] - 
-        df['website_sales'] - 
-        df['amazon_sales'] - 
-        df['flipkart_sales'] - 
-        df['direct_sales']
-    )
-    
-    return df
+    # Delivered books from the shared stock ledger, in this page's column names
+    ledger = fetch_stock_ledger(connect_db())
+    df = ledger.loc[ledger['deliver'] == 1, [
+        'book_id', 'title', 'rack_number', 'temp_physical_count', 'inventory_check_done',
+        'printed', 'sent_to_authors', 'website_sales', 'amazon_sales', 'flipkart_sales',
+        'direct_sales', 'on_hand'
+    ]].rename(columns={
+        'printed': 'total_printed',
+        'sent_to_authors': 'author_copies',
+        'on_hand': 'System Stock'
+    })
+    return df.reset_index(drop=True)
 
 # Header Section
 col1, col2 = st.columns([7, 1.5])
@@ -199,6 +167,7 @@ with col1:
 with col2:
     if st.button("🔄 Refresh Data", type="secondary", use_container_width=True):
         st.cache_data.clear()
+        invalidate_stock_ledger()
         st.rerun()
 
 try:
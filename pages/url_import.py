@@ -7,6 +7,7 @@ import gzip
 import time
 import requests
 from datetime import datetime, timedelta
+from operations_sheet import mark_operations_dirty
 
 try:
     from rapidfuzz import process as rf_process, fuzz as rf_fuzz
@@ -315,6 +316,7 @@ def run_import(importable: list, db_column: str, no_matches: list, already_have_
 
         try:
             s.commit()
+            mark_operations_dirty(*success_ids)
             bar.empty()
             st.success(f"✅ Successfully updated **{len(success_ids)}** books!")
             for f in failed_rows:
@@ -0,0 +1,161 @@
+# team_timesheets.py
+#
+# One week of timesheets for a manager's whole team, loaded with a single
+# range query and summarized per user (hours, downtime, leaves, missing days,
+# status) with pandas instead of one set of queries per report. Results are
+# shared by every session in the process, keyed by manager and week, and
+# dropped when a report submits or a timesheet is reviewed
+# (mark_timesheet_changed).
+
+import threading
+import time
+from datetime import timedelta
+
+import pandas as pd
+import streamlit as st
+
+# Safety net for writes that do not call mark_timesheet_changed (e.g. new work entries)
+TEAM_WEEK_TTL_SECONDS = 120
+
+DOWNTIME_TYPES = ['power_cut', 'no_internet', 'system_failure', 'other']
+
+# Every timesheet of the team for the fiscal week, with that week's work rows.
+# Same columns as tasks.get_weekly_timesheet_details plus user_id.
+TEAM_WEEK_SQL = """
+    SELECT
+        t.user_id,
+        w.id,
+        w.work_date,
+        w.entry_type,
+        w.work_name,
+        COALESCE(w.work_description, '') AS work_description,
+        COALESCE(w.reason, '') AS reason,
+        w.work_duration,
+        t.id AS timesheet_id,
+        t.status,
+        t.submitted_at,
+        t.reviewed_at,
+        COALESCE(t.review_notes, '') AS review_notes,
+        m.username AS manager_name
+    FROM timesheets t
+    LEFT JOIN work w ON w.timesheet_id = t.id AND w.work_date BETWEEN :start_date AND :end_date
+    LEFT JOIN userss m ON t.manager_id = m.id
+    WHERE t.user_id IN :user_ids AND t.fiscal_week = :fiscal_week
+    ORDER BY t.user_id, w.work_date ASC, w.id ASC
+"""
+
+
+def load_team_week(conn, user_ids, week_start):
+    """Work rows of each user's timesheet for the week starting week_start (a Monday)."""
+    params = {
+        "user_ids": tuple(int(u) for u in user_ids),
+        "fiscal_week": week_start.isocalendar()[1],
+        "start_date": week_start,
+        "end_date": week_start + timedelta(days=6),
+    }
+    rows = conn.query(TEAM_WEEK_SQL, params=params, ttl=0, show_spinner=False)
+    if rows.empty:
+        return rows
+    rows['work_date'] = pd.to_datetime(rows['work_date']).dt.date
+    rows['submitted_at'] = pd.to_datetime(rows['submitted_at'])
+    rows['reviewed_at'] = pd.to_datetime(rows['reviewed_at'])
+    # fiscal_week has no year: keep one timesheet per user, preferring the one
+    # with work in this week's dates, then the newest
+    rows['has_work'] = rows['id'].notna()
+    per_sheet = rows.groupby(['user_id', 'timesheet_id'], as_index=False)['has_work'].any()
+    chosen = per_sheet.sort_values(['user_id', 'has_work', 'timesheet_id']).groupby('user_id').tail(1)['timesheet_id']
+    return rows[rows['timesheet_id'].isin(chosen)].drop(columns='has_work').reset_index(drop=True)
+
+
+def summarize_team_week(reports, rows, week_start, today):
+    """Per-report totals, missing days (up to today) and status for one week."""
+    summary = reports[['id', 'username']].rename(columns={'id': 'user_id'}).set_index('user_id')
+    work = rows.dropna(subset=['id']) if not rows.empty else rows
+
+    if rows.empty:
+        sheets = pd.DataFrame(columns=['timesheet_id', 'status', 'submitted_at', 'reviewed_at'])
+    else:
+        sheets = rows.groupby('user_id')[['timesheet_id', 'status', 'submitted_at', 'reviewed_at']].first()
+    summary = summary.join(sheets)
+    summary['status'] = summary['status'].fillna('not started')
+
+    if work.empty:
+        hours = pd.DataFrame(index=summary.index)
+        leave_days = half_days = pd.Series(dtype=float)
+        filled = pd.DataFrame(index=summary.index)
+    else:
+        hours = work.pivot_table(index='user_id', columns='entry_type', values='work_duration',
+                                 aggfunc='sum', fill_value=0)
+        leave_days = work[work['entry_type'] == 'leave'].groupby('user_id')['work_date'].nunique()
+        half_days = work[work['entry_type'] == 'half_day'].groupby('user_id')['work_date'].nunique()
+        filled = pd.crosstab(work['user_id'], work['work_date']) > 0
+
+    summary['logged_hours'] = hours.sum(axis=1)
+    summary['working_hours'] = hours['work'] if 'work' in hours else 0
+    summary['downtime_hours'] = hours[[c for c in DOWNTIME_TYPES if c in hours]].sum(axis=1)
+    summary['leaves'] = leave_days
+    summary['half_days'] = half_days
+
+    # Mon..Sat that have started, as a user x day matrix of "has an entry"
+    days = [week_start + timedelta(days=i) for i in range(6) if week_start + timedelta(days=i) <= today]
+    filled = filled.reindex(index=summary.index, columns=days, fill_value=False).fillna(False).astype(bool)
+    missing = ~filled
+    summary['missing_days'] = missing.sum(axis=1)
+    names = pd.Index([d.strftime('%a') for d in days])
+    summary['missing'] = missing.dot(names + ', ').str.rstrip(', ') if days else ''
+
+    for column in ['logged_hours', 'working_hours', 'downtime_hours']:
+        summary[column] = summary[column].fillna(0).round(2)
+    for column in ['leaves', 'half_days', 'missing_days']:
+        summary[column] = summary[column].fillna(0).astype(int)
+    return summary.reset_index()
+
+
+class TeamTimesheets:
+    """Team weeks by (manager, week start), shared by every session in the process."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = {}  # (manager_id, week_start) -> (user_ids, rows, summary, loaded_at)
+
+    def get(self, conn, manager_id, reports, week_start, today):
+        key = (int(manager_id), week_start)
+        user_ids = frozenset(int(u) for u in reports['id'])
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and entry[0] == user_ids and time.time() - entry[3] < TEAM_WEEK_TTL_SECONDS:
+                return entry[1], entry[2]
+        rows = load_team_week(conn, user_ids, week_start) if user_ids else pd.DataFrame()
+        summary = summarize_team_week(reports, rows, week_start, today)
+        with self.lock:
+            self.entries[key] = (user_ids, rows, summary, time.time())
+        return rows, summary
+
+    def invalidate_user(self, user_id):
+        with self.lock:
+            for key in [k for k, e in self.entries.items() if int(user_id) in e[0]]:
+                del self.entries[key]
+
+
+@st.cache_resource
+def get_team_timesheets():
+    return TeamTimesheets()
+
+
+def get_team_week(conn, manager_id, reports, week_start, today):
+    """(work rows, per-user summary) for manager_id's reports in the week starting week_start."""
+    return get_team_timesheets().get(conn, manager_id, reports, week_start, today)
+
+
+def user_week_rows(rows, user_id):
+    """One user's rows from get_team_week, shaped like get_weekly_timesheet_details."""
+    if rows.empty:
+        return rows
+    user_rows = rows[(rows['user_id'] == int(user_id)) & rows['id'].notna()].drop(columns='user_id')
+    user_rows['id'] = user_rows['id'].astype(int)
+    return user_rows.reset_index(drop=True)
+
+
+def mark_timesheet_changed(user_id):
+    """Call after a timesheet of user_id is submitted, approved or sent back."""
+    get_team_timesheets().invalidate_user(user_id)
@@ -0,0 +1,161 @@
+# uploads.py
+#
+# Saving uploaded files (author photos, syllabi). Originals are stored under
+# their content hash, so uploading the same file again reuses the copy on
+# disk. Images also get WebP variants at upload time: a small thumbnail for
+# list views and a size-bounded display copy. Variants live next to the
+# originals in thumbs/ and web/, named after the original's file name, so
+# files saved before this module existed get them too (on first view or
+# through the upload_backfill job).
+
+import hashlib
+import os
+
+from PIL import Image, ImageOps
+from sqlalchemy import text
+
+from file_downloads import file_exists, forget_file
+from jobs import job_handler, query_frame
+
+THUMBNAIL_PX = 256
+DISPLAY_PX = 1600
+WEBP_QUALITY = 80
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp"}
+
+# (table, key, path column) for every column holding stored upload paths
+UPLOAD_COLUMNS = {
+    "author_photo": ("authors", "author_id", "author_photo"),
+    "syllabus": ("books", "book_id", "syllabus_path"),
+}
+
+# Originals thumbnail_for could not decode, so lists stop retrying them on
+# every rerun. Per process; paths are content hashes, so a failure is final.
+_unreadable = set()
+
+
+def _variant_path(path, folder, size):
+    directory, name = os.path.split(path)
+    return os.path.join(directory, folder, f"{name}.{size}.webp")
+
+
+def thumbnail_path(path):
+    return _variant_path(path, "thumbs", THUMBNAIL_PX)
+
+
+def display_path(path):
+    return _variant_path(path, "web", DISPLAY_PX)
+
+
+def is_image(path):
+    return os.path.splitext(str(path))[1].lower() in IMAGE_EXTENSIONS
+
+
+def _write_webp(image, path, max_px):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    variant = image.copy()
+    variant.thumbnail((max_px, max_px), Image.Resampling.LANCZOS)
+    tmp = f"{path}.tmp"
+    variant.save(tmp, "WEBP", quality=WEBP_QUALITY, method=4)
+    os.replace(tmp, path)
+    forget_file(path)
+
+
+def make_variants(path, overwrite=False):
+    """Write the thumbnail and display WebP for an image file. Returns how many were written."""
+    targets = [(p, px) for p, px in ((thumbnail_path(path), THUMBNAIL_PX), (display_path(path), DISPLAY_PX))
+               if overwrite or not os.path.exists(p)]
+    if not targets:
+        return 0
+    with Image.open(path) as image:
+        # Phone photos are often stored sideways with an EXIF rotation
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+        for target, px in targets:
+            _write_webp(image, target, px)
+    return len(targets)
+
+
+def store_upload(uploaded_file, directory):
+    """
+    Save a Streamlit UploadedFile under directory as <sha256><ext> and return
+    the path. An identical file already on disk is reused instead of rewritten.
+    Images get their WebP variants here.
+    """
+    data = uploaded_file.getvalue()
+    extension = os.path.splitext(uploaded_file.name)[1].lower()
+    path = os.path.join(directory, hashlib.sha256(data).hexdigest() + extension)
+    os.makedirs(directory, exist_ok=True)
+    if not os.path.exists(path):
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        forget_file(path)
+    if is_image(path):
+        try:
+            make_variants(path)
+        except Exception:
+            # Not a readable image after all; the original is still stored
+            pass
+    return path
+
+
+def thumbnail_for(path):
+    """Thumbnail path to show in lists, built on first use for older files. Falls back to path."""
+    if not path or not is_image(path):
+        return path
+    if path in _unreadable:
+        return path
+    thumb = thumbnail_path(path)
+    if file_exists(thumb):
+        return thumb
+    try:
+        make_variants(path)
+        return thumb
+    except FileNotFoundError:
+        return path
+    except Exception:
+        _unreadable.add(path)
+        return path
+
+
+def release_upload(conn, kind, path):
+    """
+    Delete a replaced upload and its variants unless another row still points
+    at it (identical uploads share one file). Call after the row stops using it.
+    """
+    if not path:
+        return
+    table, _, column = UPLOAD_COLUMNS[kind]
+    with conn.session as s:
+        in_use = s.execute(text(f"SELECT COUNT(*) FROM {table} WHERE {column} = :path"), {"path": path}).scalar()
+    if in_use:
+        return
+    for p in (path, thumbnail_path(path), display_path(path)):
+        try:
+            os.remove(p)
+        except OSError:
+            pass
+        forget_file(p)
+    _unreadable.discard(path)
+
+
+@job_handler("upload_backfill")
+def run_upload_backfill(job):
+    """Build missing thumbnails and WebP copies for every stored author photo."""
+    table, key, column = UPLOAD_COLUMNS["author_photo"]
+    rows = query_frame(job.conn, f"SELECT {key}, {column} AS path FROM {table} WHERE {column} IS NOT NULL AND {column} != ''")
+    paths = sorted({p for p in rows["path"] if is_image(p)}) if not rows.empty else []
+    written, missing, failed = 0, 0, 0
+    for done, path in enumerate(paths, start=1):
+        if not os.path.exists(path):
+            missing += 1
+        else:
+            try:
+                written += make_variants(path)
+            except Exception:
+                failed += 1
+        job.progress(done / len(paths), f"{done}/{len(paths)} photos")
+    return f"{len(paths)} photos checked, {written} variants written, {missing} missing, {failed} unreadable"
+
@@ -0,0 +1,154 @@
+# working_time.py
+
+import numpy as np
+import pandas as pd
+
+# Office hours: Monday to Saturday, 9:30 AM to 6:00 PM
+WORK_DAY_START_MINUTE = 9 * 60 + 30
+WORK_DAY_MINUTES = 8.5 * 60
+WORK_DAYS_PER_WEEK = 6  # Sunday is off
+MINUTES_PER_DAY = 24 * 60
+
+
+def _to_datetime64(values) -> np.ndarray:
+    """Coerce a scalar, list or Series of timestamps into a naive datetime64[ns] array."""
+    ts = pd.to_datetime(values if isinstance(values, pd.Series) else pd.Series(values), errors='coerce')
+    if getattr(ts.dt, 'tz', None) is not None:
+        ts = ts.dt.tz_localize(None)
+    return ts.to_numpy(dtype='datetime64[ns]')
+
+
+def working_clock(values) -> np.ndarray:
+    """
+    Map timestamps onto a monotonic "office minutes" clock.
+
+    working_clock(b) - working_clock(a) is the number of office-hour minutes
+    between a and b, so any interval is measured with two lookups instead of a
+    day-by-day walk. NaT maps to NaN.
+    """
+    arr = _to_datetime64(values)
+    nat = np.isnat(arr)
+    minutes = arr.astype('int64') / 60e9
+
+    days = np.floor(minutes / MINUTES_PER_DAY)
+    minute_of_day = minutes - days * MINUTES_PER_DAY
+
+    # 1970-01-01 was a Thursday; shift so Monday = 0 ... Sunday = 6
+    weeks, weekday = np.divmod(days + 3, 7)
+    work_days_before = weeks * WORK_DAYS_PER_WEEK + np.minimum(weekday, WORK_DAYS_PER_WEEK)
+    minutes_today = np.where(
+        weekday < WORK_DAYS_PER_WEEK,
+        np.clip(minute_of_day - WORK_DAY_START_MINUTE, 0, WORK_DAY_MINUTES),
+        0
+    )
+
+    clock = work_days_before * WORK_DAY_MINUTES + minutes_today
+    clock[nat] = np.nan
+    return clock
+
+
+def working_durations(intervals_df, start_col, end_col, holds_df=None, section=None, key_col='Book ID'):
+    """
+    Compute hold-aware durations for every row of intervals_df at once.
+
+    Returns a DataFrame aligned to intervals_df.index with:
+    - working_minutes: office-hour minutes between start and end, minus holds
+    - hold_working_minutes: office-hour minutes spent on hold inside the interval
+    - hold_calendar_minutes: wall-clock minutes of all holds for the row
+    Open holds (no resume_time) are treated as lasting until the interval end.
+    Overlapping holds are merged so no minute is subtracted twice.
+    """
+    index = intervals_df.index
+    starts = _to_datetime64(intervals_df[start_col])
+    ends = _to_datetime64(intervals_df[end_col])
+    start_clock = working_clock(starts)
+    end_clock = working_clock(ends)
+
+    gross = np.where(
+        np.isnan(start_clock) | np.isnan(end_clock) | (ends <= starts),
+        0.0,
+        end_clock - start_clock
+    )
+    hold_working = np.zeros(len(index))
+    hold_calendar = np.zeros(len(index))
+
+    if holds_df is not None and not holds_df.empty and len(index):
+        holds = holds_df
+        if section is not None and 'section' in holds.columns:
+            holds = holds[holds['section'] == section]
+
+        rows = pd.DataFrame({
+            'row': np.arange(len(index)),
+            'book_id': intervals_df[key_col].to_numpy(),
+            'start': starts,
+            'end': ends,
+        })
+        merged = rows.merge(
+            pd.DataFrame({
+                'book_id': holds['book_id'].to_numpy(),
+                'hold_start': _to_datetime64(holds['hold_start']),
+                'hold_end': _to_datetime64(holds['resume_time']),
+            }),
+            on='book_id',
+            how='inner'
+        )
+        merged = merged[merged['hold_start'].notna() & merged['end'].notna()].copy()
+
+        if not merged.empty:
+            # Open holds run until the end of the interval
+            merged['hold_end'] = merged['hold_end'].fillna(merged['end'])
+
+            calendar = (merged['hold_end'] - merged['hold_start']).dt.total_seconds() / 60
+            calendar = calendar.where(calendar > 0, 0.0)
+            np.add.at(hold_calendar, merged['row'].to_numpy(), calendar.to_numpy())
+
+            # Clip each hold to its interval, then take the union per row
+            clipped_start = merged[['hold_start', 'start']].max(axis=1)
+            clipped_end = merged[['hold_end', 'end']].min(axis=1)
+            merged = merged.assign(clipped_start=clipped_start, clipped_end=clipped_end)
+            merged = merged[merged['clipped_start'] < merged['clipped_end']]
+
+            if not merged.empty:
+                merged = merged.sort_values(['row', 'clipped_start'])
+                merged['running_end'] = merged.groupby('row')['clipped_end'].cummax()
+                prev_end = merged.groupby('row')['running_end'].shift()
+                effective_start = merged['clipped_start'].where(
+                    prev_end.isna() | (merged['clipped_start'] > prev_end), prev_end
+                )
+                covered = working_clock(merged['clipped_end']) - working_clock(effective_start)
+                covered = np.where(covered > 0, covered, 0.0)
+                np.add.at(hold_working, merged['row'].to_numpy(), covered)
+
+    return pd.DataFrame({
+        'working_minutes': np.maximum(gross - hold_working, 0.0),
+        'hold_working_minutes': hold_working,
+        'hold_calendar_minutes': hold_calendar,
+    }, index=index)
+
+
+def split_working_minutes(minutes):
+    """Split office minutes into (days, hours, minutes) arrays where 1 day = 8.5 hours."""
+    minutes = np.round(np.asarray(minutes, dtype=float))
+    days, remainder = np.divmod(minutes, WORK_DAY_MINUTES)
+    hours, mins = np.divmod(remainder, 60)
+    return days.astype(int), hours.astype(int), mins.astype(int)
+
+
+def format_day_hours(minutes, day_minutes=WORK_DAY_MINUTES):
+    """Format minutes as 'Xd Yh' strings, rounding to the nearest hour."""
+    minutes = np.asarray(minutes, dtype=float)
+    days, remainder = np.divmod(minutes, day_minutes)
+    hours = np.round(remainder / 60).astype(int)
+    return [f"{int(d)}d {h}h" for d, h in zip(days, hours)]
+
+
+def worker_aggregates(df, by_col, minutes_col='working_minutes'):
+    """Per-worker book count, total and average office minutes."""
+    if df.empty:
+        return pd.DataFrame(columns=[by_col, 'Book Count', 'Total Minutes', 'Avg Minutes'])
+    return (
+        df.groupby(by_col)[minutes_col]
+        .agg(['count', 'sum', 'mean'])
+        .rename(columns={'count': 'Book Count', 'sum': 'Total Minutes', 'mean': 'Avg Minutes'})
+        .reset_index()
+    )